@@ -19,6 +19,51 @@ class Settings(BaseSettings):
     # Database - usar configuración centralizada
     mongodb_url: str = f"mongodb://{database_config['host']}:{database_config['port']}"
     database_name: str = "sistema_contable_ec"
+    # Transacciones multi-documento para mayorización (requiere replica set)
+    mongodb_transactions: bool = True
+    
+    # Perfilador de comandos Mongo por petición
+    profiler_enabled: bool = True
+    profiler_max_round_trips: int = 25  # peticiones con más comandos se registran en el log
+    profiler_slow_command_ms: float = 100.0
+    
+    # Métricas en formato Prometheus (/metrics)
+    metrics_enabled: bool = True
+    
+    # Compresión de respuestas (gzip; brotli si el paquete está instalado)
+    compression_enabled: bool = True
+    compression_min_size: int = 1024  # bytes
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    
+    # Logging estructurado (QueueHandler + QueueListener)
+    log_level: str = "INFO"
+    log_levels: str = ""  # niveles por módulo: "app.services.ledger_service=DEBUG,app.routes.journal=WARNING"
+    log_format: str = "json"  # json | text
+    log_queue_size: int = 10000
+    
+    # Caché de resultados de reportes (LRU por empresa, reporte, parámetros y versión de datos)
+    report_cache_enabled: bool = True
+    report_cache_max_entries: int = 256
+    report_cache_max_bytes: int = 64 * 1024 * 1024
+    # Reportes consolidados: empresas calculadas a la vez
+    consolidation_max_concurrency: int = 4
+    # Flujo de efectivo: clasificación de cuentas que complementa la de omisión
+    cash_flow_sections: str = ""  # "1101=efectivo,1402=ajuste,2201=financiamiento"
+    # Cierre de períodos: cuenta de patrimonio que recibe el resultado del ejercicio
+    closing_result_account: str = "3201"
+    # Fecha de bloqueo por empresa en memoria: segundos antes de releerla (cierres de otros procesos)
+    period_lock_cache_ttl: float = 30.0
+    # Agregaciones del mayor dentro del período bloqueado guardadas en memoria (inmutables)
+    sealed_ledger_max_entries: int = 512
+    # Formulario 104: roles de cuentas y de tipos de comprobante que complementan los de omisión
+    sri_104_accounts: str = ""       # "4101=ventas_gravadas,2103=iva_ventas,1105=iva_compras"
+    sri_104_receipt_types: str = ""  # "04=nota_credito,07=excluido"
+    # Formulario 103: conceptos de las cuentas de retención y roles de tipos de comprobante
+    sri_103_accounts: str = ""       # "2104=servicios_profesionales,2105=arrendamiento"
+    sri_103_receipt_types: str = ""  # "07=retencion,00=excluido"
+    # ATS generado en segundo plano: directorio de los archivos (vacío = temporal del sistema)
+    ats_export_dir: str = ""
     
     # Backend - usar configuración centralizada
     backend_port: int = backend_config['port']
@@ -1,4 +1,5 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -24,14 +25,37 @@ from app.models.audit import AuditLog
 from app.models.ledger import LedgerEntry
 from app.models.document_type import DocumentType
 from app.models.document_reservation import DocumentNumberReservation
+from app.models.company_version import CompanyVersion
+from app.models.period_closing import PeriodClosing, PeriodLock, FiscalArchive
+from app.models.ats_export import AtsExport
 from app.routes import auth, users, companies, accounts, journal, reports, sri, ledger
 from app.routes import document_types
 from app.routes import document_reservations
 from app.routes import database
+from app.routes import monitoring
+from app.routes import closings
+from app.services.query_profiler import profiler, QueryProfilerMiddleware
+from app.services.metrics import metrics, MetricsMiddleware
+from app.services.chart_cache import chart_cache
+from app.services.report_cache import report_cache
+from app.services.period_locks import period_locks
+from app.services.ledger_archive import ledger_archives
+from app.services.logging_setup import configure_logging, shutdown_logging
+from app.services.data_version import DataVersionMiddleware, data_versions
+from app.services.compression import CompressionMiddleware
+
+# Los listeners de pymongo deben registrarse antes de crear cualquier cliente Motor
+profiler.register()
+metrics.register()
+metrics.register_cache("chart_of_accounts", chart_cache)
+metrics.register_cache("reports", report_cache)
+metrics.register_cache("period_locks", period_locks)
+metrics.register_cache("sealed_ledger", ledger_archives)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_logging()
     client = AsyncIOMotorClient(settings.mongodb_url)
     database = client[settings.database_name]
     
@@ -45,15 +69,22 @@ async def lifespan(app: FastAPI):
             AuditLog,
             LedgerEntry,
             DocumentType,
-            DocumentNumberReservation
+            DocumentNumberReservation,
+            CompanyVersion,
+            PeriodClosing,
+            PeriodLock,
+            FiscalArchive,
+            AtsExport
         ],
         allow_index_dropping=True
     )
+    await data_versions.ensure_epoch()
     
     yield
     
     # Shutdown
     client.close()
+    shutdown_logging()
 
 app = FastAPI(
     title=settings.app_name,
@@ -134,6 +165,15 @@ app.add_middleware(
     max_age=600,
 )
 
+# Perfilador de comandos Mongo por petición (ver /api/monitoring/queries)
+app.add_middleware(QueryProfilerMiddleware)
+# Métricas por ruta en formato Prometheus (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+# Versión de datos por empresa: ETag / If-None-Match en lecturas, incremento en escrituras
+app.add_middleware(DataVersionMiddleware)
+# Compresión gzip/brotli (más externo: las métricas registran el tamaño sin comprimir)
+app.add_middleware(CompressionMiddleware)
+
 # Routes
 app.include_router(auth.router, prefix="/api/auth", tags=["Autenticación"])
 app.include_router(users.router, prefix="/api/users", tags=["Usuarios"])
@@ -142,10 +182,12 @@ app.include_router(accounts.router, prefix="/api/accounts", tags=["Cuentas Conta
 app.include_router(journal.router, prefix="/api/journal", tags=["Diario Contable"])
 app.include_router(ledger.router, prefix="/api/ledger", tags=["Mayor General"])
 app.include_router(reports.router, prefix="/api/reports", tags=["Reportes"])
+app.include_router(closings.router, prefix="/api/closings", tags=["Cierre de Períodos"])
 app.include_router(sri.router, prefix="/api/sri", tags=["Declaraciones SRI"])
 app.include_router(document_types.router, prefix="/api", tags=["Tipos de Documentos"])
 app.include_router(document_reservations.router, prefix="/api", tags=["Reservas de Documentos"])
 app.include_router(database.router, prefix="/api/database", tags=["Base de Datos"])
+app.include_router(monitoring.router, prefix="/api/monitoring", tags=["Monitoreo"])
 
 @app.get("/")
 async def root():
@@ -159,6 +201,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -2,6 +2,7 @@ from beanie import Document
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from app.models.money import Money, ZERO
 from enum import Enum
 
 class AccountType(str, Enum):
@@ -28,12 +29,14 @@ class Account(Document):
     is_active: bool = True
     is_editable: bool = True
     # Saldos de la cuenta
-    initial_debit_balance: float = 0.0
-    initial_credit_balance: float = 0.0
-    current_debit_balance: float = 0.0
-    current_credit_balance: float = 0.0
+    initial_debit_balance: Money = ZERO
+    initial_credit_balance: Money = ZERO
+    current_debit_balance: Money = ZERO
+    current_credit_balance: Money = ZERO
     # Fecha de último movimiento
     last_transaction_date: Optional[datetime] = None
+    # Revisión para control de concurrencia optimista (compare-and-swap)
+    revision: int = 0
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
     created_by: str
@@ -51,14 +54,16 @@ class AccountCreate(BaseModel):
     parent_code: Optional[str] = None
     level: int = 1
     is_editable: bool = True
-    initial_debit_balance: float = 0.0
-    initial_credit_balance: float = 0.0
+    initial_debit_balance: Money = ZERO
+    initial_credit_balance: Money = ZERO
 
 class AccountUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     is_active: Optional[bool] = None
     is_editable: Optional[bool] = None
+    # Revisión leída por el cliente; si no coincide se responde 409
+    revision: Optional[int] = None
 
 class AccountResponse(BaseModel):
     id: str
@@ -72,24 +77,25 @@ class AccountResponse(BaseModel):
     company_id: str
     is_active: bool
     is_editable: bool
-    initial_debit_balance: float
-    initial_credit_balance: float
-    current_debit_balance: float
-    current_credit_balance: float
+    initial_debit_balance: Money
+    initial_credit_balance: Money
+    current_debit_balance: Money
+    current_credit_balance: Money
     last_transaction_date: Optional[datetime]
+    revision: int = 0
     created_at: datetime
     updated_at: datetime
 
 class AccountBalance(BaseModel):
     account: AccountResponse
-    debit_balance: float = 0.0
-    credit_balance: float = 0.0
-    net_balance: float = 0.0
+    debit_balance: Money = ZERO
+    credit_balance: Money = ZERO
+    net_balance: Money = ZERO
 
 class InitialBalanceUpdate(BaseModel):
     account_code: str
-    initial_debit_balance: float = 0.0
-    initial_credit_balance: float = 0.0
+    initial_debit_balance: Money = ZERO
+    initial_credit_balance: Money = ZERO
     name: Optional[str] = None
     account_type: Optional[AccountType] = None
     nature: Optional[AccountNature] = None
@@ -106,6 +112,6 @@ class ChartOfAccountsExport(BaseModel):
     name: str
     account_type: str
     nature: str
-    initial_debit_balance: float = 0.0
-    initial_credit_balance: float = 0.0
+    initial_debit_balance: Money = ZERO
+    initial_credit_balance: Money = ZERO
 
@@ -0,0 +1,60 @@
+from beanie import Document
+from pymongo import IndexModel
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+from enum import Enum
+
+
+class AtsExportStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class AtsExport(Document):
+    """
+    Generación en segundo plano del Anexo Transaccional Simplificado de un mes. El
+    documento es el estado del trabajo (avance en comprobantes escritos) y, al
+    terminar, la ubicación del archivo para descargarlo.
+    """
+    company_id: str
+    period: str  # YYYY-MM
+    zipped: bool = True
+    status: AtsExportStatus = AtsExportStatus.PENDING
+    documents: int = 0  # Comprobantes escritos hasta ahora
+    step: Optional[str] = None
+    error: Optional[str] = None
+    file_path: Optional[str] = None
+    file_name: Optional[str] = None
+    size: int = 0
+    requested_by: str
+    created_at: datetime = datetime.now()
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = datetime.now()
+
+    class Settings:
+        name = "ats_exports"
+        indexes = [
+            IndexModel([("company_id", 1), ("created_at", -1)], name="company_created"),
+        ]
+
+
+class AtsExportResponse(BaseModel):
+    id: str
+    company_id: str
+    period: str
+    zipped: bool
+    status: AtsExportStatus
+    documents: int
+    step: Optional[str]
+    error: Optional[str]
+    file_name: Optional[str]
+    size: int
+    requested_by: str
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    updated_at: datetime
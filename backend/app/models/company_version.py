@@ -0,0 +1,27 @@
+from beanie import Document
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+
+class CompanyVersion(Document):
+    """
+    Versión de datos contables de una empresa: un contador que solo crece y se
+    incrementa con cada escritura de cuentas, asientos, mayor o tipos de documento.
+    El documento con id "*" es la época global (importaciones de base de datos).
+    """
+    id: str  # company_id, o "*" para la época global
+    version: int = 0
+    generation: Optional[str] = None  # Solo en la época global: cambia al restaurar datos
+    updated_at: Optional[datetime] = None
+
+    class Settings:
+        name = "company_versions"
+
+
+class DataVersionResponse(BaseModel):
+    company_id: str
+    version: int
+    epoch: int
+    token: str
+    updated_at: Optional[datetime] = None
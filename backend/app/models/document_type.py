@@ -1,4 +1,5 @@
 from beanie import Document
+from pymongo import IndexModel
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
@@ -31,7 +32,9 @@ class DocumentType(Document):
 
     class Settings:
         name = "document_types"
-        indexes = []
+        indexes = [
+            IndexModel([("company_id", 1), ("code", 1)], name="company_code"),
+        ]
 
 
 class DocumentTypeCreate(BaseModel):
@@ -1,7 +1,9 @@
 from beanie import Document
+from pymongo import IndexModel
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from app.models.money import Money, ZERO
 from enum import Enum
 
 class JournalEntryStatus(str, Enum):
@@ -19,8 +21,8 @@ class JournalLine(BaseModel):
     account_code: str
     account_name: str
     description: str
-    debit: float = 0.0
-    credit: float = 0.0
+    debit: Money = ZERO
+    credit: Money = ZERO
     reference: Optional[str] = None
 
 class JournalEntry(Document):
@@ -32,19 +34,26 @@ class JournalEntry(Document):
     document_type_id: Optional[str] = None
     document_type_code: Optional[str] = None
     lines: List[JournalLine]
-    total_debit: float = 0.0
-    total_credit: float = 0.0
+    total_debit: Money = ZERO
+    total_credit: Money = ZERO
     company_id: str
     created_by: str
     responsable: Optional[str] = None  # Nombre del usuario responsable
     approved_by: Optional[str] = None
     approved_at: Optional[datetime] = None
+    # Revisión para control de concurrencia optimista (compare-and-swap)
+    revision: int = 0
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
     
     class Settings:
         name = "journal_entries"
-        indexes = []
+        indexes = [
+            # Unicidad por empresa y búsquedas por prefijo ^CODE- (regex anclada usa el índice)
+            IndexModel([("company_id", 1), ("entry_number", 1)], name="company_entry_number"),
+            # Formularios del SRI y listados por rango de fechas
+            IndexModel([("company_id", 1), ("date", 1)], name="company_date"),
+        ]
 
 class JournalEntryCreate(BaseModel):
     entry_number: str
@@ -64,6 +73,8 @@ class JournalEntryUpdate(BaseModel):
     document_type_code: Optional[str] = None
     lines: Optional[List[JournalLine]] = None
     responsable: Optional[str] = None
+    # Revisión leída por el cliente; si no coincide se responde 409
+    revision: Optional[int] = None
 
 class JournalEntryResponse(BaseModel):
     id: str
@@ -75,13 +86,14 @@ class JournalEntryResponse(BaseModel):
     entry_type: JournalEntryType
     status: JournalEntryStatus
     lines: List[JournalLine]
-    total_debit: float
-    total_credit: float
+    total_debit: Money
+    total_credit: Money
     company_id: str
     created_by: str
     responsable: Optional[str]
     approved_by: Optional[str]
     approved_at: Optional[datetime]
+    revision: int = 0
     created_at: datetime
     updated_at: datetime
 
@@ -1,7 +1,9 @@
 from beanie import Document
+from pymongo import IndexModel
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
+from app.models.money import Money, ZERO
 from enum import Enum
 
 class LedgerEntryType(str, Enum):
@@ -21,16 +23,23 @@ class LedgerEntry(Document):
     date: datetime
     description: str
     reference: Optional[str] = None
-    debit_amount: float = 0.0
-    credit_amount: float = 0.0
-    running_debit_balance: float = 0.0  # Saldo acumulado débito
-    running_credit_balance: float = 0.0  # Saldo acumulado crédito
+    debit_amount: Money = ZERO
+    credit_amount: Money = ZERO
+    running_debit_balance: Money = ZERO  # Saldo acumulado débito
+    running_credit_balance: Money = ZERO  # Saldo acumulado crédito
     created_at: datetime = datetime.now()
     created_by: str
+    # Solo en filas de apertura de un año archivado: id del FiscalArchive que las generó
+    archive_id: Optional[str] = None
     
     class Settings:
         name = "ledger_entries"
-        indexes = []
+        indexes = [
+            # Reportes por rango de fechas (balance, resultados, comparativos)
+            IndexModel([("company_id", 1), ("date", 1)], name="company_date"),
+            # Saldo acumulado previo de cada cuenta al mayorizar (última fila hasta una fecha)
+            IndexModel([("account_id", 1), ("date", -1), ("created_at", -1)], name="account_date"),
+        ]
 
 class LedgerEntryCreate(BaseModel):
     account_id: str
@@ -41,8 +50,8 @@ class LedgerEntryCreate(BaseModel):
     date: datetime
     description: str
     reference: Optional[str] = None
-    debit_amount: float = 0.0
-    credit_amount: float = 0.0
+    debit_amount: Money = ZERO
+    credit_amount: Money = ZERO
 
 class LedgerEntryResponse(BaseModel):
     id: str
@@ -55,10 +64,10 @@ class LedgerEntryResponse(BaseModel):
     date: datetime
     description: str
     reference: Optional[str]
-    debit_amount: float
-    credit_amount: float
-    running_debit_balance: float
-    running_credit_balance: float
+    debit_amount: Money
+    credit_amount: Money
+    running_debit_balance: Money
+    running_credit_balance: Money
     created_at: datetime
     created_by: str
 
@@ -71,13 +80,13 @@ class AccountLedgerSummary(BaseModel):
     nature: str
     parent_code: Optional[str] = None
     level: int = 1
-    initial_debit_balance: float
-    initial_credit_balance: float
-    current_debit_balance: float
-    current_credit_balance: float
-    net_balance: float
-    total_debits: float
-    total_credits: float
+    initial_debit_balance: Money
+    initial_credit_balance: Money
+    current_debit_balance: Money
+    current_credit_balance: Money
+    net_balance: Money
+    total_debits: Money
+    total_credits: Money
     entry_count: int
     last_transaction_date: Optional[datetime]
     entries: List[LedgerEntryResponse] = []
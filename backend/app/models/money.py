@@ -0,0 +1,55 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Any
+from typing_extensions import Annotated
+from bson import Decimal128
+from pydantic import BeforeValidator, PlainSerializer
+
+# Los montos se guardan como Decimal128 redondeados al centavo: sumas y
+# saldos acumulados son exactos y no necesitan tolerancias de 0.01
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+def to_decimal(value: Any) -> Decimal:
+    """
+    Convertir un monto (Decimal128 de Mongo, float heredado, int, str o Decimal)
+    a Decimal redondeado al centavo. None se interpreta como cero.
+    """
+    if value is None:
+        return ZERO
+    if isinstance(value, Decimal128):
+        value = value.to_decimal()
+    elif isinstance(value, float):
+        # repr() da el decimal más corto que representa al float (0.1 -> "0.1")
+        value = Decimal(repr(value))
+    elif not isinstance(value, Decimal):
+        try:
+            value = Decimal(str(value).strip() or "0")
+        except InvalidOperation:
+            raise ValueError(f"Monto inválido: {value!r}")
+    if not value.is_finite():
+        raise ValueError(f"Monto inválido: {value!r}")
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_decimal128(value: Any) -> Decimal128:
+    """Monto listo para consultas y $inc directos con Motor (pymongo no codifica Decimal)"""
+    return Decimal128(to_decimal(value))
+
+
+def to_cents(value: Any) -> int:
+    """Monto en centavos enteros (para cálculos vectorizados con int64)"""
+    return int(to_decimal(value) * 100)
+
+
+def from_cents(cents: int) -> Decimal:
+    """Centavos enteros a Decimal al centavo"""
+    return (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+# Tipo de campo monetario: Decimal en Python, Decimal128 en Mongo, número en JSON
+Money = Annotated[
+    Decimal,
+    BeforeValidator(to_decimal),
+    PlainSerializer(float, return_type=float, when_used="json"),
+]
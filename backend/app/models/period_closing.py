@@ -0,0 +1,135 @@
+from beanie import Document
+from pymongo import IndexModel
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from app.models.money import Money, ZERO
+from enum import Enum
+
+
+class PeriodClosingStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ClosingBalance(BaseModel):
+    """Saldo de una cuenta al cierre (ya aplicado el asiento de cierre; los padres suman sus hijas)"""
+    account_id: str
+    code: str
+    name: str
+    debit: Money = ZERO
+    credit: Money = ZERO
+
+
+class PeriodClosing(Document):
+    """
+    Cierre de un período contable de una empresa. El documento es también el
+    estado del trabajo en segundo plano (estado, avance y paso actual) y, al
+    terminar, la instantánea de saldos al cierre.
+    """
+    company_id: str
+    period_start: Optional[datetime] = None
+    period_end: datetime
+    result_account_code: str
+    status: PeriodClosingStatus = PeriodClosingStatus.PENDING
+    progress: int = 0  # 0 a 100
+    step: Optional[str] = None
+    error: Optional[str] = None
+    closing_entry_id: Optional[str] = None
+    closing_entry_number: Optional[str] = None
+    accounts_closed: int = 0
+    net_income: Money = ZERO
+    snapshot: List[ClosingBalance] = []
+    requested_by: str
+    created_at: datetime = datetime.now()
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = datetime.now()
+
+    class Settings:
+        name = "period_closings"
+        indexes = [
+            # Un cierre por empresa y fecha de corte
+            IndexModel([("company_id", 1), ("period_end", 1)], name="company_period_end", unique=True),
+        ]
+
+
+class PeriodLock(Document):
+    """Fecha hasta la que (inclusive) el período de una empresa está cerrado"""
+    id: str  # company_id
+    locked_through: datetime
+    closing_id: Optional[str] = None
+    updated_by: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+    class Settings:
+        name = "period_locks"
+
+
+class FiscalArchive(Document):
+    """
+    Año fiscal archivado de una empresa: sus filas del mayor y asientos se movieron
+    a colecciones por año y en ledger_entries queda una fila de apertura por cuenta
+    (archive_id = id de este documento) con los totales archivados.
+    """
+    company_id: str
+    closing_id: str
+    period_end: datetime
+    boundary: datetime  # Primer instante no archivado (period_end + 1 día)
+    ledger_collection: str
+    journal_collection: str
+    ledger_rows: int = 0
+    journal_entries: int = 0
+    opening_rows: int = 0
+    created_by: str
+    created_at: datetime = datetime.now()
+
+    class Settings:
+        name = "fiscal_archives"
+        indexes = [
+            IndexModel([("company_id", 1), ("period_end", 1)], name="company_period_end", unique=True),
+        ]
+
+
+class FiscalArchiveResponse(BaseModel):
+    id: str
+    company_id: str
+    closing_id: str
+    period_end: datetime
+    boundary: datetime
+    ledger_collection: str
+    journal_collection: str
+    ledger_rows: int
+    journal_entries: int
+    opening_rows: int
+    created_by: str
+    created_at: datetime
+
+
+class PeriodClosingCreate(BaseModel):
+    period_end: str  # YYYY-MM-DD
+    period_start: Optional[str] = None  # Por omisión, inicio del año fiscal de period_end
+    result_account_code: Optional[str] = None  # Por omisión, settings.closing_result_account
+
+
+class PeriodClosingResponse(BaseModel):
+    id: str
+    company_id: str
+    period_start: Optional[datetime]
+    period_end: datetime
+    result_account_code: str
+    status: PeriodClosingStatus
+    progress: int
+    step: Optional[str]
+    error: Optional[str]
+    closing_entry_id: Optional[str]
+    closing_entry_number: Optional[str]
+    accounts_closed: int
+    net_income: Money
+    requested_by: str
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    updated_at: datetime
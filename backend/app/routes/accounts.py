@@ -1,12 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from typing import List, Optional
 from app.models.account import Account, AccountCreate, AccountUpdate, AccountResponse, AccountBalance, InitialBalanceUpdate, InitialBalancesBatch, ChartOfAccountsExport, AccountType, AccountNature
+from app.models.money import to_decimal
 from app.models.user import User
+from app.models.period_closing import FiscalArchive, PeriodLock
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.services.data_version import company_etag, data_versions
+from app.services.concurrency import ConcurrencyConflictError, compare_and_set
+from app.services.chart_cache import chart_cache
+from app.services.ledger_service import sort_accounts_hierarchically as _sort_accounts_hierarchically
+from app.services.fast_json import FastJSONResponse, ProjectionSchema, SchemaField, id_str, money
 from datetime import datetime
 from bson import ObjectId
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Forma de AccountResponse sobre documentos crudos (ruta ?fast=true)
+_ACCOUNT_FAST_SCHEMA = ProjectionSchema(
+    id=SchemaField("_id", id_str),
+    code=SchemaField(),
+    name=SchemaField(),
+    description=SchemaField(),
+    account_type=SchemaField(),
+    nature=SchemaField(),
+    parent_code=SchemaField(),
+    level=SchemaField(default=1),
+    company_id=SchemaField(),
+    is_active=SchemaField(default=True),
+    is_editable=SchemaField(default=True),
+    initial_debit_balance=SchemaField(convert=money, default=0.0),
+    initial_credit_balance=SchemaField(convert=money, default=0.0),
+    current_debit_balance=SchemaField(convert=money, default=0.0),
+    current_credit_balance=SchemaField(convert=money, default=0.0),
+    last_transaction_date=SchemaField(),
+    revision=SchemaField(default=0),
+    created_at=SchemaField(),
+    updated_at=SchemaField(),
+)
 
 # Utilidades para derivar jerarquía a partir del código
 def _derive_parent_and_level_from_code(account_code: str):
@@ -69,7 +101,9 @@ async def get_accounts(
     document_type_code: Optional[str] = Query(None, description="Código de tipo de documento"),
     reference: Optional[str] = Query(None, description="Referencia"),
     entry_number: Optional[str] = Query(None, description="Número de asiento"),
-    current_user: User = Depends(require_permission("accounts:read"))
+    fast: bool = Query(False, description="Serialización rápida (orjson) de documentos proyectados, sin revalidar response_model"),
+    current_user: User = Depends(require_permission("accounts:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener lista de cuentas contables con filtros"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -82,12 +116,12 @@ async def get_accounts(
     # Ejecutar cálculo automático de saldos padre antes de obtener las cuentas
     # Usar exactamente la misma lógica que funciona correctamente
     try:
-        print(f"🔄 Ejecutando cálculo automático de saldos padre para Plan de Cuentas (lógica unificada)...")
+        logger.debug("🔄 Ejecutando cálculo automático de saldos padre para Plan de Cuentas (lógica unificada)...")
         from app.services.ledger_service import LedgerService
         result = await LedgerService._fix_complete_hierarchy_internal(company_id)
-        print(f"✅ Cálculo automático de saldos padre completado para Plan de Cuentas: {result['updated_count']} cuentas actualizadas")
+        logger.debug("✅ Cálculo automático de saldos padre completado para Plan de Cuentas: %s cuentas actualizadas", result['updated_count'])
     except Exception as calc_error:
-        print(f"⚠️ Error en cálculo automático de saldos padre: {calc_error}")
+        logger.warning("⚠️ Error en cálculo automático de saldos padre: %s", calc_error)
         # No interrumpir la carga si falla el cálculo automático
     
     query = {"company_id": company_id}
@@ -175,6 +209,12 @@ async def get_accounts(
         # Se podrían implementar con agregación de MongoDB
         pass
     
+    if fast:
+        # Ruta rápida: documentos crudos con la proyección del esquema, sin modelos Beanie ni AccountResponse
+        docs = await Account.get_motor_collection().find(query, _ACCOUNT_FAST_SCHEMA.projection).to_list(length=None)
+        docs = _sort_accounts_hierarchically(docs)[skip:skip + limit]
+        return FastJSONResponse(_ACCOUNT_FAST_SCHEMA.rows(docs))
+    
     accounts = await Account.find(query).to_list()
     
     # Ordenar jerárquicamente
@@ -201,6 +241,7 @@ async def get_accounts(
             current_debit_balance=account.current_debit_balance,
             current_credit_balance=account.current_credit_balance,
             last_transaction_date=account.last_transaction_date,
+            revision=account.revision,
             created_at=account.created_at,
             updated_at=account.updated_at
         )
@@ -227,8 +268,8 @@ async def update_initial_balances(
 
         for balance_data in balances_data.balances:
             try:
-                debit = float(balance_data.initial_debit_balance or 0)
-                credit = float(balance_data.initial_credit_balance or 0)
+                debit = to_decimal(balance_data.initial_debit_balance)
+                credit = to_decimal(balance_data.initial_credit_balance)
 
                 account = await Account.find_one(
                     Account.code == balance_data.account_code,
@@ -286,19 +327,25 @@ async def update_initial_balances(
                 }
 
                 # Actualizar saldos iniciales; NO tocar saldos corrientes (representan movimientos ya registrados)
+                expected_revision = account.revision
                 account.initial_debit_balance = debit
                 account.initial_credit_balance = credit
                 account.updated_at = datetime.now()
+                changed_fields = {"initial_debit_balance", "initial_credit_balance", "updated_at", "parent_code", "level"}
 
                 # Campos complementarios si se envían
                 if balance_data.name:
                     account.name = balance_data.name
+                    changed_fields.add("name")
                 if balance_data.account_type:
                     account.account_type = balance_data.account_type
+                    changed_fields.add("account_type")
                 if balance_data.nature:
                     account.nature = balance_data.nature
+                    changed_fields.add("nature")
                 if balance_data.description is not None:
                     account.description = balance_data.description
+                    changed_fields.add("description")
                 # Ajuste de jerarquía: usar explícitos si vienen válidos, sino derivar de código
                 derived_parent, derived_level = _derive_parent_and_level_from_code(balance_data.account_code)
                 if balance_data.parent_code is not None:
@@ -311,8 +358,12 @@ async def update_initial_balances(
                     account.level = balance_data.level
                 if balance_data.is_editable is not None:
                     account.is_editable = balance_data.is_editable
+                    changed_fields.add("is_editable")
 
-                await account.save()
+                # Solo los campos modificados: los saldos corrientes se mueven con $inc al mayorizar
+                account.revision = await compare_and_set(
+                    Account, account.id, expected_revision, account.model_dump(include=changed_fields)
+                )
                 updated_accounts.append(account.code)
 
                 await log_audit(
@@ -334,6 +385,10 @@ async def update_initial_balances(
             except Exception as e:
                 errors.append(f"Error actualizando cuenta {balance_data.account_code}: {str(e)}")
 
+        chart_cache.invalidate(company_id)
+
+        await data_versions.bump(company_id)
+
         # Recalcular saldos de cuentas padre después de actualizar saldos iniciales
         if updated_accounts:
             try:
@@ -345,9 +400,9 @@ async def update_initial_balances(
                 ).to_list()
                 affected_account_ids = {str(acc.id) for acc in updated_account_objects}
                 await LedgerService._recalculate_parent_account_balances(affected_account_ids, company_id)
-                print(f"✅ Saldos padre recalculados automáticamente para {len(updated_accounts)} cuentas actualizadas")
+                logger.debug("✅ Saldos padre recalculados automáticamente para %s cuentas actualizadas", len(updated_accounts))
             except Exception as e:
-                print(f"⚠️ Error al recalcular saldos padre después de actualizar saldos iniciales: {e}")
+                logger.warning("⚠️ Error al recalcular saldos padre después de actualizar saldos iniciales: %s", e)
 
         return {
             "message": f"Saldos iniciales actualizados para {len(updated_accounts)} cuentas",
@@ -398,6 +453,7 @@ async def get_account(
         current_debit_balance=account.current_debit_balance,
         current_credit_balance=account.current_credit_balance,
         last_transaction_date=account.last_transaction_date,
+        revision=account.revision,
         created_at=account.created_at,
         updated_at=account.updated_at
     )
@@ -458,8 +514,8 @@ async def create_account(
         company_id=company_id,
         is_active=True,
         is_editable=(account_data.is_editable if account_data.is_editable is not None else True),
-        initial_debit_balance=float(account_data.initial_debit_balance or 0.0),
-        initial_credit_balance=float(account_data.initial_credit_balance or 0.0),
+        initial_debit_balance=to_decimal(account_data.initial_debit_balance),
+        initial_credit_balance=to_decimal(account_data.initial_credit_balance),
         current_debit_balance=0.0,
         current_credit_balance=0.0,
         created_by=str(current_user.id),
@@ -468,6 +524,8 @@ async def create_account(
     )
     
     await new_account.insert()
+    chart_cache.invalidate(company_id)
+    await data_versions.bump(company_id)
     
     # Recalcular saldos de cuentas padre si la nueva cuenta tiene padre
     if new_account.parent_code:
@@ -475,9 +533,9 @@ async def create_account(
             from app.services.ledger_service import LedgerService
             affected_account_ids = {str(new_account.id)}
             await LedgerService._recalculate_parent_account_balances(affected_account_ids, company_id)
-            print(f"✅ Saldos padre recalculados automáticamente para nueva cuenta: {new_account.code}")
+            logger.debug("✅ Saldos padre recalculados automáticamente para nueva cuenta: %s", new_account.code)
         except Exception as e:
-            print(f"⚠️ Error al recalcular saldos padre para nueva cuenta: {e}")
+            logger.warning("⚠️ Error al recalcular saldos padre para nueva cuenta: %s", e)
     
     # Log de auditoría
     await log_audit(
@@ -513,6 +571,7 @@ async def create_account(
         current_debit_balance=new_account.current_debit_balance,
         current_credit_balance=new_account.current_credit_balance,
         last_transaction_date=new_account.last_transaction_date,
+        revision=new_account.revision,
         created_at=new_account.created_at,
         updated_at=new_account.updated_at
     )
@@ -556,6 +615,9 @@ async def update_account(
     
     # Actualizar campos
     update_data = account_update.dict(exclude_unset=True)
+    expected_revision = update_data.pop("revision", None)
+    if expected_revision is None:
+        expected_revision = account.revision
     
     # Si se está cambiando el parent_code o el código, recalcular jerarquía
     if 'parent_code' in update_data or 'code' in update_data:
@@ -580,7 +642,22 @@ async def update_account(
             setattr(account, field, value)
     
     account.updated_at = datetime.now()
-    await account.save()
+    
+    # Guardar solo los campos modificados (nunca los saldos, que se mueven con $inc)
+    changed_fields = set(update_data) | {"updated_at"}
+    if 'parent_code' in update_data or 'code' in update_data:
+        changed_fields |= {"parent_code", "level"}
+    try:
+        account.revision = await compare_and_set(
+            Account,
+            account.id,
+            expected_revision,
+            account.model_dump(include=changed_fields)
+        )
+    except ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    chart_cache.invalidate(account.company_id)
+    await data_versions.bump(account.company_id)
     
     # Log de auditoría
     await log_audit(
@@ -613,6 +690,7 @@ async def update_account(
         current_debit_balance=account.current_debit_balance,
         current_credit_balance=account.current_credit_balance,
         last_transaction_date=account.last_transaction_date,
+        revision=account.revision,
         created_at=account.created_at,
         updated_at=account.updated_at
     )
@@ -649,7 +727,17 @@ async def toggle_account_status(
     old_status = account.is_active
     account.is_active = not account.is_active
     account.updated_at = datetime.now()
-    await account.save()
+    try:
+        account.revision = await compare_and_set(
+            Account,
+            account.id,
+            account.revision,
+            {"is_active": account.is_active, "updated_at": account.updated_at}
+        )
+    except ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    chart_cache.invalidate(account.company_id)
+    await data_versions.bump(account.company_id)
     
     # Log de auditoría
     action_text = "activada" if account.is_active else "desactivada"
@@ -686,6 +774,18 @@ async def purge_company_accounts(
             detail="No tienes acceso a esta empresa"
         )
 
+    if force:
+        # El período bloqueado es inmutable (sus agregaciones se guardan sin revalidar) y
+        # los años archivados se siguen uniendo a las consultas: borrar el mayor vivo
+        # dejaría reportes incoherentes. El reinicio completo es eliminar la empresa.
+        locked = await PeriodLock.get_motor_collection().find_one({"_id": company_id}, {"_id": 1})
+        archived = await FiscalArchive.get_motor_collection().find_one({"company_id": company_id}, {"_id": 1})
+        if locked or archived:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="La empresa tiene períodos cerrados o años archivados; no se pueden borrar sus asientos y mayor"
+            )
+
     try:
         # Usar la colección de Beanie para eliminar masivamente sin dependencias adicionales
         accounts_collection = Account.get_motor_collection()
@@ -707,6 +807,8 @@ async def purge_company_accounts(
                 deleted_ledger = 0
 
         result = await accounts_collection.delete_many({"company_id": company_id})
+        chart_cache.invalidate(company_id)
+        await data_versions.bump(company_id)
         deleted_count = getattr(result, "deleted_count", 0)
 
         # Log de auditoría (no fallar si el log falla)
@@ -779,6 +881,8 @@ async def delete_account(
     
     # Eliminar la cuenta de la base de datos
     await account.delete()
+    chart_cache.invalidate(company_id)
+    await data_versions.bump(company_id)
     
     # Log de auditoría
     await log_audit(
@@ -907,30 +1011,45 @@ async def import_initial_balances(
                 # Actualizar cuenta existente
                 old_debit = account.initial_debit_balance
                 old_credit = account.initial_credit_balance
+                expected_revision = account.revision
                 account.initial_debit_balance = balance_data.initial_debit_balance or 0.0
                 account.initial_credit_balance = balance_data.initial_credit_balance or 0.0
                 account.current_debit_balance = 0.0
                 account.current_credit_balance = 0.0
                 account.updated_at = datetime.now()
+                changed_fields = {
+                    "initial_debit_balance", "initial_credit_balance",
+                    "current_debit_balance", "current_credit_balance", "updated_at", "level"
+                }
                 if balance_data.name:
                     account.name = balance_data.name
+                    changed_fields.add("name")
                 if balance_data.account_type:
                     account.account_type = balance_data.account_type
+                    changed_fields.add("account_type")
                 if balance_data.nature:
                     account.nature = balance_data.nature
+                    changed_fields.add("nature")
                 if balance_data.description is not None:
                     account.description = balance_data.description
+                    changed_fields.add("description")
                 if balance_data.parent_code is not None or balance_data.level is not None:
                     if balance_data.parent_code is not None:
                         account.parent_code = balance_data.parent_code
+                        changed_fields.add("parent_code")
                     if balance_data.level is not None:
                         account.level = balance_data.level
                 else:
                     derived_parent, derived_level = _derive_parent_and_level_from_code(balance_data.account_code)
                     if derived_parent is not None:
                         account.parent_code = derived_parent
+                        changed_fields.add("parent_code")
                     account.level = derived_level
-                await account.save()
+                # La importación reinicia los saldos corrientes: condicionado a la revisión
+                # leída, un movimiento mayorizado entretanto produce un conflicto en vez de perderse
+                account.revision = await compare_and_set(
+                    Account, account.id, expected_revision, account.model_dump(include=changed_fields)
+                )
                 updated_accounts.append(account.code)
                 
                 # Log de auditoría para actualización
@@ -957,6 +1076,8 @@ async def import_initial_balances(
             errors.append(f"Error procesando cuenta {balance_data.account_code}: {str(e)}")
     
     total_updated = len(created_accounts) + len(updated_accounts)
+    chart_cache.invalidate(company_id)
+    await data_versions.bump(company_id)
     
     # Log de auditoría general
     await log_audit(
@@ -980,11 +1101,11 @@ async def import_initial_balances(
     if total_updated > 0:
         try:
             from app.services.ledger_service import LedgerService
-            print(f"🔄 Ejecutando cálculo automático de saldos padre después de importar saldos iniciales...")
+            logger.debug("🔄 Ejecutando cálculo automático de saldos padre después de importar saldos iniciales...")
             result = await LedgerService._fix_complete_hierarchy_internal(company_id)
-            print(f"✅ Cálculo automático de saldos padre completado: {result['updated_count']} cuentas actualizadas")
+            logger.debug("✅ Cálculo automático de saldos padre completado: %s cuentas actualizadas", result['updated_count'])
         except Exception as e:
-            print(f"⚠️ Error en cálculo automático de saldos padre: {e}")
+            logger.warning("⚠️ Error en cálculo automático de saldos padre: %s", e)
             # No interrumpir la operación si falla el cálculo automático
 
     # Fetch all active accounts after import for immediate frontend update
@@ -1014,6 +1135,7 @@ async def import_initial_balances(
             current_debit_balance=account.current_debit_balance,
             current_credit_balance=account.current_credit_balance,
             last_transaction_date=account.last_transaction_date,
+            revision=account.revision,
             created_at=account.created_at,
             updated_at=account.updated_at
         )
@@ -1091,7 +1213,7 @@ async def get_accounts_balance(
         client.close()
     except Exception as e:
         # Fallback suave: si falla la agregación, continuar con saldos iniciales (sin movimientos)
-        print(f"⚠️ Error consultando movimientos (fallback a 0): {e}")
+        logger.warning("⚠️ Error consultando movimientos (fallback a 0): %s", e)
         sums = []
 
     sums_by_account = {str(item.get("_id")): item for item in sums}
@@ -1099,11 +1221,11 @@ async def get_accounts_balance(
     balances: List[AccountBalance] = []
     for account in accounts:
         agg = sums_by_account.get(str(account.id), {})
-        sum_debit = float(agg.get("sum_debit", 0) or 0)
-        sum_credit = float(agg.get("sum_credit", 0) or 0)
+        sum_debit = to_decimal(agg.get("sum_debit"))
+        sum_credit = to_decimal(agg.get("sum_credit"))
 
-        debit_balance = float(account.initial_debit_balance or 0) + sum_debit
-        credit_balance = float(account.initial_credit_balance or 0) + sum_credit
+        debit_balance = to_decimal(account.initial_debit_balance) + sum_debit
+        credit_balance = to_decimal(account.initial_credit_balance) + sum_credit
         net_balance = debit_balance - credit_balance
 
         balances.append(
@@ -1122,6 +1244,7 @@ async def get_accounts_balance(
                     current_debit_balance=account.current_debit_balance,
                     current_credit_balance=account.current_credit_balance,
                     last_transaction_date=account.last_transaction_date,
+                    revision=account.revision,
                     company_id=account.company_id,
                     is_active=account.is_active,
                     is_editable=account.is_editable,
@@ -1153,31 +1276,11 @@ async def recalculate_parent_balances(
     try:
         from app.services.ledger_service import LedgerService
         
-        # Obtener todas las cuentas de la empresa
-        all_accounts = await Account.find(
-            Account.company_id == company_id,
-            Account.is_active == True
-        ).to_list()
-        
-        # Obtener todas las cuentas padre (que tienen cuentas hijas)
-        parent_accounts = []
-        for account in all_accounts:
-            # Verificar si tiene cuentas hijas
-            has_children = any(
-                acc.parent_code == account.code or 
-                (acc.code.startswith(account.code) and acc.code != account.code and len(acc.code) > len(account.code))
-                for acc in all_accounts
-            )
-            if has_children:
-                parent_accounts.append(account)
-        
-        print(f"🔄 Recalculando saldos de {len(parent_accounts)} cuentas padre")
-        
-        # Recalcular saldos para cada cuenta padre
-        updated_count = 0
-        for parent_account in parent_accounts:
-            await LedgerService._calculate_parent_balance(parent_account, all_accounts)
-            updated_count += 1
+        # Rollup del plan sobre la instantánea columnar; cada padre se escribe
+        # condicionado a la revisión leída (no pisa movimientos concurrentes)
+        logger.debug("🔄 Recalculando saldos de cuentas padre para empresa %s", company_id)
+        result = await LedgerService._fix_complete_hierarchy_internal(company_id)
+        updated_count = result['updated_count']
         
         # Log de auditoría
         await log_audit(
@@ -1198,7 +1301,7 @@ async def recalculate_parent_balances(
         }
         
     except Exception as e:
-        print(f"Error al recalcular saldos de cuentas padre: {e}")
+        logger.error("Error al recalcular saldos de cuentas padre: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al recalcular saldos: {str(e)}"
@@ -1222,14 +1325,14 @@ async def fix_complete_hierarchy(
     try:
         from app.services.ledger_service import LedgerService
         
-        print(f"🚀 INICIANDO corrección manual de jerarquía completa para empresa {company_id}")
+        logger.debug("🚀 INICIANDO corrección manual de jerarquía completa para empresa %s", company_id)
         
         # Usar el método interno que es exactamente el mismo que el cálculo automático
         result = await LedgerService._fix_complete_hierarchy_internal(company_id)
         updated_count = result['updated_count']
         corrections = result['corrections']
         
-        print(f"🎯 CORRECCIÓN MANUAL COMPLETADA: {updated_count} cuentas padre actualizadas")
+        logger.debug("🎯 CORRECCIÓN MANUAL COMPLETADA: %s cuentas padre actualizadas", updated_count)
         
         # Log de auditoría
         await log_audit(
@@ -1251,7 +1354,7 @@ async def fix_complete_hierarchy(
         }
         
     except Exception as e:
-        print(f"Error al corregir jerarquía completa: {e}")
+        logger.error("Error al corregir jerarquía completa: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al corregir jerarquía: {str(e)}"
@@ -1260,6 +1363,7 @@ async def fix_complete_hierarchy(
 
 @router.post("/fix-levels")
 async def fix_account_levels(
+    request: Request,
     company_id: str = Query(..., description="ID de la empresa"),
     current_user: User = Depends(require_permission("accounts:update"))
 ):
@@ -1289,21 +1393,37 @@ async def fix_account_levels(
                 old_level = account.level
                 account.level = derived_level
                 
+                old_parent = account.parent_code
+                
                 # También corregir el parent_code si es necesario
                 if account.parent_code != derived_parent:
                     account.parent_code = derived_parent
                 
-                await account.save()
+                # Solo nivel y cuenta padre (derivados del código): nunca los saldos ni una revisión vieja
+                now = datetime.now()
+                await Account.get_motor_collection().update_one(
+                    {"_id": account.id},
+                    {
+                        "$set": {"level": derived_level, "parent_code": derived_parent, "updated_at": now},
+                        "$inc": {"revision": 1}
+                    }
+                )
+                account.updated_at = now
+                account.revision += 1
                 updated_count += 1
                 corrections.append({
                     "code": account.code,
                     "name": account.name,
                     "old_level": old_level,
                     "new_level": derived_level,
-                    "old_parent": account.parent_code,
+                    "old_parent": old_parent,
                     "new_parent": derived_parent
                 })
         
+        if updated_count:
+            chart_cache.invalidate(company_id)
+            await data_versions.bump(company_id)
+        
         # Log de auditoría
         await log_audit(
             user=current_user,
@@ -1324,60 +1444,8 @@ async def fix_account_levels(
         }
         
     except Exception as e:
-        print(f"Error al corregir niveles: {e}")
+        logger.error("Error al corregir niveles: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al corregir niveles: {str(e)}"
         )
-
-
-def _sort_accounts_hierarchically(accounts):
-    """
-    Ordena las cuentas jerárquicamente respetando la estructura padre-hijo.
-    Las cuentas se ordenan por nivel y luego por código dentro de cada nivel.
-    """
-    if not accounts:
-        return []
-    
-    # Crear un diccionario para acceso rápido por código
-    account_dict = {acc.code: acc for acc in accounts}
-    
-    # Función para obtener el orden jerárquico de una cuenta
-    def get_hierarchical_order(account):
-        # Si no tiene padre, es de nivel 1
-        if not account.parent_code:
-            return [account.code]
-        
-        # Construir la ruta completa desde la raíz
-        path = []
-        current_code = account.code
-        
-        # Recorrer hacia arriba hasta encontrar la raíz
-        while current_code in account_dict:
-            current_account = account_dict[current_code]
-            path.insert(0, current_code)
-            
-            if not current_account.parent_code:
-                break
-            current_code = current_account.parent_code
-        
-        return path
-    
-    # Ordenar las cuentas jerárquicamente
-    def sort_key(account):
-        hierarchical_path = get_hierarchical_order(account)
-        # Convertir cada código en una tupla de números para ordenamiento natural
-        path_numbers = []
-        for code in hierarchical_path:
-            # Convertir código a números para ordenamiento natural
-            # Ej: "3010101" -> (3, 1, 1, 1)
-            numbers = []
-            for char in code:
-                if char.isdigit():
-                    numbers.append(int(char))
-            path_numbers.append(tuple(numbers))
-        
-        return path_numbers
-    
-    return sorted(accounts, key=sort_key)
-
@@ -0,0 +1,221 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from typing import Any, Dict, List
+from app.models.user import User
+from app.models.company import Company
+from app.models.period_closing import FiscalArchive, FiscalArchiveResponse, PeriodClosing, PeriodClosingCreate, PeriodClosingResponse
+from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.config import settings
+from app.services.concurrency import ConcurrencyConflictError
+from app.services.period_closing import fiscal_year_start, start_closing
+from app.services.period_locks import period_locks
+from app.services.ledger_archive import ledger_archives
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError
+
+router = APIRouter()
+
+# Campos del cierre sin la instantánea de saldos (polling de avance y listados)
+_WITHOUT_SNAPSHOT = {"snapshot": 0}
+
+
+def _check_company_access(current_user: User, company_id: str):
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+
+
+def _parse_date(value: str, field: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato de fecha inválido en {field}. Use YYYY-MM-DD"
+        )
+
+
+def _closing_response(doc: Dict[str, Any]) -> PeriodClosingResponse:
+    doc = dict(doc)
+    doc.pop("snapshot", None)
+    return PeriodClosingResponse(id=str(doc.pop("_id")), **doc)
+
+
+async def _get_closing(closing_id: str, current_user: User, projection: Dict[str, int] = None) -> Dict[str, Any]:
+    try:
+        object_id = ObjectId(closing_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cierre no encontrado")
+    doc = await PeriodClosing.get_motor_collection().find_one({"_id": object_id}, projection)
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cierre no encontrado")
+    _check_company_access(current_user, doc["company_id"])
+    return doc
+
+
+@router.post("/", response_model=PeriodClosingResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_period_closing(
+    closing_data: PeriodClosingCreate,
+    request: Request,
+    company_id: str = Query(..., description="ID de la empresa"),
+    current_user: User = Depends(require_permission("journal:approve"))
+):
+    """Cerrar un período contable en segundo plano.
+
+    Salda las cuentas de resultados (grupos 4, 5 y 6) contra la cuenta de resultados
+    del ejercicio con un asiento de cierre mayorizado, bloquea el período hasta
+    period_end y guarda la instantánea de saldos. Responde de inmediato; el avance
+    se consulta en GET /api/closings/{closing_id}.
+    """
+    _check_company_access(current_user, company_id)
+    try:
+        company = await Company.get(ObjectId(company_id))
+    except (InvalidId, TypeError):
+        company = None
+    if not company:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empresa no encontrada")
+
+    period_end = _parse_date(closing_data.period_end, "period_end")
+    if closing_data.period_start:
+        period_start = _parse_date(closing_data.period_start, "period_start")
+    else:
+        period_start = fiscal_year_start(period_end, company.fiscal_year_start)
+    if period_start > period_end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de inicio es posterior a la fecha de cierre"
+        )
+
+    try:
+        closing = await start_closing(
+            company_id,
+            period_end,
+            period_start,
+            closing_data.result_account_code or settings.closing_result_account,
+            str(current_user.id)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    await log_audit(
+        user=current_user,
+        action=AuditAction.CREATE,
+        module=AuditModule.JOURNAL,
+        description=f"Cierre de período solicitado al {period_end:%Y-%m-%d}",
+        resource_id=str(closing.id),
+        resource_type="period_closing",
+        new_values={
+            "company_id": company_id,
+            "period_start": f"{period_start:%Y-%m-%d}",
+            "period_end": f"{period_end:%Y-%m-%d}",
+            "result_account_code": closing.result_account_code
+        },
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", "Unknown")
+    )
+
+    return _closing_response({**closing.model_dump(exclude={"id", "snapshot"}), "_id": closing.id})
+
+
+@router.get("/", response_model=List[PeriodClosingResponse])
+async def get_period_closings(
+    company_id: str = Query(..., description="ID de la empresa"),
+    current_user: User = Depends(require_permission("journal:read"))
+):
+    """Cierres de la empresa, del más reciente al más antiguo (sin instantánea)"""
+    _check_company_access(current_user, company_id)
+    docs = await PeriodClosing.get_motor_collection().find(
+        {"company_id": company_id}, _WITHOUT_SNAPSHOT
+    ).sort("period_end", -1).to_list(length=None)
+    return [_closing_response(doc) for doc in docs]
+
+
+@router.get("/lock")
+async def get_period_lock(
+    company_id: str = Query(..., description="ID de la empresa"),
+    current_user: User = Depends(get_current_user)
+):
+    """Fecha hasta la que el período de la empresa está cerrado (null si no hay cierres)"""
+    _check_company_access(current_user, company_id)
+    locked_through = await period_locks.locked_through(company_id)
+    return {"company_id": company_id, "locked_through": locked_through}
+
+
+@router.get("/archives", response_model=List[FiscalArchiveResponse])
+async def get_fiscal_archives(
+    company_id: str = Query(..., description="ID de la empresa"),
+    current_user: User = Depends(require_permission("journal:read"))
+):
+    """Períodos archivados de la empresa, del más antiguo al más reciente"""
+    _check_company_access(current_user, company_id)
+    archives = await FiscalArchive.find(FiscalArchive.company_id == company_id).sort("period_end").to_list()
+    return [FiscalArchiveResponse(id=str(archive.id), **archive.model_dump(exclude={"id", "revision_id"})) for archive in archives]
+
+
+@router.get("/{closing_id}", response_model=PeriodClosingResponse)
+async def get_period_closing(
+    closing_id: str,
+    current_user: User = Depends(require_permission("journal:read"))
+):
+    """Estado y avance de un cierre (para polling del trabajo en segundo plano)"""
+    return _closing_response(await _get_closing(closing_id, current_user, _WITHOUT_SNAPSHOT))
+
+
+@router.get("/{closing_id}/snapshot")
+async def get_period_closing_snapshot(
+    closing_id: str,
+    current_user: User = Depends(require_permission("journal:read"))
+):
+    """Instantánea de saldos al cierre (ya aplicado el asiento de cierre)"""
+    doc = await _get_closing(closing_id, current_user)
+    closing = PeriodClosing.model_validate(doc)
+    return {
+        "cierre": _closing_response(doc),
+        "cuentas": closing.snapshot
+    }
+
+
+@router.post("/{closing_id}/archive", response_model=FiscalArchiveResponse)
+async def archive_fiscal_year(
+    closing_id: str,
+    request: Request,
+    current_user: User = Depends(require_permission("journal:approve"))
+):
+    """Archivar el período de un cierre completado.
+
+    Mueve las filas del mayor y los asientos hasta period_end a colecciones por año
+    y deja en el mayor vivo una fila de apertura por cuenta. Los reportes siguen
+    consultando esas fechas: las agregaciones unen los años archivados solo cuando
+    el rango pedido llega antes del archivo.
+    """
+    doc = await _get_closing(closing_id, current_user, _WITHOUT_SNAPSHOT)
+    closing = PeriodClosing.model_validate(doc)
+    try:
+        archive = await ledger_archives.archive(closing, str(current_user.id))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El período ya fue archivado")
+
+    await log_audit(
+        user=current_user,
+        action=AuditAction.UPDATE,
+        module=AuditModule.JOURNAL,
+        description=f"Período archivado al {closing.period_end:%Y-%m-%d}",
+        resource_id=str(archive.id),
+        resource_type="fiscal_archive",
+        new_values={
+            "company_id": closing.company_id,
+            "ledger_rows": archive.ledger_rows,
+            "journal_entries": archive.journal_entries,
+            "opening_rows": archive.opening_rows
+        },
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", "Unknown")
+    )
+    return FiscalArchiveResponse(id=str(archive.id), **archive.model_dump(exclude={"id", "revision_id"}))
@@ -1,3 +1,4 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from typing import List, Optional
 from app.models.company import Company, CompanyCreate, CompanyUpdate, CompanyResponse
@@ -7,7 +8,14 @@ from app.models.journal import JournalEntry
 from app.models.ledger import LedgerEntry
 from app.models.document_type import DocumentType
 from app.models.document_reservation import DocumentNumberReservation
+from app.models.period_closing import FiscalArchive, PeriodClosing, PeriodLock
+from app.models.ats_export import AtsExport
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.services.chart_cache import chart_cache
+from app.services.period_locks import period_locks
+from app.services.ledger_archive import ledger_archives
+from app.services.data_version import data_versions, get_data_version
+from app.models.company_version import DataVersionResponse
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -29,6 +37,7 @@ async def delete_company_related_data(company_id: str) -> dict:
         # 1. Eliminar Cuentas (Accounts)
         accounts_result = await Account.find(Account.company_id == company_id).delete()
         deleted_counts['accounts'] = accounts_result.deleted_count
+        chart_cache.invalidate(company_id)
         print(f"🗑️  Eliminadas {accounts_result.deleted_count} cuentas relacionadas")
         
         # 2. Eliminar Asientos Contables (Journal Entries)
@@ -78,6 +87,30 @@ async def delete_company_related_data(company_id: str) -> dict:
         deleted_counts['audit_logs'] = audit_result.deleted_count
         print(f"🗑️  Eliminados {audit_result.deleted_count} logs de auditoría")
         
+        # 8. Eliminar cierres, bloqueo de período y años archivados de la empresa
+        archives = await FiscalArchive.find(FiscalArchive.company_id == company_id).to_list()
+        archived_rows = 0
+        for name in {archive.ledger_collection for archive in archives} | {archive.journal_collection for archive in archives}:
+            archived_rows += (await db[name].delete_many({"company_id": company_id})).deleted_count
+        deleted_counts['archived_entries'] = archived_rows
+        deleted_counts['fiscal_archives'] = (await FiscalArchive.find(FiscalArchive.company_id == company_id).delete()).deleted_count
+        deleted_counts['period_closings'] = (await PeriodClosing.find(PeriodClosing.company_id == company_id).delete()).deleted_count
+        await PeriodLock.find(PeriodLock.id == company_id).delete()
+        period_locks.invalidate(company_id)
+        ledger_archives.forget(company_id)
+        print(f"🗑️  Eliminados {deleted_counts['period_closings']} cierres y {archived_rows} registros archivados")
+        
+        # 9. Eliminar las exportaciones ATS generadas y sus archivos
+        exports = await AtsExport.find(AtsExport.company_id == company_id).to_list()
+        for export in exports:
+            if export.file_path and os.path.exists(export.file_path):
+                os.remove(export.file_path)
+        deleted_counts['ats_exports'] = (await AtsExport.find(AtsExport.company_id == company_id).delete()).deleted_count
+        print(f"🗑️  Eliminadas {deleted_counts['ats_exports']} exportaciones ATS")
+        
+        # 10. Invalidar lecturas en caché de la empresa (la versión no se borra: solo crece)
+        await data_versions.bump(company_id)
+        
         client.close()
         
         return deleted_counts
@@ -171,6 +204,24 @@ async def get_company(
         updated_at=company.updated_at
     )
 
+@router.get("/{company_id}/data-version", response_model=DataVersionResponse)
+async def get_company_data_version(
+    company_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Versión de datos contables de la empresa. `version` crece con cada escritura de
+    cuentas, asientos, mayor o tipos de documento; `token` cambia además con las
+    importaciones de base de datos. Pensado para polling del frontend: si el token
+    no cambió, los datos ya cargados siguen vigentes.
+    """
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+    return (await get_data_version(company_id)).response()
+
 @router.post("/", response_model=CompanyResponse)
 async def create_company(
     company_data: CompanyCreate,
@@ -286,7 +337,9 @@ async def update_company(
     
     company.updated_at = datetime.now()
     await company.save()
-    
+    # Nombre, RUC o ejercicio fiscal forman parte de reportes en caché y ETags
+    await data_versions.bump(company_id)
+
     # Log de auditoría
     await log_audit(
         user=current_user,
@@ -6,6 +6,12 @@ from app.auth.dependencies import get_current_user, require_permission, log_audi
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from app.config import settings
+from app.models.money import to_decimal128
+from app.services.chart_cache import chart_cache
+from app.services.data_version import data_versions
+from app.services.period_locks import period_locks
+from app.services.ledger_archive import ledger_archives
+from app.services.document_sequences import resync_document_sequences
 import json
 import csv
 import io
@@ -17,6 +23,13 @@ import asyncio
 
 router = APIRouter()
 
+# Campos monetarios: el backup JSON los guarda como texto (Decimal128 -> str)
+MONEY_FIELDS = {
+    "initial_debit_balance", "initial_credit_balance", "current_debit_balance", "current_credit_balance",
+    "total_debit", "total_credit", "debit_amount", "credit_amount",
+    "running_debit_balance", "running_credit_balance",
+}
+
 def process_document_for_import(doc):
     """
     Procesa un documento para importación, validando y convirtiendo ObjectIds correctamente
@@ -47,6 +60,17 @@ def process_document_for_import(doc):
                     print(f"   ⚠️  Error reconstruyendo ObjectId desde dict: {e}")
                     return None
         
+        # Restaurar montos como Decimal128 (incluidas las líneas de asientos)
+        for key in MONEY_FIELDS & processed_doc.keys():
+            if isinstance(processed_doc[key], (str, int, float)):
+                processed_doc[key] = to_decimal128(processed_doc[key])
+        if isinstance(processed_doc.get("lines"), list):
+            processed_doc["lines"] = [
+                {**line, **{k: to_decimal128(line[k]) for k in ("debit", "credit") if isinstance(line.get(k), (str, int, float))}}
+                if isinstance(line, dict) else line
+                for line in processed_doc["lines"]
+            ]
+        
         # Procesar otros campos que puedan contener ObjectIds
         for key, value in processed_doc.items():
             if key != '_id' and isinstance(value, str) and len(value) == 24:
@@ -543,6 +567,11 @@ async def import_database(
                         collections_processed += 1
                     
                     print(f"🎉 Importación completada: {imported_count} documentos en {collections_processed} colecciones")
+
+                    # Los asientos importados no pasan por la creación: recalcular secuencias
+                    if "journal_entries" in collections_data or "document_types" in collections_data:
+                        resynced = await resync_document_sequences()
+                        print(f"   🔢 Secuencias de {resynced} tipos de documento sincronizadas")
                     
                 else:
                     raise HTTPException(
@@ -579,6 +608,11 @@ async def import_database(
                     )
             finally:
                 client.close()
+                # La importación puede reemplazar datos (y versiones) de cualquier empresa
+                chart_cache.invalidate()
+                period_locks.invalidate()
+                ledger_archives.forget()
+                await data_versions.bump_all()
                 print(f"🔌 Conexión a MongoDB cerrada")
             
             # Log de auditoría
@@ -8,10 +8,11 @@ from app.models.document_type import (
     DocumentTypeUpdate,
     DocumentTypeResponse,
 )
-from app.models.journal import JournalEntry
 from app.models.user import User
 from app.models.document_reservation import DocumentNumberReservation, ReservationStatus
 from app.auth.dependencies import require_permission, log_audit, AuditAction, AuditModule
+from app.services.document_sequences import resync_document_sequences
+from app.services.data_version import data_versions
 
 
 router = APIRouter(prefix="/document-types", tags=["Document Types"])
@@ -46,26 +47,10 @@ async def list_document_types(
     company_id: str = Query(...),
     current_user: User = Depends(require_permission("companies:update"))
 ):
+    # next_sequence se mantiene al crear asientos (marca de agua alta con $max),
+    # así que el listado es una sola lectura por el índice (company_id, code)
     items = await DocumentType.find(DocumentType.company_id == company_id).to_list()
 
-    # Sincronizar next_sequence con el máximo número existente de asientos por código
-    for doc in items:
-        try:
-            # Buscar el último asiento con prefijo CODE- y misma empresa
-            last_list = await JournalEntry.find({
-                "company_id": company_id,
-                "entry_number": {"$regex": f"^{doc.code}-"}
-            }).sort("-entry_number").limit(1).to_list()
-            if last_list:
-                last_number_str = last_list[0].entry_number.split("-")[-1]
-                last_numeric = int(last_number_str)
-                if doc.next_sequence < last_numeric:
-                    doc.next_sequence = last_numeric
-                    await doc.save()
-        except Exception:
-            # No interrumpir listado por errores de parseo/consulta
-            pass
-
     return [to_response(i) for i in items]
 
 
@@ -101,6 +86,7 @@ async def create_document_type(
         created_by=str(current_user.id)
     )
     await doc.insert()
+    await data_versions.bump(company_id)
     await log_audit(
         user=current_user,
         action=AuditAction.CREATE,
@@ -134,6 +120,7 @@ async def update_document_type(
         setattr(doc, k, v)
     doc.updated_at = datetime.now()
     await doc.save()
+    await data_versions.bump(doc.company_id)
     await log_audit(
         user=current_user,
         action=AuditAction.UPDATE,
@@ -448,6 +435,7 @@ async def reset_all_document_numbers(
             await document_type.insert()
             created_count += 1
         
+        await data_versions.bump(company_id)
         client.close()
         return {"message": f"Se crearon {created_count} tipos de documentos y se reiniciaron los números"}
     
@@ -463,6 +451,9 @@ async def reset_all_document_numbers(
                 }
             }
     )
+    # Volver a la marca de agua alta de los asientos que aún existen
+    await resync_document_sequences(company_id)
+    await data_versions.bump(company_id)
     
     client.close()
     return {"message": f"Reiniciados {result.modified_count} tipos de documentos"}
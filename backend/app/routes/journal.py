@@ -1,14 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from typing import List, Optional
 from app.models.journal import JournalEntry, JournalEntryCreate, JournalEntryUpdate, JournalEntryResponse, JournalEntryApprove, JournalLine
+from app.models.money import ZERO
 from app.models.document_reservation import DocumentNumberReservation, ReservationStatus
 from app.models.user import User
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.services.data_version import company_etag, data_versions
 from app.services.ledger_service import LedgerService
+from app.services.ledger_archive import ledger_archives
+from app.services.concurrency import ConcurrencyConflictError, compare_and_set
+from app.services.period_locks import PeriodLockedError, period_locks
+from app.services.document_sequences import record_entry_number
+from app.services.fast_json import FastJSONResponse, ProjectionSchema, SchemaField, id_str, money
 from datetime import datetime
 from bson import ObjectId
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+async def _check_period_open(company_id: str, *dates: datetime):
+    """409 si alguna fecha cae en un período cerrado (fecha de bloqueo en memoria, sin E/S)"""
+    try:
+        for date in dates:
+            await period_locks.check(company_id, date)
+    except PeriodLockedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+# Forma de JournalEntryResponse sobre documentos crudos (ruta ?fast=true)
+_LINE_FAST_SCHEMA = ProjectionSchema(
+    account_code=SchemaField(),
+    account_name=SchemaField(),
+    description=SchemaField(),
+    debit=SchemaField(convert=money, default=0.0),
+    credit=SchemaField(convert=money, default=0.0),
+    reference=SchemaField(),
+)
+_ENTRY_FAST_SCHEMA = ProjectionSchema(
+    id=SchemaField("_id", id_str),
+    entry_number=SchemaField(),
+    document_type_id=SchemaField(),
+    document_type_code=SchemaField(),
+    date=SchemaField(),
+    description=SchemaField(),
+    entry_type=SchemaField(),
+    status=SchemaField(),
+    lines=SchemaField(convert=_LINE_FAST_SCHEMA.rows, default=[]),
+    total_debit=SchemaField(convert=money, default=0.0),
+    total_credit=SchemaField(convert=money, default=0.0),
+    company_id=SchemaField(),
+    created_by=SchemaField(),
+    responsable=SchemaField(),
+    approved_by=SchemaField(),
+    approved_at=SchemaField(),
+    revision=SchemaField(default=0),
+    created_at=SchemaField(),
+    updated_at=SchemaField(),
+)
 
 @router.get("/", response_model=List[JournalEntryResponse])
 async def get_journal_entries(
@@ -20,7 +69,9 @@ async def get_journal_entries(
     status: Optional[str] = Query(None),
     entry_type: Optional[str] = Query(None),
     account_code: Optional[str] = Query(None, description="Filtrar por código de cuenta en líneas"),
-    current_user: User = Depends(require_permission("journal:read"))
+    fast: bool = Query(False, description="Serialización rápida (orjson) de documentos proyectados, sin revalidar response_model"),
+    current_user: User = Depends(require_permission("journal:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener lista de asientos contables con filtros"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -51,7 +102,23 @@ async def get_journal_entries(
         # Filtrar por líneas que contengan el código de cuenta
         query["lines.account_code"] = account_code
 
-    entries = await JournalEntry.find(query).skip(skip).limit(limit).to_list()
+    # Un rango de fechas anterior al archivo incluye los asientos de los años archivados
+    archived = await ledger_archives.journal_collections(company_id, query)
+    if archived:
+        stages = [{"$sort": {"date": 1, "_id": 1}}, {"$skip": skip}, {"$limit": limit}]
+        if fast:
+            stages.append({"$project": _ENTRY_FAST_SCHEMA.projection})
+        pipeline = ledger_archives.journal_pipeline(query, archived, stages)
+        docs = await JournalEntry.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        if fast:
+            return FastJSONResponse(_ENTRY_FAST_SCHEMA.rows(docs))
+        entries = [JournalEntry.model_validate(doc) for doc in docs]
+    elif fast:
+        # Ruta rápida: documentos crudos con la proyección del esquema, sin modelos Beanie ni JournalEntryResponse
+        docs = await JournalEntry.get_motor_collection().find(query, _ENTRY_FAST_SCHEMA.projection).skip(skip).limit(limit).to_list(length=None)
+        return FastJSONResponse(_ENTRY_FAST_SCHEMA.rows(docs))
+    else:
+        entries = await JournalEntry.find(query).skip(skip).limit(limit).to_list()
     
     return [
         JournalEntryResponse(
@@ -72,7 +139,8 @@ async def get_journal_entries(
             approved_by=entry.approved_by,
             approved_at=entry.approved_at,
             created_at=entry.created_at,
-            updated_at=entry.updated_at
+            updated_at=entry.updated_at,
+            revision=entry.revision
         )
         for entry in entries
     ]
@@ -115,7 +183,8 @@ async def get_journal_entry(
         approved_by=entry.approved_by,
         approved_at=entry.approved_at,
         created_at=entry.created_at,
-        updated_at=entry.updated_at
+        updated_at=entry.updated_at,
+        revision=entry.revision
     )
 
 @router.post("/", response_model=JournalEntryResponse)
@@ -126,11 +195,11 @@ async def create_journal_entry(
     current_user: User = Depends(require_permission("journal:create"))
 ):
     """Crear nuevo asiento contable"""
-    print(f"🚀 CREANDO ASIENTO - Número: {entry_data.entry_number}")
-    print(f"📋 Descripción: {entry_data.description}")
-    print(f"👨‍💼 Responsable: {entry_data.responsable}")
-    print(f"🏢 Empresa: {company_id}")
-    print(f"👤 Usuario: {current_user.first_name} {current_user.last_name}")
+    logger.debug("🚀 CREANDO ASIENTO - Número: %s", entry_data.entry_number)
+    logger.debug("📋 Descripción: %s", entry_data.description)
+    logger.debug("👨‍💼 Responsable: %s", entry_data.responsable)
+    logger.debug("🏢 Empresa: %s", company_id)
+    logger.debug("👤 Usuario: %s %s", current_user.first_name, current_user.last_name)
     
     # Verificar que el usuario tenga acceso a esta empresa
     if current_user.role != "admin" and company_id not in current_user.companies:
@@ -140,15 +209,17 @@ async def create_journal_entry(
         )
     
     # Validar doble partida
-    total_debit = sum(line.debit for line in entry_data.lines)
-    total_credit = sum(line.credit for line in entry_data.lines)
+    total_debit = sum((line.debit for line in entry_data.lines), ZERO)
+    total_credit = sum((line.credit for line in entry_data.lines), ZERO)
     
-    if abs(total_debit - total_credit) > 0.01:  # Tolerancia de 1 centavo
+    if total_debit != total_credit:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El asiento no está balanceado. Débitos y créditos deben ser iguales"
         )
     
+    await _check_period_open(company_id, entry_data.date)
+    
     # Usar el número de asiento provisto (reservado) y validar unicidad por empresa
     entry_number = entry_data.entry_number
     if not entry_number or "-" not in entry_number:
@@ -184,9 +255,11 @@ async def create_journal_entry(
     )
     
     await new_entry.insert()
-    print(f"✅ ASIENTO CREADO EXITOSAMENTE - ID: {new_entry.id}")
-    print(f"📋 Número: {new_entry.entry_number}")
-    print(f"👨‍💼 Responsable: {new_entry.responsable}")
+    await record_entry_number(company_id, new_entry.entry_number)
+    await data_versions.bump(company_id)
+    logger.debug("✅ ASIENTO CREADO EXITOSAMENTE - ID: %s", new_entry.id)
+    logger.debug("📋 Número: %s", new_entry.entry_number)
+    logger.debug("👨‍💼 Responsable: %s", new_entry.responsable)
 
     # Marcar reserva como usada si existe
     try:
@@ -240,7 +313,8 @@ async def create_journal_entry(
         approved_by=new_entry.approved_by,
         approved_at=new_entry.approved_at,
         created_at=new_entry.created_at,
-        updated_at=new_entry.updated_at
+        updated_at=new_entry.updated_at,
+        revision=new_entry.revision
     )
 
 @router.put("/{entry_id}/", response_model=JournalEntryResponse)
@@ -283,13 +357,18 @@ async def update_journal_entry(
     
     # Actualizar campos
     update_data = entry_update.dict(exclude_unset=True)
+    # Ni la fecha actual ni la nueva pueden caer en un período cerrado
+    await _check_period_open(entry.company_id, entry.date, update_data.get("date") or entry.date)
+    expected_revision = update_data.pop("revision", None)
+    if expected_revision is None:
+        expected_revision = entry.revision
     
     # Si se actualizan las líneas, validar doble partida
     if "lines" in update_data:
-        total_debit = sum(line["debit"] for line in update_data["lines"])
-        total_credit = sum(line["credit"] for line in update_data["lines"])
+        total_debit = sum((line["debit"] for line in update_data["lines"]), ZERO)
+        total_credit = sum((line["credit"] for line in update_data["lines"]), ZERO)
         
-        if abs(total_debit - total_credit) > 0.01:
+        if total_debit != total_credit:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El asiento no está balanceado. Débitos y créditos deben ser iguales"
@@ -305,7 +384,22 @@ async def update_journal_entry(
             entry.lines = [JournalLine(**line) for line in value]
     
     entry.updated_at = datetime.now()
-    await entry.save()
+    
+    # Guardar solo los campos modificados con compare-and-swap sobre la revisión
+    changed_fields = set(update_data) | {"updated_at"}
+    if "lines" in update_data:
+        changed_fields |= {"total_debit", "total_credit"}
+    try:
+        entry.revision = await compare_and_set(
+            JournalEntry,
+            entry.id,
+            expected_revision,
+            entry.model_dump(include=changed_fields),
+            expected={"status": {"$ne": "posted"}}
+        )
+    except ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await data_versions.bump(entry.company_id)
     
     # Log de auditoría
     await log_audit(
@@ -339,7 +433,8 @@ async def update_journal_entry(
         approved_by=entry.approved_by,
         approved_at=entry.approved_at,
         created_at=entry.created_at,
-        updated_at=entry.updated_at
+        updated_at=entry.updated_at,
+        revision=entry.revision
     )
 
 @router.post("/{entry_id}/approve/", response_model=JournalEntryResponse)
@@ -370,6 +465,7 @@ async def approve_journal_entry(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El asiento ya está aprobado"
         )
+    await _check_period_open(entry.company_id, entry.date)
     
     # Actualizar estado
     if approval_data.approved:
@@ -382,7 +478,17 @@ async def approve_journal_entry(
         entry.approved_at = None
     
     entry.updated_at = datetime.now()
-    await entry.save()
+    try:
+        entry.revision = await compare_and_set(
+            JournalEntry,
+            entry.id,
+            entry.revision,
+            entry.model_dump(include={"status", "approved_by", "approved_at", "updated_at"}),
+            expected={"status": {"$ne": "posted"}}
+        )
+    except ConcurrencyConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await data_versions.bump(entry.company_id)
     
     # Log de auditoría
     action = AuditAction.APPROVE if approval_data.approved else AuditAction.REJECT
@@ -419,7 +525,8 @@ async def approve_journal_entry(
         approved_by=entry.approved_by,
         approved_at=entry.approved_at,
         created_at=entry.created_at,
-        updated_at=entry.updated_at
+        updated_at=entry.updated_at,
+        revision=entry.revision
     )
 
 @router.delete("/{entry_id}/")
@@ -452,6 +559,7 @@ async def delete_journal_entry(
     
     # Eliminar asiento
     await entry.delete()
+    await data_versions.bump(entry.company_id)
     
     # Log de auditoría
     await log_audit(
@@ -480,27 +588,28 @@ async def post_journal_entry(
 ):
     """Mayorizar un asiento contable (aplicar a las cuentas)"""
     try:
-        print(f"🚀 Iniciando mayorización de asiento: {entry_id}")
+        logger.debug("🚀 Iniciando mayorización de asiento: %s", entry_id)
         
         entry = await JournalEntry.get(entry_id)
         if not entry:
-            print(f"❌ Asiento no encontrado: {entry_id}")
+            logger.warning("❌ Asiento no encontrado: %s", entry_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Asiento contable no encontrado"
             )
         
-        print(f"📋 Asiento encontrado: {entry.entry_number}, Estado: {entry.status}")
+        logger.debug("📋 Asiento encontrado: %s, Estado: %s", entry.entry_number, entry.status)
         
         # Verificar que el asiento esté en estado DRAFT
         if entry.status != "draft":
-            print(f"❌ Asiento no está en estado DRAFT: {entry.status}")
+            logger.warning("❌ Asiento no está en estado DRAFT: %s", entry.status)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Solo se pueden mayorizar asientos en estado DRAFT"
             )
+        await _check_period_open(entry.company_id, entry.date)
         
-        print(f"✅ Asiento válido para mayorización. Iniciando proceso...")
+        logger.debug("✅ Asiento válido para mayorización. Iniciando proceso...")
         
         # Mayorizar el asiento
         success = await LedgerService.post_journal_entry(
@@ -509,24 +618,24 @@ async def post_journal_entry(
             str(current_user.id)
         )
         
-        print(f"📊 Resultado de mayorización: {success}")
+        logger.debug("📊 Resultado de mayorización: %s", success)
         
         if not success:
-            print(f"❌ Error en la mayorización del asiento")
+            logger.error("❌ Error en la mayorización del asiento")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Error al mayorizar el asiento"
             )
         
-        print(f"✅ Asiento mayorizado exitosamente")
+        logger.debug("✅ Asiento mayorizado exitosamente")
         
     except HTTPException:
         # Re-lanzar HTTPExceptions sin modificar
         raise
+    except (ConcurrencyConflictError, PeriodLockedError) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except Exception as e:
-        print(f"❌ Error inesperado al mayorizar asiento: {e}")
-        import traceback
-        print(f"📋 Traceback completo: {traceback.format_exc()}")
+        logger.exception("❌ Error inesperado al mayorizar asiento: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error interno del servidor: {str(e)}"
@@ -548,9 +657,9 @@ async def post_journal_entry(
     # Obtener el asiento actualizado
     updated_entry = await JournalEntry.get(entry_id)
     responsable_value = getattr(updated_entry, 'responsable', None)
-    print(f"🔍 Asiento actualizado - Responsable: {responsable_value}")
-    print(f"🔍 Tipo de responsable: {type(responsable_value)}")
-    print(f"🔍 Es None: {responsable_value is None}")
+    logger.debug("🔍 Asiento actualizado - Responsable: %s", responsable_value)
+    logger.debug("🔍 Tipo de responsable: %s", type(responsable_value))
+    logger.debug("🔍 Es None: %s", responsable_value is None)
     return JournalEntryResponse(
         id=str(updated_entry.id),
         entry_number=updated_entry.entry_number,
@@ -569,7 +678,8 @@ async def post_journal_entry(
         approved_by=updated_entry.approved_by,
         approved_at=updated_entry.approved_at,
         created_at=updated_entry.created_at,
-        updated_at=updated_entry.updated_at
+        updated_at=updated_entry.updated_at,
+        revision=updated_entry.revision
     )
 
 @router.post("/{entry_id}/unpost/", response_model=JournalEntryResponse)
@@ -592,13 +702,17 @@ async def unpost_journal_entry(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Solo se pueden desmayorizar asientos mayorizados"
         )
+    await _check_period_open(entry.company_id, entry.date)
     
     # Desmayorizar usando el LedgerService
-    success = await LedgerService.unpost_journal_entry(
-        entry, 
-        entry.company_id, 
-        str(current_user.id)
-    )
+    try:
+        success = await LedgerService.unpost_journal_entry(
+            entry, 
+            entry.company_id, 
+            str(current_user.id)
+        )
+    except (ConcurrencyConflictError, PeriodLockedError) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
     if not success:
         raise HTTPException(
@@ -638,7 +752,8 @@ async def unpost_journal_entry(
         approved_by=entry.approved_by,
         approved_at=entry.approved_at,
         created_at=entry.created_at,
-        updated_at=entry.updated_at
+        updated_at=entry.updated_at,
+        revision=entry.revision
     )
 
 @router.post("/{entry_id}/copy/", response_model=JournalEntryResponse)
@@ -662,6 +777,8 @@ async def copy_journal_entry(
             detail="No tienes acceso a este asiento"
         )
     
+    await _check_period_open(original_entry.company_id, original_entry.date)
+    
     # Generar número de asiento para la copia
     last_entry = await JournalEntry.find(
         JournalEntry.company_id == original_entry.company_id
@@ -689,6 +806,8 @@ async def copy_journal_entry(
     )
     
     await copied_entry.insert()
+    await record_entry_number(copied_entry.company_id, copied_entry.entry_number)
+    await data_versions.bump(copied_entry.company_id)
     
     # Log de auditoría
     await log_audit(
@@ -723,7 +842,8 @@ async def copy_journal_entry(
         approved_by=copied_entry.approved_by,
         approved_at=copied_entry.approved_at,
         created_at=copied_entry.created_at,
-        updated_at=copied_entry.updated_at
+        updated_at=copied_entry.updated_at,
+        revision=copied_entry.revision
     )
 
 @router.post("/{entry_id}/reverse/")
@@ -746,13 +866,18 @@ async def reverse_journal_entry(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Solo se pueden revertir asientos mayorizados"
         )
+    # El asiento de reversión se fecha hoy
+    await _check_period_open(entry.company_id, datetime.now())
     
     # Revertir el asiento
-    success = await LedgerService.reverse_journal_entry(
-        entry, 
-        entry.company_id, 
-        str(current_user.id)
-    )
+    try:
+        success = await LedgerService.reverse_journal_entry(
+            entry, 
+            entry.company_id, 
+            str(current_user.id)
+        )
+    except (ConcurrencyConflictError, PeriodLockedError) as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
     if not success:
         raise HTTPException(
@@ -2,9 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from typing import List, Optional
 from app.models.ledger import AccountLedgerSummary
 from app.models.journal import JournalEntry, JournalEntryResponse
+from app.models.money import ZERO, to_decimal
 from app.models.user import User
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.services.data_version import company_etag
 from app.services.ledger_service import LedgerService
+from app.services.ledger_archive import ledger_archives
+from app.services.fast_json import FastJSONResponse
 from datetime import datetime
 
 router = APIRouter()
@@ -60,7 +64,7 @@ async def debug_ledger_data(
             "journal_entries": [{"id": str(je.id), "entry_number": je.entry_number, "status": je.status, "lines_count": len(je.lines)} for je in journal_entries],
             "ledger_entries_count": len(ledger_entries),
             "mongo_ledger_entries_count": len(mongo_ledger_entries),
-            "mongo_ledger_entries": [{"account_id": entry.get("account_id"), "account_code": entry.get("account_code"), "debit": entry.get("debit_amount"), "credit": entry.get("credit_amount")} for entry in mongo_ledger_entries[:10]]
+            "mongo_ledger_entries": [{"account_id": entry.get("account_id"), "account_code": entry.get("account_code"), "debit": to_decimal(entry.get("debit_amount")), "credit": to_decimal(entry.get("credit_amount"))} for entry in mongo_ledger_entries[:10]]
         }
         
     except Exception as e:
@@ -291,7 +295,9 @@ async def get_general_ledger(
     min_value: Optional[float] = Query(None, description="Valor mínimo"),
     max_value: Optional[float] = Query(None, description="Valor máximo"),
     exact_value: Optional[float] = Query(None, description="Valor exacto"),
-    current_user: User = Depends(require_permission("reports:read"))
+    fast: bool = Query(False, description="Serialización rápida (orjson) sin revalidar los resúmenes contra response_model"),
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener el mayor general de todas las cuentas"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -373,6 +379,9 @@ async def get_general_ledger(
             search_filters['exact_value'] = exact_value
         
         ledgers = await LedgerService.get_general_ledger(company_id, start_dt, end_dt, search_filters)
+        if fast:
+            # Los resúmenes ya fueron construidos y validados por el servicio
+            return FastJSONResponse(ledgers)
         return ledgers
     except Exception as e:
         raise HTTPException(
@@ -386,7 +395,8 @@ async def get_account_ledger(
     company_id: str = Query(..., description="ID de la empresa"),
     start_date: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener el mayor de una cuenta específica"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -438,7 +448,8 @@ async def get_account_ledger_entries(
     company_id: str = Query(..., description="ID de la empresa"),
     start_date: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Entradas del mayor para una cuenta (respuesta simple y robusta)"""
     if current_user.role != "admin" and company_id not in current_user.companies:
@@ -459,8 +470,6 @@ async def get_account_ledger_entries(
             raise HTTPException(status_code=400, detail="Formato de fecha fin inválido. Use YYYY-MM-DD")
 
     try:
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from app.config import settings
         from app.models.account import Account
 
         # Obtener cuenta
@@ -471,10 +480,6 @@ async def get_account_ledger_entries(
         if not account:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        db = client[settings.database_name]
-        col = db.ledger_entries
-
         query = {"company_id": company_id, "account_id": str(account.id)}
         if start_dt:
             query["date"] = {"$gte": start_dt}
@@ -484,8 +489,10 @@ async def get_account_ledger_entries(
             else:
                 query["date"] = {"$lte": end_dt}
 
-        docs = await col.find(query).sort("date", 1).to_list(1000)
-        client.close()
+        # Años archivados incluidos si el rango de fechas llega antes del archivo
+        docs = await ledger_archives.aggregate_ledger(
+            company_id, query, [{"$sort": {"date": 1, "created_at": 1, "_id": 1}}, {"$limit": 1000}]
+        )
 
         # Normalizar
         entries = [
@@ -494,10 +501,10 @@ async def get_account_ledger_entries(
                 "date": d.get("date"),
                 "description": d.get("description"),
                 "reference": d.get("reference"),
-                "debit_amount": d.get("debit_amount", 0),
-                "credit_amount": d.get("credit_amount", 0),
-                "running_debit_balance": d.get("running_debit_balance", 0),
-                "running_credit_balance": d.get("running_credit_balance", 0),
+                "debit_amount": to_decimal(d.get("debit_amount")),
+                "credit_amount": to_decimal(d.get("credit_amount")),
+                "running_debit_balance": to_decimal(d.get("running_debit_balance")),
+                "running_credit_balance": to_decimal(d.get("running_credit_balance")),
                 "account_code": d.get("account_code"),
                 "account_name": d.get("account_name"),
             }
@@ -522,7 +529,8 @@ async def get_ledger_entries(
     company_id: str = Query(..., description="ID de la empresa"),
     start_date: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="Fecha fin (YYYY-MM-DD)"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener los asientos contables mayorizados (para el Mayor General)"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -604,7 +612,8 @@ async def get_ledger_entries(
                 approved_by=entry.get("approved_by"),
                 approved_at=entry.get("approved_at"),
                 created_at=entry["created_at"],
-                updated_at=entry["updated_at"]
+                updated_at=entry["updated_at"],
+                revision=entry.get("revision", 0)
             ))
         
         return response_entries
@@ -617,7 +626,8 @@ async def get_ledger_entries(
 @router.get("/summary", response_model=dict)
 async def get_ledger_summary(
     company_id: str = Query(..., description="ID de la empresa"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Obtener resumen del mayor general"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -642,9 +652,9 @@ async def get_ledger_summary(
         ledgers = await LedgerService.get_general_ledger(company_id)
         
         # Calcular totales generales
-        total_debits = sum(ledger.total_debits for ledger in ledgers)
-        total_credits = sum(ledger.total_credits for ledger in ledgers)
-        total_balance = sum(ledger.net_balance for ledger in ledgers)
+        total_debits = sum((ledger.total_debits for ledger in ledgers), ZERO)
+        total_credits = sum((ledger.total_credits for ledger in ledgers), ZERO)
+        total_balance = sum((ledger.net_balance for ledger in ledgers), ZERO)
         
         # Agrupar por tipo de cuenta
         by_type = {}
@@ -653,9 +663,9 @@ async def get_ledger_summary(
             if account_type not in by_type:
                 by_type[account_type] = {
                     "count": 0,
-                    "total_debits": 0,
-                    "total_credits": 0,
-                    "net_balance": 0
+                    "total_debits": ZERO,
+                    "total_credits": ZERO,
+                    "net_balance": ZERO
                 }
             
             by_type[account_type]["count"] += 1
@@ -669,7 +679,7 @@ async def get_ledger_summary(
             "total_debits": total_debits,
             "total_credits": total_credits,
             "total_balance": total_balance,
-            "is_balanced": abs(total_debits - total_credits) < 0.01,
+            "is_balanced": total_debits == total_credits,
             "by_type": by_type,
             "generated_at": datetime.now().isoformat()
         }
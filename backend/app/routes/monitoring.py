@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+from app.models.user import User
+from app.auth.dependencies import require_role
+from app.services.query_profiler import profiler
+from app.services.report_cache import report_cache
+
+router = APIRouter()
+
+
+@router.get("/queries")
+async def get_query_stats(
+    limit: int = 50,
+    sort: str = "avg_commands",
+    current_user: User = Depends(require_role(["admin"]))
+):
+    """Estadísticas de comandos Mongo por ruta (round trips, tiempo en Mongo, documentos)"""
+    return profiler.stats(limit=limit, sort=sort)
+
+
+@router.delete("/queries")
+async def reset_query_stats(current_user: User = Depends(require_role(["admin"]))):
+    """Reiniciar las estadísticas del perfilador de consultas"""
+    profiler.reset()
+    return {"message": "Estadísticas del perfilador reiniciadas"}
+
+
+@router.get("/report-cache")
+async def get_report_cache_stats(current_user: User = Depends(require_role(["admin"]))):
+    """Estado de la caché de reportes (aciertos, fallos, peticiones agrupadas, memoria)"""
+    return report_cache.stats()
+
+
+@router.delete("/report-cache")
+async def clear_report_cache(current_user: User = Depends(require_role(["admin"]))):
+    """Vaciar la caché de reportes y reiniciar sus contadores"""
+    report_cache.clear()
+    report_cache.reset_stats()
+    return {"message": "Caché de reportes vaciada"}
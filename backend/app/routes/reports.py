@@ -1,66 +1,64 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Awaitable, Callable
 from app.models.user import User
-from app.models.account import Account, AccountBalance, AccountResponse
+from app.models.company import Company
 from app.models.journal import JournalEntry
+from app.models.ledger import LedgerEntryType
+from app.models.money import from_cents
+from app.services.data_version import DataVersion, company_etag, data_versions
+from app.services.chart_cache import ChartSnapshot, chart_cache
+from app.services.fast_json import FastJSONResponse
+from app.services.report_cache import cached_json, report_cache
+from app.services.cash_flow import DEFAULT_SECTIONS, build_cash_flow, parse_sections
+from app.services.ledger_archive import ledger_archives
+from app.services.consolidation import ConsolidatedChart, apply_eliminations, consolidated_groups, gather_bounded, leaf_group_totals
+from app.config import settings
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
 from datetime import datetime, timedelta
 from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import numpy as np
 
 router = APIRouter()
 
-def _build_hierarchy_helpers(accounts: List[Account]) -> Tuple[Dict[str, List[Account]], Dict[str, Account]]:
-    """Create helpers to identify parents/children by `parent_code` and fallback by code length pattern."""
-    account_by_code: Dict[str, Account] = {a.code: a for a in accounts if a.code}
-    children_by_parent: Dict[str, List[Account]] = {}
-    for acc in accounts:
-        if not acc.code:
-            continue
-        parent = acc.parent_code
-        if parent:
-            children_by_parent.setdefault(parent, []).append(acc)
-    return children_by_parent, account_by_code
-
-def _get_direct_children(parent_code: str, accounts: List[Account], children_by_parent: Dict[str, List[Account]]) -> List[Account]:
-    """Return immediate children of a parent. Prefer `parent_code`, fallback to code-length heuristic (+2)."""
-    direct = list(children_by_parent.get(parent_code, []))
-    if direct:
-        return direct
-    # Fallback by code-length (+2)
-    expected_len = len(parent_code) + 2
-    return [a for a in accounts if a.code and a.code.startswith(parent_code) and len(a.code) == expected_len]
-
-def _compute_parent_balances(accounts: List[Account], per_account_saldo: Dict[str, float]) -> Dict[str, float]:
-    """Compute parent balances as sum of immediate children saldo. Leaves retain their own saldo."""
-    children_by_parent, _ = _build_hierarchy_helpers(accounts)
-    # We may need to compute bottom-up; sort parents by code length desc ensures children first
-    by_code = {a.code: a for a in accounts if a.code}
-    codes_sorted = sorted(by_code.keys(), key=lambda c: len(c), reverse=True)
-    result = dict(per_account_saldo)
-    for code in codes_sorted:
-        parent = by_code[code]
-        kids = _get_direct_children(code, accounts, children_by_parent)
-        if kids:
-            result[code] = sum(result.get(k.code, 0.0) for k in kids if k.code)
-    return result
-
-def _is_leaf(account: Account, accounts: List[Account], children_by_parent: Dict[str, List[Account]]) -> bool:
-    if account.code in children_by_parent and children_by_parent[account.code]:
-        return False
-    # Fallback check by code-length heuristic
-    expected_len = len(account.code or '') + 2
-    return not any(a.code and a.code.startswith(account.code or '') and len(a.code) == expected_len for a in accounts)
+# Columnas máximas de un reporte comparativo (p. ej. 36 meses)
+_MAX_COMPARATIVE_COLUMNS = 36
+
+def _build_report_groups(chart: ChartSnapshot, balances: np.ndarray, descriptions: Dict[str, str]) -> Dict[str, Any]:
+    """Armar los grupos del reporte (cuentas en orden del plan y total sumando solo hojas)."""
+    groups: Dict[str, Any] = {}
+    for group, description in descriptions.items():
+        in_group = chart.group == int(group)
+        indexes = np.flatnonzero(in_group)
+        groups[group] = {
+            "descripcion": description,
+            "cuentas": [
+                {
+                    "id": chart.ids[i],
+                    "codigo": chart.codes[i],
+                    "nombre": chart.names[i],
+                    "saldo": from_cents(balances[i])
+                }
+                for i in indexes
+            ],
+            # Total solo con hojas para evitar doble conteo
+            "total": from_cents(balances[in_group & chart.is_leaf].sum())
+        }
+    return groups
 
 @router.get("/balance-general")
 async def get_balance_general(
     company_id: str = Query(..., description="ID de la empresa"),
     as_of_date: str = Query(..., description="Fecha de corte (YYYY-MM-DD)"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    version: DataVersion = Depends(company_etag)
 ):
     """Generar Estado de Situación Financiera (Balance General) a una fecha.
 
     Agrupa por naturaleza del plan de cuentas mediante el primer dígito del código:
-    1 Activo, 2 Pasivo, 3 Patrimonio.
+    1 Activo, 2 Pasivo, 3 Patrimonio. El resultado se guarda en la caché de
+    reportes hasta la próxima escritura de la empresa.
     """
     if current_user.role != "admin" and company_id not in current_user.companies:
         raise HTTPException(
@@ -77,88 +75,66 @@ async def get_balance_general(
             detail="Formato de fecha inválido. Use YYYY-MM-DD"
         )
 
-    # Cargar cuentas
-    accounts = await Account.find(
-        Account.company_id == company_id,
-        Account.is_active == True
-    ).to_list()
+    body = await report_cache.get_or_compute(
+        company_id, "balance-general", {"as_of_date": as_of_date}, version.token,
+        lambda: _compute_balance_general(company_id, as_of_date, inclusive_end)
+    )
+    return cached_json(body)
 
-    account_by_id: Dict[str, Account] = {str(a.id): a for a in accounts}
+def _movements_match(company_id: str, date_filter: Dict[str, Any], include_closing: bool) -> Dict[str, Any]:
+    match: Dict[str, Any] = {"company_id": company_id, "date": date_filter}
+    if not include_closing:
+        # Los asientos de cierre saldan los resultados contra patrimonio: no son
+        # ingresos ni gastos del período
+        match["entry_type"] = {"$ne": LedgerEntryType.CLOSING.value}
+    return match
 
-    # Agregar movimientos hasta la fecha de corte
+async def _account_movements(company_id: str, date_filter: Dict[str, datetime], include_closing: bool = True) -> List[dict]:
+    """
+    Débitos y créditos por cuenta de los movimientos del mayor en el rango de fechas
+    (con los años archivados si el rango llega antes del archivo)
+    """
+    group = {"$group": {
+        "_id": "$account_id",
+        "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+        "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
+    }}
     try:
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from app.config import settings
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        db = client[settings.database_name]
-        collection = db.ledger_entries
-
-        pipeline = [
-            {"$match": {
-                "company_id": company_id,
-                "date": {"$lt": inclusive_end}
-            }},
-            {"$group": {
-                "_id": "$account_id",
-                "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
-                "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
-            }}
-        ]
-        cursor = collection.aggregate(pipeline)
-        sums = await cursor.to_list(10000)
-        client.close()
+        return await ledger_archives.aggregate_ledger(company_id, _movements_match(company_id, date_filter, include_closing), [group])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error consultando movimientos: {str(e)}")
 
-    sums_by_account: Dict[str, Dict[str, float]] = {str(doc.get("_id")): doc for doc in sums}
-
-    # Calcular saldo por cuenta (neto) y luego recomputar saldos de padres desde sus hijas
-    per_account_saldo: Dict[str, float] = {}
-    for account in accounts:
-        agg = sums_by_account.get(str(account.id), {})
-        sum_debit = float(agg.get("sum_debit", 0) or 0)
-        sum_credit = float(agg.get("sum_credit", 0) or 0)
-        initial_debit = float(account.initial_debit_balance or 0)
-        initial_credit = float(account.initial_credit_balance or 0)
-        net_balance = (initial_debit + sum_debit) - (initial_credit + sum_credit)
-        if account.code:
-            per_account_saldo[account.code] = net_balance
-
-    # Recalcular saldos de cuentas padre (sumando hijas inmediatas)
-    per_account_saldo = _compute_parent_balances(accounts, per_account_saldo)
-
-    # Helpers jerárquicos para detectar hojas y evitar doble conteo en totales
-    children_by_parent, _ = _build_hierarchy_helpers(accounts)
+async def _balance_general_vector(company_id: str, inclusive_end: datetime) -> Tuple[ChartSnapshot, np.ndarray]:
+    """Saldo neto por cuenta en centavos a la fecha de corte; los padres suman sus hijas"""
+    # Plan de cuentas en forma columnar (caché por empresa)
+    chart = await chart_cache.get(company_id)
+    sums = await _account_movements(company_id, {"$lt": inclusive_end})
+    sum_debit, sum_credit = chart.movement_vectors(sums)
+    net_balance = (chart.initial_debit + sum_debit) - (chart.initial_credit + sum_credit)
+    return chart, chart.rollup(net_balance)
+
+async def _estado_resultados_vector(company_id: str, start: datetime, inclusive_end: datetime) -> Tuple[ChartSnapshot, np.ndarray]:
+    """Movimiento neto del período por cuenta en centavos (sin saldos iniciales)"""
+    chart = await chart_cache.get(company_id)
+    sums = await _account_movements(company_id, {"$gte": start, "$lt": inclusive_end}, include_closing=False)
+    # Grupos 4 y 6 de naturaleza acreedora
+    sum_debit, sum_credit = chart.movement_vectors(sums)
+    net_movement = np.where(np.isin(chart.group, (4, 6)), sum_credit - sum_debit, sum_debit - sum_credit)
+    return chart, chart.rollup(net_movement)
+
+async def _compute_balance_general(company_id: str, as_of_date: str, inclusive_end: datetime) -> Dict[str, Any]:
+    chart, net_balance = await _balance_general_vector(company_id, inclusive_end)
 
     # Armar estructura por grupos 1,2,3
     result: Dict[str, Any] = {
         "empresa": company_id,
         "fecha_corte": as_of_date,
-        "grupos": {
-            "1": {"descripcion": "Activo", "cuentas": [], "total": 0.0},
-            "2": {"descripcion": "Pasivo", "cuentas": [], "total": 0.0},
-            "3": {"descripcion": "Patrimonio", "cuentas": [], "total": 0.0},
-        }
-    }
-
-    for account in accounts:
-        code = account.code or ""
-        if not code:
-            continue
-        group = code[0]
-        if group not in ("1", "2", "3"):
-            continue
-        net_balance = float(per_account_saldo.get(account.code, 0.0))
-
-        result["grupos"][group]["cuentas"].append({
-            "id": str(account.id),
-            "codigo": account.code,
-            "nombre": account.name,
-            "saldo": net_balance
+        "grupos": _build_report_groups(chart, net_balance, {
+            "1": "Activo",
+            "2": "Pasivo",
+            "3": "Patrimonio",
         })
-        # Sumar al total solo si es hoja para evitar doble conteo
-        if _is_leaf(account, accounts, children_by_parent):
-            result["grupos"][group]["total"] += net_balance
+    }
 
     return result
 
@@ -167,11 +143,13 @@ async def get_estado_resultados(
     company_id: str = Query(..., description="ID de la empresa"),
     start_date: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
     end_date: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    version: DataVersion = Depends(company_etag)
 ):
     """Generar Estado de Resultados (por período).
 
-    Agrupa por grupos del plan: 4 Ingresos, 5 Gastos, 6 Resultados.
+    Agrupa por grupos del plan: 4 Ingresos, 5 Gastos, 6 Resultados. El resultado
+    se guarda en la caché de reportes hasta la próxima escritura de la empresa.
     """
     if current_user.role != "admin" and company_id not in current_user.companies:
         raise HTTPException(
@@ -189,85 +167,24 @@ async def get_estado_resultados(
             detail="Formato de fecha inválido. Use YYYY-MM-DD"
         )
 
-    # Cargar cuentas
-    accounts = await Account.find(
-        Account.company_id == company_id,
-        Account.is_active == True
-    ).to_list()
-
-    # Agregar movimientos del periodo
-    try:
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from app.config import settings
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        db = client[settings.database_name]
-        collection = db.ledger_entries
-
-        pipeline = [
-            {"$match": {
-                "company_id": company_id,
-                "date": {"$gte": start, "$lt": inclusive_end}
-            }},
-            {"$group": {
-                "_id": "$account_id",
-                "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
-                "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
-            }}
-        ]
-        cursor = collection.aggregate(pipeline)
-        sums = await cursor.to_list(10000)
-        client.close()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error consultando movimientos: {str(e)}")
-
-    sums_by_account: Dict[str, Dict[str, float]] = {str(doc.get("_id")): doc for doc in sums}
-
-    # Calcular saldo por cuenta (movimiento neto del período, sin saldos iniciales)
-    per_account_saldo: Dict[str, float] = {}
-    for account in accounts:
-        agg = sums_by_account.get(str(account.id), {})
-        sum_debit = float(agg.get("sum_debit", 0) or 0)
-        sum_credit = float(agg.get("sum_credit", 0) or 0)
-        group = (account.code or "")[0] if account.code else ""
-        if group in ("4", "6"):
-            net_movement = sum_credit - sum_debit
-        else:
-            net_movement = sum_debit - sum_credit
-        if account.code:
-            per_account_saldo[account.code] = net_movement
+    body = await report_cache.get_or_compute(
+        company_id, "estado-resultados", {"start_date": start_date, "end_date": end_date}, version.token,
+        lambda: _compute_estado_resultados(company_id, start_date, end_date, start, inclusive_end)
+    )
+    return cached_json(body)
 
-    # Recalcular saldos de cuentas padre (sumando hijas inmediatas)
-    per_account_saldo = _compute_parent_balances(accounts, per_account_saldo)
-    children_by_parent, _ = _build_hierarchy_helpers(accounts)
+async def _compute_estado_resultados(company_id: str, start_date: str, end_date: str, start: datetime, inclusive_end: datetime) -> Dict[str, Any]:
+    chart, net_movement = await _estado_resultados_vector(company_id, start, inclusive_end)
 
     result: Dict[str, Any] = {
         "empresa": company_id,
         "periodo": f"{start_date} a {end_date}",
-        "grupos": {
-            "4": {"descripcion": "Ingresos", "cuentas": [], "total": 0.0},
-            "5": {"descripcion": "Gastos", "cuentas": [], "total": 0.0},
-            "6": {"descripcion": "Resultados", "cuentas": [], "total": 0.0},
-        }
-    }
-
-    for account in accounts:
-        code = account.code or ""
-        if not code:
-            continue
-        group = code[0]
-        if group not in ("4", "5", "6"):
-            continue
-        net_movement = float(per_account_saldo.get(account.code, 0.0))
-
-        result["grupos"][group]["cuentas"].append({
-            "id": str(account.id),
-            "codigo": account.code,
-            "nombre": account.name,
-            "saldo": net_movement
+        "grupos": _build_report_groups(chart, net_movement, {
+            "4": "Ingresos",
+            "5": "Gastos",
+            "6": "Resultados",
         })
-        # Sumar al total solo si es hoja para evitar doble conteo
-        if _is_leaf(account, accounts, children_by_parent):
-            result["grupos"][group]["total"] += net_movement
+    }
 
     # Puede calcularse utilidad neta como total(4 y 6) - total(5)
     ingresos_total = result["grupos"]["4"]["total"] + result["grupos"]["6"]["total"]
@@ -276,13 +193,385 @@ async def get_estado_resultados(
 
     return result
 
+def _build_comparative_groups(chart: ChartSnapshot, balances: np.ndarray, descriptions: Dict[str, str]) -> Dict[str, Any]:
+    """Como _build_report_groups para una matriz (cuentas x columnas): saldos y totales por columna."""
+    groups: Dict[str, Any] = {}
+    for group, description in descriptions.items():
+        in_group = chart.group == int(group)
+        indexes = np.flatnonzero(in_group)
+        groups[group] = {
+            "descripcion": description,
+            "cuentas": [
+                {
+                    "id": chart.ids[i],
+                    "codigo": chart.codes[i],
+                    "nombre": chart.names[i],
+                    "saldos": [from_cents(value) for value in balances[i]]
+                }
+                for i in indexes
+            ],
+            # Totales solo con hojas para evitar doble conteo
+            "totales": [from_cents(value) for value in balances[in_group & chart.is_leaf].sum(axis=0)]
+        }
+    return groups
+
+def _parse_day(value: str) -> datetime:
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato de fecha inválido: {value}. Use YYYY-MM-DD"
+        )
+
+def _check_columns(values: List[str]):
+    if not values or len(values) > _MAX_COMPARATIVE_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Indique entre 1 y {_MAX_COMPARATIVE_COLUMNS} períodos"
+        )
+
+async def _period_movements(
+    chart: ChartSnapshot,
+    company_id: str,
+    periods: List[Tuple[Optional[datetime], datetime]],
+    include_closing: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Débitos y créditos en centavos (cuentas x períodos) de cada período [inicio, fin)
+    con un solo $group; inicio None = desde el primer movimiento.
+
+    Los límites de todos los períodos parten las fechas en intervalos disjuntos:
+    Mongo suma por (cuenta, intervalo) y cada período sale como diferencia de sumas
+    acumuladas, así que los períodos pueden solaparse (cortes de balance) sin leer
+    dos veces el mismo movimiento.
+    """
+    bounds = sorted({end for _, end in periods} | {start for start, _ in periods if start is not None})
+    date_filter: Dict[str, Any] = {"$lt": bounds[-1]}
+    if all(start is not None for start, _ in periods):
+        date_filter["$gte"] = bounds[0]
+
+    # Intervalo k: fechas en [bounds[k-1], bounds[k]); el intervalo 0 es todo lo anterior a bounds[0]
+    bucket = {"$switch": {
+        "branches": [{"case": {"$lt": ["$date", bound]}, "then": k} for k, bound in enumerate(bounds)],
+        "default": len(bounds)
+    }}
+    group = {"$group": {
+        "_id": {"account_id": "$account_id", "bucket": bucket},
+        "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+        "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
+    }}
+    try:
+        sums = await ledger_archives.aggregate_ledger(company_id, _movements_match(company_id, date_filter, include_closing), [group], bounds)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error consultando movimientos: {str(e)}")
+
+    debit, credit = chart.movement_matrix(sums, len(bounds))
+    # Acumulado antes de bounds[j] en la columna j + 1 (columna 0 = nada)
+    zeros = np.zeros((len(chart), 1), dtype=np.int64)
+    debit_before = np.hstack([zeros, np.cumsum(debit, axis=1)])
+    credit_before = np.hstack([zeros, np.cumsum(credit, axis=1)])
+
+    ends = [bounds.index(end) + 1 for _, end in periods]
+    starts = [bounds.index(start) + 1 if start is not None else 0 for start, _ in periods]
+    return debit_before[:, ends] - debit_before[:, starts], credit_before[:, ends] - credit_before[:, starts]
+
+@router.get("/comparativo/balance-general")
+async def get_balance_general_comparativo(
+    company_id: str = Query(..., description="ID de la empresa"),
+    cutoffs: List[str] = Query(..., description="Fechas de corte (YYYY-MM-DD), una por columna"),
+    current_user: User = Depends(require_permission("reports:read")),
+    version: DataVersion = Depends(company_etag)
+):
+    """Balance General comparativo: una columna por fecha de corte, con una sola agregación.
+
+    Cada columna coincide con /balance-general a esa fecha.
+    """
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+    _check_columns(cutoffs)
+    periods = [(None, _parse_day(cutoff) + timedelta(days=1)) for cutoff in cutoffs]
+
+    body = await report_cache.get_or_compute(
+        company_id, "comparativo-balance-general", {"cutoffs": tuple(cutoffs)}, version.token,
+        lambda: _compute_balance_comparativo(company_id, cutoffs, periods)
+    )
+    return cached_json(body)
+
+async def _compute_balance_comparativo(company_id: str, cutoffs: List[str], periods) -> Dict[str, Any]:
+    chart = await chart_cache.get(company_id)
+    sum_debit, sum_credit = await _period_movements(chart, company_id, periods)
+    net_balance = (chart.initial_debit[:, None] + sum_debit) - (chart.initial_credit[:, None] + sum_credit)
+    net_balance = chart.rollup(net_balance)
+
+    return {
+        "empresa": company_id,
+        "columnas": list(cutoffs),
+        "grupos": _build_comparative_groups(chart, net_balance, {
+            "1": "Activo",
+            "2": "Pasivo",
+            "3": "Patrimonio",
+        })
+    }
+
+@router.get("/comparativo/estado-resultados")
+async def get_estado_resultados_comparativo(
+    company_id: str = Query(..., description="ID de la empresa"),
+    periods: List[str] = Query(..., description="Períodos YYYY-MM-DD:YYYY-MM-DD (inicio:fin), uno por columna"),
+    current_user: User = Depends(require_permission("reports:read")),
+    version: DataVersion = Depends(company_etag)
+):
+    """Estado de Resultados comparativo: una columna por período, con una sola agregación.
+
+    Cada columna coincide con /estado-resultados para ese período; los períodos
+    pueden solaparse (p. ej. meses y acumulado anual).
+    """
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+    _check_columns(periods)
+    parsed = []
+    for period in periods:
+        start_date, separator, end_date = period.partition(":")
+        if not separator:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Período inválido: {period}. Use YYYY-MM-DD:YYYY-MM-DD"
+            )
+        start, end = _parse_day(start_date), _parse_day(end_date)
+        if end < start:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Período inválido: {period}. La fecha fin es anterior al inicio"
+            )
+        parsed.append((start, end + timedelta(days=1)))
+
+    body = await report_cache.get_or_compute(
+        company_id, "comparativo-estado-resultados", {"periods": tuple(periods)}, version.token,
+        lambda: _compute_resultados_comparativo(company_id, periods, parsed)
+    )
+    return cached_json(body)
+
+async def _compute_resultados_comparativo(company_id: str, labels: List[str], periods) -> Dict[str, Any]:
+    chart = await chart_cache.get(company_id)
+    sum_debit, sum_credit = await _period_movements(chart, company_id, periods, include_closing=False)
+    # Grupos 4 y 6 de naturaleza acreedora, como en /estado-resultados
+    creditor = np.isin(chart.group, (4, 6))[:, None]
+    net_movement = chart.rollup(np.where(creditor, sum_credit - sum_debit, sum_debit - sum_credit))
+
+    groups = _build_comparative_groups(chart, net_movement, {
+        "4": "Ingresos",
+        "5": "Gastos",
+        "6": "Resultados",
+    })
+    return {
+        "empresa": company_id,
+        "columnas": [label.replace(":", " a ") for label in labels],
+        "grupos": groups,
+        "utilidad_neta": [
+            ingresos + resultados - gastos
+            for ingresos, gastos, resultados in zip(groups["4"]["totales"], groups["5"]["totales"], groups["6"]["totales"])
+        ]
+    }
+
+@router.get("/flujo-efectivo")
+async def get_flujo_efectivo(
+    company_id: str = Query(..., description="ID de la empresa"),
+    start_date: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
+    sections: List[str] = Query([], description="Clasificación adicional CODIGO=seccion (efectivo, resultado, ajuste, operacion, inversion, financiamiento)"),
+    current_user: User = Depends(require_permission("reports:read")),
+    version: DataVersion = Depends(company_etag)
+):
+    """Generar Estado de Flujo de Efectivo (método indirecto) del período.
+
+    Saldos al inicio y variaciones del período salen de una sola agregación sobre
+    ledger_entries. Cada cuenta toma la sección de su ancestro clasificado más
+    cercano: clasificación por omisión, CASH_FLOW_SECTIONS y luego `sections`.
+    """
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+    start = _parse_day(start_date)
+    inclusive_end = _parse_day(end_date) + timedelta(days=1)
+    if inclusive_end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha fin es anterior a la fecha inicio"
+        )
+    try:
+        mapping = {**DEFAULT_SECTIONS, **parse_sections([settings.cash_flow_sections]), **parse_sections(sections)}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    body = await report_cache.get_or_compute(
+        company_id, "flujo-efectivo",
+        {"start_date": start_date, "end_date": end_date, "sections": tuple(sorted(mapping.items()))},
+        version.token,
+        lambda: _compute_flujo_efectivo(company_id, start_date, end_date, start, inclusive_end, mapping)
+    )
+    return cached_json(body)
+
+async def _compute_flujo_efectivo(company_id: str, start_date: str, end_date: str, start: datetime, inclusive_end: datetime, mapping: Dict[str, str]) -> Dict[str, Any]:
+    chart = await chart_cache.get(company_id)
+    # Columna 0: movimientos anteriores al período; columna 1: movimientos del período
+    # Sin asientos de cierre: la utilidad del período sale de las cuentas de resultados
+    sum_debit, sum_credit = await _period_movements(chart, company_id, [(None, start), (start, inclusive_end)], include_closing=False)
+    opening = (chart.initial_debit - chart.initial_credit) + (sum_debit[:, 0] - sum_credit[:, 0])
+    change = sum_debit[:, 1] - sum_credit[:, 1]
+    return {
+        "empresa": company_id,
+        "periodo": f"{start_date} a {end_date}",
+        **build_cash_flow(chart, opening, change, mapping)
+    }
+
+async def _consolidation_companies(current_user: User, company_ids: Optional[List[str]], group_of: Optional[str]) -> List[Company]:
+    """
+    Empresas a consolidar: la lista indicada o, con group_of, todas las empresas del
+    mismo propietario (created_by) que esa empresa. El usuario debe tener acceso a todas.
+    """
+    if bool(company_ids) == bool(group_of):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indique company_ids o group_of (solo uno de los dos)"
+        )
+    try:
+        if group_of:
+            anchor_company = await Company.get(ObjectId(group_of))
+            if not anchor_company:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empresa no encontrada")
+            companies = await Company.find(Company.created_by == anchor_company.created_by).sort("+name").to_list()
+        else:
+            ids = list(dict.fromkeys(company_ids))
+            companies = await Company.find({"_id": {"$in": [ObjectId(company_id) for company_id in ids]}}).to_list()
+            if len(companies) != len(ids):
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alguna de las empresas no existe")
+            position = {company_id: i for i, company_id in enumerate(ids)}
+            companies.sort(key=lambda company: position[str(company.id)])
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ID de empresa inválido")
+
+    if current_user.role != "admin":
+        denied = [company.name for company in companies if str(company.id) not in current_user.companies]
+        if denied:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"No tienes acceso a las empresas: {', '.join(denied)}"
+            )
+    return companies
+
+async def _consolidated_report(
+    companies: List[Company],
+    report: str,
+    params: Dict[str, Any],
+    vector: Callable[[str], Awaitable[Tuple[ChartSnapshot, np.ndarray]]],
+    descriptions: Dict[str, str],
+    eliminations: List[str],
+    summary: Optional[Callable[[Dict[str, int]], Dict[str, Any]]] = None
+) -> bytes:
+    """
+    Calcular el reporte de cada empresa en paralelo (a lo sumo
+    consolidation_max_concurrency a la vez), unir los planes por código y aplicar
+    las eliminaciones. La latencia es la de la empresa más lenta, no la suma.
+    """
+    company_ids = [str(company.id) for company in companies]
+    tokens = await asyncio.gather(*[data_versions.token(company_id) for company_id in company_ids])
+
+    async def _compute() -> Dict[str, Any]:
+        results = await gather_bounded(
+            [lambda company_id=company_id: vector(company_id) for company_id in company_ids],
+            settings.consolidation_max_concurrency
+        )
+        charts = [chart for chart, _ in results]
+        vectors = [values for _, values in results]
+        consolidated = ConsolidatedChart(charts)
+        balances = consolidated.merge(vectors)
+        totals = consolidated.group_totals(vectors, descriptions)
+        # Totales de cada empresa antes de eliminaciones (conciliación del consolidado)
+        per_company = {
+            company_id: {group: from_cents(total) for group, total in leaf_group_totals(chart, values, descriptions).items()}
+            for company_id, chart, values in zip(company_ids, charts, vectors)
+        }
+        applied = apply_eliminations(consolidated, balances, totals, eliminations)
+        result = {
+            "empresas": [{"id": str(company.id), "nombre": company.name} for company in companies],
+            **params,
+            "grupos": consolidated_groups(consolidated, balances, totals, descriptions),
+            "totales_por_empresa": per_company,
+            "eliminaciones": applied
+        }
+        if summary:
+            result.update(summary(totals))
+        return result
+
+    return await report_cache.get_or_compute(
+        "+".join(sorted(company_ids)), report, {**params, "eliminaciones": tuple(eliminations)},
+        "|".join(tokens), _compute
+    )
+
+@router.get("/consolidado/balance-general")
+async def get_balance_general_consolidado(
+    as_of_date: str = Query(..., description="Fecha de corte (YYYY-MM-DD)"),
+    company_ids: Optional[List[str]] = Query(None, description="Empresas a consolidar"),
+    group_of: Optional[str] = Query(None, description="ID de una empresa: consolida todas las del mismo propietario"),
+    eliminations: List[str] = Query([], description="Reglas de eliminación: CODIGO_A:CODIGO_B (recíprocas) o CODIGO (saldo completo)"),
+    current_user: User = Depends(require_permission("reports:read"))
+):
+    """Balance General consolidado de varias empresas con eliminaciones intercompañía.
+
+    Las cuentas se unen por código entre los planes de las empresas.
+    """
+    inclusive_end = _parse_day(as_of_date) + timedelta(days=1)
+    companies = await _consolidation_companies(current_user, company_ids, group_of)
+    body = await _consolidated_report(
+        companies, "consolidado-balance-general", {"fecha_corte": as_of_date},
+        lambda company_id: _balance_general_vector(company_id, inclusive_end),
+        {"1": "Activo", "2": "Pasivo", "3": "Patrimonio"},
+        eliminations
+    )
+    return cached_json(body)
+
+@router.get("/consolidado/estado-resultados")
+async def get_estado_resultados_consolidado(
+    start_date: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
+    company_ids: Optional[List[str]] = Query(None, description="Empresas a consolidar"),
+    group_of: Optional[str] = Query(None, description="ID de una empresa: consolida todas las del mismo propietario"),
+    eliminations: List[str] = Query([], description="Reglas de eliminación: CODIGO_A:CODIGO_B (recíprocas) o CODIGO (saldo completo)"),
+    current_user: User = Depends(require_permission("reports:read"))
+):
+    """Estado de Resultados consolidado de varias empresas con eliminaciones intercompañía.
+
+    Las cuentas se unen por código entre los planes de las empresas. La utilidad
+    neta se calcula después de las eliminaciones.
+    """
+    start = _parse_day(start_date)
+    inclusive_end = _parse_day(end_date) + timedelta(days=1)
+    companies = await _consolidation_companies(current_user, company_ids, group_of)
+    body = await _consolidated_report(
+        companies, "consolidado-estado-resultados", {"periodo": f"{start_date} a {end_date}"},
+        lambda company_id: _estado_resultados_vector(company_id, start, inclusive_end),
+        {"4": "Ingresos", "5": "Gastos", "6": "Resultados"},
+        eliminations,
+        lambda totals: {"utilidad_neta": from_cents(totals["4"] + totals["6"] - totals["5"])}
+    )
+    return cached_json(body)
+
 @router.get("/libro-mayor")
 async def get_libro_mayor(
     company_id: str = Query(..., description="ID de la empresa"),
     start_date: str = Query(..., description="Fecha inicio (YYYY-MM-DD)"),
     end_date: str = Query(..., description="Fecha fin (YYYY-MM-DD)"),
     account_code: Optional[str] = Query(None, description="Código de cuenta específica"),
-    current_user: User = Depends(require_permission("reports:read"))
+    current_user: User = Depends(require_permission("reports:read")),
+    _etag: None = Depends(company_etag)
 ):
     """Generar Libro Mayor"""
     # Verificar que el usuario tenga acceso a esta empresa
@@ -330,6 +619,7 @@ async def get_audit_logs(
     module: Optional[str] = Query(None, description="Módulo específico"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    fast: bool = Query(False, description="Serialización rápida (orjson) sin jsonable_encoder"),
     current_user: User = Depends(require_permission("audit:read"))
 ):
     """Obtener logs de auditoría.
@@ -410,6 +700,8 @@ async def get_audit_logs(
             "company_id": _to_str(doc.get("company_id")),
         })
 
+    if fast:
+        return FastJSONResponse({"logs": mapped, "total": len(mapped)})
     return {"logs": mapped, "total": len(mapped)}
 
 @router.delete("/auditoria/{log_id}")
@@ -1,85 +1,274 @@
+import os
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional, Dict, Any
 from app.models.user import User
 from app.auth.dependencies import get_current_user, require_permission, log_audit, AuditAction, AuditModule
+from app.models.company import Company
+from app.models.ats_export import AtsExport, AtsExportResponse, AtsExportStatus
+from app.services.ats import AtsGenerator, start_ats_export
+from app.services.data_version import DataVersion, company_etag
+from app.services.fast_json import dumps
+from app.services.report_cache import cached_json, report_cache
+from app.services.sri_forms import Formulario103, formulario_103, formulario_104, month_bounds, roles_103, roles_104
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
 
 router = APIRouter()
 
-@router.get("/formulario-103")
-async def get_formulario_103(
-    company_id: str = Query(..., description="ID de la empresa"),
-    period: str = Query(..., description="Período (YYYY-MM)"),
-    current_user: User = Depends(require_permission("sri:read"))
-):
-    """Generar Formulario 103 - Retención en la Fuente"""
-    # Verificar que el usuario tenga acceso a esta empresa
+
+def _check_company_access(current_user: User, company_id: str):
     if current_user.role != "admin" and company_id not in current_user.companies:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="No tienes acceso a esta empresa"
         )
-    
-    # TODO: Implementar cálculo real del formulario 103
-    formulario_103 = {
-        "empresa": company_id,
-        "periodo": period,
-        "ruc_empresa": "1234567890001",  # TODO: Obtener de la empresa
-        "nombre_empresa": "Empresa Ejemplo S.A.",  # TODO: Obtener de la empresa
-        "retenciones": {
-            "servicios_profesionales": 0.0,
-            "arrendamiento": 0.0,
-            "intereses": 0.0,
-            "dividendos": 0.0,
-            "otros": 0.0,
-            "total_retenciones": 0.0
-        },
-        "detalle_retenciones": []
+
+
+async def _get_company(company_id: str) -> Company:
+    try:
+        company = await Company.get(ObjectId(company_id))
+    except (InvalidId, TypeError):
+        company = None
+    if not company:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Empresa no encontrada")
+    return company
+
+
+def _parse_period(period: str):
+    try:
+        return month_bounds(period)
+    except (TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato de período inválido. Use YYYY-MM"
+        )
+
+
+def _roles(resolve, accounts: List[str], receipt_types: List[str]):
+    try:
+        return resolve(accounts, receipt_types)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _form_params(company: Company, period: str, account_roles: Dict[str, str], receipt_roles: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "period": period,
+        "accounts": tuple(sorted(account_roles.items())),
+        "receipt_types": tuple(sorted(receipt_roles.items())),
+        # Los datos de la empresa no cambian la versión de datos
+        "company": (company.ruc, company.legal_name, company.name),
     }
-    
-    return formulario_103
+
+
+@router.get("/formulario-103")
+async def get_formulario_103(
+    company_id: str = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Período (YYYY-MM)"),
+    accounts: List[str] = Query([], description="Conceptos de cuentas de retención adicionales CODIGO=concepto (servicios_profesionales, servicios_intelecto, servicios, publicidad, transporte, bienes, arrendamiento, seguros, intereses, otros)"),
+    receipt_types: List[str] = Query([], description="Roles de tipos de comprobante adicionales TIPO=rol (retencion, excluido)"),
+    current_user: User = Depends(require_permission("sri:read")),
+    version: DataVersion = Depends(company_etag)
+):
+    """Generar Formulario 103 - Retención en la Fuente.
+
+    Totales por concepto de los asientos mayorizados del mes sobre cuentas de
+    retención (clasificación SRI_103_ACCOUNTS y luego `accounts`). El detalle por
+    asiento se descarga en /formulario-103/detalle. El resultado se guarda en la
+    caché de reportes hasta la próxima escritura de la empresa.
+    """
+    _check_company_access(current_user, company_id)
+    company = await _get_company(company_id)
+    _parse_period(period)
+    account_roles, receipt_roles = _roles(roles_103, accounts, receipt_types)
+
+    body = await report_cache.get_or_compute(
+        company_id, "formulario-103", _form_params(company, period, account_roles, receipt_roles), version.token,
+        lambda: formulario_103(company, period, account_roles, receipt_roles)
+    )
+    return cached_json(body)
+
+@router.get("/formulario-103/detalle")
+async def get_formulario_103_detalle(
+    company_id: str = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Período (YYYY-MM)"),
+    accounts: List[str] = Query([], description="Conceptos de cuentas de retención adicionales CODIGO=concepto"),
+    receipt_types: List[str] = Query([], description="Roles de tipos de comprobante adicionales TIPO=rol (retencion, excluido)"),
+    current_user: User = Depends(require_permission("sri:read"))
+):
+    """Detalle de retenciones del Formulario 103 en NDJSON (una retención por línea).
+
+    Se envía a medida que se lee el cursor de asientos: la memoria no depende de
+    la cantidad de retenciones del mes.
+    """
+    _check_company_access(current_user, company_id)
+    await _get_company(company_id)
+    _parse_period(period)
+    account_roles, receipt_roles = _roles(roles_103, accounts, receipt_types)
+    form = await Formulario103.load(company_id, period, account_roles, receipt_roles)
+
+    async def generate():
+        async for row in form.rows():
+            yield dumps(row) + b"\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=formulario_103_{period}_detalle.ndjson"}
+    )
 
 @router.get("/formulario-104")
 async def get_formulario_104(
     company_id: str = Query(..., description="ID de la empresa"),
     period: str = Query(..., description="Período (YYYY-MM)"),
+    accounts: List[str] = Query([], description="Roles de cuentas adicionales CODIGO=rol (ventas_gravadas, ventas_tarifa_0, exportaciones, compras_gravadas, activos_fijos_gravados, compras_tarifa_0, iva_ventas, iva_compras, iva_activos_fijos, retenciones_iva)"),
+    receipt_types: List[str] = Query([], description="Roles de tipos de comprobante adicionales TIPO=rol (bruto, nota_credito, excluido)"),
+    current_user: User = Depends(require_permission("sri:read")),
+    version: DataVersion = Depends(company_etag)
+):
+    """Generar Formulario 104 - IVA.
+
+    Se calcula con los asientos mayorizados del mes en una sola agregación por
+    (tipo de documento, cuenta). Cada cuenta toma el rol de su ancestro clasificado
+    más cercano: clasificación por omisión, SRI_104_ACCOUNTS y luego `accounts`; el
+    tipo de comprobante SRI del documento decide si suma al valor bruto o a notas de
+    crédito. El resultado se guarda en la caché de reportes hasta la próxima
+    escritura de la empresa.
+    """
+    _check_company_access(current_user, company_id)
+    company = await _get_company(company_id)
+    _parse_period(period)
+    account_roles, receipt_roles = _roles(roles_104, accounts, receipt_types)
+
+    body = await report_cache.get_or_compute(
+        company_id, "formulario-104", _form_params(company, period, account_roles, receipt_roles), version.token,
+        lambda: formulario_104(company, period, account_roles, receipt_roles)
+    )
+    return cached_json(body)
+
+def _export_response(export: AtsExport) -> AtsExportResponse:
+    return AtsExportResponse(id=str(export.id), **export.model_dump(exclude={"id", "revision_id", "file_path"}))
+
+
+async def _get_export(export_id: str, current_user: User) -> AtsExport:
+    try:
+        export = await AtsExport.get(ObjectId(export_id))
+    except (InvalidId, TypeError):
+        export = None
+    if not export:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Exportación ATS no encontrada")
+    _check_company_access(current_user, export.company_id)
+    return export
+
+
+@router.get("/ats")
+async def get_ats(
+    request: Request,
+    company_id: str = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Período (YYYY-MM)"),
+    zipped: bool = Query(True, alias="zip", description="Descargar el XML comprimido en ZIP"),
+    current_user: User = Depends(require_permission("sri:export"))
+):
+    """Descargar el Anexo Transaccional Simplificado (ATS) del mes.
+
+    El XML se escribe y se envía por bloques mientras se leen los asientos con
+    cursor (opcionalmente comprimido en ZIP al vuelo): la memoria no depende de la
+    cantidad de comprobantes. Para meses grandes conviene POST /ats/exportaciones.
+    """
+    _check_company_access(current_user, company_id)
+    company = await _get_company(company_id)
+    _parse_period(period)
+    generator = await AtsGenerator.load(company, period)
+
+    await log_audit(
+        user=current_user,
+        action=AuditAction.EXPORT,
+        module=AuditModule.SRI,
+        description=f"ATS descargado para período {period}",
+        resource_id=company_id,
+        resource_type="company",
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", "Unknown")
+    )
+
+    return StreamingResponse(
+        generator.chunks(zipped),
+        media_type="application/zip" if zipped else "application/xml",
+        headers={"Content-Disposition": f"attachment; filename={generator.file_name(zipped)}"}
+    )
+
+@router.post("/ats/exportaciones", response_model=AtsExportResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_ats_export(
+    request: Request,
+    company_id: str = Query(..., description="ID de la empresa"),
+    period: str = Query(..., description="Período (YYYY-MM)"),
+    zipped: bool = Query(True, alias="zip", description="Comprimir el XML en ZIP"),
+    current_user: User = Depends(require_permission("sri:export"))
+):
+    """Generar el ATS del mes en segundo plano.
+
+    Responde de inmediato; el avance (comprobantes escritos) se consulta en
+    GET /ats/exportaciones/{export_id} y el archivo se descarga en
+    GET /ats/exportaciones/{export_id}/descarga al completarse.
+    """
+    _check_company_access(current_user, company_id)
+    company = await _get_company(company_id)
+    _parse_period(period)
+    export = await start_ats_export(company, period, zipped, str(current_user.id))
+
+    await log_audit(
+        user=current_user,
+        action=AuditAction.EXPORT,
+        module=AuditModule.SRI,
+        description=f"Generación de ATS solicitada para período {period}",
+        resource_id=str(export.id),
+        resource_type="ats_export",
+        new_values={"company_id": company_id, "period": period, "zipped": zipped},
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent", "Unknown")
+    )
+
+    return _export_response(export)
+
+@router.get("/ats/exportaciones", response_model=List[AtsExportResponse])
+async def get_ats_exports(
+    company_id: str = Query(..., description="ID de la empresa"),
     current_user: User = Depends(require_permission("sri:read"))
 ):
-    """Generar Formulario 104 - IVA"""
-    # Verificar que el usuario tenga acceso a esta empresa
-    if current_user.role != "admin" and company_id not in current_user.companies:
+    """Exportaciones ATS de la empresa, de la más reciente a la más antigua"""
+    _check_company_access(current_user, company_id)
+    exports = await AtsExport.find(AtsExport.company_id == company_id).sort(-AtsExport.created_at).to_list()
+    return [_export_response(export) for export in exports]
+
+@router.get("/ats/exportaciones/{export_id}", response_model=AtsExportResponse)
+async def get_ats_export(
+    export_id: str,
+    current_user: User = Depends(require_permission("sri:read"))
+):
+    """Estado y avance de una exportación ATS"""
+    return _export_response(await _get_export(export_id, current_user))
+
+@router.get("/ats/exportaciones/{export_id}/descarga")
+async def download_ats_export(
+    export_id: str,
+    current_user: User = Depends(require_permission("sri:export"))
+):
+    """Descargar el archivo de una exportación ATS completada"""
+    export = await _get_export(export_id, current_user)
+    if export.status != AtsExportStatus.COMPLETED:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No tienes acceso a esta empresa"
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"La exportación no está completada (estado: {export.status.value})"
         )
-    
-    # TODO: Implementar cálculo real del formulario 104
-    formulario_104 = {
-        "empresa": company_id,
-        "periodo": period,
-        "ruc_empresa": "1234567890001",  # TODO: Obtener de la empresa
-        "nombre_empresa": "Empresa Ejemplo S.A.",  # TODO: Obtener de la empresa
-        "ventas": {
-            "gravadas_12": 0.0,
-            "gravadas_0": 0.0,
-            "exentas": 0.0,
-            "total_ventas": 0.0
-        },
-        "compras": {
-            "gravadas_12": 0.0,
-            "gravadas_0": 0.0,
-            "exentas": 0.0,
-            "total_compras": 0.0
-        },
-        "iva": {
-            "iva_ventas": 0.0,
-            "iva_compras": 0.0,
-            "iva_pagar": 0.0
-        }
-    }
-    
-    return formulario_104
+    if not export.file_path or not os.path.exists(export.file_path):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="El archivo de la exportación ya no existe")
+    return FileResponse(
+        export.file_path,
+        media_type="application/zip" if export.zipped else "application/xml",
+        filename=export.file_name
+    )
 
 @router.get("/rdep")
 async def get_rdep(
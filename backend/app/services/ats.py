@@ -0,0 +1,469 @@
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from beanie.odm.utils.encoder import Encoder
+from app.config import settings
+from app.models.ats_export import AtsExport, AtsExportStatus
+from app.models.company import Company
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry
+from app.models.money import from_cents, to_cents
+from app.services.cash_flow import classify
+from app.services.chart_cache import chart_cache
+from app.services.ledger_archive import ledger_archives
+from app.services.sri_forms import (
+    ACTIVOS_FIJOS_GRAVADOS, COMPRAS_GRAVADAS, CONCEPTS_103, COMPRAS_TARIFA_0, EXPORTACIONES, IVA_ACTIVOS_FIJOS,
+    IVA_COMPRAS, IVA_VENTAS, NOTA_CREDITO, VENTAS_GRAVADAS, VENTAS_TARIFA_0,
+    Formulario103, month_bounds, posted_match, roles_103, roles_104
+)
+
+logger = logging.getLogger(__name__)
+
+# Bytes acumulados antes de entregar un bloque a la respuesta o al archivo
+_CHUNK_SIZE = 64 * 1024
+# Cada cuánto se publica el avance del trabajo en segundo plano (segundos)
+_PROGRESS_EVERY = 2.0
+# Ventas sin cliente identificado en el asiento
+_FINAL_CONSUMER = ("07", "9999999999999")
+# Desde este total (centavos) se informa la forma de pago: 20 = otros con utilización del sistema financiero
+_PAYMENT_FORM_THRESHOLD = 1000 * 100
+_PAYMENT_FORM = "20"
+_SALES_ROLES = (VENTAS_GRAVADAS, VENTAS_TARIFA_0, EXPORTACIONES, IVA_VENTAS)
+_PURCHASE_ROLES = (COMPRAS_GRAVADAS, ACTIVOS_FIJOS_GRAVADOS, COMPRAS_TARIFA_0, IVA_COMPRAS, IVA_ACTIVOS_FIJOS)
+
+# Trabajos de generación en curso en este proceso (export_id -> tarea)
+_jobs: Dict[str, asyncio.Task] = {}
+
+
+class _ChunkSink:
+    """
+    Destino de escritura que acumula bytes hasta que se retiran con `drain`. No
+    admite seek, así que zipfile escribe el ZIP en modo streaming.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pending = 0
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._pending += len(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    @property
+    def pending(self) -> int:
+        """Bytes escritos que aún no se retiraron"""
+        return self._pending
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        self._pending = 0
+        return data
+
+
+class _XmlWriter:
+    """Escritura incremental de elementos XML sobre un flujo binario"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def raw(self, text: str):
+        self._stream.write(text.encode("utf-8"))
+
+    def open(self, tag: str):
+        self.raw(f"<{tag}>")
+
+    def close(self, tag: str):
+        self.raw(f"</{tag}>\n")
+
+    def elements(self, fields: Iterable[Tuple[str, Any]]):
+        self.raw("".join(f"<{tag}>{escape(str(value))}</{tag}>" for tag, value in fields))
+
+
+def _money(cents: int) -> str:
+    return str(from_cents(cents))
+
+
+def _ddmmyyyy(date: datetime) -> str:
+    return f"{date:%d/%m/%Y}"
+
+
+def export_dir() -> str:
+    return settings.ats_export_dir or os.path.join(tempfile.gettempdir(), "ats_exports")
+
+
+class AtsGenerator:
+    """
+    Anexo Transaccional Simplificado (ATS) de un mes, escrito de forma incremental.
+
+    Se leen con cursor los asientos mayorizados del mes con tipo de documento SRI
+    (receipt_type) dos veces: la primera acumula las ventas por cliente y tipo de
+    comprobante (el encabezado lleva el total de ventas) y la segunda escribe cada
+    compra a medida que llega. La memoria depende de la cantidad de clientes y
+    establecimientos, no de la de comprobantes.
+
+    Compra o venta según supplier_movement / customer_movement del tipo de
+    documento (o, si no están, según las cuentas del asiento); bases e IVA según los
+    roles del Formulario 104 y retenciones según los conceptos del Formulario 103.
+    El asiento no registra al proveedor ni al cliente: se toma la primera
+    referencia de línea con 10 o 13 dígitos (cédula o RUC).
+    """
+
+    def __init__(self, company: Company, period: str, chart, document_types: List[dict]):
+        self.company = company
+        self.company_id = str(company.id)
+        self.period = period
+        self.start, self.end = month_bounds(period)
+        self.chart = chart
+        account_roles, self.receipt_roles = roles_104()
+        self.role_of, _ = classify(chart, account_roles)
+        self.types_by_id = {str(doc["_id"]): doc for doc in document_types}
+        self.types_by_code = {doc["code"]: doc for doc in document_types}
+        receipts = (
+            {key: doc["receipt_type"] for key, doc in self.types_by_id.items()},
+            {key: doc["receipt_type"] for key, doc in self.types_by_code.items()},
+        )
+        self.withholdings = Formulario103(chart, self.company_id, period, *roles_103(), account_roles, receipts)
+        self.documents = 0
+
+    @classmethod
+    async def load(cls, company: Company, period: str) -> "AtsGenerator":
+        company_id = str(company.id)
+        document_types = await DocumentType.get_motor_collection().find(
+            {"company_id": company_id, "receipt_type": {"$nin": [None, ""]}},
+            {"code": 1, "receipt_type": 1, "establishment_point": 1, "supplier_movement": 1, "customer_movement": 1, "is_electronic": 1}
+        ).to_list(length=None)
+        return cls(company, period, await chart_cache.get(company_id), document_types)
+
+    @property
+    def file_stem(self) -> str:
+        return f"AT-{self.start:%m%Y}"
+
+    def file_name(self, zipped: bool) -> str:
+        return f"{self.file_stem}.{'zip' if zipped else 'xml'}"
+
+    async def entries(self) -> AsyncIterator[dict]:
+        """Asientos mayorizados del mes con tipo de documento SRI, en orden de fecha (cursor)"""
+        if not self.types_by_id:
+            return
+        match = {
+            **posted_match(self.company_id, self.start, self.end),
+            "$or": [
+                {"document_type_id": {"$in": list(self.types_by_id)}},
+                {"document_type_code": {"$in": list(self.types_by_code)}},
+            ],
+        }
+        stages = [
+            {"$sort": {"date": 1, "_id": 1}},
+            {"$project": {
+                "entry_number": 1, "date": 1, "document_type_id": 1, "document_type_code": 1,
+                "lines.account_code": 1, "lines.debit": 1, "lines.credit": 1, "lines.reference": 1,
+            }},
+        ]
+        archived = await ledger_archives.journal_collections(self.company_id, match)
+        pipeline = ledger_archives.journal_pipeline(match, archived, stages)
+        async for entry in JournalEntry.get_motor_collection().aggregate(pipeline):
+            yield entry
+
+    def _document_type(self, entry: dict) -> Optional[dict]:
+        return self.types_by_id.get(entry.get("document_type_id") or "") or self.types_by_code.get(entry.get("document_type_code") or "")
+
+    def _amounts(self, entry: dict, receipt_type: str) -> Dict[str, int]:
+        """Centavos por rol del Formulario 104; en notas de crédito, en positivo"""
+        amounts: Dict[str, int] = {}
+        for line in entry.get("lines") or []:
+            index = self.chart.index_by_code.get(line.get("account_code"))
+            role = self.role_of[index] if index is not None else None
+            if role is None:
+                continue
+            debit, credit = to_cents(line.get("debit")), to_cents(line.get("credit"))
+            amounts[role] = amounts.get(role, 0) + (credit - debit if role in _SALES_ROLES else debit - credit)
+        if self.receipt_roles.get(receipt_type) == NOTA_CREDITO:
+            amounts = {role: -amount for role, amount in amounts.items()}
+        return amounts
+
+    def _kind(self, document_type: dict, amounts: Dict[str, int]) -> Optional[str]:
+        if document_type.get("supplier_movement"):
+            return "compra"
+        if document_type.get("customer_movement"):
+            return "venta"
+        if any(amounts.get(role) for role in _SALES_ROLES):
+            return "venta"
+        if any(amounts.get(role) for role in _PURCHASE_ROLES):
+            return "compra"
+        return None
+
+    @staticmethod
+    def _identification(entry: dict) -> Optional[str]:
+        for line in entry.get("lines") or []:
+            reference = (line.get("reference") or "").strip()
+            if reference.isdigit() and len(reference) in (10, 13):
+                return reference
+        return None
+
+    @staticmethod
+    def _establishment(document_type: dict) -> Tuple[str, str]:
+        parts = (document_type.get("establishment_point") or "").split("-")
+        establishment = parts[0].strip().zfill(3) if parts[0].strip() else "001"
+        point = parts[1].strip().zfill(3) if len(parts) > 1 and parts[1].strip() else "001"
+        return establishment, point
+
+    @staticmethod
+    def _sequence(entry_number: str) -> str:
+        match = re.search(r"(\d+)$", entry_number or "")
+        return (match.group(1) if match else "1")[-9:].zfill(9)
+
+    def _classify(self, entry: dict) -> Optional[Tuple[str, dict, str, Dict[str, int]]]:
+        document_type = self._document_type(entry)
+        if document_type is None:
+            return None
+        receipt_type = document_type["receipt_type"]
+        amounts = self._amounts(entry, receipt_type)
+        kind = self._kind(document_type, amounts)
+        if kind is None:
+            return None
+        return kind, document_type, receipt_type, amounts
+
+    async def _sales(self) -> Tuple[Dict[Tuple[str, str, str, str], List[int]], Dict[str, int]]:
+        """Primera pasada: ventas por (tipo id, cliente, comprobante, emisión) y total por establecimiento"""
+        groups: Dict[Tuple[str, str, str, str], List[int]] = {}
+        establishments: Dict[str, int] = {}
+        for document_type in self.types_by_id.values():
+            if document_type.get("customer_movement"):
+                establishments.setdefault(self._establishment(document_type)[0], 0)
+        async for entry in self.entries():
+            classified = self._classify(entry)
+            if classified is None or classified[0] != "venta":
+                continue
+            _, document_type, receipt_type, amounts = classified
+            client = self._identification(entry)
+            id_type, client = (("04" if len(client) == 13 else "05"), client) if client else _FINAL_CONSUMER
+            emission = "E" if document_type.get("is_electronic") else "F"
+            # [comprobantes, base tarifa 0, base gravada, IVA]
+            group = groups.setdefault((id_type, client, receipt_type, emission), [0, 0, 0, 0])
+            group[0] += 1
+            group[1] += amounts.get(VENTAS_TARIFA_0, 0) + amounts.get(EXPORTACIONES, 0)
+            group[2] += amounts.get(VENTAS_GRAVADAS, 0)
+            group[3] += amounts.get(IVA_VENTAS, 0)
+            sign = -1 if self.receipt_roles.get(receipt_type) == NOTA_CREDITO else 1
+            establishment = self._establishment(document_type)[0]
+            establishments[establishment] = establishments.get(establishment, 0) + sign * (
+                amounts.get(VENTAS_TARIFA_0, 0) + amounts.get(EXPORTACIONES, 0) + amounts.get(VENTAS_GRAVADAS, 0)
+            )
+        return groups, establishments
+
+    def _write_purchase(self, xml: _XmlWriter, entry: dict, document_type: dict, receipt_type: str, amounts: Dict[str, int]):
+        supplier = self._identification(entry)
+        id_type = ("01" if len(supplier) == 13 else "02") if supplier else "03"
+        establishment, point = self._establishment(document_type)
+        base_zero = amounts.get(COMPRAS_TARIFA_0, 0)
+        base_taxed = amounts.get(COMPRAS_GRAVADAS, 0) + amounts.get(ACTIVOS_FIJOS_GRAVADOS, 0)
+        vat = amounts.get(IVA_COMPRAS, 0) + amounts.get(IVA_ACTIVOS_FIJOS, 0)
+        date = _ddmmyyyy(entry["date"])
+        xml.open("detalleCompras")
+        xml.elements([
+            # 01: crédito tributario para IVA; 02: costo o gasto
+            ("codSustento", "01" if vat else "02"),
+            ("tpIdProv", id_type),
+            ("idProv", supplier or entry.get("entry_number") or ""),
+            ("tipoComprobante", receipt_type),
+            ("parteRel", "NO"),
+            ("fechaRegistro", date),
+            ("establecimiento", establishment),
+            ("puntoEmision", point),
+            ("secuencial", self._sequence(entry.get("entry_number"))),
+            ("fechaEmision", date),
+            ("autorizacion", "0000000000"),
+            ("baseNoGraIva", "0.00"),
+            ("baseImponible", _money(base_zero)),
+            ("baseImpGrav", _money(base_taxed)),
+            ("baseImpExe", "0.00"),
+            ("montoIce", "0.00"),
+            ("montoIva", _money(vat)),
+            ("valRetBien10", "0.00"),
+            ("valRetServ20", "0.00"),
+            ("valorRetBienes", "0.00"),
+            ("valRetServ50", "0.00"),
+            ("valorRetServicios", "0.00"),
+            ("valRetServ100", "0.00"),
+            ("totbasesImpReemb", "0.00"),
+        ])
+        xml.open("pagoExterior")
+        xml.elements([("pagoLocExt", "01"), ("paisEfecPago", "NA"), ("aplicConvDobTrib", "NA"), ("pagExtSujRetNorLeg", "NA")])
+        xml.close("pagoExterior")
+        if base_zero + base_taxed + vat >= _PAYMENT_FORM_THRESHOLD:
+            xml.open("formasDePago")
+            xml.elements([("formaPago", _PAYMENT_FORM)])
+            xml.close("formasDePago")
+        withheld = self.withholdings.entry_rows(entry)
+        if withheld:
+            xml.open("air")
+            for row in withheld:
+                base, value = to_cents(row["base_imponible"]), to_cents(row["valor_retenido"])
+                xml.open("detalleAir")
+                xml.elements([
+                    ("codRetAir", CONCEPTS_103[row["concepto"]][0]),
+                    ("baseImpAir", _money(base)),
+                    ("porcentajeAir", f"{value * 100 / base:.2f}" if base else "0.00"),
+                    ("valRetAir", _money(value)),
+                ])
+                xml.close("detalleAir")
+            xml.close("air")
+        xml.close("detalleCompras")
+
+    async def chunks(self, zipped: bool = False) -> AsyncIterator[bytes]:
+        """Bloques del archivo (XML o ZIP con el XML) a medida que se generan"""
+        sink = _ChunkSink()
+        archive = zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) if zipped else None
+        stream = archive.open(f"{self.file_stem}.xml", "w", force_zip64=True) if archive else sink
+        xml = _XmlWriter(stream)
+        self.documents = 0
+
+        sales, establishments = await self._sales()
+        xml.raw('<?xml version="1.0" encoding="UTF-8"?>\n')
+        xml.open("iva")
+        xml.elements([
+            ("TipoIDInformante", "R"),
+            ("IdInformante", self.company.ruc),
+            ("razonSocial", (self.company.legal_name or self.company.name).upper()),
+            ("Anio", f"{self.start:%Y}"),
+            ("Mes", f"{self.start:%m}"),
+            ("numEstabRuc", f"{max(len(establishments), 1):03d}"),
+            ("totalVentas", _money(sum(establishments.values()))),
+            ("codigoOperativo", "IVA"),
+        ])
+        xml.raw("\n")
+
+        xml.open("compras")
+        async for entry in self.entries():
+            classified = self._classify(entry)
+            if classified is None or classified[0] != "compra":
+                continue
+            self._write_purchase(xml, entry, *classified[1:])
+            self.documents += 1
+            if sink.pending >= _CHUNK_SIZE:
+                yield sink.drain()
+        xml.close("compras")
+
+        xml.open("ventas")
+        for (id_type, client, receipt_type, emission), (count, base_zero, base_taxed, vat) in sorted(sales.items()):
+            xml.open("detalleVentas")
+            fields = [("tpIdCliente", id_type), ("idCliente", client)]
+            if id_type != _FINAL_CONSUMER[0]:
+                fields.append(("parteRelVtas", "NO"))
+            fields += [
+                ("tipoComprobante", receipt_type),
+                ("tipoEmision", emission),
+                ("numeroComprobantes", count),
+                ("baseNoGraIva", "0.00"),
+                ("baseImponible", _money(base_zero)),
+                ("baseImpGrav", _money(base_taxed)),
+                ("montoIva", _money(vat)),
+                ("montoIce", "0.00"),
+                ("valorRetIva", "0.00"),
+                ("valorRetRenta", "0.00"),
+            ]
+            xml.elements(fields)
+            if self.receipt_roles.get(receipt_type) != NOTA_CREDITO:
+                xml.open("formasDePago")
+                xml.elements([("formaPago", _PAYMENT_FORM)])
+                xml.close("formasDePago")
+            xml.close("detalleVentas")
+            self.documents += count
+        xml.close("ventas")
+
+        xml.open("ventasEstablecimiento")
+        for establishment, total in sorted(establishments.items()):
+            xml.open("ventaEst")
+            xml.elements([("codEstab", establishment), ("ventasEstab", _money(total)), ("ivaComp", "0.00")])
+            xml.close("ventaEst")
+        xml.close("ventasEstablecimiento")
+        xml.close("iva")
+
+        if archive:
+            stream.close()
+            archive.close()
+        yield sink.drain()
+
+
+async def _update(export: AtsExport, **changes: Any):
+    """Avance y resultado del trabajo, visibles para el polling de otros procesos"""
+    changes["updated_at"] = datetime.now()
+    await AtsExport.get_motor_collection().update_one({"_id": export.id}, {"$set": Encoder().encode(changes)})
+
+
+async def start_ats_export(company: Company, period: str, zipped: bool, requested_by: str) -> AtsExport:
+    """Registrar la generación del ATS y lanzarla en segundo plano (estado PENDING)"""
+    month_bounds(period)
+    now = datetime.now()
+    export = AtsExport(
+        company_id=str(company.id),
+        period=period,
+        zipped=zipped,
+        requested_by=requested_by,
+        step="En cola",
+        created_at=now,
+        updated_at=now
+    )
+    await export.insert()
+    export_id = str(export.id)
+    task = asyncio.ensure_future(run_ats_export(export, company))
+    _jobs[export_id] = task
+    task.add_done_callback(lambda done: _jobs.pop(export_id, None))
+    return export
+
+
+async def run_ats_export(export: AtsExport, company: Company):
+    """Trabajo de generación: escribe el archivo por bloques; los errores quedan en el documento"""
+    path = None
+    try:
+        await _update(export, status=AtsExportStatus.RUNNING, started_at=datetime.now(), step="Leyendo comprobantes")
+        generator = await AtsGenerator.load(company, export.period)
+        directory = export_dir()
+        os.makedirs(directory, exist_ok=True)
+        file_name = generator.file_name(export.zipped)
+        path = os.path.join(directory, f"{export.id}_{file_name}")
+        size = 0
+        last_progress = time.monotonic()
+        with open(path, "wb") as handle:
+            async for chunk in generator.chunks(export.zipped):
+                handle.write(chunk)
+                size += len(chunk)
+                if time.monotonic() - last_progress >= _PROGRESS_EVERY:
+                    last_progress = time.monotonic()
+                    await _update(export, documents=generator.documents, size=size, step="Escribiendo comprobantes")
+        await _update(
+            export,
+            status=AtsExportStatus.COMPLETED,
+            documents=generator.documents,
+            size=size,
+            file_path=path,
+            file_name=file_name,
+            step="ATS generado",
+            finished_at=datetime.now()
+        )
+        logger.info("🧾 ATS %s de %s generado: %s comprobantes, %s bytes", export.period, export.company_id, generator.documents, size)
+    except Exception as e:
+        logger.exception("❌ Error al generar el ATS %s: %s", export.id, e)
+        if path and os.path.exists(path):
+            os.remove(path)
+        try:
+            await _update(export, status=AtsExportStatus.FAILED, error=str(e), finished_at=datetime.now())
+        except Exception as update_error:
+            logger.warning("⚠️ No se pudo registrar el error del ATS %s: %s", export.id, update_error)
@@ -0,0 +1,142 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.models.money import from_cents
+from app.services.chart_cache import ChartSnapshot
+
+# Secciones del estado de flujo de efectivo (método indirecto)
+CASH = "efectivo"
+RESULT = "resultado"
+ADJUSTMENT = "ajuste"
+OPERATING = "operacion"
+INVESTING = "inversion"
+FINANCING = "financiamiento"
+SECTIONS = (CASH, RESULT, ADJUSTMENT, OPERATING, INVESTING, FINANCING)
+
+# Clasificación por defecto del plan de cuentas de ejemplo (create_sample_chart.py).
+# Cada cuenta toma la sección de su ancestro más cercano (o de sí misma) presente aquí.
+DEFAULT_SECTIONS: Dict[str, str] = {
+    "1101": CASH,          # Caja
+    "1102": CASH,          # Bancos
+    "11": OPERATING,       # Activo corriente
+    "12": OPERATING,       # Cuentas por cobrar
+    "13": OPERATING,       # Inventarios
+    "14": INVESTING,       # Activo no corriente
+    "1402": ADJUSTMENT,    # Depreciación acumulada (partida que no mueve efectivo)
+    "21": OPERATING,       # Pasivo corriente
+    "22": FINANCING,       # Pasivo no corriente
+    "3": FINANCING,        # Patrimonio
+    "32": RESULT,          # Resultados acumulados (recibe los asientos de cierre)
+    "4": RESULT,
+    "5": RESULT,
+    "6": RESULT,
+}
+
+_SECTION_DESCRIPTIONS = {
+    OPERATING: "Flujos de efectivo de actividades de operación",
+    INVESTING: "Flujos de efectivo de actividades de inversión",
+    FINANCING: "Flujos de efectivo de actividades de financiamiento",
+}
+
+
+def parse_sections(items: Iterable[str]) -> Dict[str, str]:
+    """["1101=efectivo", "1402=ajuste"] o "1101=efectivo,1402=ajuste" -> {código: sección}"""
+    sections = {}
+    for item in items:
+        for pair in (item or "").split(","):
+            if "=" not in pair:
+                continue
+            code, section = (part.strip() for part in pair.split("=", 1))
+            if code and section:
+                if section not in SECTIONS:
+                    raise ValueError(f"Sección desconocida '{section}' para la cuenta {code}. Use: {', '.join(SECTIONS)}")
+                sections[code] = section
+    return sections
+
+
+def classify(chart: ChartSnapshot, sections: Dict[str, str]) -> Tuple[List[Optional[str]], np.ndarray]:
+    """
+    Sección de cada cuenta y la cuenta clasificada (ancestro más cercano presente en
+    `sections`) que le da nombre a su partida; -1 si ningún ancestro está clasificado.
+    """
+    section_of: List[Optional[str]] = [None] * len(chart)
+    line_of = np.full(len(chart), -1, dtype=np.int64)
+    for i in range(len(chart)):
+        node = i
+        while node >= 0 and chart.codes[node] not in sections:
+            node = int(chart.parent_index[node])
+        if node >= 0:
+            section_of[i] = sections[chart.codes[node]]
+            line_of[i] = node
+    return section_of, line_of
+
+
+def build_cash_flow(chart: ChartSnapshot, opening: np.ndarray, change: np.ndarray, sections: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Estado de flujo de efectivo por el método indirecto a partir de saldos netos
+    deudores (débito - crédito, en centavos) de cada cuenta: `opening` al inicio del
+    período y `change` su variación en el período.
+
+    Por partida doble, la variación del efectivo es menos la suma de las variaciones
+    de todas las demás cuentas: cada partida aporta -variación (un activo que crece
+    consume efectivo, un pasivo que crece lo aporta). Solo se suman hojas.
+    """
+    section_of, line_of = classify(chart, sections)
+    leaves = np.flatnonzero(chart.is_leaf)
+
+    net_income = 0
+    lines: Dict[str, Dict[int, int]] = {OPERATING: {}, INVESTING: {}, FINANCING: {}}
+    adjustments: Dict[int, int] = {}
+    unclassified: List[int] = []
+    cash_opening = cash_change = 0
+    for i in leaves:
+        section = section_of[i]
+        effect = -int(change[i])
+        if section == CASH:
+            cash_opening += int(opening[i])
+            cash_change += int(change[i])
+        elif section == RESULT:
+            net_income += effect
+        elif section == ADJUSTMENT:
+            adjustments[line_of[i]] = adjustments.get(line_of[i], 0) + effect
+        elif section in lines:
+            lines[section][line_of[i]] = lines[section].get(line_of[i], 0) + effect
+        elif effect:
+            # Sin clasificar: se presenta en operación para que el estado cuadre
+            unclassified.append(i)
+            lines[OPERATING][i] = lines[OPERATING].get(i, 0) + effect
+
+    def _items(amounts: Dict[int, int], kind: str) -> List[Dict[str, Any]]:
+        return [
+            {"codigo": chart.codes[i], "nombre": chart.names[i], "tipo": kind, "monto": from_cents(amount)}
+            for i, amount in sorted(amounts.items(), key=lambda item: chart.codes[item[0]])
+            if amount
+        ]
+
+    result_sections: Dict[str, Any] = {}
+    for section, description in _SECTION_DESCRIPTIONS.items():
+        items = _items(lines[section], "variacion")
+        total = sum(lines[section].values())
+        if section == OPERATING:
+            items = (
+                [{"codigo": None, "nombre": "Utilidad (pérdida) neta del período", "tipo": "resultado", "monto": from_cents(net_income)}]
+                + _items(adjustments, "ajuste")
+                + items
+            )
+            total += net_income + sum(adjustments.values())
+        result_sections[section] = {"descripcion": description, "partidas": items, "total": from_cents(total)}
+
+    flows = net_income + sum(adjustments.values()) + sum(sum(amounts.values()) for amounts in lines.values())
+    return {
+        "metodo": "indirecto",
+        "utilidad_neta": from_cents(net_income),
+        "secciones": result_sections,
+        "variacion_neta": from_cents(flows),
+        "efectivo": {
+            "inicial": from_cents(cash_opening),
+            "final": from_cents(cash_opening + cash_change),
+            "variacion": from_cents(cash_change),
+        },
+        # Distinto de cero solo si hay movimientos descuadrados en el período
+        "diferencia": from_cents(cash_change - flows),
+        "cuentas_sin_clasificar": [chart.codes[i] for i in unclassified],
+    }
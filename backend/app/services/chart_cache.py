@@ -0,0 +1,202 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from app.models.account import Account, AccountNature, AccountType
+from app.models.money import to_cents
+from app.services.data_version import data_versions
+
+# Categorías codificadas como enteros pequeños (índice en estas listas; -1 = desconocido)
+ACCOUNT_TYPES: List[str] = [t.value for t in AccountType]
+NATURES: List[str] = [n.value for n in AccountNature]
+
+_PROJECTION = {
+    "code": 1, "name": 1, "parent_code": 1, "level": 1, "account_type": 1, "nature": 1, "revision": 1,
+    "initial_debit_balance": 1, "initial_credit_balance": 1,
+    "current_debit_balance": 1, "current_credit_balance": 1,
+}
+
+
+class ChartSnapshot:
+    """
+    Plan de cuentas activo de una empresa en forma columnar.
+
+    Cada cuenta es una posición i: ids[i], codes[i], names[i] y los vectores
+    NumPy (tipos, naturalezas, índice del padre, saldos en centavos int64).
+    Los saldos padre se obtienen con `rollup`, sumando hijas nivel por nivel.
+    """
+
+    def __init__(self, company_id: str, version: Tuple[str, int], docs: List[dict]):
+        self.company_id = company_id
+        self.version = version
+        self.loaded_at = datetime.now()
+
+        self.document_ids: List = [doc["_id"] for doc in docs]
+        self.ids: List[str] = [str(document_id) for document_id in self.document_ids]
+        self.codes: List[str] = [doc.get("code") or "" for doc in docs]
+        self.names: List[str] = [doc.get("name") or "" for doc in docs]
+        self.parent_codes: List[Optional[str]] = [doc.get("parent_code") for doc in docs]
+        self.index_by_code: Dict[str, int] = {code: i for i, code in enumerate(self.codes) if code}
+        self.index_by_id: Dict[str, int] = {account_id: i for i, account_id in enumerate(self.ids)}
+
+        self.account_type = np.array([_category(doc.get("account_type"), ACCOUNT_TYPES) for doc in docs], dtype=np.int8)
+        self.nature = np.array([_category(doc.get("nature"), NATURES) for doc in docs], dtype=np.int8)
+        self.level = np.array([doc.get("level") or 1 for doc in docs], dtype=np.int16)
+        self.revision = np.array([doc.get("revision") or 0 for doc in docs], dtype=np.int64)
+        # Grupo del plan: primer dígito del código (1 Activo, 2 Pasivo, ... ; -1 si no es dígito)
+        self.group = np.array([int(code[0]) if code[:1].isdigit() else -1 for code in self.codes], dtype=np.int8)
+
+        self.initial_debit = _cents(docs, "initial_debit_balance")
+        self.initial_credit = _cents(docs, "initial_credit_balance")
+        self.current_debit = _cents(docs, "current_debit_balance")
+        self.current_credit = _cents(docs, "current_credit_balance")
+
+        self.parent_index = np.array([self._resolve_parent(i) for i in range(len(docs))], dtype=np.int32)
+        self.depth = self._compute_depths()
+        self.is_leaf = np.ones(len(docs), dtype=bool)
+        self.is_leaf[self.parent_index[self.parent_index >= 0]] = False
+
+        # Índices con padre agrupados por profundidad, de la más profunda a la raíz
+        with_parent = self.parent_index >= 0
+        self._rollup_levels = [
+            np.flatnonzero(with_parent & (self.depth == d))
+            for d in range(int(self.depth.max(initial=0)), 0, -1)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _resolve_parent(self, i: int) -> int:
+        """Padre por parent_code y, si no existe en el plan, por patrón de código (+2 dígitos)"""
+        code = self.codes[i]
+        parent = self.parent_codes[i]
+        if not parent or parent == code or parent not in self.index_by_code:
+            parent = code[:-2] if len(code) > 2 else None
+        if not parent or parent == code:
+            return -1
+        return self.index_by_code.get(parent, -1)
+
+    def _compute_depths(self) -> np.ndarray:
+        """Profundidad de cada cuenta (raíz = 0); rompe ciclos de parent_code si los hubiera"""
+        depth = np.full(len(self.ids), -1, dtype=np.int32)
+        for start in range(len(self.ids)):
+            path = []
+            node = start
+            while node >= 0 and depth[node] < 0 and node not in path:
+                path.append(node)
+                node = int(self.parent_index[node])
+            if node >= 0 and node in path:
+                # Ciclo: la última cuenta del recorrido pasa a ser raíz
+                self.parent_index[path[-1]] = -1
+                node = -1
+            base = depth[node] if node >= 0 else -1
+            for offset, visited in enumerate(reversed(path), start=1):
+                depth[visited] = base + offset
+        return depth
+
+    def rollup(self, values: np.ndarray) -> np.ndarray:
+        """
+        Saldos jerárquicos: las hojas conservan su valor y cada cuenta padre es la
+        suma de sus hijas directas. Acepta vectores (n,) o matrices (n, k).
+        """
+        result = np.array(values, copy=True)
+        result[~self.is_leaf] = 0
+        for nodes in self._rollup_levels:
+            np.add.at(result, self.parent_index[nodes], result[nodes])
+        return result
+
+    def movement_vectors(self, sums: Iterable[dict], debit_key: str = "sum_debit", credit_key: str = "sum_credit") -> Tuple[np.ndarray, np.ndarray]:
+        """Convertir el resultado de un $group por account_id en vectores de centavos alineados al plan"""
+        debit = np.zeros(len(self.ids), dtype=np.int64)
+        credit = np.zeros(len(self.ids), dtype=np.int64)
+        for doc in sums:
+            i = self.index_by_id.get(str(doc.get("_id")))
+            if i is not None:
+                debit[i] = to_cents(doc.get(debit_key))
+                credit[i] = to_cents(doc.get(credit_key))
+        return debit, credit
+
+    def movement_matrix(self, sums: Iterable[dict], columns: int, debit_key: str = "sum_debit", credit_key: str = "sum_credit") -> Tuple[np.ndarray, np.ndarray]:
+        """Como movement_vectors, para un $group por {account_id, bucket}: matrices (n, columns)"""
+        debit = np.zeros((len(self.ids), columns), dtype=np.int64)
+        credit = np.zeros((len(self.ids), columns), dtype=np.int64)
+        for doc in sums:
+            key = doc.get("_id") or {}
+            i = self.index_by_id.get(str(key.get("account_id")))
+            if i is not None:
+                debit[i, key["bucket"]] += to_cents(doc.get(debit_key))
+                credit[i, key["bucket"]] += to_cents(doc.get(credit_key))
+        return debit, credit
+
+    def children_of(self, i: int) -> np.ndarray:
+        return np.flatnonzero(self.parent_index == i)
+
+
+def _category(value, labels: List[str]) -> int:
+    value = getattr(value, "value", value)
+    return labels.index(value) if value in labels else -1
+
+
+def _cents(docs: List[dict], field: str) -> np.ndarray:
+    return np.array([to_cents(doc.get(field)) for doc in docs], dtype=np.int64)
+
+
+class ChartCache:
+    """
+    Caché de ChartSnapshot por empresa. Una instantánea solo se sirve si fue
+    cargada en la versión vigente: la versión de datos persistida de la empresa
+    (company_versions, que otros procesos también incrementan) más un contador
+    local que `invalidate` incrementa en este proceso.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, ChartSnapshot] = {}
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def version(self, company_id: str) -> int:
+        return self._versions.get(company_id, 0)
+
+    def invalidate(self, company_id: Optional[str] = None):
+        """Invalidar una empresa (o todas si company_id es None)"""
+        companies = [company_id] if company_id else list(set(self._versions) | set(self._snapshots))
+        for company in companies:
+            self._versions[company] = self._versions.get(company, 0) + 1
+            self._snapshots.pop(company, None)
+
+    async def get(self, company_id: str) -> ChartSnapshot:
+        # Leer la versión antes que las cuentas: una escritura concurrente deja
+        # la instantánea con la versión anterior, nunca al revés
+        token = await data_versions.token(company_id)
+        snapshot = self._snapshots.get(company_id)
+        if snapshot and snapshot.version == (token, self.version(company_id)):
+            self.hits += 1
+            return snapshot
+
+        # Una sola carga concurrente por empresa
+        lock = self._locks.setdefault(company_id, asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get(company_id)
+            if snapshot and snapshot.version == (token, self.version(company_id)):
+                self.hits += 1
+                return snapshot
+
+            self.misses += 1
+            local_version = self._versions.setdefault(company_id, 0)
+            docs = await Account.get_motor_collection().find(
+                {"company_id": company_id, "is_active": True},
+                _PROJECTION
+            ).sort("_id", 1).to_list(length=None)
+            snapshot = ChartSnapshot(company_id, (token, local_version), docs)
+            # Si hubo una invalidación local durante la carga, no guardar la instantánea
+            if local_version == self.version(company_id):
+                self._snapshots[company_id] = snapshot
+            return snapshot
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,101 @@
+import gzip
+from typing import Optional
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/xml", "application/javascript")
+# Por encima de este tamaño se comprime en un hilo para no bloquear el event loop
+_THREAD_THRESHOLD = 256 * 1024
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Elegir br o gzip según Accept-Encoding (ignora codificaciones con q=0)"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        token, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI de compresión gzip/brotli para respuestas de un solo bloque
+    (JSON de rutas y reportes) mayores a compression_min_size. Las respuestas en
+    streaming (exportaciones) pasan sin comprimir.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.compression_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Retener los encabezados hasta ver el cuerpo
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body", False)
+                or len(body) < settings.compression_min_size
+                or "content-encoding" in headers
+                or not content_type.startswith(_COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) > _THREAD_THRESHOLD:
+                compressed = await anyio.to_thread.run_sync(_compress, body, encoding)
+            else:
+                compressed = _compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,41 @@
+from typing import Any, Dict, Optional, Type
+from beanie import Document
+from beanie.odm.utils.encoder import Encoder
+
+
+class ConcurrencyConflictError(Exception):
+    """El documento fue modificado por otra operación desde que se leyó"""
+
+
+def revision_filter(revision: int) -> dict:
+    """Filtro por revisión; los documentos anteriores al campo se consideran revisión 0"""
+    if revision:
+        return {"revision": revision}
+    return {"revision": {"$in": [0, None]}}
+
+
+async def compare_and_set(
+    model: Type[Document],
+    document_id: Any,
+    revision: int,
+    changes: Dict[str, Any],
+    expected: Optional[dict] = None,
+    session=None
+) -> int:
+    """
+    Aplicar `changes` ($set) solo si el documento sigue en `revision` y cumple
+    `expected` (p. ej. {"status": "draft"}). Incrementa la revisión y devuelve
+    la nueva; lanza ConcurrencyConflictError si otro proceso lo modificó antes.
+    No modifica el documento en memoria (las transacciones pueden reintentarse).
+    """
+    query = {"_id": document_id, **revision_filter(revision), **(expected or {})}
+    update: Dict[str, Any] = {"$inc": {"revision": 1}}
+    if changes:
+        # Codificar como lo hace Beanie (Decimal -> Decimal128, modelos anidados -> dict)
+        update["$set"] = Encoder().encode(changes)
+    result = await model.get_motor_collection().update_one(query, update, session=session)
+    if result.matched_count == 0:
+        raise ConcurrencyConflictError(
+            f"{model.__name__} {document_id} fue modificado por otra operación; recargue e intente de nuevo"
+        )
+    return revision + 1
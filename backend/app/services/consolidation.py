@@ -0,0 +1,151 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+import numpy as np
+from app.models.money import from_cents
+from app.services.chart_cache import ChartSnapshot
+
+T = TypeVar("T")
+
+
+async def gather_bounded(calls: Iterable[Callable[[], Awaitable[T]]], limit: int) -> List[T]:
+    """
+    Ejecutar las llamadas de forma concurrente con a lo sumo `limit` en curso.
+    El resultado conserva el orden de `calls`.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*[_run(call) for call in calls])
+
+
+def leaf_group_totals(chart: ChartSnapshot, values: np.ndarray, groups: Iterable[str]) -> Dict[str, int]:
+    """Total en centavos por grupo del plan de una empresa, sumando solo hojas"""
+    return {group: int(values[(chart.group == int(group)) & chart.is_leaf].sum()) for group in groups}
+
+
+class ConsolidatedChart:
+    """
+    Unión por código de los planes de cuentas de varias empresas. Cada empresa se
+    proyecta sobre el plan consolidado con un vector de índices; el nombre y la
+    cuenta padre de cada código son los de la primera empresa que lo tiene.
+    """
+
+    def __init__(self, charts: List[ChartSnapshot]):
+        self.charts = charts
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        self.parent_codes: List[Optional[str]] = []
+        self.index_by_code: Dict[str, int] = {}
+        for chart in charts:
+            for i, code in enumerate(chart.codes):
+                if code and code not in self.index_by_code:
+                    self.index_by_code[code] = len(self.codes)
+                    self.codes.append(code)
+                    self.names.append(chart.names[i])
+                    parent = int(chart.parent_index[i])
+                    self.parent_codes.append(chart.codes[parent] if parent >= 0 else None)
+
+        # Orden del reporte: por código, igual que el plan de cada empresa
+        self.order = sorted(range(len(self.codes)), key=lambda i: self.codes[i])
+        self.group = np.array([int(code[0]) if code[:1].isdigit() else -1 for code in self.codes], dtype=np.int8)
+        self._maps = [
+            np.array([self.index_by_code.get(code, -1) if code else -1 for code in chart.codes], dtype=np.int64)
+            for chart in charts
+        ]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def merge(self, vectors: List[np.ndarray]) -> np.ndarray:
+        """Sumar por código los saldos (ya consolidados jerárquicamente) de cada empresa"""
+        total = np.zeros(len(self.codes), dtype=np.int64)
+        for index_map, values in zip(self._maps, vectors):
+            valid = index_map >= 0
+            np.add.at(total, index_map[valid], values[valid])
+        return total
+
+    def group_totals(self, vectors: List[np.ndarray], groups: Iterable[str]) -> Dict[str, int]:
+        """Totales por grupo del plan sumando solo las hojas de cada empresa (sin doble conteo)"""
+        totals = {group: 0 for group in groups}
+        for chart, values in zip(self.charts, vectors):
+            for group, total in leaf_group_totals(chart, values, totals).items():
+                totals[group] += total
+        return totals
+
+    def ancestors(self, i: int) -> List[int]:
+        """Cuentas padre de i en el plan consolidado, de la más cercana a la raíz"""
+        result = []
+        code = self.parent_codes[i]
+        while code and code in self.index_by_code:
+            index = self.index_by_code[code]
+            if index in result or index == i:
+                break
+            result.append(index)
+            code = self.parent_codes[index]
+        return result
+
+
+def apply_eliminations(chart: ConsolidatedChart, balances: np.ndarray, totals: Dict[str, int], rules: List[str]) -> List[Dict[str, Any]]:
+    """
+    Aplicar reglas de eliminación intercompañía sobre los saldos consolidados.
+
+    "CODIGO_A:CODIGO_B"  cuentas recíprocas (p. ej. cuentas por cobrar / por pagar
+                         entre empresas del grupo, o ventas / costo intercompañía):
+                         se elimina el monto que se compensa, min(|A|, |B|), llevando
+                         ambas hacia cero; lo que no se compensa queda como diferencia.
+    "CODIGO"             se elimina el saldo completo (p. ej. inversión en subsidiarias).
+
+    Cada eliminación se propaga a las cuentas padre y al total del grupo.
+    """
+    applied = []
+    for rule in rules:
+        codes = [code.strip() for code in rule.split(":") if code.strip()]
+        missing = [code for code in codes if code not in chart.index_by_code]
+        if not codes or len(codes) > 2 or missing:
+            applied.append({
+                "regla": rule,
+                "monto": from_cents(0),
+                "nota": f"Cuentas inexistentes en el plan consolidado: {', '.join(missing)}" if missing else "Regla inválida"
+            })
+            continue
+
+        indexes = [chart.index_by_code[code] for code in codes]
+        if len(indexes) == 2:
+            amount = min(abs(int(balances[indexes[0]])), abs(int(balances[indexes[1]])))
+            difference = abs(int(balances[indexes[0]])) - abs(int(balances[indexes[1]]))
+        else:
+            amount = abs(int(balances[indexes[0]]))
+            difference = 0
+
+        for i in indexes:
+            delta = amount if balances[i] > 0 else -amount
+            for node in [i] + chart.ancestors(i):
+                balances[node] -= delta
+            group = str(int(chart.group[i]))
+            if group in totals:
+                totals[group] -= delta
+
+        applied.append({"regla": rule, "monto": from_cents(amount), "diferencia": from_cents(difference)})
+    return applied
+
+
+def consolidated_groups(chart: ConsolidatedChart, balances: np.ndarray, totals: Dict[str, int], descriptions: Dict[str, str]) -> Dict[str, Any]:
+    """Grupos del reporte consolidado, con la misma forma que los reportes por empresa"""
+    groups: Dict[str, Any] = {}
+    for group, description in descriptions.items():
+        groups[group] = {
+            "descripcion": description,
+            "cuentas": [
+                {
+                    "codigo": chart.codes[i],
+                    "nombre": chart.names[i],
+                    "saldo": from_cents(balances[i])
+                }
+                for i in chart.order if chart.group[i] == int(group)
+            ],
+            "total": from_cents(totals[group])
+        }
+    return groups
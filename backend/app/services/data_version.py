@@ -0,0 +1,193 @@
+from datetime import datetime
+from typing import Optional
+from bson import ObjectId
+from fastapi import Depends, HTTPException, Query, Request, status
+from pymongo import ReturnDocument
+from starlette.datastructures import MutableHeaders
+from app.auth.dependencies import get_current_user
+from app.config import settings
+from app.models.company_version import CompanyVersion, DataVersionResponse
+from app.models.user import User
+
+# Documento de la época global en company_versions
+_GLOBAL_ID = "*"
+
+
+class DataVersion:
+    """Versión vigente de una empresa: contador propio + época y generación globales"""
+
+    def __init__(self, company_id: str, version: int, epoch: int, generation: str, updated_at: Optional[datetime] = None):
+        self.company_id = company_id
+        self.version = version
+        self.epoch = epoch
+        self.generation = generation
+        self.updated_at = updated_at
+
+    @property
+    def token(self) -> str:
+        """Identificador opaco: cambia con cualquier escritura de la empresa o importación"""
+        return f"{self.generation}.{self.epoch}.{self.version}"
+
+    @property
+    def etag(self) -> str:
+        # Débil: el mismo contenido puede enviarse comprimido o no
+        return f'W/"{settings.version}-{self.company_id}-{self.token}"'
+
+    def response(self) -> DataVersionResponse:
+        return DataVersionResponse(
+            company_id=self.company_id,
+            version=self.version,
+            epoch=self.epoch,
+            token=self.token,
+            updated_at=self.updated_at
+        )
+
+
+class DataVersions:
+    """
+    Versiones de datos por empresa persistidas en company_versions, compartidas
+    por todos los procesos del backend. `bump` es un $inc atómico; con `session`
+    se confirma en la misma transacción que la escritura que lo provoca.
+
+    La época global invalida todas las empresas a la vez; su generación cambia
+    al importar una base de datos, porque la importación puede restaurar también
+    contadores anteriores.
+    """
+
+    @staticmethod
+    def _collection():
+        return CompanyVersion.get_motor_collection()
+
+    async def bump(self, company_id: Optional[str] = None, session=None) -> int:
+        """Incrementar la versión de una empresa (o la época global si no se conoce)"""
+        doc = await self._collection().find_one_and_update(
+            {"_id": company_id or _GLOBAL_ID},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now()}},
+            projection={"version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        return doc["version"]
+
+    async def bump_all(self):
+        """Invalidar todas las empresas con una nueva generación (importación de datos)"""
+        await self._collection().update_one(
+            {"_id": _GLOBAL_ID},
+            {"$inc": {"version": 1}, "$set": {"generation": str(ObjectId()), "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+    async def ensure_epoch(self) -> dict:
+        """
+        Crear la época global si no existe. Se llama al iniciar: así la colección
+        existe antes de la primera transacción que incremente una versión.
+        """
+        return await self._collection().find_one_and_update(
+            {"_id": _GLOBAL_ID},
+            {"$setOnInsert": {"version": 0, "generation": str(ObjectId()), "updated_at": datetime.now()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def get(self, company_id: str) -> DataVersion:
+        """Versión vigente de una empresa: una sola lectura por _id de dos documentos"""
+        docs = await self._collection().find({"_id": {"$in": [company_id, _GLOBAL_ID]}}).to_list(length=2)
+        by_id = {doc["_id"]: doc for doc in docs}
+        epoch = by_id.get(_GLOBAL_ID) or await self.ensure_epoch()
+        company = by_id.get(company_id, {})
+        return DataVersion(
+            company_id,
+            company.get("version", 0),
+            epoch.get("version", 0),
+            epoch.get("generation") or "",
+            company.get("updated_at") or epoch.get("updated_at")
+        )
+
+    async def token(self, company_id: str) -> str:
+        return (await self.get(company_id)).token
+
+    async def current(self, company_id: str, session=None) -> int:
+        """Contador de la empresa; dentro de una transacción, el de su instantánea"""
+        doc = await self._collection().find_one({"_id": company_id}, {"version": 1}, session=session)
+        return doc.get("version", 0) if doc else 0
+
+
+data_versions = DataVersions()
+
+
+async def get_data_version(company_id: str) -> DataVersion:
+    """Versión de datos vigente de una empresa (para cachés de reportes, ETags y polling)"""
+    return await data_versions.get(company_id)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (lista separada por comas o *)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+async def company_etag(
+    request: Request,
+    company_id: str = Query(..., description="ID de la empresa"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dependencia de GET condicional para lecturas por empresa: responde 304 si el
+    cliente ya tiene la versión vigente. Declararla después de la dependencia de
+    permisos de la ruta para que el 304 solo se conceda a usuarios autorizados.
+    Devuelve la DataVersion leída (clave de las cachés de reportes).
+    """
+    if current_user.role != "admin" and company_id not in current_user.companies:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes acceso a esta empresa"
+        )
+    # Leer la versión antes que los datos: si una escritura ocurre entre ambas
+    # lecturas, el cliente recibe datos nuevos con el ETag anterior y solo pierde un 304
+    version = await data_versions.get(company_id)
+    etag = version.etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+    # El middleware agrega el ETag a la respuesta 200 (también a las respuestas FastJSONResponse)
+    request.state.etag = etag
+    return version
+
+
+class DataVersionMiddleware:
+    """
+    Middleware ASGI: agrega ETag y Cache-Control a las respuestas 200 de las
+    lecturas que pasaron por `company_etag`. Las versiones las incrementan las
+    propias escrituras (ver `data_versions.bump`).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = MutableHeaders(scope=message)
+                    headers["ETag"] = etag
+                    headers["Cache-Control"] = "private, no-cache"
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,78 @@
+from typing import Optional, Tuple
+from pymongo import UpdateOne
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry
+
+
+def parse_entry_number(entry_number: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Separar "CE-000123" en ("CE", 123); None si no tiene secuencia numérica"""
+    if not entry_number or "-" not in entry_number:
+        return None
+    code = entry_number.split("-")[0]
+    sequence = entry_number.split("-")[-1]
+    if not code or not sequence.isdigit():
+        return None
+    return code, int(sequence)
+
+
+async def record_entry_number(company_id: str, entry_number: Optional[str], session=None):
+    """
+    Mantener la marca de agua alta del tipo de documento: next_sequence nunca
+    queda por debajo del mayor número de asiento usado con ese código ($max atómico).
+    """
+    parsed = parse_entry_number(entry_number)
+    if not parsed:
+        return
+    code, sequence = parsed
+    await DocumentType.get_motor_collection().update_one(
+        {"company_id": company_id, "code": code},
+        {"$max": {"next_sequence": sequence}},
+        session=session
+    )
+
+
+async def resync_document_sequences(company_id: Optional[str] = None) -> int:
+    """
+    Recalcular la marca de agua alta desde los asientos existentes con un solo
+    $group (máximo numérico por prefijo) en lugar de una consulta por tipo.
+    Necesario tras importaciones o reinicios que escriben asientos directamente.
+    Devuelve la cantidad de tipos de documento actualizados.
+    """
+    match = {"entry_number": {"$regex": "^[^-]+-"}}
+    if company_id:
+        match["company_id"] = company_id
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "company_id": 1,
+            "parts": {"$split": ["$entry_number", "-"]}
+        }},
+        {"$project": {
+            "company_id": 1,
+            "code": {"$arrayElemAt": ["$parts", 0]},
+            "sequence": {"$convert": {
+                "input": {"$arrayElemAt": ["$parts", -1]},
+                "to": "long",
+                "onError": None,
+                "onNull": None
+            }}
+        }},
+        {"$match": {"sequence": {"$ne": None}}},
+        {"$group": {
+            "_id": {"company_id": "$company_id", "code": "$code"},
+            "max_sequence": {"$max": "$sequence"}
+        }}
+    ]
+    rows = await JournalEntry.get_motor_collection().aggregate(pipeline).to_list(length=None)
+
+    operations = [
+        UpdateOne(
+            {"company_id": row["_id"]["company_id"], "code": row["_id"]["code"]},
+            {"$max": {"next_sequence": int(row["max_sequence"])}}
+        )
+        for row in rows
+    ]
+    if not operations:
+        return 0
+    result = await DocumentType.get_motor_collection().bulk_write(operations, ordered=False)
+    return result.modified_count
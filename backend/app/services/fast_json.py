@@ -0,0 +1,108 @@
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+from app.models.money import to_decimal
+
+
+def _default(value: Any):
+    """Tipos que orjson no serializa por sí solo (enums, datetimes y dicts sí)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        # Modelos ya construidos y validados por el servicio: sin model_dump ni revalidación
+        return value.__dict__
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON serializada con orjson. Devolverla desde una ruta evita la
+    validación contra response_model y el jsonable_encoder de FastAPI; el
+    contenido debe tener ya la forma del modelo (ver ProjectionSchema).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Conversiones de campos crudos de Mongo al JSON del response_model equivalente
+def _decimal128_to_float(value: Decimal128) -> Optional[float]:
+    """
+    Decodificar el BID de un Decimal128 con a lo sumo dos decimales directamente a
+    float (varias veces más rápido que pasar por Decimal). None si no aplica.
+    """
+    bid = value.bid
+    high = int.from_bytes(bid[8:], "little")
+    if (high >> 61) & 3 == 3:
+        # Formato de coeficiente grande, infinito o NaN
+        return None
+    exponent = ((high >> 49) & 0x3FFF) - 6176
+    if exponent < -2:
+        # Más de dos decimales (dato heredado sin redondear): to_decimal lo redondea
+        return None
+    coefficient = ((high & 0x1FFFFFFFFFFFF) << 64) | int.from_bytes(bid[:8], "little")
+    # La división entera de Python redondea correctamente, igual que float(Decimal)
+    result = coefficient / 10 ** -exponent if exponent < 0 else float(coefficient * 10 ** exponent)
+    return -result if high >> 63 else result
+
+
+def money(value: Any) -> float:
+    """Igual que Money en JSON: Decimal al centavo serializado como número"""
+    if isinstance(value, Decimal128):
+        result = _decimal128_to_float(value)
+        if result is not None:
+            return result
+    return float(to_decimal(value))
+
+
+def id_str(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def enum_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+class SchemaField:
+    def __init__(self, source: Optional[str] = None, convert: Optional[Callable[[Any], Any]] = None, default: Any = None):
+        self.source = source
+        self.convert = convert
+        self.default = default
+
+
+class ProjectionSchema:
+    """
+    Esquema de salida para documentos crudos de Motor: cada campo de la respuesta
+    declara su campo de origen, una conversión opcional y el valor por defecto del
+    modelo. `projection` pide a Mongo solo esos campos.
+    """
+
+    def __init__(self, **fields: SchemaField):
+        self.fields = [(name, field.source or name, field.convert, field.default) for name, field in fields.items()]
+        self.projection: Dict[str, int] = {source: 1 for _, source, _, _ in self.fields}
+
+    def row(self, doc: dict) -> dict:
+        row = {}
+        for name, source, convert, default in self.fields:
+            value = doc.get(source)
+            if value is None:
+                row[name] = default
+            else:
+                row[name] = convert(value) if convert else value
+        return row
+
+    def rows(self, docs: Iterable[dict]) -> List[dict]:
+        row = self.row
+        return [row(doc) for doc in docs]
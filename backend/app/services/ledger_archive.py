@@ -0,0 +1,271 @@
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from bson import ObjectId
+from app.config import settings
+from app.models.account import Account
+from app.models.journal import JournalEntry
+from app.models.ledger import LedgerEntry, LedgerEntryType
+from app.models.money import to_decimal
+from app.models.period_closing import FiscalArchive, PeriodClosing, PeriodClosingStatus
+from app.services.data_version import data_versions
+from app.services.period_locks import period_locks
+
+logger = logging.getLogger(__name__)
+
+_DATE_OPERATORS = ("$gte", "$gt", "$lt", "$lte")
+
+
+def archive_collection_names(period_end: datetime) -> Dict[str, str]:
+    """Colecciones de archivo del año de `period_end` (compartidas por todas las empresas)"""
+    return {
+        "ledger": f"ledger_entries_archive_{period_end:%Y}",
+        "journal": f"journal_entries_archive_{period_end:%Y}",
+    }
+
+
+def _date_bounds(match: Dict[str, Any]) -> List[datetime]:
+    date_filter = match.get("date")
+    if not isinstance(date_filter, dict):
+        return []
+    return [value for key, value in date_filter.items() if key in _DATE_OPERATORS and isinstance(value, datetime)]
+
+
+class LedgerArchives:
+    """
+    Enrutamiento transparente entre las colecciones vivas y los años archivados.
+
+    Tras archivar, ledger_entries conserva una fila de apertura por cuenta con los
+    totales archivados (fechada en el último instante del año archivado). Toda
+    consulta cuyos límites de fecha estén en el año vigente se responde solo con
+    la colección viva; si algún límite cae antes del archivo, la agregación une
+    ($unionWith) las colecciones de archivo y excluye las filas de apertura.
+
+    Las agregaciones cuyo límite superior ($lt) no pasa del período bloqueado son
+    inmutables (ninguna escritura puede tocar esas fechas): su resultado se guarda
+    en memoria sin revalidar, por empresa y generación de datos (una importación
+    cambia la generación).
+    """
+
+    def __init__(self):
+        self._sealed: "OrderedDict[tuple, List[dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._sealed)
+
+    def forget(self, company_id: Optional[str] = None):
+        """Descartar las agregaciones guardadas de una empresa (o de todas)"""
+        for key in [key for key in self._sealed if company_id is None or key[0] == company_id]:
+            del self._sealed[key]
+
+    @staticmethod
+    async def archives(company_id: str) -> List[dict]:
+        return await FiscalArchive.get_motor_collection().find(
+            {"company_id": company_id},
+            {"boundary": 1, "ledger_collection": 1, "journal_collection": 1}
+        ).sort("boundary", 1).to_list(length=None)
+
+    @staticmethod
+    def _needs_archive(archives: List[dict], bounds: List[datetime]) -> bool:
+        # Sin límites de fecha la consulta abarca toda la historia
+        return bool(archives) and (not bounds or min(bounds) < archives[-1]["boundary"])
+
+    async def ledger_pipeline(
+        self,
+        company_id: str,
+        match: Dict[str, Any],
+        stages: List[dict],
+        bounds: Iterable[datetime] = ()
+    ) -> List[dict]:
+        """
+        Pipeline para ledger_entries con `match` (que incluye company_id y el filtro
+        de fechas) seguido de `stages`. `bounds` agrega otros límites de fecha usados
+        por las etapas (p. ej. los cortes de un $switch por períodos).
+        """
+        archives = await self.archives(company_id)
+        if not self._needs_archive(archives, _date_bounds(match) + list(bounds)):
+            return [{"$match": match}, *stages]
+        collections = list(dict.fromkeys(archive["ledger_collection"] for archive in archives))
+        return [
+            {"$match": {**match, "archive_id": None}},
+            *({"$unionWith": {"coll": name, "pipeline": [{"$match": match}]}} for name in collections),
+            *stages,
+        ]
+
+    async def journal_collections(self, company_id: str, match: Dict[str, Any]) -> List[str]:
+        """
+        Colecciones de asientos archivados que alcanza la consulta: solo si pide
+        fechas anteriores al archivo (sin fechas se listan los años vivos).
+        """
+        archives = await self.archives(company_id)
+        bounds = _date_bounds(match)
+        if not bounds or not self._needs_archive(archives, bounds):
+            return []
+        return list(dict.fromkeys(archive["journal_collection"] for archive in archives))
+
+    @staticmethod
+    def journal_pipeline(match: Dict[str, Any], collections: List[str], stages: List[dict]) -> List[dict]:
+        return [
+            {"$match": match},
+            *({"$unionWith": {"coll": name, "pipeline": [{"$match": match}]}} for name in collections),
+            *stages,
+        ]
+
+    async def _sealed_key(self, company_id: str, match: Dict[str, Any], stages: List[dict], bounds: List[datetime]) -> Optional[tuple]:
+        """Clave de la agregación si todas sus fechas están en el período bloqueado; None si no"""
+        date_filter = match.get("date")
+        end = date_filter.get("$lt") if isinstance(date_filter, dict) else None
+        if not isinstance(end, datetime) or settings.sealed_ledger_max_entries <= 0:
+            return None
+        locked_through = await period_locks.cached_locked_through(company_id)
+        if locked_through is None or end > locked_through + timedelta(days=1):
+            return None
+        version = await data_versions.get(company_id)
+        return (company_id, f"{version.generation}.{version.epoch}", repr(match), repr(stages), tuple(bounds))
+
+    async def aggregate_ledger(self, company_id: str, match: Dict[str, Any], stages: List[dict], bounds: Iterable[datetime] = ()) -> List[dict]:
+        bounds = list(bounds)
+        key = await self._sealed_key(company_id, match, stages, bounds)
+        if key is not None:
+            rows = self._sealed.get(key)
+            if rows is not None:
+                self._sealed.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+        pipeline = await self.ledger_pipeline(company_id, match, stages, bounds)
+        rows = await LedgerEntry.get_motor_collection().aggregate(pipeline).to_list(length=None)
+        if key is not None:
+            self._sealed[key] = rows
+            while len(self._sealed) > settings.sealed_ledger_max_entries:
+                self._sealed.popitem(last=False)
+        return rows
+
+    async def archive(self, closing: PeriodClosing, created_by: str) -> FiscalArchive:
+        """
+        Archivar el año cerrado por `closing`:
+
+        1. Copiar con $merge (en el servidor, idempotente) las filas del mayor y los
+           asientos mayorizados anteriores al límite a las colecciones del año.
+        2. Calcular con una agregación los totales por cuenta hasta el límite
+           (incluidas las aperturas de archivos anteriores).
+        3. En una transacción: insertar las filas de apertura, borrar de las
+           colecciones vivas lo archivado y registrar el FiscalArchive.
+
+        Si falla antes del paso 3 las copias quedan sin uso y el reintento las reutiliza.
+        """
+        # Importación diferida: ledger_service importa este módulo para el mayor por cuenta
+        from app.services.ledger_service import LedgerService
+
+        company_id = closing.company_id
+        if closing.status != PeriodClosingStatus.COMPLETED:
+            raise ValueError("Solo se pueden archivar períodos con el cierre completado")
+        locked_through = await period_locks.locked_through(company_id)
+        if locked_through is None or locked_through < closing.period_end:
+            raise ValueError(f"El período al {closing.period_end:%Y-%m-%d} no está bloqueado")
+        boundary = closing.period_end + timedelta(days=1)
+        archived = await FiscalArchive.find_one({"company_id": company_id, "boundary": {"$gte": boundary}})
+        if archived:
+            raise ValueError(f"La empresa ya tiene archivado el período hasta {archived.period_end:%Y-%m-%d}")
+
+        names = archive_collection_names(closing.period_end)
+        ledger = LedgerEntry.get_motor_collection()
+        journal = JournalEntry.get_motor_collection()
+        database = ledger.database
+        # Los borradores de un período cerrado no se archivan: no pueden mayorizarse
+        ledger_match = {"company_id": company_id, "date": {"$lt": boundary}, "archive_id": None}
+        journal_match = {"company_id": company_id, "date": {"$lt": boundary}, "status": {"$ne": "draft"}}
+
+        logger.info("📦 Archivando %s hasta %s en %s", company_id, f"{closing.period_end:%Y-%m-%d}", names["ledger"])
+        for collection, match, target in ((ledger, ledger_match, names["ledger"]), (journal, journal_match, names["journal"])):
+            await collection.aggregate([
+                {"$match": match},
+                {"$merge": {"into": target, "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+            ]).to_list(length=None)
+        await database[names["ledger"]].create_index([("company_id", 1), ("date", 1)], name="company_date")
+        await database[names["ledger"]].create_index([("account_id", 1), ("date", -1), ("created_at", -1)], name="account_date")
+        await database[names["journal"]].create_index([("company_id", 1), ("date", 1)], name="company_date")
+
+        totals = await ledger.aggregate([
+            {"$match": {"company_id": company_id, "date": {"$lt": boundary}}},
+            {"$group": {
+                "_id": "$account_id",
+                "account_code": {"$first": "$account_code"},
+                "account_name": {"$first": "$account_name"},
+                "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+                "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
+            }}
+        ]).to_list(length=None)
+        account_ids = [ObjectId(row["_id"]) for row in totals if ObjectId.is_valid(row["_id"])]
+        initial = {
+            str(doc["_id"]): doc
+            async for doc in Account.get_motor_collection().find(
+                {"_id": {"$in": account_ids}}, {"initial_debit_balance": 1, "initial_credit_balance": 1}
+            )
+        }
+
+        archive_id = ObjectId()
+        now = datetime.now()
+        openings = []
+        for row in totals:
+            debit, credit = to_decimal(row.get("sum_debit")), to_decimal(row.get("sum_credit"))
+            if not debit and not credit:
+                continue
+            account = initial.get(row["_id"], {})
+            openings.append(LedgerEntry(
+                id=ObjectId(),
+                account_id=row["_id"],
+                account_code=row.get("account_code") or "",
+                account_name=row.get("account_name") or "",
+                company_id=company_id,
+                entry_type=LedgerEntryType.INITIAL,
+                date=boundary - timedelta(milliseconds=1),
+                description=f"Saldo traído del período archivado al {closing.period_end:%Y-%m-%d}",
+                reference=f"ARCHIVO-{closing.period_end:%Y%m%d}",
+                debit_amount=debit,
+                credit_amount=credit,
+                running_debit_balance=to_decimal(account.get("initial_debit_balance")) + debit,
+                running_credit_balance=to_decimal(account.get("initial_credit_balance")) + credit,
+                created_at=now,
+                created_by=created_by,
+                archive_id=str(archive_id)
+            ))
+
+        fiscal_archive = FiscalArchive(
+            id=archive_id,
+            company_id=company_id,
+            closing_id=str(closing.id),
+            period_end=closing.period_end,
+            boundary=boundary,
+            ledger_collection=names["ledger"],
+            journal_collection=names["journal"],
+            ledger_rows=await ledger.count_documents(ledger_match),
+            journal_entries=await journal.count_documents(journal_match),
+            opening_rows=len(openings),
+            created_by=created_by,
+            created_at=now
+        )
+
+        async def _commit(session):
+            if openings:
+                await LedgerEntry.insert_many(openings, session=session)
+            # $ne también elimina las aperturas de archivos anteriores (ya sumadas en las nuevas)
+            await ledger.delete_many(
+                {"company_id": company_id, "date": {"$lt": boundary}, "archive_id": {"$ne": str(archive_id)}},
+                session=session
+            )
+            await journal.delete_many(journal_match, session=session)
+            await fiscal_archive.insert(session=session)
+
+        await LedgerService._run_and_invalidate(company_id, _commit)
+        logger.info(
+            "✅ Archivado %s: %s filas del mayor, %s asientos, %s aperturas",
+            company_id, fiscal_archive.ledger_rows, fiscal_archive.journal_entries, fiscal_archive.opening_rows
+        )
+        return fiscal_archive
+
+
+ledger_archives = LedgerArchives()
@@ -1,10 +1,77 @@
-from typing import List, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from decimal import Decimal
 from app.models.account import Account
 from app.models.journal import JournalEntry, JournalLine
 from app.models.ledger import LedgerEntry, LedgerEntryCreate, LedgerEntryType, AccountLedgerSummary
 from app.models.ledger import LedgerEntryResponse as LedgerEntryResponseModel
+from app.models.money import ZERO, to_decimal, to_decimal128, from_cents
 from bson import ObjectId
+from pymongo import UpdateMany, UpdateOne
+from app.services.transactions import run_in_transaction
+from app.services.concurrency import ConcurrencyConflictError, compare_and_set, revision_filter
+from app.services.chart_cache import chart_cache
+from app.services.data_version import data_versions
+from app.services.document_sequences import record_entry_number
+from app.services.period_locks import PeriodLockedError, period_locks
+from app.services.ledger_archive import ledger_archives
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def sort_accounts_hierarchically(accounts: List[Account]) -> List[Account]:
+    """
+    Ordenar cuentas jerárquicamente (cada padre antes que sus hijas, orden natural por
+    dígitos: "3010101" -> (3, 0, 1, 0, 1, 0, 1)). La clave de una cuenta es la de su padre
+    más sus propios dígitos y se memoriza por código, así cada rama se recorre una vez.
+    Acepta modelos Account o documentos crudos de Motor (dict).
+    """
+    if not accounts:
+        return []
+    if isinstance(accounts[0], dict):
+        code_of = lambda acc: acc.get("code")
+        parent_of = lambda acc: acc.get("parent_code")
+    else:
+        code_of = lambda acc: acc.code
+        parent_of = lambda acc: getattr(acc, "parent_code", None)
+    account_dict = {code_of(acc): acc for acc in accounts}
+    keys: Dict[str, tuple] = {}
+
+    def digits(code: str) -> tuple:
+        return tuple(int(ch) for ch in code if ch.isdigit())
+
+    def sort_key(account) -> tuple:
+        # Subir por parent_code hasta una cuenta con clave conocida, la raíz o un ciclo
+        chain = []
+        visited = set()
+        current = code_of(account)
+        key: tuple = ()
+        cyclic = False
+        while True:
+            if current in keys:
+                key = keys[current]
+                break
+            if current not in account_dict:
+                break
+            if current in visited:
+                cyclic = True
+                break
+            visited.add(current)
+            chain.append(current)
+            parent = parent_of(account_dict[current])
+            if not parent:
+                break
+            current = parent
+        for code in reversed(chain):
+            key = key + (digits(code),)
+            if not cyclic:
+                keys[code] = key
+        return key
+
+    return sorted(accounts, key=sort_key)
+
 
 class LedgerService:
     """Servicio para manejar el mayor general y mayorización de asientos"""
@@ -12,121 +79,86 @@ class LedgerService:
     @staticmethod
     async def post_journal_entry(journal_entry: JournalEntry, company_id: str, created_by: str) -> bool:
         """
-        Mayorizar un asiento contable (aplicar las transacciones a las cuentas)
+        Mayorizar un asiento contable (aplicar las transacciones a las cuentas).
+        Filas del mayor, saldos de cuentas y estado del asiento se escriben en una
+        sola transacción: o se aplican todos o ninguno.
         """
         try:
-            print(f"🔍 Iniciando post_journal_entry para asiento: {journal_entry.entry_number}")
-            print(f"📋 Estado del asiento: {journal_entry.status}")
-            print(f"🏢 Company ID: {company_id}")
-            print(f"👤 Created by: {created_by}")
+            logger.debug("🔍 Iniciando post_journal_entry para asiento: %s", journal_entry.entry_number)
+            logger.debug("📋 Estado del asiento: %s", journal_entry.status)
+            logger.debug("🏢 Company ID: %s", company_id)
+            logger.debug("👤 Created by: %s", created_by)
             
             # Verificar que el asiento esté en estado DRAFT
             if journal_entry.status != "draft":
-                print(f"❌ Asiento no está en estado DRAFT: {journal_entry.status}")
+                logger.warning("❌ Asiento no está en estado DRAFT: %s", journal_entry.status)
                 raise ValueError("Solo se pueden mayorizar asientos en estado DRAFT")
             
-            print(f"✅ Asiento en estado DRAFT, continuando...")
+            logger.debug("✅ Asiento en estado DRAFT, continuando...")
             
-            # Verificar si ya existen entradas del ledger para este asiento
-            existing_entries = await LedgerEntry.find(
-                LedgerEntry.journal_entry_id == str(journal_entry.id)
-            ).to_list()
-            
-            print(f"🔍 Entradas existentes encontradas: {len(existing_entries)}")
-            
-            if existing_entries:
-                print(f"🔄 Actualizando entradas existentes...")
-                # Si ya existen entradas, actualizarlas en lugar de crear nuevas
-                return await LedgerService._update_existing_ledger_entries(journal_entry, company_id, created_by)
-            
-            # Procesar cada línea del asiento
-            print(f"📋 Procesando {len(journal_entry.lines)} líneas del asiento...")
-            affected_account_ids = set()
-            
-            for i, line in enumerate(journal_entry.lines):
-                print(f"🔍 Procesando línea {i+1}: {line.account_code} - {line.account_name}")
-                print(f"   💰 Débito: {line.debit}, Crédito: {line.credit}")
-                
-                # Buscar la cuenta
-                account = await Account.find_one(
-                    Account.code == line.account_code,
-                    Account.company_id == company_id
-                )
-                
-                if not account:
-                    print(f"❌ Cuenta no encontrada: {line.account_code}")
-                    raise ValueError(f"Cuenta {line.account_code} no encontrada")
-                
-                print(f"✅ Cuenta encontrada: {account.code} - {account.name}")
-                
-                # Crear entrada en el mayor
-                print(f"📝 Creando entrada en el mayor...")
-                ledger_entry = LedgerEntry(
-                    account_id=str(account.id),
-                    account_code=line.account_code,
-                    account_name=line.account_name,
-                    company_id=company_id,
-                    entry_type=LedgerEntryType.JOURNAL,
-                    journal_entry_id=str(journal_entry.id),
-                    date=journal_entry.date,
-                    description=line.description,
-                    reference=line.reference or journal_entry.entry_number,
-                    debit_amount=line.debit,
-                    credit_amount=line.credit,
-                    created_by=created_by
-                )
-                
-                print(f"✅ Entrada del mayor creada en memoria")
-                
-                # Calcular saldos acumulados
-                print(f"🧮 Calculando saldos acumulados...")
-                await LedgerService._calculate_running_balances(ledger_entry, account)
-                
-                # Guardar entrada en el mayor
-                print(f"💾 Guardando entrada en la base de datos...")
-                await ledger_entry.insert()
-                print(f"✅ Entrada guardada exitosamente")
-                
-                # Actualizar saldos de la cuenta
-                print(f"🔄 Actualizando saldos de la cuenta...")
-                await LedgerService._update_account_balances(account, line.debit, line.credit)
-                affected_account_ids.add(str(account.id))
-                print(f"✅ Línea {i+1} procesada exitosamente")
+            updated_at, revision = await LedgerService._run_and_invalidate(
+                company_id,
+                lambda session: LedgerService._post_entry(journal_entry, company_id, created_by, session)
+            )
             
-            # Recalcular saldos acumulados para todas las cuentas afectadas
-            for account_id in affected_account_ids:
-                try:
-                    acc = await Account.get(ObjectId(account_id))
-                except Exception:
-                    acc = await Account.find_one(Account.id == account_id)
-                if acc:
-                    await LedgerService._recalculate_running_balances(acc, company_id)
-
-            # Calcular automáticamente saldos de cuentas padre
-            print(f"🚀 EJECUTANDO cálculo automático de saldos padre post-mayorización...")
-            await LedgerService._recalculate_parent_account_balances(affected_account_ids, company_id)
-            print(f"🏁 FINALIZADO cálculo automático de saldos padre post-mayorización")
-
-            # Marcar el asiento como POSTED
-            print(f"📝 Marcando asiento como POSTED...")
+            # Reflejar en memoria el estado ya confirmado en la base
             journal_entry.status = "posted"
-            journal_entry.updated_at = datetime.now()
-            await journal_entry.save()
-            print(f"✅ Asiento marcado como POSTED exitosamente")
+            journal_entry.updated_at = updated_at
+            journal_entry.revision = revision
+            logger.debug("✅ Asiento marcado como POSTED exitosamente")
             
-            print(f"🎉 Mayorización completada exitosamente para asiento: {journal_entry.entry_number}")
+            logger.info("🎉 Mayorización completada exitosamente para asiento: %s", journal_entry.entry_number)
             return True
             
+        except ConcurrencyConflictError:
+            logger.warning("⚠️ Conflicto de concurrencia al mayorizar asiento: %s", journal_entry.entry_number)
+            raise
+        except PeriodLockedError as e:
+            logger.warning("🔒 %s (asiento %s)", e, journal_entry.entry_number)
+            raise
         except Exception as e:
-            print(f"❌ Error al mayorizar asiento: {e}")
-            import traceback
-            print(f"📋 Traceback completo: {traceback.format_exc()}")
+            logger.exception("❌ Error al mayorizar asiento: %s", e)
             return False
     
+    @staticmethod
+    async def _post_entry(journal_entry: JournalEntry, company_id: str, created_by: str, session=None) -> Tuple[datetime, int]:
+        """
+        Cuerpo transaccional de la mayorización. Es re-ejecutable: no modifica el
+        asiento en memoria y devuelve la fecha de actualización y la nueva revisión.
+        """
+        # Reclamar el asiento (DRAFT -> POSTED) antes de escribir: otra mayorización
+        # concurrente del mismo asiento falla con ConcurrencyConflictError
+        logger.debug("📝 Marcando asiento como POSTED...")
+        await period_locks.confirm(company_id, journal_entry.date, session)
+        result = await LedgerService._transition_entry(journal_entry, "draft", "posted", session)
+        await LedgerService._lock_accounts(company_id, journal_entry, session)
+
+        # Verificar si ya existen entradas del ledger para este asiento
+        existing_entry = await LedgerEntry.find_one(
+            LedgerEntry.journal_entry_id == str(journal_entry.id),
+            session=session
+        )
+        
+        if existing_entry:
+            logger.debug("🔄 Actualizando entradas existentes...")
+            # Si ya existen entradas, reemplazarlas aplicando solo la diferencia neta
+            await LedgerService._repost_entry(journal_entry, company_id, created_by, session)
+        else:
+            # Insertar filas del mayor (saldos acumulados a partir de la fila previa de cada cuenta)
+            logger.debug("📋 Procesando %s líneas del asiento...", len(journal_entry.lines))
+            deltas = await LedgerService._insert_entry_ledger_rows(journal_entry, company_id, created_by, session)
+
+            # Aplicar saldos a las cuentas y a sus cuentas padre con deltas $inc
+            logger.debug("🚀 Aplicando saldos a %s cuentas y sus cuentas padre...", len(deltas))
+            await LedgerService._apply_balance_deltas(company_id, deltas, session)
+
+        return result
+    
     @staticmethod
     async def reverse_journal_entry(journal_entry: JournalEntry, company_id: str, created_by: str) -> bool:
         """
-        Revertir un asiento contable (crear asiento de reversión)
+        Revertir un asiento contable (crear asiento de reversión).
+        La creación y la mayorización del asiento de reversión son atómicas.
         """
         try:
             # Crear asiento de reversión
@@ -140,7 +172,9 @@ class LedgerService:
                 total_debit=journal_entry.total_credit,  # Invertir totales
                 total_credit=journal_entry.total_debit,
                 company_id=company_id,
-                created_by=created_by
+                created_by=created_by,
+                created_at=datetime.now(),
+                updated_at=datetime.now()
             )
             
             # Crear líneas de reversión (invertir débitos y créditos)
@@ -155,142 +189,72 @@ class LedgerService:
                 )
                 reversal_entry.lines.append(reversal_line)
             
-            await reversal_entry.insert()
-            
-            # Mayorizar el asiento de reversión
-            return await LedgerService.post_journal_entry(reversal_entry, company_id, created_by)
+            async def _reverse(session):
+                # Incrementar la revisión del original: dos reversiones concurrentes
+                # (o una reversión y una desmayorización) no pueden confirmarse ambas
+                original = await LedgerService._transition_entry(journal_entry, "posted", "posted", session)
+                await reversal_entry.insert(session=session)
+                await record_entry_number(company_id, reversal_entry.entry_number, session)
+                return original, await LedgerService._post_entry(reversal_entry, company_id, created_by, session)
+            
+            # Insertar y mayorizar el asiento de reversión
+            (_, original_revision), (updated_at, revision) = await LedgerService._run_and_invalidate(company_id, _reverse)
+            journal_entry.revision = original_revision
+            reversal_entry.status = "posted"
+            reversal_entry.updated_at = updated_at
+            reversal_entry.revision = revision
+            return True
             
+        except (ConcurrencyConflictError, PeriodLockedError):
+            raise
         except Exception as e:
-            print(f"Error al revertir asiento: {e}")
+            logger.error("Error al revertir asiento: %s", e)
             return False
     
-    @staticmethod
-    async def _calculate_running_balances(ledger_entry: LedgerEntry, account: Account):
-        """
-        Calcular saldos acumulados para una entrada del mayor
-        """
-        # Obtener la última entrada del mayor para esta cuenta
-        last_entry = await LedgerEntry.find_one(
-            LedgerEntry.account_id == str(account.id),
-            sort=[("date", -1), ("created_at", -1)]
-        )
-        
-        if last_entry:
-            # Continuar desde el último saldo
-            ledger_entry.running_debit_balance = last_entry.running_debit_balance + ledger_entry.debit_amount
-            ledger_entry.running_credit_balance = last_entry.running_credit_balance + ledger_entry.credit_amount
-        else:
-            # Primera entrada, usar saldos iniciales
-            ledger_entry.running_debit_balance = account.initial_debit_balance + ledger_entry.debit_amount
-            ledger_entry.running_credit_balance = account.initial_credit_balance + ledger_entry.credit_amount
-    
-    @staticmethod
-    async def _update_account_balances(account: Account, debit: float, credit: float):
-        """
-        Actualizar saldos actuales de una cuenta
-        """
-        account.current_debit_balance += debit
-        account.current_credit_balance += credit
-        account.last_transaction_date = datetime.now()
-        account.updated_at = datetime.now()
-        await account.save()
-    
     @staticmethod
     async def _update_existing_ledger_entries(journal_entry: JournalEntry, company_id: str, created_by: str) -> bool:
         """
-        Actualizar entradas existentes del ledger para un asiento
+        Actualizar entradas existentes del ledger para un asiento.
+        Se aplica como una sola operación delta: se eliminan las filas anteriores,
+        se insertan las nuevas y solo se ajusta la diferencia neta en las cuentas.
         """
         try:
-            # Obtener entradas existentes
-            existing_entries = await LedgerEntry.find(
-                LedgerEntry.journal_entry_id == str(journal_entry.id)
-            ).to_list()
-            
-            # Eliminar entradas existentes y revertir saldos de cuentas
-            for entry in existing_entries:
-                # Revertir saldos de la cuenta
-                try:
-                    account = await Account.get(ObjectId(entry.account_id))
-                except:
-                    # Si falla con ObjectId, intentar con string
-                    account = await Account.find_one(Account.id == entry.account_id)
-                
-                if account:
-                    account.current_debit_balance -= entry.debit_amount
-                    account.current_credit_balance -= entry.credit_amount
-                    await account.save()
-                
-                # Eliminar entrada del ledger
-                await entry.delete()
-            
-            # Recalcular saldos acumulados para todas las cuentas afectadas
-            affected_account_ids = set()
-            for line in journal_entry.lines:
-                account = await Account.find_one(
-                    Account.code == line.account_code,
-                    Account.company_id == company_id
-                )
-                if account:
-                    affected_account_ids.add(str(account.id))
-            
-            # Recalcular saldos acumulados para cada cuenta afectada
-            for account_id in affected_account_ids:
-                try:
-                    account = await Account.get(ObjectId(account_id))
-                except:
-                    account = await Account.find_one(Account.id == account_id)
-                
-                if account:
-                    await LedgerService._recalculate_running_balances(account, company_id)
+            async def _update(session):
+                current_status = getattr(journal_entry.status, "value", journal_entry.status)
+                await period_locks.confirm(company_id, journal_entry.date, session)
+                result = await LedgerService._transition_entry(journal_entry, current_status, "posted", session)
+                await LedgerService._lock_accounts(company_id, journal_entry, session)
+                await LedgerService._repost_entry(journal_entry, company_id, created_by, session)
+                return result
+
+            updated_at, revision = await LedgerService._run_and_invalidate(company_id, _update)
 
-            # Recalcular saldos de cuentas padre
-            await LedgerService._recalculate_parent_account_balances(affected_account_ids, company_id)
-            
-            # Crear nuevas entradas con los datos actualizados
-            for line in journal_entry.lines:
-                account = await Account.find_one(
-                    Account.code == line.account_code,
-                    Account.company_id == company_id
-                )
-                
-                if not account:
-                    raise ValueError(f"Cuenta {line.account_code} no encontrada")
-                
-                # Crear nueva entrada en el mayor
-                ledger_entry = LedgerEntry(
-                    account_id=str(account.id),
-                    account_code=line.account_code,
-                    account_name=line.account_name,
-                    company_id=company_id,
-                    entry_type=LedgerEntryType.JOURNAL,
-                    journal_entry_id=str(journal_entry.id),
-                    date=journal_entry.date,
-                    description=line.description,
-                    reference=line.reference or journal_entry.entry_number,
-                    debit_amount=line.debit,
-                    credit_amount=line.credit,
-                    created_by=created_by
-                )
-                
-                # Calcular saldos acumulados
-                await LedgerService._calculate_running_balances(ledger_entry, account)
-                
-                # Guardar entrada en el mayor
-                await ledger_entry.insert()
-                
-                # Actualizar saldos de la cuenta
-                await LedgerService._update_account_balances(account, line.debit, line.credit)
-            
             # Marcar el asiento como POSTED
             journal_entry.status = "posted"
-            journal_entry.updated_at = datetime.now()
-            await journal_entry.save()
+            journal_entry.updated_at = updated_at
+            journal_entry.revision = revision
             
             return True
             
+        except (ConcurrencyConflictError, PeriodLockedError):
+            raise
         except Exception as e:
-            print(f"Error al actualizar entradas del ledger: {e}")
+            logger.error("Error al actualizar entradas del ledger: %s", e)
             return False
+
+    @staticmethod
+    async def _repost_entry(journal_entry: JournalEntry, company_id: str, created_by: str, session=None):
+        """Reemplazar las filas del mayor de un asiento y aplicar la diferencia neta de saldos"""
+        removed = await LedgerService._remove_entry_ledger_rows(journal_entry, company_id, session)
+        added = await LedgerService._insert_entry_ledger_rows(journal_entry, company_id, created_by, session)
+
+        deltas: Dict[str, List[Decimal]] = {}
+        for source in (removed, added):
+            for code, (debit, credit) in source.items():
+                total = deltas.setdefault(code, [ZERO, ZERO])
+                total[0] += debit
+                total[1] += credit
+        await LedgerService._apply_balance_deltas(company_id, deltas, session)
     
     @staticmethod
     async def unpost_journal_entry(journal_entry: JournalEntry, company_id: str, created_by: str) -> bool:
@@ -302,79 +266,297 @@ class LedgerService:
             if journal_entry.status != "posted":
                 raise ValueError("Solo se pueden desmayorizar asientos mayorizados")
             
-            # Obtener entradas del ledger para este asiento
-            ledger_entries = await LedgerEntry.find(
-                LedgerEntry.journal_entry_id == str(journal_entry.id)
-            ).to_list()
+            async def _unpost(session):
+                await period_locks.confirm(company_id, journal_entry.date, session)
+                result = await LedgerService._transition_entry(journal_entry, "posted", "draft", session)
+                await LedgerService._lock_accounts(company_id, journal_entry, session)
+                # Eliminar filas del mayor en bloque y revertir saldos con deltas negativos
+                deltas = await LedgerService._remove_entry_ledger_rows(journal_entry, company_id, session)
+                await LedgerService._apply_balance_deltas(company_id, deltas, session)
+                return result
             
-            # Revertir saldos de cuentas y eliminar entradas del ledger
-            affected_account_ids = set()
-            for entry in ledger_entries:
-                # Revertir saldos de la cuenta
-                try:
-                    account = await Account.get(ObjectId(entry.account_id))
-                except:
-                    # Si falla con ObjectId, intentar con string
-                    account = await Account.find_one(Account.id == entry.account_id)
-                
-                if account:
-                    account.current_debit_balance -= entry.debit_amount
-                    account.current_credit_balance -= entry.credit_amount
-                    account.last_transaction_date = datetime.now()
-                    account.updated_at = datetime.now()
-                    await account.save()
-                    affected_account_ids.add(str(account.id))
-                
-                # Eliminar entrada del ledger
-                await entry.delete()
-            
-            # Recalcular saldos acumulados para todas las cuentas afectadas
-            for account_id in affected_account_ids:
-                try:
-                    account = await Account.get(ObjectId(account_id))
-                except:
-                    account = await Account.find_one(Account.id == account_id)
-                
-                if account:
-                    await LedgerService._recalculate_running_balances(account, company_id)
-
-            # Recalcular saldos de cuentas padre después de desmayorizar
-            await LedgerService._recalculate_parent_account_balances(affected_account_ids, company_id)
+            updated_at, revision = await LedgerService._run_and_invalidate(company_id, _unpost)
             
             # Cambiar estado del asiento a DRAFT
             journal_entry.status = "draft"
-            journal_entry.updated_at = datetime.now()
-            await journal_entry.save()
+            journal_entry.updated_at = updated_at
+            journal_entry.revision = revision
             
             return True
             
+        except ConcurrencyConflictError:
+            logger.warning("⚠️ Conflicto de concurrencia al desmayorizar asiento: %s", journal_entry.entry_number)
+            raise
+        except PeriodLockedError as e:
+            logger.warning("🔒 %s (asiento %s)", e, journal_entry.entry_number)
+            raise
         except Exception as e:
-            print(f"Error al desmayorizar asiento: {e}")
+            logger.error("Error al desmayorizar asiento: %s", e)
             return False
-    
+
     @staticmethod
-    async def _recalculate_running_balances(account: Account, company_id: str):
+    async def _run_and_invalidate(company_id: str, operation):
         """
-        Recalcular saldos acumulados para una cuenta después de eliminar entradas
+        Ejecutar una operación transaccional sobre saldos e invalidar después el
+        plan en caché de la empresa (también si falla: sin transacciones pudo
+        quedar escrita en parte). Invalidar antes del commit permitiría recargar
+        la instantánea con los saldos anteriores.
+
+        La versión de datos de la empresa se incrementa dentro de la misma
+        transacción; si la operación falla se incrementa igual, fuera de ella.
         """
-        # Obtener todas las entradas del ledger para esta cuenta ordenadas por fecha
-        ledger_entries = await LedgerEntry.find(
-            LedgerEntry.account_id == str(account.id),
-            LedgerEntry.company_id == company_id
-        ).sort([("date", 1), ("created_at", 1)]).to_list()
-        
-        # Recalcular saldos acumulados
-        running_debit = account.initial_debit_balance
-        running_credit = account.initial_credit_balance
-        
-        for entry in ledger_entries:
-            running_debit += entry.debit_amount
-            running_credit += entry.credit_amount
-            
-            # Actualizar la entrada con los nuevos saldos acumulados
-            entry.running_debit_balance = running_debit
-            entry.running_credit_balance = running_credit
-            await entry.save()
+        async def _versioned(session):
+            result = await operation(session)
+            await data_versions.bump(company_id, session)
+            return result
+
+        try:
+            return await run_in_transaction(_versioned)
+        except Exception:
+            try:
+                await data_versions.bump(company_id)
+            except Exception as bump_error:
+                logger.warning("⚠️ No se pudo incrementar la versión de datos de %s: %s", company_id, bump_error)
+            raise
+        finally:
+            chart_cache.invalidate(company_id)
+
+    @staticmethod
+    async def _transition_entry(journal_entry: JournalEntry, from_status: str, to_status: str, session=None) -> Tuple[datetime, int]:
+        """
+        Cambiar el estado del asiento con compare-and-swap sobre (revisión, estado).
+        Devuelve la fecha de actualización y la nueva revisión.
+        """
+        now = datetime.now()
+        revision = await compare_and_set(
+            JournalEntry,
+            journal_entry.id,
+            journal_entry.revision,
+            {"status": to_status, "updated_at": now},
+            expected={"status": from_status},
+            session=session
+        )
+        return now, revision
+
+    @staticmethod
+    async def _lock_accounts(company_id: str, journal_entry: JournalEntry, session=None):
+        """
+        Escribir primero sobre las cuentas del asiento dentro de la transacción.
+        Dos transacciones que tocan la misma cuenta chocan aquí (WriteConflict, que
+        with_transaction reintenta) antes de leer saldos acumulados, de modo que
+        las mayorizaciones concurrentes sobre una cuenta quedan serializadas.
+        """
+        if session is None:
+            return
+        codes = list({line.account_code for line in journal_entry.lines})
+        await Account.get_motor_collection().update_many(
+            {"company_id": company_id, "code": {"$in": codes}},
+            {"$set": {"updated_at": datetime.now()}},
+            session=session
+        )
+
+    @staticmethod
+    async def _remove_entry_ledger_rows(journal_entry: JournalEntry, company_id: str, session=None) -> Dict[str, List[Decimal]]:
+        """
+        Eliminar en bloque las filas del mayor de un asiento.
+        Desplaza los saldos acumulados posteriores de cada cuenta y devuelve
+        los deltas negativos por código de cuenta: {código: [débito, crédito]}.
+        """
+        collection = LedgerEntry.get_motor_collection()
+        entry_filter = {"journal_entry_id": str(journal_entry.id)}
+        rows = await collection.find(
+            entry_filter,
+            {"account_id": 1, "account_code": 1, "date": 1, "created_at": 1, "debit_amount": 1, "credit_amount": 1},
+            session=session
+        ).to_list(length=None)
+        if not rows:
+            return {}
+
+        await collection.delete_many(entry_filter, session=session)
+
+        deltas: Dict[str, List[Decimal]] = {}
+        shifts = []
+        for row in rows:
+            debit = to_decimal(row.get("debit_amount"))
+            credit = to_decimal(row.get("credit_amount"))
+            total = deltas.setdefault(row["account_code"], [ZERO, ZERO])
+            total[0] -= debit
+            total[1] -= credit
+            if debit or credit:
+                shifts.append(UpdateMany(
+                    LedgerService._later_rows_filter(row["account_id"], company_id, row["date"], row.get("created_at"), row["_id"]),
+                    {"$inc": {"running_debit_balance": to_decimal128(-debit), "running_credit_balance": to_decimal128(-credit)}}
+                ))
+
+        if shifts:
+            await collection.bulk_write(shifts, ordered=False, session=session)
+        return deltas
+
+    @staticmethod
+    async def _insert_entry_ledger_rows(journal_entry: JournalEntry, company_id: str, created_by: str, session=None) -> Dict[str, List[Decimal]]:
+        """
+        Insertar las filas del mayor de un asiento calculando su saldo acumulado a partir
+        de la fila anterior de cada cuenta y desplazando solo las filas posteriores.
+        Todo en bloque: una agregación para los saldos previos, un insert_many y un
+        bulk_write de desplazamientos, sin importar la cantidad de líneas (asientos
+        de cierre con cientos de cuentas).
+        Devuelve los deltas positivos por código de cuenta: {código: [débito, crédito]}.
+        """
+        codes = list({line.account_code for line in journal_entry.lines})
+        accounts = await Account.find({"company_id": company_id, "code": {"$in": codes}}, session=session).to_list()
+        accounts_by_code = {acc.code: acc for acc in accounts}
+        for code in codes:
+            if code not in accounts_by_code:
+                raise ValueError(f"Cuenta {code} no encontrada")
+
+        collection = LedgerEntry.get_motor_collection()
+        account_ids = [str(accounts_by_code[code].id) for code in codes]
+        # Las nuevas filas quedan al final de su fecha: parten del saldo de la última fila previa
+        previous_rows = await collection.aggregate([
+            {"$match": {"company_id": company_id, "account_id": {"$in": account_ids}, "date": {"$lte": journal_entry.date}}},
+            {"$sort": {"account_id": 1, "date": -1, "created_at": -1, "_id": -1}},
+            {"$group": {
+                "_id": "$account_id",
+                "running_debit_balance": {"$first": "$running_debit_balance"},
+                "running_credit_balance": {"$first": "$running_credit_balance"}
+            }}
+        ], session=session).to_list(length=None)
+        running = {
+            row["_id"]: [to_decimal(row.get("running_debit_balance")), to_decimal(row.get("running_credit_balance"))]
+            for row in previous_rows
+        }
+
+        ledger_type = LedgerEntryType.CLOSING if journal_entry.entry_type == "closing" else LedgerEntryType.JOURNAL
+        now = datetime.now()
+        rows: List[LedgerEntry] = []
+        deltas: Dict[str, List[Decimal]] = {}
+        for line in journal_entry.lines:
+            account = accounts_by_code[line.account_code]
+            account_id = str(account.id)
+            # Varias líneas sobre la misma cuenta se encadenan en el orden del asiento
+            balance = running.setdefault(account_id, [account.initial_debit_balance, account.initial_credit_balance])
+            balance[0] += line.debit
+            balance[1] += line.credit
+            rows.append(LedgerEntry(
+                id=ObjectId(),
+                account_id=account_id,
+                account_code=line.account_code,
+                account_name=line.account_name,
+                company_id=company_id,
+                entry_type=ledger_type,
+                journal_entry_id=str(journal_entry.id),
+                date=journal_entry.date,
+                description=line.description,
+                reference=line.reference or journal_entry.entry_number,
+                debit_amount=line.debit,
+                credit_amount=line.credit,
+                running_debit_balance=balance[0],
+                running_credit_balance=balance[1],
+                created_at=now,
+                created_by=created_by
+            ))
+
+            total = deltas.setdefault(line.account_code, [ZERO, ZERO])
+            total[0] += line.debit
+            total[1] += line.credit
+
+        if rows:
+            await LedgerEntry.insert_many(rows, session=session)
+
+        # Desplazar los saldos acumulados de las filas con fecha posterior, una vez por cuenta
+        shifts = [
+            UpdateMany(
+                {"account_id": str(accounts_by_code[code].id), "company_id": company_id, "date": {"$gt": journal_entry.date}},
+                {"$inc": {"running_debit_balance": to_decimal128(debit), "running_credit_balance": to_decimal128(credit)}}
+            )
+            for code, (debit, credit) in deltas.items()
+            if debit or credit
+        ]
+        if shifts:
+            await collection.bulk_write(shifts, ordered=False, session=session)
+        return deltas
+
+    @staticmethod
+    def _later_rows_filter(account_id: str, company_id: str, date: datetime, created_at: Optional[datetime], row_id) -> dict:
+        """Filtro de filas del mayor posteriores a una fila dada, en el orden (date, created_at, _id)"""
+        return {
+            "account_id": account_id,
+            "company_id": company_id,
+            "$or": [
+                {"date": {"$gt": date}},
+                {"date": date, "created_at": {"$gt": created_at}},
+                {"date": date, "created_at": created_at, "_id": {"$gt": row_id}},
+            ]
+        }
+
+    @staticmethod
+    async def _apply_balance_deltas(company_id: str, deltas: Dict[str, List[Decimal]], session=None):
+        """
+        Aplicar deltas {código: [débito, crédito]} a las cuentas y a todos sus ancestros
+        con actualizaciones $inc en bloque, sin recalcular la jerarquía completa.
+        """
+        if not any(debit or credit for debit, credit in deltas.values()):
+            return
+
+        collection = Account.get_motor_collection()
+        parent_by_code = {
+            doc["code"]: doc.get("parent_code")
+            async for doc in collection.find(
+                {"company_id": company_id, "is_active": True},
+                {"code": 1, "parent_code": 1},
+                session=session
+            )
+            if doc.get("code")
+        }
+
+        totals: Dict[str, List[Decimal]] = {}
+        for code, (debit, credit) in deltas.items():
+            for target in [code] + LedgerService._ancestor_codes(code, parent_by_code):
+                total = totals.setdefault(target, [ZERO, ZERO])
+                total[0] += debit
+                total[1] += credit
+
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"company_id": company_id, "code": code},
+                {
+                    "$inc": {
+                        "current_debit_balance": to_decimal128(debit),
+                        "current_credit_balance": to_decimal128(credit),
+                        "revision": 1
+                    },
+                    "$set": {"last_transaction_date": now, "updated_at": now}
+                }
+            )
+            for code, (debit, credit) in totals.items()
+            if debit or credit
+        ]
+        if operations:
+            await collection.bulk_write(operations, ordered=False, session=session)
+
+    @staticmethod
+    def _ancestor_codes(code: str, parent_by_code: Dict[str, Optional[str]]) -> List[str]:
+        """
+        Ancestros de una cuenta, del padre inmediato a la raíz.
+        Usa parent_code y, si no existe en el plan, el patrón de códigos (+2 dígitos por nivel)
+        igual que _fix_complete_hierarchy_internal.
+        """
+        ancestors = []
+        visited = {code}
+        current = code
+        while True:
+            parent = parent_by_code.get(current)
+            if not parent or parent not in parent_by_code:
+                parent = current[:-2] if len(current) > 2 else None
+                if parent not in parent_by_code:
+                    parent = None
+            if not parent or parent in visited:
+                break
+            ancestors.append(parent)
+            visited.add(parent)
+            current = parent
+        return ancestors
     
     @staticmethod
     async def get_account_ledger(account_id: str, company_id: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> AccountLedgerSummary:
@@ -399,13 +581,7 @@ class LedgerService:
         if not account:
             raise ValueError("Cuenta no encontrada")
         
-        # Obtener entradas del mayor usando motor para evitar issues de tipos
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from app.config import settings
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        database = client[settings.database_name]
-        collection = database.ledger_entries
-
+        # Obtener entradas del mayor como documentos crudos (con los años archivados si el rango los alcanza)
         query = {
             "account_id": str(account.id),
             "company_id": company_id
@@ -420,13 +596,13 @@ class LedgerService:
             else:
                 query["date"] = {"$lt": inclusive_end}
 
-        cursor = collection.find(query).sort("date", 1)
-        raw_entries = await cursor.to_list(1000)
-        client.close()
+        raw_entries = await ledger_archives.aggregate_ledger(
+            company_id, query, [{"$sort": {"date": 1, "created_at": 1, "_id": 1}}, {"$limit": 1000}]
+        )
         
         # Calcular totales
-        total_debits = sum(e.get("debit_amount", 0) for e in raw_entries)
-        total_credits = sum(e.get("credit_amount", 0) for e in raw_entries)
+        total_debits = sum((to_decimal(e.get("debit_amount")) for e in raw_entries), ZERO)
+        total_credits = sum((to_decimal(e.get("credit_amount")) for e in raw_entries), ZERO)
         
         # Calcular saldo neto
         net_balance = account.current_debit_balance - account.current_credit_balance
@@ -480,7 +656,7 @@ class LedgerService:
         """
         Obtener el mayor general de todas las cuentas
         """
-        print(f"🔍 Buscando cuentas para empresa: {company_id}")
+        logger.debug("🔍 Buscando cuentas para empresa: %s", company_id)
 
         # Construir query para cuentas
         account_query = {
@@ -513,71 +689,33 @@ class LedgerService:
         accounts = await Account.find(account_query).to_list()
 
         # Ordenar jerárquicamente igual que en Plan de Cuentas
-        def _sort_accounts_hierarchically(accounts_list):
-            if not accounts_list:
-                return []
-            account_dict = {acc.code: acc for acc in accounts_list}
+        accounts = sort_accounts_hierarchically(accounts)
 
-            def get_hierarchical_path(account):
-                if not getattr(account, "parent_code", None):
-                    return [account.code]
-                path = []
-                current_code = account.code
-                # Recorrer hacia la raíz usando parent_code conocido cuando esté disponible
-                visited = set()
-                while current_code in account_dict and current_code not in visited:
-                    visited.add(current_code)
-                    current_account = account_dict[current_code]
-                    path.insert(0, current_code)
-                    if not getattr(current_account, "parent_code", None):
-                        break
-                    current_code = current_account.parent_code
-                return path
+        logger.debug("📊 Cuentas encontradas: %s", len(accounts))
+        # Diagnóstico detallado solo con DEBUG: evita recorrer y formatear el plan en cada consulta
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("📋 Códigos de cuentas encontradas: %s", [acc.code for acc in accounts])
+            
+            # Verificar específicamente las cuentas problemáticas
+            target_codes = ["101010202", "101010203"]  # Pichincha y Guayaquil
+            for code in target_codes:
+                found = any(acc.code == code for acc in accounts)
+                logger.debug("🔍 Cuenta %s encontrada: %s", code, found)
+                if found:
+                    acc = next(acc for acc in accounts if acc.code == code)
+                    logger.debug("   - Nombre: %s", acc.name)
+                    logger.debug("   - Activa: %s", acc.is_active)
+                    logger.debug("   - Saldo inicial D: %s", acc.initial_debit_balance)
+                    logger.debug("   - Saldo inicial C: %s", acc.initial_credit_balance)
 
-            def sort_key(account):
-                hierarchical_path = get_hierarchical_path(account)
-                path_numbers = []
-                for code in hierarchical_path:
-                    nums = []
-                    for ch in code:
-                        if ch.isdigit():
-                            nums.append(int(ch))
-                    path_numbers.append(tuple(nums))
-                return path_numbers
-
-            return sorted(accounts_list, key=sort_key)
-
-        accounts = _sort_accounts_hierarchically(accounts)
-
-        print(f"📊 Cuentas encontradas: {len(accounts)}")
-        print(f"📋 Códigos de cuentas encontradas: {[acc.code for acc in accounts]}")
-        
-        # Verificar específicamente las cuentas problemáticas
-        target_codes = ["101010202", "101010203"]  # Pichincha y Guayaquil
-        for code in target_codes:
-            found = any(acc.code == code for acc in accounts)
-            print(f"🔍 Cuenta {code} encontrada: {found}")
-            if found:
-                acc = next(acc for acc in accounts if acc.code == code)
-                print(f"   - Nombre: {acc.name}")
-                print(f"   - Activa: {acc.is_active}")
-                print(f"   - Saldo inicial D: {acc.initial_debit_balance}")
-                print(f"   - Saldo inicial C: {acc.initial_credit_balance}")
-
-        # Obtener todas las entradas del ledger para la empresa
-        from motor.motor_asyncio import AsyncIOMotorClient
-        from app.config import settings
-        
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        database = client[settings.database_name]
-        collection = database.ledger_entries
-        
-        # Construir query para MongoDB
-        query = {"company_id": company_id}
+        # Movimientos por cuenta en una sola agregación, con los años archivados si el
+        # rango los alcanza. Las filas de apertura de un archivo (archive_id) son saldo
+        # traído, no movimientos: no suman a los totales ni a la cantidad.
+        query = {"company_id": company_id, "archive_id": None}
         if start_date:
             query["date"] = {"$gte": start_date}
         if end_date:
-            from datetime import timedelta
             inclusive_end = end_date + timedelta(days=1)
             if "date" in query:
                 query["date"]["$lt"] = inclusive_end
@@ -595,21 +733,24 @@ class LedgerService:
             if search_filters.get('entry_number'):
                 query["entry_number"] = {"$regex": search_filters['entry_number'], "$options": "i"}
         
-        # Obtener todas las entradas del ledger
-        ledger_entries = await collection.find(query).sort("date", 1).to_list(1000)
-        print(f"📊 Entradas del ledger encontradas: {len(ledger_entries)}")
-        
-        # Agrupar entradas por account_id
-        entries_by_account = {}
-        for entry in ledger_entries:
-            account_id = entry["account_id"]
-            if account_id not in entries_by_account:
-                entries_by_account[account_id] = []
-            entries_by_account[account_id].append(entry)
+        group = {"$group": {
+            "_id": "$account_id",
+            "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+            "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}},
+            "count": {"$sum": 1}
+        }}
+        # Sin fecha inicial el rango abarca toda la historia, también la archivada
+        bounds = () if start_date else (datetime.min,)
+        rows = await ledger_archives.aggregate_ledger(company_id, query, [group], bounds)
+        movements = {
+            row["_id"]: (to_decimal(row.get("sum_debit")), to_decimal(row.get("sum_credit")), row["count"])
+            for row in rows
+        }
+        logger.debug("📊 Cuentas con movimientos en el mayor: %s", len(movements))
         
         # Si no hay entradas del ledger, buscar en asientos aprobados
-        if not ledger_entries:
-            print("🔄 No hay entradas del ledger, buscando en asientos aprobados...")
+        if not movements:
+            logger.debug("🔄 No hay entradas del ledger, buscando en asientos aprobados...")
             from app.models.journal import JournalEntry
             
             # Obtener asientos aprobados
@@ -618,49 +759,28 @@ class LedgerService:
                 JournalEntry.status == "posted"
             ).to_list()
             
-            print(f"📊 Asientos aprobados encontrados: {len(journal_entries)}")
+            logger.debug("📊 Asientos aprobados encontrados: %s", len(journal_entries))
             
-            # Procesar líneas de asientos aprobados
+            # Sumar las líneas de asientos aprobados por cuenta
+            accounts_by_code = {acc.code: acc for acc in accounts}
             for journal_entry in journal_entries:
                 for line in journal_entry.lines:
-                    # Buscar cuenta por código
-                    account = next((acc for acc in accounts if acc.code == line.account_code), None)
+                    account = accounts_by_code.get(line.account_code)
                     if account:
                         account_id = str(account.id)
-                        if account_id not in entries_by_account:
-                            entries_by_account[account_id] = []
-                        
-                        # Crear entrada virtual del ledger
-                        virtual_entry = {
-                            "account_id": account_id,
-                            "account_code": line.account_code,
-                            "account_name": line.account_name,
-                            "date": journal_entry.date,
-                            "description": line.description,
-                            "reference": line.reference,
-                            "debit_amount": line.debit,
-                            "credit_amount": line.credit,
-                            "journal_entry_id": str(journal_entry.id),
-                            "entry_number": journal_entry.entry_number
-                        }
-                        entries_by_account[account_id].append(virtual_entry)
-                        print(f"   📝 Entrada virtual creada para {line.account_code}: D={line.debit}, C={line.credit}")
-        
-        client.close()
+                        debit, credit, count = movements.get(account_id, (ZERO, ZERO, 0))
+                        movements[account_id] = (debit + line.debit, credit + line.credit, count + 1)
+                        logger.debug("   📝 Línea de asiento para %s: D=%s, C=%s", line.account_code, line.debit, line.credit)
 
         # Crear resumen del mayor para cada cuenta
         ledgers = []
         for account in accounts:
             try:
                 account_id = str(account.id)
-                entries = entries_by_account.get(account_id, [])
-                
-                print(f"🔍 Procesando cuenta: {account.code} - {account.name}")
-                print(f"   Entradas encontradas: {len(entries)}")
+                total_debits, total_credits, entry_count = movements.get(account_id, (ZERO, ZERO, 0))
                 
-                # Calcular totales
-                total_debits = sum(entry["debit_amount"] for entry in entries)
-                total_credits = sum(entry["credit_amount"] for entry in entries)
+                logger.debug("🔍 Procesando cuenta: %s - %s", account.code, account.name)
+                logger.debug("   Movimientos encontrados: %s", entry_count)
                 
                 # Calcular saldo neto
                 net_balance = account.current_debit_balance - account.current_credit_balance
@@ -681,7 +801,7 @@ class LedgerService:
                     net_balance=net_balance,
                     total_debits=total_debits,
                     total_credits=total_credits,
-                    entry_count=len(entries),
+                    entry_count=entry_count,
                     last_transaction_date=account.last_transaction_date,
                     entries=[]
                 )
@@ -690,22 +810,22 @@ class LedgerService:
                 
                 # Log específico para cuentas problemáticas
                 if account.code in ["101010202", "101010203"]:
-                    print(f"✅ Cuenta {account.code} agregada al ledger:")
-                    print(f"   - Saldo inicial D: {account.initial_debit_balance}")
-                    print(f"   - Saldo inicial C: {account.initial_credit_balance}")
-                    print(f"   - Saldo actual D: {account.current_debit_balance}")
-                    print(f"   - Saldo actual C: {account.current_credit_balance}")
-                    print(f"   - Total débitos: {total_debits}")
-                    print(f"   - Total créditos: {total_credits}")
-                    print(f"   - Saldo neto: {net_balance}")
+                    logger.debug("✅ Cuenta %s agregada al ledger:", account.code)
+                    logger.debug("   - Saldo inicial D: %s", account.initial_debit_balance)
+                    logger.debug("   - Saldo inicial C: %s", account.initial_credit_balance)
+                    logger.debug("   - Saldo actual D: %s", account.current_debit_balance)
+                    logger.debug("   - Saldo actual C: %s", account.current_credit_balance)
+                    logger.debug("   - Total débitos: %s", total_debits)
+                    logger.debug("   - Total créditos: %s", total_credits)
+                    logger.debug("   - Saldo neto: %s", net_balance)
                 
             except Exception as e:
-                print(f"Error al obtener mayor de cuenta {account.code}: {e}")
+                logger.error("Error al obtener mayor de cuenta %s: %s", account.code, e)
                 continue
 
         # Aplicar filtros de saldo y movimientos
         if search_filters:
-            print(f"🔍 Aplicando filtros de búsqueda: {search_filters}")
+            logger.debug("🔍 Aplicando filtros de búsqueda: %s", search_filters)
             filtered_ledgers = []
             for ledger in ledgers:
                 include = True
@@ -720,7 +840,7 @@ class LedgerService:
                         include = False
                 
                 if search_filters.get('exact_balance') is not None:
-                    if abs(ledger.net_balance - search_filters['exact_balance']) > 0.01:  # Tolerancia para decimales
+                    if ledger.net_balance != to_decimal(search_filters['exact_balance']):
                         include = False
                 
                 # Filtro por movimientos
@@ -747,29 +867,30 @@ class LedgerService:
                         include = False
                 
                 if search_filters.get('exact_value') is not None:
-                    if abs(total_value - search_filters['exact_value']) > 0.01:  # Tolerancia para decimales
+                    if total_value != to_decimal(search_filters['exact_value']):
                         include = False
                 
                 # Log específico para cuentas problemáticas en filtros
                 if ledger.account_code in ["101010202", "101010203"]:
-                    print(f"🔍 Filtro para cuenta {ledger.account_code}:")
-                    print(f"   - Incluida: {include}")
-                    print(f"   - Saldo neto: {ledger.net_balance}")
-                    print(f"   - Movimientos: {ledger.entry_count}")
-                    print(f"   - Total valor: {total_value}")
+                    logger.debug("🔍 Filtro para cuenta %s:", ledger.account_code)
+                    logger.debug("   - Incluida: %s", include)
+                    logger.debug("   - Saldo neto: %s", ledger.net_balance)
+                    logger.debug("   - Movimientos: %s", ledger.entry_count)
+                    logger.debug("   - Total valor: %s", total_value)
                 
                 if include:
                     filtered_ledgers.append(ledger)
             
             ledgers = filtered_ledgers
 
-        print(f"✅ Mayor general generado: {len(ledgers)} cuentas")
+        logger.debug("✅ Mayor general generado: %s cuentas", len(ledgers))
         
         # Verificar si las cuentas problemáticas están en el resultado final
-        final_codes = [ledger.account_code for ledger in ledgers]
-        for code in ["101010202", "101010203"]:
-            found = code in final_codes
-            print(f"🔍 Cuenta {code} en resultado final: {found}")
+        if debug:
+            final_codes = [ledger.account_code for ledger in ledgers]
+            for code in ["101010202", "101010203"]:
+                found = code in final_codes
+                logger.debug("🔍 Cuenta %s en resultado final: %s", code, found)
         
         return ledgers
 
@@ -780,281 +901,110 @@ class LedgerService:
         cuando se mayoriza un asiento que afecta a cuentas hijas
         """
         try:
-            print(f"🔄 INICIANDO recálculo automático de saldos padre para {len(affected_account_ids)} cuentas afectadas")
-            print(f"🔍 Cuentas afectadas: {affected_account_ids}")
+            logger.debug("🔄 INICIANDO recálculo automático de saldos padre para %s cuentas afectadas", len(affected_account_ids))
+            logger.debug("🔍 Cuentas afectadas: %s", affected_account_ids)
             
             # Usar exactamente el mismo método que el endpoint manual
             result = await LedgerService._fix_complete_hierarchy_internal(company_id)
-            print(f"🎯 COMPLETADO: Jerarquía completa corregida automáticamente")
-            print(f"📊 Resultado: {result['updated_count']} cuentas padre actualizadas")
+            logger.debug("🎯 COMPLETADO: Jerarquía completa corregida automáticamente")
+            logger.debug("📊 Resultado: %s cuentas padre actualizadas", result['updated_count'])
             
             # Mostrar detalles de las correcciones realizadas
             if result.get('corrections'):
                 for correction in result['corrections'][:5]:  # Mostrar solo las primeras 5
-                    print(f"✅ {correction['parent_code']} ({correction['parent_name']}): {correction['old_balance']} → {correction['new_balance']}")
+                    logger.debug("✅ %s (%s): %s → %s", correction['parent_code'], correction['parent_name'], correction['old_balance'], correction['new_balance'])
                 
         except Exception as e:
-            print(f"❌ ERROR al recalcular saldos de cuentas padre: {e}")
-            import traceback
-            print(f"📋 Traceback completo: {traceback.format_exc()}")
+            logger.exception("❌ ERROR al recalcular saldos de cuentas padre: %s", e)
             
             # En caso de error, intentar corrección completa como fallback
             try:
-                print("🔄 Intentando corrección completa como fallback...")
+                logger.debug("🔄 Intentando corrección completa como fallback...")
                 await LedgerService._fix_complete_hierarchy_fallback(company_id)
-                print("✅ Corrección de fallback completada")
+                logger.debug("✅ Corrección de fallback completada")
             except Exception as fallback_error:
-                print(f"❌ Error en corrección de fallback: {fallback_error}")
-                print(f"📋 Fallback traceback: {traceback.format_exc()}")
+                logger.exception("❌ Error en corrección de fallback: %s", fallback_error)
     
     @staticmethod
     async def _fix_complete_hierarchy_internal(company_id: str):
         """
         Método interno para corregir completamente toda la jerarquía de saldos padre
-        (Usado tanto por el endpoint manual como por el cálculo automático)
+        (Usado tanto por el endpoint manual como por el cálculo automático).
+
+        Trabaja sobre la instantánea columnar del plan: los saldos esperados de todos
+        los padres salen de un solo rollup vectorizado y solo se escriben los que
+        difieren. Cada corrección se condiciona a la revisión leída, así una
+        instantánea desactualizada nunca pisa saldos escritos por otra operación.
         """
-        # Obtener todas las cuentas activas de la empresa
-        all_accounts = await Account.find(
-            Account.company_id == company_id,
-            Account.is_active == True
-        ).to_list()
-        
-        print(f"🔍 INICIANDO corrección de jerarquía completa para {len(all_accounts)} cuentas")
-        print(f"📋 Códigos de cuentas encontradas: {[acc.code for acc in all_accounts[:10]]}...")  # Mostrar solo las primeras 10
-        
-        # Crear mapa de cuentas por código
-        accounts_by_code = {acc.code: acc for acc in all_accounts}
-        
-        # Identificar todas las cuentas padre
-        parent_accounts = []
-        for account in all_accounts:
-            # Verificar si tiene cuentas hijas
-            has_children = any(
-                acc.parent_code == account.code or 
-                (acc.code.startswith(account.code) and acc.code != account.code and len(acc.code) > len(account.code))
-                for acc in all_accounts
-            )
-            if has_children:
-                parent_accounts.append(account)
-                print(f"🔍 Cuenta padre identificada: {account.code} ({account.name})")
-        
-        print(f"📊 Encontradas {len(parent_accounts)} cuentas padre")
-        
-        # Ordenar por longitud de código (más específico primero)
-        parent_accounts.sort(key=lambda x: len(x.code), reverse=True)
-        
-        # Recalcular saldos para cada cuenta padre
-        updated_count = 0
+        chart = await chart_cache.get(company_id)
+        logger.debug("🔍 INICIANDO corrección de jerarquía completa para %s cuentas", len(chart))
+
+        balances = np.stack([chart.current_debit, chart.current_credit], axis=1)
+        expected = chart.rollup(balances)
+        mismatched = np.flatnonzero(~chart.is_leaf & np.any(expected != balances, axis=1))
+        logger.debug("📊 %s cuentas padre, %s con saldo desactualizado", int((~chart.is_leaf).sum()), len(mismatched))
+
+        if len(mismatched) == 0:
+            return {"updated_count": 0, "corrections": []}
+
+        now = datetime.now()
+        operations = []
         corrections = []
-        
-        for parent_account in parent_accounts:
-            # Calcular saldo basándose en hijas
-            children = []
-            
-            # Buscar por parent_code directo
-            for account in all_accounts:
-                if account.parent_code == parent_account.code:
-                    children.append(account)
-            
-            # Buscar por jerarquía de códigos
-            for account in all_accounts:
-                if (account.code.startswith(parent_account.code) and 
-                    account.code != parent_account.code and 
-                    account not in children):
-                    
-                    # Verificar si es hija directa
-                    is_direct_child = False
-                    
-                    # Lógica mejorada para identificar hijas directas
-                    if len(parent_account.code) == 1:
-                        # Padre de 1 dígito -> hijas de 3 dígitos
-                        if len(account.code) == 3:
-                            is_direct_child = True
-                    elif len(parent_account.code) == 3:
-                        # Padre de 3 dígitos -> hijas de 5 dígitos
-                        if len(account.code) == 5:
-                            is_direct_child = True
-                    elif len(parent_account.code) == 5:
-                        # Padre de 5 dígitos -> hijas de 7 dígitos
-                        if len(account.code) == 7:
-                            is_direct_child = True
-                    elif len(parent_account.code) == 7:
-                        # Padre de 7 dígitos -> hijas de 9 dígitos
-                        if len(account.code) == 9:
-                            is_direct_child = True
-                    else:
-                        # Lógica genérica: hija directa si tiene exactamente 2 dígitos más
-                        if len(account.code) == len(parent_account.code) + 2:
-                            is_direct_child = True
-                    
-                    if is_direct_child:
-                        children.append(account)
-                        print(f"   👶 Hija directa encontrada: {account.code} ({account.name}) para padre {parent_account.code}")
-            
-            # Calcular saldos totales
-            total_debit = sum(child.current_debit_balance for child in children)
-            total_credit = sum(child.current_credit_balance for child in children)
-            
-            old_debit = parent_account.current_debit_balance
-            old_credit = parent_account.current_credit_balance
-            
-            print(f"   💰 Cálculo de saldos para {parent_account.code}:")
-            print(f"      📊 Hijas encontradas: {len(children)}")
-            for child in children:
-                print(f"         - {child.code}: D={child.current_debit_balance}, C={child.current_credit_balance}")
-            print(f"      🧮 Total calculado: D={total_debit}, C={total_credit}")
-            print(f"      📈 Saldo anterior: D={old_debit}, C={old_credit}")
-            
-            # Actualizar saldos
-            parent_account.current_debit_balance = total_debit
-            parent_account.current_credit_balance = total_credit
-            parent_account.last_transaction_date = datetime.now()
-            parent_account.updated_at = datetime.now()
-            
-            await parent_account.save()
-            print(f"      ✅ Saldo actualizado y guardado en BD")
-            
+        for i in mismatched:
+            old_debit, old_credit = from_cents(balances[i, 0]), from_cents(balances[i, 1])
+            total_debit, total_credit = from_cents(expected[i, 0]), from_cents(expected[i, 1])
+            children = chart.children_of(i)
+            operations.append(UpdateOne(
+                {"_id": chart.document_ids[i], **revision_filter(int(chart.revision[i]))},
+                {
+                    "$set": {
+                        "current_debit_balance": to_decimal128(total_debit),
+                        "current_credit_balance": to_decimal128(total_credit),
+                        "last_transaction_date": now,
+                        "updated_at": now
+                    },
+                    "$inc": {"revision": 1}
+                }
+            ))
             corrections.append({
-                "parent_code": parent_account.code,
-                "parent_name": parent_account.name,
+                "parent_code": chart.codes[i],
+                "parent_name": chart.names[i],
                 "children_count": len(children),
                 "old_balance": f"D:{old_debit}, C:{old_credit}",
                 "new_balance": f"D:{total_debit}, C:{total_credit}",
-                "children": [{"code": child.code, "name": child.name, "balance": f"D:{child.current_debit_balance}, C:{child.current_credit_balance}"} for child in children]
+                "children": [
+                    {
+                        "code": chart.codes[child],
+                        "name": chart.names[child],
+                        "balance": f"D:{from_cents(balances[child, 0])}, C:{from_cents(balances[child, 1])}"
+                    }
+                    for child in children
+                ]
             })
-            
-            updated_count += 1
-            
-            print(f"✅ CORREGIDO {parent_account.code} ({parent_account.name}): D={old_debit}→{total_debit}, C={old_credit}→{total_credit}")
-            print(f"   📊 Hijas incluidas ({len(children)}): {[child.code for child in children]}")
-        
+            logger.debug("✅ CORREGIDO %s (%s): D=%s→%s, C=%s→%s", chart.codes[i], chart.names[i], old_debit, total_debit, old_credit, total_credit)
+
+        result = await Account.get_motor_collection().bulk_write(operations, ordered=False)
+        chart_cache.invalidate(company_id)
+        await data_versions.bump(company_id)
+        if result.matched_count < len(operations):
+            logger.warning("⚠️ %s cuentas padre cambiaron durante la corrección; se corregirán en la próxima ejecución", len(operations) - result.matched_count)
+
         return {
-            "updated_count": updated_count,
+            "updated_count": result.matched_count,
             "corrections": corrections
         }
     
-    @staticmethod
-    async def _calculate_parent_balance(parent_account: Account, all_accounts: List[Account]):
-        """
-        Calcular el saldo de una cuenta padre basándose en sus cuentas hijas
-        """
-        try:
-            print(f"   🔍 Calculando saldo para cuenta padre: {parent_account.code} - {parent_account.name}")
-            
-            # Encontrar todas las cuentas hijas de esta cuenta padre
-            children = []
-            
-            # Buscar por parent_code directo
-            for account in all_accounts:
-                if account.parent_code == parent_account.code:
-                    children.append(account)
-                    print(f"      📋 Hija encontrada por parent_code: {account.code} - {account.name}")
-            
-            # También buscar por jerarquía de códigos (cuentas que empiecen con el código del padre)
-            # Incluir todas las cuentas hijas directas (nivel inmediatamente siguiente)
-            for account in all_accounts:
-                if (account.code.startswith(parent_account.code) and 
-                    account.code != parent_account.code and 
-                    account not in children):
-                    
-                    # Verificar si es hija directa
-                    # Lógica mejorada para diferentes niveles de jerarquía
-                    is_direct_child = False
-                    
-                    # Caso 1: Código padre de 1 dígito (ej: "1") -> buscar códigos de 3 dígitos (ej: "101", "102")
-                    if len(parent_account.code) == 1:
-                        if len(account.code) == 3:
-                            is_direct_child = True
-                    
-                    # Caso 2: Código padre de 3 dígitos (ej: "101") -> buscar códigos de 5 dígitos (ej: "10101", "10102")
-                    elif len(parent_account.code) == 3:
-                        if len(account.code) == 5:
-                            is_direct_child = True
-                    
-                    # Caso 3: Código padre de 5 dígitos (ej: "10101") -> buscar códigos de 7 dígitos (ej: "1010101", "1010102")
-                    elif len(parent_account.code) == 5:
-                        if len(account.code) == 7:
-                            is_direct_child = True
-                    
-                    # Caso 4: Código padre de 7 dígitos (ej: "1010101") -> buscar códigos de 9 dígitos (ej: "101010101", "101010102")
-                    elif len(parent_account.code) == 7:
-                        if len(account.code) == 9:
-                            is_direct_child = True
-                    
-                    # Caso general: si el código es exactamente 2 dígitos más largo
-                    else:
-                        if len(account.code) == len(parent_account.code) + 2:
-                            is_direct_child = True
-                    
-                    if is_direct_child:
-                        children.append(account)
-                        print(f"      📋 Hija encontrada por jerarquía: {account.code} - {account.name}")
-            
-            print(f"   📋 Total cuentas hijas encontradas para {parent_account.code}: {len(children)}")
-            
-            # Calcular saldos totales de las cuentas hijas
-            total_debit = 0.0
-            total_credit = 0.0
-            
-            for child in children:
-                total_debit += child.current_debit_balance
-                total_credit += child.current_credit_balance
-                print(f"      - {child.code} ({child.name}): D={child.current_debit_balance}, C={child.current_credit_balance}")
-            
-            # Actualizar saldos de la cuenta padre
-            old_debit = parent_account.current_debit_balance
-            old_credit = parent_account.current_credit_balance
-            
-            parent_account.current_debit_balance = total_debit
-            parent_account.current_credit_balance = total_credit
-            parent_account.last_transaction_date = datetime.now()
-            parent_account.updated_at = datetime.now()
-            
-            await parent_account.save()
-            
-            print(f"   💰 Saldo actualizado para {parent_account.code}: D={old_debit}→{total_debit}, C={old_credit}→{total_credit}")
-            
-        except Exception as e:
-            print(f"❌ Error al calcular saldo de cuenta padre {parent_account.code}: {e}")
-    
     @staticmethod
     async def _fix_complete_hierarchy_fallback(company_id: str):
         """
-        Método de fallback para corregir toda la jerarquía en caso de error
+        Método de fallback: repetir la corrección con una instantánea nueva del plan
+        (la anterior pudo quedar inconsistente). Las escrituras siguen condicionadas
+        a la revisión leída, nunca se guarda el documento completo.
         """
         try:
-            print("🔄 Ejecutando corrección completa de jerarquía como fallback...")
-            
-            # Obtener todas las cuentas activas de la empresa
-            all_accounts = await Account.find(
-                Account.company_id == company_id,
-                Account.is_active == True
-            ).to_list()
-            
-            # Identificar todas las cuentas padre
-            parent_accounts = []
-            for account in all_accounts:
-                # Verificar si tiene cuentas hijas
-                has_children = any(
-                    acc.parent_code == account.code or 
-                    (acc.code.startswith(account.code) and acc.code != account.code and len(acc.code) > len(account.code))
-                    for acc in all_accounts
-                )
-                if has_children:
-                    parent_accounts.append(account)
-            
-            print(f"📊 Encontradas {len(parent_accounts)} cuentas padre para corrección de fallback")
-            
-            # Ordenar por longitud de código (más específico primero)
-            parent_accounts.sort(key=lambda x: len(x.code), reverse=True)
-            
-            # Recalcular saldos para cada cuenta padre
-            for parent_account in parent_accounts:
-                await LedgerService._calculate_parent_balance(parent_account, all_accounts)
-                print(f"✅ Fallback: Actualizado saldo de cuenta padre: {parent_account.code} - {parent_account.name}")
-                
+            logger.debug("🔄 Ejecutando corrección completa de jerarquía como fallback...")
+            chart_cache.invalidate(company_id)
+            result = await LedgerService._fix_complete_hierarchy_internal(company_id)
+            logger.debug("✅ Fallback: %s cuentas padre corregidas", result['updated_count'])
         except Exception as e:
-            print(f"❌ Error en corrección de fallback: {e}")
-
-
-
+            logger.error("❌ Error en corrección de fallback: %s", e)
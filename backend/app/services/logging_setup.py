@@ -0,0 +1,127 @@
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from app.config import settings
+from app.services.query_profiler import current_profile
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea: ts, level, logger, message, request y exc_info si existen"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request = getattr(record, "request", None)
+        if request:
+            payload["request"] = request
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Encola el registro sin escribir en la salida: en el hilo de la petición solo
+    se interpola el mensaje (y solo si el nivel está habilitado); el formato y la
+    E/S ocurren en el hilo del QueueListener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El logger "app" no propaga y este es su único handler: se modifica el registro sin copiarlo
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # El traceback se convierte a texto aquí: el objeto no debe cruzar al otro hilo
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        profile = current_profile.get()
+        if profile is not None:
+            record.request = f"{profile.method} {profile.path}"
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Cola llena: descartar antes que bloquear el event loop
+            self.dropped += 1
+
+
+class _BlockingSentinelListener(QueueListener):
+    """QueueListener cuyo centinela de parada espera lugar en la cola llena en vez de fallar"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """"app.services.ledger_service=DEBUG,app.routes=WARNING" -> {logger: nivel}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = (part.strip() for part in item.split("=", 1))
+        if name and level:
+            levels[name] = logging.getLevelName(level.upper())
+    return {name: level for name, level in levels.items() if isinstance(level, int)}
+
+
+_listener: Optional[QueueListener] = None
+_handler: Optional[ContextQueueHandler] = None
+
+
+def configure_logging(stream=None, level: Optional[str] = None, levels: Optional[str] = None, log_format: Optional[str] = None) -> ContextQueueHandler:
+    """
+    Configurar el logger "app": QueueHandler en el hilo de la aplicación y un
+    QueueListener que formatea (JSON o texto) y escribe en `stream`. Idempotente:
+    una segunda llamada reemplaza la configuración anterior.
+    """
+    global _listener, _handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if (log_format or settings.log_format) == "json" else logging.Formatter(_TEXT_FORMAT))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.log_queue_size)
+    _handler = ContextQueueHandler(log_queue)
+    _listener = _BlockingSentinelListener(log_queue, output, respect_handler_level=False)
+
+    # Ni el formato JSON ni el de texto usan el proceso: ahorra trabajo al crear cada LogRecord
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    app_logger = logging.getLogger("app")
+    for handler in list(app_logger.handlers):
+        if isinstance(handler, ContextQueueHandler):
+            app_logger.removeHandler(handler)
+    app_logger.addHandler(_handler)
+    app_logger.setLevel((level or settings.log_level).upper())
+    app_logger.propagate = False
+
+    for name, module_level in parse_levels(settings.log_levels if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener.start()
+    return _handler
+
+
+def shutdown_logging():
+    """Vaciar la cola y detener el hilo del listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
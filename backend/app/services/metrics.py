@@ -0,0 +1,256 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from pymongo import monitoring
+from app.config import settings
+from app.services.query_profiler import route_template
+
+# Buckets de latencia (segundos) y de tamaño de respuesta (bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, kind: str = "counter"):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in sorted(self.values.items()))
+        return lines
+
+
+class Gauge(Counter):
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text, "gauge")
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        # labels -> ([conteo por bucket (no acumulado) + desbordes], suma, conteo)
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Estado de los pools de conexiones de pymongo por servidor"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = Gauge("mongo_pool_connections", "Conexiones abiertas en el pool de Mongo")
+        self.checked_out = Gauge("mongo_pool_checked_out_connections", "Conexiones en uso (checked out)")
+        self.created = Counter("mongo_pool_connections_created_total", "Conexiones creadas")
+        self.checkout_failures = Counter("mongo_pool_checkout_failures_total", "Checkouts fallidos por motivo")
+        self.checkout_wait = Histogram("mongo_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool", LATENCY_BUCKETS)
+        self.cleared = Counter("mongo_pool_cleared_total", "Pools vaciados (errores de red o failover)")
+        self._waits: Dict[int, float] = {}
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.cleared.inc(address=self._address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created.inc(address=self._address(event))
+            self.open.inc(address=self._address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open.dec(address=self._address(event))
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._waits[threading.get_ident()] = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._waits.pop(threading.get_ident(), None)
+            self.checkout_failures.inc(address=self._address(event), reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            started = self._waits.pop(threading.get_ident(), None)
+            if started is not None:
+                self.checkout_wait.observe(time.perf_counter() - started, address=self._address(event))
+            self.checked_out.inc(address=self._address(event))
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out.dec(address=self._address(event))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            lines = []
+            for metric in (self.open, self.checked_out, self.created, self.checkout_failures, self.checkout_wait, self.cleared):
+                lines.extend(metric.render())
+            return lines
+
+
+class MetricsRegistry:
+    """Métricas HTTP, de los pools de Mongo y de las cachés de la aplicación"""
+
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "Peticiones HTTP por ruta y código de estado")
+        self.latency = Histogram("http_request_duration_seconds", "Duración de las peticiones HTTP", LATENCY_BUCKETS)
+        self.response_size = Histogram("http_response_size_bytes", "Tamaño del cuerpo de las respuestas HTTP", SIZE_BUCKETS)
+        self.in_progress = Gauge("http_requests_in_progress", "Peticiones HTTP en curso")
+        self.exceptions = Counter("http_exceptions_total", "Excepciones no controladas por ruta y tipo")
+        self.mongo_pool = MongoPoolMetrics()
+        self.caches: Dict[str, object] = {}
+        self._registered = False
+
+    def register(self):
+        """Registrar el listener del pool; solo afecta a los clientes Motor creados después"""
+        if not self._registered and settings.metrics_enabled:
+            monitoring.register(self.mongo_pool)
+            self._registered = True
+
+    def register_cache(self, name: str, cache):
+        """Exportar una caché con atributos `hits` y `misses` (y `len(cache)`, `coalesced` y `bytes` si los tiene)"""
+        self.caches[name] = cache
+
+    def _render_caches(self) -> List[str]:
+        hits = Counter("app_cache_hits_total", "Aciertos de las cachés de la aplicación")
+        misses = Counter("app_cache_misses_total", "Fallos de las cachés de la aplicación")
+        ratio = Gauge("app_cache_hit_ratio", "Proporción de aciertos de las cachés de la aplicación")
+        entries = Gauge("app_cache_entries", "Entradas en las cachés de la aplicación")
+        coalesced = Counter("app_cache_coalesced_total", "Peticiones que esperaron un cálculo idéntico en curso")
+        size = Gauge("app_cache_bytes", "Bytes ocupados por las cachés de la aplicación")
+        for name, cache in self.caches.items():
+            cache_hits, cache_misses = getattr(cache, "hits", 0), getattr(cache, "misses", 0)
+            hits.inc(cache_hits, cache=name)
+            misses.inc(cache_misses, cache=name)
+            total = cache_hits + cache_misses
+            ratio.set(cache_hits / total if total else 0, cache=name)
+            if hasattr(cache, "__len__"):
+                entries.set(len(cache), cache=name)
+            if hasattr(cache, "coalesced"):
+                coalesced.inc(cache.coalesced, cache=name)
+            if hasattr(cache, "bytes"):
+                size.set(cache.bytes, cache=name)
+        lines = []
+        for metric in (hits, misses, ratio, entries, coalesced, size):
+            lines.extend(metric.render())
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.requests, self.latency, self.response_size, self.in_progress, self.exceptions):
+            lines.extend(metric.render())
+        lines.extend(self.mongo_pool.render())
+        lines.extend(self._render_caches())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: conteo, latencia, tamaño de respuesta y excepciones por ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "")
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_progress.inc(method=method)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            metrics.exceptions.inc(method=method, route=route_template(scope) or "(sin ruta)", exception=type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            metrics.in_progress.dec(method=method)
+            route = route_template(scope) or "(sin ruta)"
+            metrics.requests.inc(method=method, route=route, status=str(state["status"]))
+            metrics.latency.observe(elapsed, method=method, route=route)
+            metrics.response_size.observe(state["size"], method=method, route=route)
@@ -0,0 +1,279 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from beanie.odm.utils.encoder import Encoder
+from pymongo.errors import DuplicateKeyError
+from app.models.journal import JournalEntry, JournalEntryType, JournalLine
+from app.models.money import ZERO, from_cents
+from app.models.period_closing import ClosingBalance, PeriodClosing, PeriodClosingStatus
+from app.services.chart_cache import ChartSnapshot, chart_cache
+from app.services.concurrency import ConcurrencyConflictError
+from app.services.data_version import data_versions
+from app.services.ledger_archive import ledger_archives
+from app.services.ledger_service import LedgerService
+from app.services.period_locks import PeriodLockedError, period_locks
+
+logger = logging.getLogger(__name__)
+
+# Grupos del plan que se cierran contra patrimonio (Ingresos, Gastos, Costos)
+RESULT_GROUPS = (4, 5, 6)
+# Reintentos del cierre si hubo escrituras entre el cálculo de saldos y la mayorización
+_MAX_ATTEMPTS = 3
+# Un cierre "en curso" sin avance en este tiempo se considera abandonado (proceso reiniciado)
+_STALE_AFTER = timedelta(minutes=15)
+
+# Trabajos de cierre en curso en este proceso (closing_id -> tarea)
+_jobs: Dict[str, asyncio.Task] = {}
+
+
+def fiscal_year_start(period_end: datetime, start_month: int) -> datetime:
+    """Inicio del año fiscal que contiene `period_end` (fiscal_year_start de la empresa)"""
+    start_month = start_month if 1 <= start_month <= 12 else 1
+    year = period_end.year if period_end.month >= start_month else period_end.year - 1
+    return datetime(year, start_month, 1)
+
+
+def check_result_account(chart: ChartSnapshot, code: str) -> int:
+    """Índice de la cuenta que recibe el resultado; ValueError si no sirve para el cierre"""
+    index = chart.index_by_code.get(code)
+    if index is None:
+        raise ValueError(f"La cuenta de resultados del ejercicio {code} no existe en el plan de cuentas")
+    if not chart.is_leaf[index]:
+        raise ValueError(f"La cuenta {code} tiene subcuentas; use una cuenta de detalle")
+    if chart.group[index] in RESULT_GROUPS:
+        raise ValueError(f"La cuenta {code} es una cuenta de resultados; use una cuenta de patrimonio")
+    return index
+
+
+async def closing_balances(chart: ChartSnapshot, company_id: str, inclusive_end: datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Débitos y créditos totales por cuenta (saldo inicial + movimientos hasta la
+    fecha) en centavos, con una sola agregación sobre el mayor. Sin consolidar.
+    """
+    group = {"$group": {
+        "_id": "$account_id",
+        "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+        "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
+    }}
+    sums = await ledger_archives.aggregate_ledger(company_id, {"company_id": company_id, "date": {"$lt": inclusive_end}}, [group])
+    sum_debit, sum_credit = chart.movement_vectors(sums)
+    return chart.initial_debit + sum_debit, chart.initial_credit + sum_credit
+
+
+def closing_lines(
+    chart: ChartSnapshot,
+    debit: np.ndarray,
+    credit: np.ndarray,
+    result_index: int,
+    label: str
+) -> Tuple[List[JournalLine], np.ndarray, np.ndarray, int, int]:
+    """
+    Líneas del asiento de cierre: cada hoja de resultados con saldo se lleva a cero
+    y la diferencia va a la cuenta de resultados del ejercicio (utilidad al haber,
+    pérdida al debe). Devuelve las líneas, los débitos y créditos del asiento por
+    cuenta (centavos), la utilidad neta en centavos y la cantidad de cuentas cerradas.
+    """
+    net = debit - credit
+    closable = np.flatnonzero(chart.is_leaf & np.isin(chart.group, RESULT_GROUPS) & (net != 0))
+    closable = sorted(closable, key=lambda i: chart.codes[i])
+
+    close_debit = np.zeros(len(chart), dtype=np.int64)
+    close_credit = np.zeros(len(chart), dtype=np.int64)
+    lines: List[JournalLine] = []
+    for i in closable:
+        amount = int(net[i])
+        if amount > 0:
+            close_credit[i] = amount
+        else:
+            close_debit[i] = -amount
+        lines.append(JournalLine(
+            account_code=chart.codes[i],
+            account_name=chart.names[i],
+            description=f"Cierre {label}",
+            debit=from_cents(close_debit[i]),
+            credit=from_cents(close_credit[i])
+        ))
+
+    # Saldo acreedor de resultados = utilidad
+    net_income = -int(net[closable].sum()) if closable else 0
+    if net_income:
+        if net_income > 0:
+            close_credit[result_index] += net_income
+        else:
+            close_debit[result_index] += -net_income
+        lines.append(JournalLine(
+            account_code=chart.codes[result_index],
+            account_name=chart.names[result_index],
+            description=f"{'Utilidad' if net_income > 0 else 'Pérdida'} del ejercicio {label}",
+            debit=from_cents(max(-net_income, 0)),
+            credit=from_cents(max(net_income, 0))
+        ))
+    return lines, close_debit, close_credit, net_income, len(closable)
+
+
+def closing_snapshot(chart: ChartSnapshot, debit: np.ndarray, credit: np.ndarray) -> List[ClosingBalance]:
+    """Saldos al cierre de todas las cuentas con movimiento (los padres suman sus hijas)"""
+    debit, credit = chart.rollup(debit), chart.rollup(credit)
+    return [
+        ClosingBalance(
+            account_id=chart.ids[i],
+            code=chart.codes[i],
+            name=chart.names[i],
+            debit=from_cents(debit[i]),
+            credit=from_cents(credit[i])
+        )
+        for i in sorted(range(len(chart)), key=lambda i: chart.codes[i])
+        if debit[i] or credit[i]
+    ]
+
+
+async def _update(closing: PeriodClosing, session=None, **changes: Any):
+    """Avance y resultado del trabajo, visibles para el polling de otros procesos"""
+    changes["updated_at"] = datetime.now()
+    await PeriodClosing.get_motor_collection().update_one(
+        {"_id": closing.id}, {"$set": Encoder().encode(changes)}, session=session
+    )
+
+
+async def start_closing(
+    company_id: str,
+    period_end: datetime,
+    period_start: Optional[datetime],
+    result_account_code: str,
+    requested_by: str
+) -> PeriodClosing:
+    """
+    Validar y registrar el cierre y lanzarlo en segundo plano. Devuelve el documento
+    del cierre (estado PENDING) para consultar su avance.
+    """
+    locked_through = await period_locks.locked_through(company_id)
+    if locked_through is not None and period_end <= locked_through:
+        raise ValueError(f"El período ya está cerrado hasta {locked_through:%Y-%m-%d}")
+    check_result_account(await chart_cache.get(company_id), result_account_code)
+
+    existing = await PeriodClosing.find_one({"company_id": company_id, "period_end": period_end})
+    if existing:
+        if existing.status == PeriodClosingStatus.COMPLETED:
+            raise ConcurrencyConflictError(f"El período al {period_end:%Y-%m-%d} ya fue cerrado")
+        abandoned = str(existing.id) not in _jobs and existing.updated_at < datetime.now() - _STALE_AFTER
+        if existing.status != PeriodClosingStatus.FAILED and not abandoned:
+            raise ConcurrencyConflictError(f"Ya hay un cierre en curso para el período al {period_end:%Y-%m-%d}")
+        await existing.delete()
+
+    now = datetime.now()
+    closing = PeriodClosing(
+        company_id=company_id,
+        period_start=period_start,
+        period_end=period_end,
+        result_account_code=result_account_code,
+        requested_by=requested_by,
+        step="En cola",
+        created_at=now,
+        updated_at=now
+    )
+    try:
+        await closing.insert()
+    except DuplicateKeyError:
+        raise ConcurrencyConflictError(f"Ya hay un cierre en curso para el período al {period_end:%Y-%m-%d}")
+
+    closing_id = str(closing.id)
+    task = asyncio.ensure_future(run_closing(closing))
+    _jobs[closing_id] = task
+    task.add_done_callback(lambda done: _jobs.pop(closing_id, None))
+    return closing
+
+
+async def run_closing(closing: PeriodClosing):
+    """Trabajo de cierre: los errores quedan en el documento (estado FAILED)"""
+    try:
+        await _update(closing, status=PeriodClosingStatus.RUNNING, started_at=datetime.now(), progress=5, step="Cargando plan de cuentas")
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                await _close(closing)
+                break
+            except ConcurrencyConflictError as e:
+                if attempt == _MAX_ATTEMPTS:
+                    raise
+                logger.warning("⚠️ Cierre %s: %s (intento %s/%s)", closing.id, e, attempt, _MAX_ATTEMPTS)
+        logger.info("🔒 Período cerrado: empresa %s al %s", closing.company_id, f"{closing.period_end:%Y-%m-%d}")
+    except Exception as e:
+        logger.exception("❌ Error en el cierre %s: %s", closing.id, e)
+        try:
+            await _update(closing, status=PeriodClosingStatus.FAILED, error=str(e), finished_at=datetime.now())
+        except Exception as update_error:
+            logger.warning("⚠️ No se pudo registrar el error del cierre %s: %s", closing.id, update_error)
+
+
+async def _close(closing: PeriodClosing):
+    """
+    Calcular saldos, generar el asiento de cierre y confirmar en una sola transacción
+    asiento, mayor, saldos, bloqueo del período e instantánea. Si otra escritura cambió
+    la versión de datos de la empresa desde el cálculo, la transacción se aborta con
+    ConcurrencyConflictError y el cierre se recalcula.
+    """
+    company_id = closing.company_id
+    expected_version = await data_versions.current(company_id)
+    chart = await chart_cache.get(company_id)
+    result_index = check_result_account(chart, closing.result_account_code)
+
+    await _update(closing, progress=15, step="Calculando saldos de cuentas de resultados")
+    inclusive_end = closing.period_end + timedelta(days=1)
+    debit, credit = await closing_balances(chart, company_id, inclusive_end)
+
+    await _update(closing, progress=40, step="Generando asiento de cierre")
+    start = closing.period_start or closing.period_end
+    label = f"{start:%Y-%m-%d} a {closing.period_end:%Y-%m-%d}"
+    lines, close_debit, close_credit, net_income, accounts_closed = closing_lines(chart, debit, credit, result_index, label)
+    snapshot = closing_snapshot(chart, debit + close_debit, credit + close_credit)
+
+    entry: Optional[JournalEntry] = None
+    if lines:
+        now = datetime.now()
+        total = sum((line.debit for line in lines), ZERO)
+        entry = JournalEntry(
+            entry_number=f"CIERRE-{closing.period_end:%Y%m%d}",
+            # Último instante del período: el cierre queda después de todos sus movimientos
+            date=inclusive_end - timedelta(milliseconds=1),
+            description=f"ASIENTO DE CIERRE {label}",
+            entry_type=JournalEntryType.CLOSING,
+            status="draft",
+            lines=lines,
+            total_debit=total,
+            total_credit=total,
+            company_id=company_id,
+            created_by=closing.requested_by,
+            created_at=now,
+            updated_at=now
+        )
+
+    await _update(closing, progress=60, step=f"Mayorizando asiento de cierre ({len(lines)} líneas)")
+
+    async def _commit(session):
+        if await data_versions.current(company_id, session) != expected_version:
+            raise ConcurrencyConflictError("Hubo movimientos durante el cierre; se recalculan los saldos")
+        locked_through = await period_locks.locked_through(company_id, session)
+        if locked_through is not None and closing.period_end <= locked_through:
+            raise PeriodLockedError(f"El período ya está cerrado hasta {locked_through:%Y-%m-%d}")
+        if entry is not None:
+            await entry.insert(session=session)
+            await LedgerService._post_entry(entry, company_id, closing.requested_by, session)
+        await period_locks.lock(company_id, closing.period_end, str(closing.id), closing.requested_by, session)
+        await _update(
+            closing,
+            session=session,
+            status=PeriodClosingStatus.COMPLETED,
+            progress=100,
+            step="Cierre completado",
+            closing_entry_id=str(entry.id) if entry is not None else None,
+            closing_entry_number=entry.entry_number if entry is not None else None,
+            accounts_closed=accounts_closed,
+            net_income=from_cents(net_income),
+            snapshot=snapshot,
+            finished_at=datetime.now()
+        )
+
+    await LedgerService._run_and_invalidate(company_id, _commit)
+    # Confirmada la transacción, las rutas de este proceso rechazan el período sin esperar el TTL
+    period_locks.remember(company_id, closing.period_end)
@@ -0,0 +1,110 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from app.config import settings
+from app.models.period_closing import PeriodLock
+
+
+class PeriodLockedError(Exception):
+    """La fecha del movimiento cae en un período contable cerrado"""
+
+
+class PeriodLocks:
+    """
+    Bloqueo de períodos cerrados por empresa: un documento por empresa con la
+    fecha hasta la que (inclusive) no se admiten movimientos. Solo avanza.
+
+    La fecha se guarda en memoria por empresa. Como el bloqueo nunca retrocede,
+    el valor en caché es una cota inferior del vigente: si ya rechaza una fecha,
+    el rechazo es definitivo sin consultar Mongo. `check` (rutas) usa solo la
+    caché, que se refresca cada PERIOD_LOCK_CACHE_TTL segundos; `confirm`
+    (dentro de la transacción de mayorización) relee el documento cuando la
+    caché no rechaza, para que un cierre hecho en otro proceso se respete.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[Optional[datetime], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def remember(self, company_id: str, locked_through: Optional[datetime]):
+        """Guardar en caché la fecha leída o confirmada (sin retroceder una ya conocida)"""
+        cached = self._cache.get(company_id, (None, 0.0))[0]
+        if cached is not None and (locked_through is None or locked_through < cached):
+            locked_through = cached
+        self._cache[company_id] = (locked_through, time.monotonic())
+
+    def invalidate(self, company_id: Optional[str] = None):
+        """Olvidar la fecha de una empresa (o de todas): tras borrar o importar datos"""
+        if company_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(company_id, None)
+
+    async def locked_through(self, company_id: str, session=None) -> Optional[datetime]:
+        """Fecha vigente leída de Mongo (actualiza la caché)"""
+        doc = await PeriodLock.get_motor_collection().find_one(
+            {"_id": company_id}, {"locked_through": 1}, session=session
+        )
+        locked_through = doc.get("locked_through") if doc else None
+        if session is None:
+            self.remember(company_id, locked_through)
+        return locked_through
+
+    async def cached_locked_through(self, company_id: str) -> Optional[datetime]:
+        """Fecha en caché; se relee de Mongo si no está o venció su TTL"""
+        cached = self._cache.get(company_id)
+        if cached is not None and time.monotonic() - cached[1] < settings.period_lock_cache_ttl:
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        return await self.locked_through(company_id)
+
+    @staticmethod
+    def is_locked(locked_through: Optional[datetime], date: datetime) -> bool:
+        return locked_through is not None and date < locked_through + timedelta(days=1)
+
+    @staticmethod
+    def _raise(locked_through: datetime, date: datetime):
+        raise PeriodLockedError(
+            f"El período está cerrado hasta {locked_through:%Y-%m-%d}; "
+            f"no se admiten movimientos con fecha {date:%Y-%m-%d}"
+        )
+
+    async def check(self, company_id: str, date: datetime):
+        """Lanzar PeriodLockedError si `date` cae en el período cerrado (solo caché)"""
+        locked_through = await self.cached_locked_through(company_id)
+        if self.is_locked(locked_through, date):
+            self._raise(locked_through, date)
+
+    async def confirm(self, company_id: str, date: datetime, session=None):
+        """
+        Verificación definitiva para escrituras del mayor: la caché rechaza sin E/S
+        y, si no rechaza, se lee el documento dentro de la transacción.
+        """
+        await self.check(company_id, date)
+        locked_through = await self.locked_through(company_id, session)
+        if self.is_locked(locked_through, date):
+            self._raise(locked_through, date)
+
+    @staticmethod
+    async def lock(company_id: str, through: datetime, closing_id: Optional[str] = None, user_id: Optional[str] = None, session=None):
+        """
+        Cerrar el período hasta `through` ($max: nunca retrocede la fecha). Llamar a
+        `remember` solo después de confirmar la transacción.
+        """
+        await PeriodLock.get_motor_collection().update_one(
+            {"_id": company_id},
+            {
+                "$max": {"locked_through": through},
+                "$set": {"closing_id": closing_id, "updated_by": user_id, "updated_at": datetime.now()}
+            },
+            upsert=True,
+            session=session
+        )
+
+
+period_locks = PeriodLocks()
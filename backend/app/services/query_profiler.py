@@ -0,0 +1,215 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from pymongo import monitoring
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """Comandos Mongo ejecutados durante una petición HTTP"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.route: Optional[str] = None
+        self.commands = 0
+        self.duration_ms = 0.0
+        self.documents = 0
+        self.failures = 0
+        # "find accounts" -> cantidad; delata patrones N+1 (muchos find/update sobre la misma colección)
+        self.by_command: Dict[str, int] = {}
+        self.slow_commands: List[dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, command: str, duration_ms: float, documents: int, failed: bool = False):
+        # Motor ejecuta los comandos en su pool de hilos: proteger los contadores
+        with self._lock:
+            self.commands += 1
+            self.duration_ms += duration_ms
+            self.documents += documents
+            if failed:
+                self.failures += 1
+            self.by_command[command] = self.by_command.get(command, 0) + 1
+            if duration_ms >= settings.profiler_slow_command_ms:
+                self.slow_commands.append({"command": command, "duration_ms": round(duration_ms, 2)})
+
+
+class RouteStats:
+    """Acumulado por ruta (plantilla de FastAPI, p. ej. GET /api/accounts/{account_id})"""
+
+    def __init__(self):
+        self.requests = 0
+        self.commands = 0
+        self.max_commands = 0
+        self.duration_ms = 0.0
+        self.request_ms = 0.0
+        self.documents = 0
+        self.flagged = 0
+        self.by_command: Dict[str, int] = {}
+
+    def add(self, profile: RequestProfile, request_ms: float, flagged: bool):
+        self.requests += 1
+        self.commands += profile.commands
+        self.max_commands = max(self.max_commands, profile.commands)
+        self.duration_ms += profile.duration_ms
+        self.request_ms += request_ms
+        self.documents += profile.documents
+        if flagged:
+            self.flagged += 1
+        for command, count in profile.by_command.items():
+            self.by_command[command] = self.by_command.get(command, 0) + count
+
+    def to_dict(self, route: str) -> dict:
+        requests = self.requests or 1
+        top = sorted(self.by_command.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            "route": route,
+            "requests": self.requests,
+            "avg_commands": round(self.commands / requests, 2),
+            "max_commands": self.max_commands,
+            "avg_mongo_ms": round(self.duration_ms / requests, 2),
+            "avg_request_ms": round(self.request_ms / requests, 2),
+            "avg_documents": round(self.documents / requests, 2),
+            "flagged_requests": self.flagged,
+            "top_commands": [{"command": command, "count": count} for command, count in top]
+        }
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def _returned_documents(reply: dict) -> int:
+    """Documentos devueltos por un comando: lote del cursor o `n` de conteos y escrituras"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        if batch is not None:
+            return len(batch)
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class MongoCommandProfiler(monitoring.CommandListener):
+    """
+    Listener de comandos de pymongo. Motor ejecuta cada operación en un hilo con
+    una copia del contexto de la corrutina, así que `current_profile` identifica
+    la petición que originó el comando.
+    """
+
+    def __init__(self):
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if current_profile.get() is None:
+            return
+        collection = event.command.get(event.command_name)
+        label = f"{event.command_name} {collection}" if isinstance(collection, str) else event.command_name
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = label
+
+    def _finish(self, event, documents: int, failed: bool):
+        with self._lock:
+            label = self._pending.pop((event.connection_id, event.request_id), None)
+        profile = current_profile.get()
+        if profile is None or label is None:
+            return
+        profile.record(label, event.duration_micros / 1000, documents, failed)
+
+    def succeeded(self, event):
+        self._finish(event, _returned_documents(event.reply), False)
+
+    def failed(self, event):
+        self._finish(event, 0, True)
+
+
+class QueryProfiler:
+    """Registro global: listener de pymongo y estadísticas por ruta"""
+
+    def __init__(self):
+        self.listener = MongoCommandProfiler()
+        self.routes: Dict[str, RouteStats] = {}
+        self.started_at = time.time()
+        self._registered = False
+
+    def register(self):
+        """Registrar el listener; solo afecta a los clientes Motor creados después"""
+        if not self._registered and settings.profiler_enabled:
+            monitoring.register(self.listener)
+            self._registered = True
+
+    def finish(self, profile: RequestProfile, request_ms: float):
+        flagged = (
+            profile.commands > settings.profiler_max_round_trips
+            or bool(profile.slow_commands)
+        )
+        # Sin ruta resuelta (404): no usar la URL para no multiplicar las claves
+        route = profile.route or "(sin ruta)"
+        key = f"{profile.method} {route}"
+        self.routes.setdefault(key, RouteStats()).add(profile, request_ms, flagged)
+        if flagged:
+            top = sorted(profile.by_command.items(), key=lambda item: item[1], reverse=True)[:3]
+            summary = ", ".join(f"{command} x{count}" for command, count in top)
+            logger.warning(
+                "🐢 %s: %s comandos Mongo, %.1f ms en Mongo, %.1f ms total (%s)",
+                key, profile.commands, profile.duration_ms, request_ms, summary
+            )
+            for slow in profile.slow_commands[:5]:
+                logger.warning("   ⏱️ %s: %s ms", slow["command"], slow["duration_ms"])
+
+    def stats(self, limit: int = 50, sort: str = "avg_commands") -> dict:
+        rows = [stats.to_dict(route) for route, stats in self.routes.items()]
+        rows.sort(key=lambda row: row.get(sort, 0), reverse=True)
+        return {
+            "since": self.started_at,
+            "max_round_trips": settings.profiler_max_round_trips,
+            "slow_command_ms": settings.profiler_slow_command_ms,
+            "routes": rows[:limit]
+        }
+
+    def reset(self):
+        self.routes = {}
+        self.started_at = time.time()
+
+
+profiler = QueryProfiler()
+
+
+_route_paths: Dict[int, str] = {}
+
+
+def route_template(scope) -> Optional[str]:
+    """Plantilla de la ruta atendida (p. ej. /api/accounts/{account_id}); el router de Starlette deja el endpoint en el scope"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+    if not _route_paths:
+        routes = getattr(scope.get("app"), "routes", [])
+        _route_paths.update({id(route.endpoint): route.path for route in routes if hasattr(route, "endpoint")})
+    return _route_paths.get(id(endpoint))
+
+
+class QueryProfilerMiddleware:
+    """Middleware ASGI: abre un RequestProfile por petición HTTP y lo cierra al terminar"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.profiler_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope.get("method", ""), scope.get("path", ""))
+        token = current_profile.set(profile)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_profile.reset(token)
+            profile.route = route_template(scope)
+            profiler.finish(profile, (time.perf_counter() - t0) * 1000)
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from fastapi.responses import Response
+from app.config import settings
+from app.services.fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, Tuple[Tuple[str, Any], ...], str]
+
+
+class ReportCache:
+    """
+    Caché LRU de reportes ya serializados (JSON) por empresa, reporte, parámetros
+    y versión de datos de la empresa. Una escritura cambia la versión, así que las
+    entradas anteriores dejan de pedirse y salen por LRU; no hace falta invalidar.
+
+    Las peticiones idénticas concurrentes se agrupan (single-flight): solo una
+    calcula el reporte y las demás esperan su resultado. El cálculo corre en su
+    propia tarea para que la desconexión del primer cliente no cancele a los demás.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(company_id: str, report: str, params: Dict[str, Any], version: str) -> CacheKey:
+        return (company_id, report, tuple(sorted(params.items())), version)
+
+    async def get_or_compute(
+        self,
+        company_id: str,
+        report: str,
+        params: Dict[str, Any],
+        version: str,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> bytes:
+        """
+        Cuerpo JSON del reporte: desde la caché, esperando un cálculo idéntico en
+        curso o ejecutando `compute()`. `version` debe leerse antes de calcular.
+        """
+        if not settings.report_cache_enabled:
+            return dumps(await compute())
+
+        key = self.key(company_id, report, params, version)
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._compute(key, compute))
+        # Recuperar la excepción aunque todos los clientes se hayan desconectado
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: CacheKey, compute: Callable[[], Awaitable[Any]]) -> bytes:
+        try:
+            body = dumps(await compute())
+            self._store(key, body)
+            return body
+        finally:
+            # Los errores no se guardan: la próxima petición vuelve a calcular
+            self._inflight.pop(key, None)
+
+    def _store(self, key: CacheKey, body: bytes):
+        if len(body) > self.max_bytes:
+            logger.debug("📦 Reporte %s de %s bytes excede el presupuesto de la caché", key[1], len(body))
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= len(previous)
+        self._entries[key] = body
+        self.bytes += len(body)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def reset_stats(self):
+        self.hits = self.misses = self.coalesced = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": settings.report_cache_enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def cached_json(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+report_cache = ReportCache(settings.report_cache_max_entries, settings.report_cache_max_bytes)
@@ -0,0 +1,443 @@
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from app.config import settings
+from app.models.company import Company
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry, JournalEntryType
+from app.models.money import from_cents, to_cents
+from app.services.cash_flow import classify
+from app.services.chart_cache import ChartSnapshot, chart_cache
+from app.services.ledger_archive import ledger_archives
+
+# Roles de las cuentas en el Formulario 104 (IVA)
+VENTAS_GRAVADAS = "ventas_gravadas"
+VENTAS_TARIFA_0 = "ventas_tarifa_0"
+EXPORTACIONES = "exportaciones"
+COMPRAS_GRAVADAS = "compras_gravadas"
+ACTIVOS_FIJOS_GRAVADOS = "activos_fijos_gravados"
+COMPRAS_TARIFA_0 = "compras_tarifa_0"
+IVA_VENTAS = "iva_ventas"
+IVA_COMPRAS = "iva_compras"
+IVA_ACTIVOS_FIJOS = "iva_activos_fijos"
+RETENCIONES_IVA = "retenciones_iva"
+ROLES_104 = (
+    VENTAS_GRAVADAS, VENTAS_TARIFA_0, EXPORTACIONES,
+    COMPRAS_GRAVADAS, ACTIVOS_FIJOS_GRAVADOS, COMPRAS_TARIFA_0,
+    IVA_VENTAS, IVA_COMPRAS, IVA_ACTIVOS_FIJOS, RETENCIONES_IVA,
+)
+
+# Roles de los tipos de comprobante (DocumentType.receipt_type, tabla 4 del SRI)
+BRUTO = "bruto"                # Factura, nota de venta, liquidación...: valor bruto
+NOTA_CREDITO = "nota_credito"  # Descuenta del valor bruto para llegar al neto
+EXCLUIDO = "excluido"          # No alimenta el formulario
+RECEIPT_ROLES = (BRUTO, NOTA_CREDITO, EXCLUIDO)
+
+# Clasificación por defecto del plan de cuentas de ejemplo (create_sample_chart.py).
+# Cada cuenta toma el rol de su ancestro más cercano (o de sí misma) presente aquí.
+DEFAULT_ACCOUNTS_104: Dict[str, str] = {
+    "4101": VENTAS_GRAVADAS,  # Ventas
+    "4102": VENTAS_GRAVADAS,  # Servicios
+    "2103": IVA_VENTAS,       # Impuestos por pagar
+}
+# Comprobantes sin tipo SRI o sin entrada aquí cuentan como valor bruto
+DEFAULT_RECEIPT_TYPES: Dict[str, str] = {
+    "04": NOTA_CREDITO,  # Nota de crédito
+}
+
+# Conceptos de retención en la fuente del Formulario 103: (casillero base imponible,
+# casillero valor retenido, descripción)
+CONCEPTS_103: Dict[str, Tuple[str, str, str]] = {
+    "servicios_profesionales": ("303", "353", "Honorarios profesionales y dietas"),
+    "servicios_intelecto": ("304", "354", "Servicios donde predomina el intelecto"),
+    "servicios": ("307", "357", "Servicios donde predomina la mano de obra"),
+    "publicidad": ("309", "359", "Servicios de publicidad y comunicación"),
+    "transporte": ("310", "360", "Transporte privado de pasajeros o de carga"),
+    "bienes": ("312", "362", "Transferencia de bienes muebles de naturaleza corporal"),
+    "arrendamiento": ("320", "370", "Arrendamiento de bienes inmuebles"),
+    "seguros": ("322", "372", "Seguros y reaseguros"),
+    "intereses": ("323", "373", "Rendimientos financieros"),
+    "otros": ("346", "396", "Otras retenciones aplicables"),
+}
+ROLES_103 = tuple(CONCEPTS_103)
+# Roles de los tipos de comprobante en el Formulario 103
+RETENCION = "retencion"  # Cuenta todo, también las anulaciones (saldo deudor)
+RECEIPT_ROLES_103 = (RETENCION, EXCLUIDO)
+# Las cuentas de retención dependen del plan de cada empresa: sin clasificación por omisión
+DEFAULT_ACCOUNTS_103: Dict[str, str] = {}
+DEFAULT_RECEIPT_TYPES_103: Dict[str, str] = {
+    "07": RETENCION,  # Comprobante de retención
+}
+# Prefijo de los asientos de reversión (LedgerService.reverse_journal_entry)
+_REVERSAL_PREFIX = "REV-"
+
+# Casilleros (valor bruto, valor neto) de cada rol de base imponible
+_SALES_BOXES = {
+    VENTAS_GRAVADAS: ("401", "411"),
+    VENTAS_TARIFA_0: ("403", "413"),
+    EXPORTACIONES: ("407", "417"),
+}
+_PURCHASE_BOXES = {
+    COMPRAS_GRAVADAS: ("500", "510"),
+    ACTIVOS_FIJOS_GRAVADOS: ("501", "511"),
+    COMPRAS_TARIFA_0: ("507", "517"),
+}
+# Casillero del impuesto de cada cuenta de IVA
+_TAX_BOXES = {IVA_VENTAS: "421", IVA_COMPRAS: "520", IVA_ACTIVOS_FIJOS: "521"}
+
+
+def parse_mapping(items: Iterable[str], allowed: Tuple[str, ...], what: str) -> Dict[str, str]:
+    """["4101=ventas_gravadas", "2103=iva_ventas"] o "4101=ventas_gravadas,..." -> {código: rol}"""
+    mapping = {}
+    for item in items:
+        for pair in (item or "").split(","):
+            if "=" not in pair:
+                continue
+            code, role = (part.strip() for part in pair.split("=", 1))
+            if code and role:
+                if role not in allowed:
+                    raise ValueError(f"Rol desconocido '{role}' para {what} {code}. Use: {', '.join(allowed)}")
+                mapping[code] = role
+    return mapping
+
+
+def resolve_roles(
+    defaults: Dict[str, str],
+    configured: str,
+    requested: Iterable[str],
+    allowed: Tuple[str, ...],
+    what: str
+) -> Dict[str, str]:
+    """Roles por omisión, luego los de la configuración y luego los de la petición"""
+    return {**defaults, **parse_mapping([configured], allowed, what), **parse_mapping(requested, allowed, what)}
+
+
+def roles_104(accounts: Iterable[str] = (), receipt_types: Iterable[str] = ()) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return (
+        resolve_roles(DEFAULT_ACCOUNTS_104, settings.sri_104_accounts, accounts, ROLES_104, "la cuenta"),
+        resolve_roles(DEFAULT_RECEIPT_TYPES, settings.sri_104_receipt_types, receipt_types, RECEIPT_ROLES, "el comprobante"),
+    )
+
+
+def roles_103(accounts: Iterable[str] = (), receipt_types: Iterable[str] = ()) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return (
+        resolve_roles(DEFAULT_ACCOUNTS_103, settings.sri_103_accounts, accounts, ROLES_103, "la cuenta"),
+        resolve_roles(DEFAULT_RECEIPT_TYPES_103, settings.sri_103_receipt_types, receipt_types, RECEIPT_ROLES_103, "el comprobante"),
+    )
+
+
+def company_header(company: Company, period: str) -> Dict[str, Any]:
+    return {
+        "empresa": str(company.id),
+        "periodo": period,
+        "ruc_empresa": company.ruc,
+        "nombre_empresa": company.legal_name or company.name,
+    }
+
+
+def month_bounds(period: str) -> Tuple[datetime, datetime]:
+    """'YYYY-MM' -> (primer día del mes, primer día del mes siguiente); ValueError si no es válido"""
+    start = datetime.strptime(period, "%Y-%m")
+    return start, datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def posted_match(company_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+    # Los asientos de cierre no son operaciones gravadas ni retenciones
+    return {
+        "company_id": company_id,
+        "date": {"$gte": start, "$lt": end},
+        "status": "posted",
+        "entry_type": {"$ne": JournalEntryType.CLOSING.value},
+    }
+
+
+async def journal_line_sums(company_id: str, start: datetime, end: datetime) -> List[dict]:
+    """
+    Débitos y créditos del período por (tipo de documento, cuenta) de los asientos
+    mayorizados, en una sola agregación (con los años archivados si el período los
+    alcanza).
+    """
+    match = posted_match(company_id, start, end)
+    stages = [
+        {"$unwind": "$lines"},
+        {"$group": {
+            "_id": {
+                "document_type_id": "$document_type_id",
+                "document_type_code": "$document_type_code",
+                "account_code": "$lines.account_code",
+            },
+            "sum_debit": {"$sum": {"$ifNull": ["$lines.debit", 0]}},
+            "sum_credit": {"$sum": {"$ifNull": ["$lines.credit", 0]}},
+        }},
+    ]
+    archived = await ledger_archives.journal_collections(company_id, match)
+    pipeline = ledger_archives.journal_pipeline(match, archived, stages)
+    return await JournalEntry.get_motor_collection().aggregate(pipeline).to_list(length=None)
+
+
+async def document_receipt_types(company_id: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Tipo de comprobante SRI de los tipos de documento de la empresa, por id y por código"""
+    by_id: Dict[str, str] = {}
+    by_code: Dict[str, str] = {}
+    async for doc in DocumentType.get_motor_collection().find(
+        {"company_id": company_id, "receipt_type": {"$nin": [None, ""]}}, {"code": 1, "receipt_type": 1}
+    ):
+        by_id[str(doc["_id"])] = doc["receipt_type"]
+        by_code[doc["code"]] = doc["receipt_type"]
+    return by_id, by_code
+
+
+def build_formulario_104(
+    chart: ChartSnapshot,
+    sums: List[dict],
+    document_receipts: Tuple[Dict[str, str], Dict[str, str]],
+    accounts: Dict[str, str],
+    receipts: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    Casilleros del Formulario 104 a partir de las sumas por (documento, cuenta).
+
+    Las bases imponibles van a valor bruto o a notas de crédito según el rol del
+    tipo de comprobante; neto = bruto - notas de crédito. El IVA de cada casillero
+    sale de las cuentas de IVA (ya neto de notas de crédito). Supuestos: factor de
+    proporcionalidad 1 y sin saldo de crédito tributario del mes anterior.
+    """
+    role_of, _ = classify(chart, accounts)
+    by_id, by_code = document_receipts
+    # Centavos por rol: [valor bruto, notas de crédito]
+    amounts: Dict[str, List[int]] = {role: [0, 0] for role in ROLES_104}
+    details: Dict[Tuple[str, str], int] = {}
+
+    for row in sums:
+        key = row["_id"]
+        index = chart.index_by_code.get(key.get("account_code"))
+        role = role_of[index] if index is not None else None
+        if role is None:
+            continue
+        receipt_type = by_id.get(key.get("document_type_id") or "") or by_code.get(key.get("document_type_code") or "")
+        receipt_role = receipts.get(receipt_type, BRUTO) if receipt_type else BRUTO
+        if receipt_role == EXCLUIDO:
+            continue
+        debit, credit = to_cents(row.get("sum_debit")), to_cents(row.get("sum_credit"))
+        # Ventas e IVA cobrado son de naturaleza acreedora; compras, IVA pagado y retenciones, deudora
+        amount = credit - debit if role in _SALES_BOXES or role == IVA_VENTAS else debit - credit
+        if receipt_role == NOTA_CREDITO:
+            amounts[role][1] -= amount
+        else:
+            amounts[role][0] += amount
+        detail = (chart.codes[index], receipt_type or "")
+        details[detail] = details.get(detail, 0) + amount
+
+    boxes: Dict[str, int] = {}
+    for table, gross_total, net_total in ((_SALES_BOXES, "409", "419"), (_PURCHASE_BOXES, "509", "519")):
+        boxes[gross_total] = boxes[net_total] = 0
+        for role, (gross_box, net_box) in table.items():
+            gross, credit_notes = amounts[role]
+            boxes[gross_box] = gross
+            boxes[net_box] = gross - credit_notes
+            boxes[gross_total] += gross
+            boxes[net_total] += gross - credit_notes
+    for role, box in _TAX_BOXES.items():
+        boxes[box] = amounts[role][0] - amounts[role][1]
+    boxes["429"] = boxes["421"]
+    boxes["529"] = boxes["520"] + boxes["521"]
+    # Resumen impositivo
+    boxes["601"] = max(boxes["429"] - boxes["529"], 0)  # Impuesto causado
+    boxes["602"] = max(boxes["529"] - boxes["429"], 0)  # Crédito tributario aplicable
+    boxes["609"] = amounts[RETENCIONES_IVA][0] - amounts[RETENCIONES_IVA][1]  # Retenciones que le efectuaron
+    boxes["615"] = max(boxes["609"] - boxes["601"], 0)  # Saldo de retenciones para el próximo mes
+    boxes["699"] = max(boxes["601"] - boxes["609"], 0)  # Total impuesto a pagar
+
+    def _sales_or_purchases(table: Dict[str, Tuple[str, str]], total_box: str) -> Dict[str, Any]:
+        section = {role: from_cents(boxes[net_box]) for role, (_, net_box) in table.items()}
+        section["notas_credito"] = from_cents(sum(amounts[role][1] for role in table))
+        section["total"] = from_cents(boxes[total_box])
+        return section
+
+    return {
+        "ventas": _sales_or_purchases(_SALES_BOXES, "419"),
+        "compras": _sales_or_purchases(_PURCHASE_BOXES, "519"),
+        "iva": {
+            "iva_ventas": from_cents(boxes["429"]),
+            "iva_compras": from_cents(boxes["529"]),
+            "retenciones": from_cents(boxes["609"]),
+            "iva_pagar": from_cents(boxes["699"]),
+            "credito_tributario": from_cents(boxes["602"]),
+        },
+        "casilleros": {box: from_cents(boxes[box]) for box in sorted(boxes)},
+        # Aporte de cada cuenta y tipo de comprobante (conciliación con el mayor)
+        "detalle": [
+            {
+                "cuenta": code,
+                "nombre": chart.names[chart.index_by_code[code]],
+                "rol": role_of[chart.index_by_code[code]],
+                "tipo_comprobante": receipt_type or None,
+                "monto": from_cents(amount)
+            }
+            for (code, receipt_type), amount in sorted(details.items())
+            if amount
+        ],
+    }
+
+
+async def formulario_104(company: Company, period: str, account_roles: Dict[str, str], receipt_roles: Dict[str, str]) -> Dict[str, Any]:
+    company_id = str(company.id)
+    start, end = month_bounds(period)
+    chart = await chart_cache.get(company_id)
+    sums, document_receipts = await asyncio.gather(
+        journal_line_sums(company_id, start, end),
+        document_receipt_types(company_id)
+    )
+    return {
+        **company_header(company, period),
+        **build_formulario_104(chart, sums, document_receipts, account_roles, receipt_roles)
+    }
+
+
+class Formulario103:
+    """
+    Retenciones en la fuente del mes a partir de los asientos mayorizados que tocan
+    cuentas de retención (cada cuenta toma el concepto de su ancestro clasificado
+    más cercano). Una sola lectura con cursor: `rows()` produce el detalle por
+    asiento y concepto sin cargar el mes en memoria y `summary()` lo totaliza.
+
+    Por asiento, lo retenido es el saldo acreedor de sus cuentas de retención. Un
+    saldo deudor es el pago al SRI y no cuenta, salvo en comprobantes de retención
+    (anulaciones) y en asientos de reversión. La base imponible son los débitos
+    del asiento fuera de las cuentas de retención y de IVA (los créditos en una
+    reversión); con varios conceptos se reparte en proporción a lo retenido.
+    """
+
+    def __init__(
+        self,
+        chart: ChartSnapshot,
+        company_id: str,
+        period: str,
+        account_roles: Dict[str, str],
+        receipt_roles: Dict[str, str],
+        vat_roles: Dict[str, str],
+        document_receipts: Tuple[Dict[str, str], Dict[str, str]]
+    ):
+        self.chart = chart
+        self.company_id = company_id
+        self.start, self.end = month_bounds(period)
+        self.receipt_roles = receipt_roles
+        self.document_receipts = document_receipts
+        self.concept_of, _ = classify(chart, account_roles)
+        vat_of, _ = classify(chart, vat_roles)
+        self.vat_codes = {chart.codes[i] for i, role in enumerate(vat_of) if role in _TAX_BOXES}
+        self.withholding_codes = [chart.codes[i] for i, concept in enumerate(self.concept_of) if concept]
+
+    @classmethod
+    async def load(cls, company_id: str, period: str, account_roles: Dict[str, str], receipt_roles: Dict[str, str]) -> "Formulario103":
+        chart, document_receipts = await asyncio.gather(chart_cache.get(company_id), document_receipt_types(company_id))
+        return cls(chart, company_id, period, account_roles, receipt_roles, roles_104()[0], document_receipts)
+
+    def _receipt_type(self, entry: dict) -> Optional[str]:
+        by_id, by_code = self.document_receipts
+        return by_id.get(entry.get("document_type_id") or "") or by_code.get(entry.get("document_type_code") or "")
+
+    def entry_rows(self, entry: dict) -> List[Dict[str, Any]]:
+        """Filas del detalle de un asiento: una por concepto retenido"""
+        receipt_type = self._receipt_type(entry)
+        receipt_role = self.receipt_roles.get(receipt_type) if receipt_type else None
+        if receipt_role == EXCLUIDO:
+            return []
+        withheld: Dict[str, int] = {}
+        base_debit = base_credit = 0
+        for line in entry.get("lines") or []:
+            code = line.get("account_code")
+            debit, credit = to_cents(line.get("debit")), to_cents(line.get("credit"))
+            index = self.chart.index_by_code.get(code)
+            concept = self.concept_of[index] if index is not None else None
+            if concept:
+                withheld[concept] = withheld.get(concept, 0) + credit - debit
+            elif code not in self.vat_codes:
+                base_debit += debit
+                base_credit += credit
+
+        total = sum(withheld.values())
+        if not total:
+            return []
+        reversal = (entry.get("entry_number") or "").startswith(_REVERSAL_PREFIX)
+        if total < 0 and receipt_role != RETENCION and not reversal:
+            return []
+        base = base_debit if total > 0 else -base_credit
+
+        rows = []
+        allocated = 0
+        concepts = sorted(concept for concept, amount in withheld.items() if amount)
+        for n, concept in enumerate(concepts):
+            # El último concepto recibe el resto del reparto (sin perder centavos)
+            share = base - allocated if n == len(concepts) - 1 else base * withheld[concept] // total
+            allocated += share
+            rows.append({
+                "asiento_id": str(entry["_id"]),
+                "asiento": entry.get("entry_number"),
+                "fecha": entry.get("date"),
+                "descripcion": entry.get("description"),
+                "tipo_comprobante": receipt_type,
+                "concepto": concept,
+                "casillero": CONCEPTS_103[concept][1],
+                "base_imponible": from_cents(share),
+                "valor_retenido": from_cents(withheld[concept]),
+            })
+        return rows
+
+    async def entries(self) -> AsyncIterator[dict]:
+        """Asientos mayorizados del mes con alguna línea en cuentas de retención (cursor)"""
+        if not self.withholding_codes:
+            return
+        match = {**posted_match(self.company_id, self.start, self.end), "lines.account_code": {"$in": self.withholding_codes}}
+        stages = [
+            {"$sort": {"date": 1, "_id": 1}},
+            {"$project": {
+                "entry_number": 1, "date": 1, "description": 1, "document_type_id": 1, "document_type_code": 1,
+                "lines.account_code": 1, "lines.debit": 1, "lines.credit": 1,
+            }},
+        ]
+        archived = await ledger_archives.journal_collections(self.company_id, match)
+        pipeline = ledger_archives.journal_pipeline(match, archived, stages)
+        async for entry in JournalEntry.get_motor_collection().aggregate(pipeline):
+            yield entry
+
+    async def rows(self) -> AsyncIterator[Dict[str, Any]]:
+        async for entry in self.entries():
+            for row in self.entry_rows(entry):
+                yield row
+
+    async def summary(self) -> Dict[str, Any]:
+        """Totales por concepto y casilleros del formulario"""
+        bases = {concept: 0 for concept in CONCEPTS_103}
+        withheld = {concept: 0 for concept in CONCEPTS_103}
+        count = 0
+        async for row in self.rows():
+            bases[row["concepto"]] += to_cents(row["base_imponible"])
+            withheld[row["concepto"]] += to_cents(row["valor_retenido"])
+            count += 1
+
+        boxes: Dict[str, int] = {}
+        for concept, (base_box, withheld_box, _) in CONCEPTS_103.items():
+            boxes[base_box] = bases[concept]
+            boxes[withheld_box] = withheld[concept]
+        boxes["349"] = sum(bases.values())
+        boxes["399"] = sum(withheld.values())
+        return {
+            "retenciones": {
+                concept: {
+                    "descripcion": description,
+                    "base_imponible": from_cents(bases[concept]),
+                    "valor_retenido": from_cents(withheld[concept]),
+                }
+                for concept, (_, _, description) in CONCEPTS_103.items()
+            },
+            "total_retenciones": from_cents(boxes["399"]),
+            "casilleros": {box: from_cents(boxes[box]) for box in sorted(boxes)},
+            "cuentas_de_retencion": self.withholding_codes,
+            "registros_detalle": count,
+        }
+
+
+async def formulario_103(company: Company, period: str, account_roles: Dict[str, str], receipt_roles: Dict[str, str]) -> Dict[str, Any]:
+    form = await Formulario103.load(str(company.id), period, account_roles, receipt_roles)
+    return {**company_header(company, period), **await form.summary()}
@@ -0,0 +1,47 @@
+import logging
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession
+from app.config import settings
+from app.models.account import Account
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Soporte de transacciones por cliente (id del cliente -> bool)
+_transactions_supported: Dict[int, bool] = {}
+
+
+async def supports_transactions(client: AsyncIOMotorClient) -> bool:
+    """
+    Indica si el servidor admite transacciones multi-documento
+    (replica set o mongos). Se consulta una sola vez por cliente.
+    """
+    key = id(client)
+    if key not in _transactions_supported:
+        hello = await client.admin.command("hello")
+        supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        _transactions_supported[key] = supported
+        if not supported:
+            logger.warning("⚠️ MongoDB sin replica set: las operaciones contables se ejecutan sin transacción")
+    return _transactions_supported[key]
+
+
+async def run_in_transaction(operation: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[T]]) -> T:
+    """
+    Ejecutar `operation(session)` dentro de una transacción multi-documento.
+
+    Usa `with_transaction`, que reintenta la operación completa ante errores
+    transitorios (TransientTransactionError, p. ej. conflictos de escritura) y
+    reintenta el commit ante UnknownTransactionCommitResult. Por eso la operación
+    debe ser re-ejecutable: no debe modificar estado en memoria hasta que termine.
+
+    Si las transacciones están deshabilitadas (MONGODB_TRANSACTIONS=false) o el
+    servidor es standalone, la operación se ejecuta sin sesión.
+    """
+    client = Account.get_motor_collection().database.client
+    if not settings.mongodb_transactions or not await supports_transactions(client):
+        return await operation(None)
+
+    async with await client.start_session() as session:
+        return await session.with_transaction(operation)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización: ruta estándar de FastAPI frente a la ruta rápida (?fast=true).
+
+    estándar  modelo de respuesta por fila + validación contra response_model +
+              jsonable_encoder + JSONResponse (lo que hace FastAPI hoy)
+    rápida    ProjectionSchema sobre documentos crudos + orjson (FastJSONResponse)
+
+Casos: plan de cuentas (AccountResponse), asientos con líneas (JournalEntryResponse)
+y mayor general (AccountLedgerSummary con movimientos). Antes de medir verifica que
+ambas rutas produzcan el mismo JSON. La ruta estándar no incluye la construcción de
+los documentos Beanie, que la ruta rápida también evita: la mejora real es mayor.
+
+Uso:
+    python scripts/bench_fast_json.py
+    python scripts/bench_fast_json.py --accounts 5000 --entries 1000 --ledgers 1000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.models.account import AccountResponse
+from app.models.journal import JournalEntryResponse
+from app.models.ledger import AccountLedgerSummary, LedgerEntryResponse
+from app.models.money import from_cents
+from app.routes.accounts import _ACCOUNT_FAST_SCHEMA
+from app.routes.journal import _ENTRY_FAST_SCHEMA
+from app.services.fast_json import FastJSONResponse
+
+rng = random.Random(42)
+NOW = datetime(2025, 6, 30, 12, 0, 0, 123000)
+
+
+def amount() -> Decimal128:
+    return Decimal128(from_cents(rng.randrange(0, 10_000_000)))
+
+
+def account_docs(count: int) -> List[dict]:
+    return [{
+        "_id": ObjectId(), "code": f"1{i:06d}", "name": f"CUENTA {i}", "description": None,
+        "account_type": "activo", "nature": "deudora", "parent_code": "1", "level": 4,
+        "company_id": "bench-company", "is_active": True, "is_editable": True,
+        "initial_debit_balance": amount(), "initial_credit_balance": amount(),
+        "current_debit_balance": amount(), "current_credit_balance": amount(),
+        "last_transaction_date": NOW, "revision": 3, "created_at": NOW, "updated_at": NOW,
+        "created_by": "bench",
+    } for i in range(count)]
+
+
+def entry_docs(count: int, lines: int) -> List[dict]:
+    docs = []
+    for i in range(count):
+        doc_lines = [{
+            "account_code": f"1{j:06d}", "account_name": f"CUENTA {j}", "description": "Movimiento",
+            "debit": amount(), "credit": Decimal128("0.00"), "reference": None,
+        } for j in range(lines)]
+        docs.append({
+            "_id": ObjectId(), "entry_number": f"CE-{i:06d}", "document_type_id": None, "document_type_code": "CE",
+            "date": NOW - timedelta(days=i % 365), "description": f"Asiento {i}", "entry_type": "manual",
+            "status": "posted", "lines": doc_lines, "total_debit": amount(), "total_credit": amount(),
+            "company_id": "bench-company", "created_by": "bench", "responsable": None,
+            "approved_by": None, "approved_at": None, "revision": 1, "created_at": NOW, "updated_at": NOW,
+        })
+    return docs
+
+
+def ledger_summaries(count: int, entries: int) -> List[AccountLedgerSummary]:
+    return [AccountLedgerSummary(
+        account_id=str(ObjectId()), account_code=f"1{i:06d}", account_name=f"CUENTA {i}",
+        account_type="activo", nature="deudora", parent_code="1", level=4,
+        initial_debit_balance=amount(), initial_credit_balance=amount(),
+        current_debit_balance=amount(), current_credit_balance=amount(),
+        net_balance=amount(), total_debits=amount(), total_credits=amount(),
+        entry_count=entries, last_transaction_date=NOW,
+        entries=[LedgerEntryResponse(
+            id=str(ObjectId()), account_id="a", account_code=f"1{i:06d}", account_name=f"CUENTA {i}",
+            company_id="bench-company", entry_type="journal", journal_entry_id=str(ObjectId()),
+            date=NOW, description="Movimiento", reference=None,
+            debit_amount=amount(), credit_amount=Decimal128("0.00"),
+            running_debit_balance=amount(), running_credit_balance=amount(),
+            created_at=NOW, created_by="bench",
+        ) for _ in range(entries)],
+    ) for i in range(count)]
+
+
+def account_models(docs: List[dict]) -> List[AccountResponse]:
+    return [AccountResponse(id=str(doc["_id"]), **{k: v for k, v in doc.items() if k not in ("_id", "created_by")}) for doc in docs]
+
+
+def entry_models(docs: List[dict]) -> List[JournalEntryResponse]:
+    return [JournalEntryResponse(id=str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id"}) for doc in docs]
+
+
+async def standard(model, build, payload) -> bytes:
+    """Lo que FastAPI hace con una ruta con response_model"""
+    field = create_response_field(name="bench", type_=List[model])
+    content = await serialize_response(field=field, response_content=build(payload), is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def fast(schema, payload) -> bytes:
+    content = schema.rows(payload) if schema is not None else payload
+    return FastJSONResponse(content).body
+
+
+async def measure(label: str, repeat: int, standard_call, fast_call):
+    standard_body = await standard_call()
+    fast_body = await fast_call()
+    if json.loads(standard_body) != json.loads(fast_body):
+        print(f"❌ {label}: las rutas estándar y rápida producen JSON distinto")
+        return False
+    timings = {}
+    for name, call in (("estándar", standard_call), ("rápida", fast_call)):
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            await call()
+            best = min(best, time.perf_counter() - t0)
+        timings[name] = best
+    speedup = timings["estándar"] / timings["rápida"] if timings["rápida"] else float("inf")
+    print(
+        f"✅ {label:<34} estándar {timings['estándar'] * 1000:9.2f} ms   "
+        f"rápida {timings['rápida'] * 1000:8.2f} ms   x{speedup:5.1f}   ({len(fast_body) / 1024:.0f} KiB)"
+    )
+    return True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización estándar vs orjson")
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--entries", type=int, default=1000, help="Asientos (10 líneas cada uno)")
+    parser.add_argument("--ledgers", type=int, default=1000, help="Resúmenes del mayor (10 movimientos cada uno)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    accounts = account_docs(args.accounts)
+    entries = entry_docs(args.entries, 10)
+    ledgers = ledger_summaries(args.ledgers, 10)
+
+    ok = all([
+        await measure(
+            f"Plan de cuentas ({args.accounts})", args.repeat,
+            lambda: standard(AccountResponse, account_models, accounts),
+            lambda: fast(_ACCOUNT_FAST_SCHEMA, accounts),
+        ),
+        await measure(
+            f"Asientos ({args.entries} x 10 líneas)", args.repeat,
+            lambda: standard(JournalEntryResponse, entry_models, entries),
+            lambda: fast(_ENTRY_FAST_SCHEMA, entries),
+        ),
+        await measure(
+            f"Mayor general ({args.ledgers} x 10 mov.)", args.repeat,
+            lambda: standard(AccountLedgerSummary, lambda rows: rows, ledgers),
+            lambda: fast(None, ledgers),
+        ),
+    ])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de los algoritmos sobre el plan de cuentas.
+
+Ejecuta en memoria (sin MongoDB) los algoritmos de LedgerService y de los reportes
+sobre planes sintéticos de distintos tamaños:
+
+    sort            sort_accounts_hierarchically (Plan de Cuentas y Mayor General)
+    report          ChartSnapshot + rollup + _build_report_groups (balance general)
+    fix-hierarchy   _fix_complete_hierarchy_internal con un backend Motor simulado
+
+Registra tiempos y viajes a la base (round trips) por tamaño, estima el exponente
+de complejidad (pendiente log-log del tiempo frente al tamaño) y termina con
+código 1 si algún algoritmo supera el exponente máximo o si sus viajes a la base,
+que deben ser constantes, crecen con el tamaño del plan.
+
+Uso:
+    python scripts/bench_ledger_algorithms.py
+    python scripts/bench_ledger_algorithms.py --sizes 100,1000,10000,50000 --repeat 3 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from bson import Decimal128, ObjectId
+from app.models.account import Account
+from app.models.company_version import CompanyVersion
+from app.models.money import from_cents
+from app.routes.reports import _build_report_groups
+from app.services.chart_cache import ChartSnapshot, chart_cache
+from app.services.ledger_service import LedgerService, sort_accounts_hierarchically
+
+COMPANY_ID = "bench-company"
+ROOTS = "123456"
+
+
+class BenchAccount:
+    """Cuenta en memoria con la misma interfaz que usan los algoritmos"""
+
+    def __init__(self, doc: dict):
+        self.id = doc["_id"]
+        self.code = doc["code"]
+        self.name = doc["name"]
+        self.parent_code = doc["parent_code"]
+        self.level = doc["level"]
+        self.company_id = COMPANY_ID
+        self.current_debit_balance = doc["current_debit_balance"].to_decimal()
+        self.current_credit_balance = doc["current_credit_balance"].to_decimal()
+        self.last_transaction_date = None
+        self.updated_at = None
+
+
+class FakeCursor:
+    def __init__(self, docs: List[dict]):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class FakeBulkResult:
+    def __init__(self, matched: int):
+        self.matched_count = matched
+        self.modified_count = matched
+
+
+class FakeCollection:
+    """Backend Motor simulado: devuelve el plan y cuenta los viajes a la base"""
+
+    def __init__(self, docs: List[dict]):
+        self.docs = docs
+        self.round_trips = 0
+
+    def find(self, *args, **kwargs):
+        self.round_trips += 1
+        return FakeCursor(self.docs)
+
+    async def bulk_write(self, operations, **kwargs):
+        self.round_trips += 1
+        return FakeBulkResult(len(operations))
+
+
+class FakeVersionCollection:
+    """company_versions simulado: comparte el contador de viajes del plan"""
+
+    def __init__(self, accounts: FakeCollection):
+        self.accounts = accounts
+        self.docs = {"*": {"_id": "*", "version": 0, "generation": "bench"}}
+
+    def find(self, query, *args, **kwargs):
+        self.accounts.round_trips += 1
+        return FakeCursor([doc for key, doc in self.docs.items() if key in query["_id"]["$in"]])
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        self.accounts.round_trips += 1
+        doc = self.docs.setdefault(query["_id"], {"_id": query["_id"], "version": 0})
+        doc["version"] += update.get("$inc", {}).get("version", 0)
+        return doc
+
+
+def build_chart(size: int, seed: int) -> List[dict]:
+    """Plan jerárquico (1 -> 101 -> 10101 -> ...) en orden BFS truncado a `size` cuentas"""
+    rng = random.Random(seed)
+    fan_out = max(2, min(99, math.ceil((size / len(ROOTS)) ** (1 / 3))))
+    docs = []
+    queue = [(root, None, 1) for root in ROOTS]
+    while queue and len(docs) < size:
+        code, parent, level = queue.pop(0)
+        docs.append({
+            "_id": ObjectId(),
+            "code": code,
+            "name": f"CUENTA {code}",
+            "parent_code": parent,
+            "level": level,
+            "account_type": "activo",
+            "nature": "deudora",
+            "revision": 0,
+            "initial_debit_balance": Decimal128("0.00"),
+            "initial_credit_balance": Decimal128("0.00"),
+            # Saldos aleatorios: los padres quedan desactualizados a propósito
+            "current_debit_balance": Decimal128(from_cents(rng.randrange(0, 10000000))),
+            "current_credit_balance": Decimal128(from_cents(rng.randrange(0, 10000000))),
+        })
+        if level < 5:
+            queue.extend((f"{code}{i:02d}", code, level + 1) for i in range(1, fan_out + 1))
+    return docs
+
+
+@contextlib.contextmanager
+def fake_motor(collection: FakeCollection):
+    fakes = {Account: collection, CompanyVersion: FakeVersionCollection(collection)}
+    originals = {model: model.__dict__.get("get_motor_collection") for model in fakes}
+    for model, fake in fakes.items():
+        model.get_motor_collection = classmethod(lambda cls, fake=fake: fake)
+    try:
+        yield
+    finally:
+        for model, original in originals.items():
+            if original is None:
+                del model.get_motor_collection
+            else:
+                model.get_motor_collection = original
+
+
+async def bench_sort(docs: List[dict]) -> int:
+    accounts = [BenchAccount(doc) for doc in docs]
+    random.Random(0).shuffle(accounts)
+    sort_accounts_hierarchically(accounts)
+    return 0
+
+
+async def bench_report(docs: List[dict]) -> int:
+    chart = ChartSnapshot(COMPANY_ID, ("bench", 0), docs)
+    movements = [{"_id": doc_id, "sum_debit": Decimal128("10.00"), "sum_credit": Decimal128("2.50")} for doc_id in chart.ids[::3]]
+    debit, credit = chart.movement_vectors(movements)
+    net = chart.rollup((chart.initial_debit + debit) - (chart.initial_credit + credit))
+    _build_report_groups(chart, net, {"1": "Activo", "2": "Pasivo", "3": "Patrimonio"})
+    return 0
+
+
+async def bench_fix_hierarchy(docs: List[dict]) -> int:
+    collection = FakeCollection(docs)
+    chart_cache.invalidate(COMPANY_ID)
+    with fake_motor(collection):
+        await LedgerService._fix_complete_hierarchy_internal(COMPANY_ID)
+    chart_cache.invalidate(COMPANY_ID)
+    return collection.round_trips
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "sort": bench_sort,
+    "report": bench_report,
+    "fix-hierarchy": bench_fix_hierarchy,
+}
+
+
+def complexity_exponent(sizes: List[int], timings: List[float]) -> float:
+    """Pendiente de mínimos cuadrados de log(tiempo) frente a log(tamaño), usando los tamaños >= 1000 si hay dos o más"""
+    points = [(n, t) for n, t in zip(sizes, timings) if n >= 1000]
+    if len(points) < 2:
+        points = list(zip(sizes, timings))
+    if len(points) < 2:
+        return 0.0
+    xs = np.log([n for n, _ in points])
+    ys = np.log([max(t, 1e-6) for _, t in points])
+    return float(np.polyfit(xs, ys, 1)[0])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de algoritmos del plan de cuentas")
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="Tamaños de plan separados por comas")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help=f"Lista separada por comas ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por tamaño (se toma la mínima)")
+    parser.add_argument("--max-exponent", type=float, default=1.35, help="Exponente máximo admitido (1 = lineal)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.sizes.split(",") if size.strip())
+    names = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Benchmarks desconocidos: {', '.join(unknown)}")
+
+    charts = {size: build_chart(size, args.seed) for size in sizes}
+    results = {"sizes": sizes, "max_exponent": args.max_exponent, "benchmarks": {}}
+    failures = []
+
+    for name in names:
+        benchmark = BENCHMARKS[name]
+        timings, round_trips = [], []
+        for size in sizes:
+            best = float("inf")
+            trips = 0
+            for _ in range(args.repeat):
+                # Los algoritmos registran su progreso con print: silenciarlo al medir
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    t0 = time.perf_counter()
+                    trips = await benchmark(charts[size])
+                    best = min(best, time.perf_counter() - t0)
+            timings.append(best)
+            round_trips.append(trips)
+
+        exponent = complexity_exponent(sizes, timings)
+        constant_trips = len(set(round_trips)) == 1
+        ok = exponent <= args.max_exponent and constant_trips
+        results["benchmarks"][name] = {
+            "timings_ms": {str(size): round(t * 1000, 3) for size, t in zip(sizes, timings)},
+            "round_trips": {str(size): trips for size, trips in zip(sizes, round_trips)},
+            "exponent": round(exponent, 3),
+            "ok": ok
+        }
+        marker = "✅" if ok else "❌"
+        detail = "   ".join(f"{size:>6}: {t * 1000:9.2f} ms" for size, t in zip(sizes, timings))
+        print(f"{marker} {name:<15} O(n^{exponent:.2f})   viajes {round_trips}   {detail}")
+        if not ok:
+            failures.append(name)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados guardados en {args.output}")
+
+    if failures:
+        print(f"❌ Regresión de complejidad en: {', '.join(failures)}")
+        return 1
+    print("✅ Todos los algoritmos dentro del exponente máximo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
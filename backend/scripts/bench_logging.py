@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark del costo de logging en la ruta de mayorización.
+
+Compara, por asiento mayorizado, las mismas llamadas de diagnóstico que hacen
+LedgerService.post_journal_entry y _post_entry en cuatro modos:
+
+    print     f-strings + print() síncrono (comportamiento anterior)
+    warning   logging sin mensajes habilitados en esta ruta: solo el costo de las comprobaciones de nivel
+    info      logging con DEBUG deshabilitado (producción): las llamadas debug no formatean
+    debug     logging con DEBUG habilitado vía QueueHandler (formato y E/S en otro hilo)
+
+La salida va a un archivo temporal con buffer por línea (como stdout en una
+terminal o con PYTHONUNBUFFERED=1).
+
+Uso:
+    python scripts/bench_logging.py
+    python scripts/bench_logging.py --iterations 20000 --lines 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.logging_setup import configure_logging, shutdown_logging
+
+logger = logging.getLogger("app.services.ledger_service")
+
+
+class BenchEntry:
+    def __init__(self, lines: int):
+        self.entry_number = "CE-000123"
+        self.status = "draft"
+        self.lines = [object()] * lines
+
+
+def posting_path_print(entry: BenchEntry, company_id: str, created_by: str):
+    print(f"🔍 Iniciando post_journal_entry para asiento: {entry.entry_number}")
+    print(f"📋 Estado del asiento: {entry.status}")
+    print(f"🏢 Company ID: {company_id}")
+    print(f"👤 Created by: {created_by}")
+    print("✅ Asiento en estado DRAFT, continuando...")
+    print("📝 Marcando asiento como POSTED...")
+    print(f"📋 Procesando {len(entry.lines)} líneas del asiento...")
+    print(f"🚀 Aplicando saldos a {len(entry.lines)} cuentas y sus cuentas padre...")
+    print("✅ Asiento marcado como POSTED exitosamente")
+    print(f"🎉 Mayorización completada exitosamente para asiento: {entry.entry_number}")
+
+
+def posting_path_logging(entry: BenchEntry, company_id: str, created_by: str):
+    logger.debug("🔍 Iniciando post_journal_entry para asiento: %s", entry.entry_number)
+    logger.debug("📋 Estado del asiento: %s", entry.status)
+    logger.debug("🏢 Company ID: %s", company_id)
+    logger.debug("👤 Created by: %s", created_by)
+    logger.debug("✅ Asiento en estado DRAFT, continuando...")
+    logger.debug("📝 Marcando asiento como POSTED...")
+    logger.debug("📋 Procesando %s líneas del asiento...", len(entry.lines))
+    logger.debug("🚀 Aplicando saldos a %s cuentas y sus cuentas padre...", len(entry.lines))
+    logger.debug("✅ Asiento marcado como POSTED exitosamente")
+    logger.info("🎉 Mayorización completada exitosamente para asiento: %s", entry.entry_number)
+
+
+def time_posting(mode: str, iterations: int, lines: int, output) -> float:
+    entry = BenchEntry(lines)
+    if mode == "print":
+        with contextlib.redirect_stdout(output):
+            t0 = time.perf_counter()
+            for _ in range(iterations):
+                posting_path_print(entry, "bench-company", "bench-user")
+            return time.perf_counter() - t0
+    configure_logging(stream=output, level=mode.upper(), levels="")
+    try:
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            posting_path_logging(entry, "bench-company", "bench-user")
+        return time.perf_counter() - t0
+    finally:
+        shutdown_logging()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark del costo de logging en la mayorización")
+    parser.add_argument("--iterations", type=int, default=10000, help="Asientos simulados por modo")
+    parser.add_argument("--lines", type=int, default=10, help="Líneas por asiento")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile("w", buffering=1, encoding="utf-8") as output:
+        print(f"📊 Ruta de mayorización ({args.iterations} asientos, {args.lines} líneas)")
+        baseline = None
+        for mode in ("print", "warning", "info", "debug"):
+            elapsed = time_posting(mode, args.iterations, args.lines, output)
+            per_entry = elapsed / args.iterations * 1e6
+            baseline = baseline or per_entry
+            print(f"   {mode:<6} {per_entry:8.2f} µs/asiento   ({per_entry / baseline:5.2f}x print)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
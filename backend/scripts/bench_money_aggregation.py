@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark del costo de agregación: montos double vs Decimal128.
+
+Inserta el mismo conjunto de filas del mayor en dos colecciones (una con montos
+float y otra con Decimal128 al centavo), ejecuta el $group/$sum por cuenta que
+usan los reportes y compara tiempos. También muestra la deriva acumulada de la
+suma en float frente a la suma exacta.
+
+Uso:
+    python scripts/bench_money_aggregation.py --rows 200000 --runs 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.models.money import ZERO, to_decimal, to_decimal128
+
+COMPANY_ID = "bench-company"
+
+
+def build_rows(rows: int, accounts: int, seed_value: int):
+    """Montos al centavo como texto, para generar ambos formatos a partir del mismo valor"""
+    rng = random.Random(seed_value)
+    start = datetime(2024, 1, 1)
+    for _ in range(rows):
+        cents = rng.randrange(1, 500000)
+        amount = f"{cents // 100}.{cents % 100:02d}"
+        debit_side = rng.random() < 0.5
+        yield {
+            "account_id": f"acc-{rng.randrange(accounts):04d}",
+            "company_id": COMPANY_ID,
+            "date": start + timedelta(days=rng.randrange(365)),
+            "debit": amount if debit_side else "0.00",
+            "credit": "0.00" if debit_side else amount,
+        }
+
+
+async def seed(database, rows: int, accounts: int, seed_value: int, batch_size: int = 5000):
+    float_batch, decimal_batch = [], []
+    for row in build_rows(rows, accounts, seed_value):
+        base = {"account_id": row["account_id"], "company_id": row["company_id"], "date": row["date"]}
+        float_batch.append({**base, "debit_amount": float(row["debit"]), "credit_amount": float(row["credit"])})
+        decimal_batch.append({**base, "debit_amount": to_decimal128(row["debit"]), "credit_amount": to_decimal128(row["credit"])})
+        if len(float_batch) >= batch_size:
+            await asyncio.gather(database.ledger_float.insert_many(float_batch), database.ledger_decimal.insert_many(decimal_batch))
+            float_batch, decimal_batch = [], []
+    if float_batch:
+        await asyncio.gather(database.ledger_float.insert_many(float_batch), database.ledger_decimal.insert_many(decimal_batch))
+    for name in ("ledger_float", "ledger_decimal"):
+        await database[name].create_index([("company_id", 1), ("date", 1)])
+
+
+def pipeline(as_of: datetime):
+    """Mismo $group que balance-general"""
+    return [
+        {"$match": {"company_id": COMPANY_ID, "date": {"$lte": as_of}}},
+        {"$group": {
+            "_id": "$account_id",
+            "sum_debit": {"$sum": {"$ifNull": ["$debit_amount", 0]}},
+            "sum_credit": {"$sum": {"$ifNull": ["$credit_amount", 0]}}
+        }}
+    ]
+
+
+async def time_aggregation(collection, runs: int, convert):
+    as_of = datetime(2024, 12, 31)
+    timings = []
+    result = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        docs = await collection.aggregate(pipeline(as_of)).to_list(None)
+        result = {doc["_id"]: (convert(doc["sum_debit"]), convert(doc["sum_credit"])) for doc in docs}
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de agregación double vs Decimal128")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    args = parser.parse_args()
+
+    database_name = f"bench_money_{int(time.time())}"
+    client = AsyncIOMotorClient(args.mongodb_url)
+    database = client[database_name]
+    try:
+        print(f"🌱 Insertando {args.rows} filas en cada formato ({database_name})...")
+        await seed(database, args.rows, args.accounts, args.seed)
+
+        # Calentar caché de WiredTiger antes de medir
+        await time_aggregation(database.ledger_float, 1, float)
+        await time_aggregation(database.ledger_decimal, 1, to_decimal)
+
+        float_times, float_result = await time_aggregation(database.ledger_float, args.runs, float)
+        decimal_times, decimal_result = await time_aggregation(database.ledger_decimal, args.runs, to_decimal)
+
+        print(f"⏱️  {args.runs} ejecuciones del $group por cuenta:")
+        for label, timings in (("double", float_times), ("Decimal128", decimal_times)):
+            print(f"   {label:<11} media {statistics.mean(timings):8.2f} ms   mediana {statistics.median(timings):8.2f} ms   máx {max(timings):8.2f} ms")
+        print(f"📈 Costo relativo Decimal128 / double: x{statistics.median(decimal_times) / statistics.median(float_times):.2f}")
+
+        drift_accounts = 0
+        max_drift = ZERO
+        for account_id, (debit, credit) in decimal_result.items():
+            float_debit, float_credit = float_result[account_id]
+            drift = max(abs(Decimal(repr(float_debit)) - debit), abs(Decimal(repr(float_credit)) - credit))
+            if drift:
+                drift_accounts += 1
+                max_drift = max(max_drift, drift)
+        print(f"🎯 Deriva de la suma en float: {drift_accounts}/{len(decimal_result)} cuentas difieren del valor exacto (máx {max_drift})")
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Simulación de la caché de reportes con agrupación de peticiones (single-flight).
+
+Varios usuarios piden el mismo balance general al mismo tiempo. El cálculo es
+simulado: una espera que representa la agregación en Mongo más el armado del
+reporte (--latency-ms). Se compara contra ejecutar el cálculo una vez por petición.
+
+    ráfaga     N peticiones idénticas simultáneas: un solo cálculo, N-1 agrupadas
+    repetida   las mismas peticiones después: todas aciertos
+    escritura  nueva versión de datos: un cálculo nuevo, la anterior sale por LRU
+
+Uso:
+    python scripts/bench_report_cache.py
+    python scripts/bench_report_cache.py --clients 50 --latency-ms 400 --accounts 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from decimal import Decimal
+from app.services.report_cache import ReportCache
+
+COMPANY_ID = "bench-company"
+
+
+def build_report(accounts: int) -> dict:
+    return {
+        "empresa": COMPANY_ID,
+        "fecha_corte": "2025-06-30",
+        "grupos": {
+            group: {
+                "descripcion": description,
+                "cuentas": [
+                    {"id": f"{group}{i:06d}", "codigo": f"{group}{i:06d}", "nombre": f"CUENTA {i}", "saldo": Decimal("1234.56")}
+                    for i in range(accounts // 3)
+                ],
+                "total": Decimal("1234.56") * (accounts // 3),
+            }
+            for group, description in (("1", "Activo"), ("2", "Pasivo"), ("3", "Patrimonio"))
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Simulación de caché de reportes con single-flight")
+    parser.add_argument("--clients", type=int, default=20, help="Peticiones idénticas simultáneas")
+    parser.add_argument("--latency-ms", type=float, default=250.0, help="Duración simulada del cálculo")
+    parser.add_argument("--accounts", type=int, default=1500)
+    args = parser.parse_args()
+
+    computations = 0
+
+    async def compute():
+        nonlocal computations
+        computations += 1
+        await asyncio.sleep(args.latency_ms / 1000)
+        return build_report(args.accounts)
+
+    async def burst(cache: ReportCache, version: str) -> float:
+        params = {"as_of_date": "2025-06-30"}
+        t0 = time.perf_counter()
+        bodies = await asyncio.gather(*[
+            cache.get_or_compute(COMPANY_ID, "balance-general", params, version, compute)
+            for _ in range(args.clients)
+        ])
+        assert len(set(bodies)) == 1, "las peticiones agrupadas recibieron cuerpos distintos"
+        return time.perf_counter() - t0
+
+    # Sin caché: un cálculo por petición (lo que hace hoy la ruta)
+    t0 = time.perf_counter()
+    await asyncio.gather(*[compute() for _ in range(args.clients)])
+    baseline = time.perf_counter() - t0
+    print(f"📊 Sin caché       {args.clients} peticiones, {computations} cálculos, {baseline * 1000:8.1f} ms")
+
+    cache = ReportCache(max_entries=1, max_bytes=64 * 1024 * 1024)
+    ok = True
+    for label, version, expected in (("ráfaga", "v1", 1), ("repetida", "v1", 0), ("escritura", "v2", 1)):
+        computations = 0
+        elapsed = await burst(cache, version)
+        ok &= computations == expected
+        print(
+            f"{'✅' if computations == expected else '❌'} {label:<14} {args.clients} peticiones, {computations} cálculos, "
+            f"{elapsed * 1000:8.1f} ms   (aciertos {cache.hits}, agrupadas {cache.coalesced}, "
+            f"fallos {cache.misses}, entradas {len(cache)}, {cache.bytes / 1024:.0f} KiB)"
+        )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Benchmark de desmayorización / re-mayorización de asientos.
+
+Compara el camino anterior (borrado fila por fila, account.save() por fila,
+recálculo completo de saldos acumulados y de la jerarquía padre) con el camino
+delta de LedgerService (borrado en bloque, $inc y desplazamiento de saldos posteriores).
+
+Uso:
+    python scripts/bench_unpost.py --entries 2000 --cycles 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from bson import ObjectId
+from app.config import settings
+from app.models.account import Account, AccountType, AccountNature
+from app.models.journal import JournalEntry, JournalLine
+from app.models.company_version import CompanyVersion
+from app.models.period_closing import PeriodLock
+from app.models.ledger import LedgerEntry, LedgerEntryType
+from app.models.money import ZERO, to_decimal128
+from app.services.data_version import data_versions
+from app.services.ledger_service import LedgerService
+
+COMPANY_ID = "bench-company"
+USER_ID = "bench-user"
+
+
+def build_chart(groups: int = 5, per_level: int = 4):
+    """Plan de cuentas jerárquico 1 / 101 / 10101 / 1010101"""
+    accounts = []
+    for g in range(1, groups + 1):
+        root = str(g)
+        accounts.append((root, None, 1))
+        for a in range(1, per_level + 1):
+            lvl2 = f"{root}{a:02d}"
+            accounts.append((lvl2, root, 2))
+            for b in range(1, per_level + 1):
+                lvl3 = f"{lvl2}{b:02d}"
+                accounts.append((lvl3, lvl2, 3))
+                for c in range(1, per_level + 1):
+                    accounts.append((f"{lvl3}{c:02d}", lvl3, 4))
+    return accounts
+
+
+async def seed(entries: int, seed_value: int):
+    """Crear plan, asientos mayorizados y filas del mayor con saldos acumulados coherentes"""
+    rng = random.Random(seed_value)
+    chart = build_chart()
+    leaf_codes = [code for code, _, level in chart if level == 4]
+
+    account_docs = [
+        Account(
+            code=code, name=f"Cuenta {code}", account_type=AccountType.ACTIVO,
+            nature=AccountNature.DEUDORA, parent_code=parent, level=level,
+            company_id=COMPANY_ID, created_by=USER_ID
+        )
+        for code, parent, level in chart
+    ]
+    await Account.insert_many(account_docs)
+    accounts_by_code = {acc.code: acc for acc in await Account.find(Account.company_id == COMPANY_ID).to_list()}
+
+    start = datetime(2024, 1, 1)
+    journal_docs = []
+    ledger_rows = []
+    running = {}
+    dated = sorted(
+        (start + timedelta(days=rng.randrange(365)), i) for i in range(entries)
+    )
+    for date, i in dated:
+        amount = round(rng.uniform(10, 5000), 2)
+        debit_code, credit_code = rng.sample(leaf_codes, 2)
+        entry_id = ObjectId()
+        lines = [
+            JournalLine(account_code=debit_code, account_name=f"Cuenta {debit_code}", description="Débito", debit=amount),
+            JournalLine(account_code=credit_code, account_name=f"Cuenta {credit_code}", description="Crédito", credit=amount),
+        ]
+        journal_docs.append(JournalEntry(
+            id=entry_id, entry_number=f"CD-{i + 1:06d}", date=date, description=f"Asiento {i + 1}",
+            status="posted", lines=lines, total_debit=amount, total_credit=amount,
+            company_id=COMPANY_ID, created_by=USER_ID
+        ))
+        for line in lines:
+            account = accounts_by_code[line.account_code]
+            run = running.setdefault(line.account_code, [ZERO, ZERO])
+            run[0] += line.debit
+            run[1] += line.credit
+            ledger_rows.append(LedgerEntry(
+                account_id=str(account.id), account_code=line.account_code, account_name=line.account_name,
+                company_id=COMPANY_ID, entry_type=LedgerEntryType.JOURNAL, journal_entry_id=str(entry_id),
+                date=date, description=line.description, reference=f"CD-{i + 1:06d}",
+                debit_amount=line.debit, credit_amount=line.credit,
+                running_debit_balance=run[0], running_credit_balance=run[1],
+                created_at=date, created_by=USER_ID
+            ))
+
+    await JournalEntry.insert_many(journal_docs)
+    await LedgerEntry.insert_many(ledger_rows)
+
+    collection = Account.get_motor_collection()
+    for code, (debit, credit) in running.items():
+        await collection.update_one(
+            {"company_id": COMPANY_ID, "code": code},
+            {"$set": {"current_debit_balance": to_decimal128(debit), "current_credit_balance": to_decimal128(credit)}}
+        )
+    await LedgerService._fix_complete_hierarchy_internal(COMPANY_ID)
+
+
+# Camino anterior congelado aquí: el servicio ya no lo usa y la comparación debe
+# medir siempre el mismo algoritmo de referencia.
+
+async def legacy_running_balances(ledger_entry: LedgerEntry, account: Account):
+    """Saldos acumulados de una fila nueva a partir de la última fila de la cuenta"""
+    last_entry = await LedgerEntry.find_one(
+        LedgerEntry.account_id == str(account.id),
+        sort=[("date", -1), ("created_at", -1)]
+    )
+    if last_entry:
+        ledger_entry.running_debit_balance = last_entry.running_debit_balance + ledger_entry.debit_amount
+        ledger_entry.running_credit_balance = last_entry.running_credit_balance + ledger_entry.credit_amount
+    else:
+        ledger_entry.running_debit_balance = account.initial_debit_balance + ledger_entry.debit_amount
+        ledger_entry.running_credit_balance = account.initial_credit_balance + ledger_entry.credit_amount
+
+
+async def legacy_update_account_balances(account: Account, debit, credit):
+    """Saldos actuales por lectura-modificación-guardado del documento completo"""
+    account.current_debit_balance += debit
+    account.current_credit_balance += credit
+    account.last_transaction_date = datetime.now()
+    account.updated_at = datetime.now()
+    await account.save()
+
+
+async def legacy_recalculate_running_balances(account: Account):
+    """Reescribir fila por fila los saldos acumulados de toda la cuenta"""
+    ledger_entries = await LedgerEntry.find(
+        LedgerEntry.account_id == str(account.id),
+        LedgerEntry.company_id == COMPANY_ID
+    ).sort([("date", 1), ("created_at", 1)]).to_list()
+    running_debit = account.initial_debit_balance
+    running_credit = account.initial_credit_balance
+    for entry in ledger_entries:
+        running_debit += entry.debit_amount
+        running_credit += entry.credit_amount
+        entry.running_debit_balance = running_debit
+        entry.running_credit_balance = running_credit
+        await entry.save()
+
+
+async def legacy_unpost(journal_entry: JournalEntry):
+    """Camino anterior de desmayorización (fila por fila + recálculos completos)"""
+    ledger_entries = await LedgerEntry.find(LedgerEntry.journal_entry_id == str(journal_entry.id)).to_list()
+    affected_account_ids = set()
+    for entry in ledger_entries:
+        account = await Account.get(ObjectId(entry.account_id))
+        if account:
+            account.current_debit_balance -= entry.debit_amount
+            account.current_credit_balance -= entry.credit_amount
+            account.updated_at = datetime.now()
+            await account.save()
+            affected_account_ids.add(str(account.id))
+        await entry.delete()
+    for account_id in affected_account_ids:
+        account = await Account.get(ObjectId(account_id))
+        if account:
+            await legacy_recalculate_running_balances(account)
+    await LedgerService._fix_complete_hierarchy_internal(COMPANY_ID)
+    journal_entry.status = "draft"
+    await journal_entry.save()
+
+
+async def legacy_repost(journal_entry: JournalEntry):
+    """Camino anterior de mayorización (fila por fila + recálculos completos)"""
+    affected_account_ids = set()
+    for line in journal_entry.lines:
+        account = await Account.find_one(Account.code == line.account_code, Account.company_id == COMPANY_ID)
+        ledger_entry = LedgerEntry(
+            account_id=str(account.id), account_code=line.account_code, account_name=line.account_name,
+            company_id=COMPANY_ID, entry_type=LedgerEntryType.JOURNAL, journal_entry_id=str(journal_entry.id),
+            date=journal_entry.date, description=line.description, reference=journal_entry.entry_number,
+            debit_amount=line.debit, credit_amount=line.credit, created_by=USER_ID
+        )
+        await legacy_running_balances(ledger_entry, account)
+        await ledger_entry.insert()
+        await legacy_update_account_balances(account, line.debit, line.credit)
+        affected_account_ids.add(str(account.id))
+    for account_id in affected_account_ids:
+        account = await Account.get(ObjectId(account_id))
+        await legacy_recalculate_running_balances(account)
+    await LedgerService._fix_complete_hierarchy_internal(COMPANY_ID)
+    journal_entry.status = "posted"
+    await journal_entry.save()
+
+
+async def fast_unpost(journal_entry: JournalEntry):
+    ok = await LedgerService.unpost_journal_entry(journal_entry, COMPANY_ID, USER_ID)
+    assert ok, "unpost_journal_entry falló"
+
+
+async def fast_repost(journal_entry: JournalEntry):
+    ok = await LedgerService.post_journal_entry(journal_entry, COMPANY_ID, USER_ID)
+    assert ok, "post_journal_entry falló"
+
+
+async def time_cycles(label, entries, unpost, repost):
+    unpost_times = []
+    repost_times = []
+    for entry in entries:
+        t0 = time.perf_counter()
+        await unpost(entry)
+        t1 = time.perf_counter()
+        await repost(entry)
+        t2 = time.perf_counter()
+        unpost_times.append(t1 - t0)
+        repost_times.append(t2 - t1)
+    avg_unpost = sum(unpost_times) / len(unpost_times) * 1000
+    avg_repost = sum(repost_times) / len(repost_times) * 1000
+    print(f"   {label:<8} desmayorizar: {avg_unpost:9.2f} ms   re-mayorizar: {avg_repost:9.2f} ms")
+    return avg_unpost, avg_repost
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de desmayorización/re-mayorización")
+    parser.add_argument("--entries", type=int, default=2000, help="Asientos mayorizados de base")
+    parser.add_argument("--cycles", type=int, default=20, help="Ciclos desmayorizar/re-mayorizar por camino")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    args = parser.parse_args()
+
+    database_name = f"bench_unpost_{int(time.time())}"
+    client = AsyncIOMotorClient(args.mongodb_url)
+    try:
+        await init_beanie(database=client[database_name], document_models=[Account, JournalEntry, LedgerEntry, CompanyVersion, PeriodLock])
+        await data_versions.ensure_epoch()
+        print(f"🌱 Generando {args.entries} asientos en {database_name}...")
+        await seed(args.entries, args.seed)
+
+        posted = await JournalEntry.find(JournalEntry.company_id == COMPANY_ID).to_list()
+        rng = random.Random(args.seed)
+        sample = rng.sample(posted, min(len(posted), args.cycles * 2))
+        legacy_entries, fast_entries = sample[:args.cycles], sample[args.cycles:]
+
+        print(f"⏱️  {args.cycles} ciclos por camino:")
+        legacy = await time_cycles("anterior", legacy_entries, legacy_unpost, legacy_repost)
+        fast = await time_cycles("delta", fast_entries, fast_unpost, fast_repost)
+        print(f"🚀 Aceleración: desmayorizar x{legacy[0] / fast[0]:.1f}, re-mayorizar x{legacy[1] / fast[1]:.1f}")
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos a escala de producción.
+
+Crea N empresas con un plan de cuentas jerárquico (1 -> 101 -> 10101 -> 1010101),
+tipos de documento, saldos iniciales cuadrados y millones de asientos balanceados
+con sus filas del mayor (saldos acumulados incluidos). Los documentos se escriben
+con insert_many en lotes paralelos.
+
+La salida es determinista para una misma semilla y parámetros (incluidos los
+ObjectId), de modo que sirve como fixture de todos los benchmarks de rendimiento.
+Al terminar se guarda un manifiesto en la colección `scale_fixture` con los
+parámetros, las empresas generadas y una huella (sha256) del contenido.
+
+Uso:
+    python scripts/generate_scale_data.py --companies 3 --entries 1000000 --drop
+    python scripts/generate_scale_data.py --database contabilidad_scale --seed 7 --leaves 800
+"""
+
+import argparse
+import asyncio
+import calendar
+import hashlib
+import json
+import os
+import random
+import struct
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from bson import Decimal128, ObjectId
+from app.config import settings
+from app.auth.jwt_handler import get_password_hash, get_user_permissions
+from app.models.account import Account, AccountType, AccountNature
+from app.models.company import Company
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry
+from app.models.ledger import LedgerEntry
+from app.models.money import from_cents
+from app.models.user import User
+from scripts.init_document_types import ECUADORIAN_DOCUMENT_TYPES
+
+CREATED_BY = "scale-generator"
+FIXTURE_COLLECTION = "scale_fixture"
+
+# Grupos del plan: (dígito, nombre, tipo, naturaleza, peso en cantidad de hojas, subgrupos)
+CHART_ROOTS = [
+    ("1", "ACTIVO", AccountType.ACTIVO, AccountNature.DEUDORA, 0.30,
+     ["ACTIVO CORRIENTE", "ACTIVO NO CORRIENTE", "INVERSIONES", "ACTIVOS DIFERIDOS", "OTROS ACTIVOS"]),
+    ("2", "PASIVO", AccountType.PASIVO, AccountNature.ACREEDORA, 0.15,
+     ["PASIVO CORRIENTE", "PASIVO NO CORRIENTE", "PROVISIONES", "OTROS PASIVOS"]),
+    ("3", "PATRIMONIO", AccountType.PATRIMONIO, AccountNature.ACREEDORA, 0.05,
+     ["CAPITAL", "RESERVAS", "RESULTADOS"]),
+    ("4", "INGRESOS", AccountType.INGRESOS, AccountNature.ACREEDORA, 0.15,
+     ["INGRESOS OPERACIONALES", "INGRESOS NO OPERACIONALES", "OTROS INGRESOS"]),
+    ("5", "GASTOS", AccountType.GASTOS, AccountNature.DEUDORA, 0.25,
+     ["GASTOS DE VENTAS", "GASTOS ADMINISTRATIVOS", "GASTOS FINANCIEROS", "OTROS GASTOS"]),
+    ("6", "COSTOS", AccountType.COSTOS, AccountNature.DEUDORA, 0.10,
+     ["COSTO DE VENTAS", "COSTO DE PRODUCCIÓN", "COSTOS INDIRECTOS"]),
+]
+
+# Tipos de documento con los que se numeran los asientos generados (y su frecuencia)
+ENTRY_DOCUMENT_CODES = [("CD", 5), ("CE", 3), ("CI", 3), ("21", 4), ("01", 3), ("RP", 1)]
+
+
+def money(cents: int) -> Decimal128:
+    return Decimal128(from_cents(cents))
+
+
+class IdFactory:
+    """ObjectId deterministas: marca de tiempo del documento + contador propio"""
+
+    def __init__(self, namespace: int):
+        self.namespace = namespace
+        self.counter = 0
+
+    def next(self, moment: datetime) -> ObjectId:
+        self.counter += 1
+        seconds = calendar.timegm(moment.timetuple())
+        return ObjectId(struct.pack(">IHIH", seconds, self.namespace, self.counter >> 16, self.counter & 0xFFFF))
+
+
+class BatchWriter:
+    """Acumula documentos y los inserta con insert_many; el semáforo limita los lotes en vuelo"""
+
+    def __init__(self, collection, batch_size: int, semaphore: asyncio.Semaphore):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.semaphore = semaphore
+        self.batch: List[dict] = []
+        self.tasks = set()
+        self.inserted = 0
+
+    async def add(self, doc: dict):
+        self.batch.append(doc)
+        if len(self.batch) >= self.batch_size:
+            await self._dispatch()
+
+    async def _dispatch(self):
+        batch, self.batch = self.batch, []
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._insert(batch))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _insert(self, batch: List[dict]):
+        try:
+            await self.collection.insert_many(batch, ordered=False, bypass_document_validation=True)
+            self.inserted += len(batch)
+        finally:
+            self.semaphore.release()
+
+    async def close(self):
+        if self.batch:
+            await self._dispatch()
+        await asyncio.gather(*list(self.tasks))
+
+
+def build_chart(rng: random.Random, leaves: int) -> List[dict]:
+    """Plan jerárquico de 4 niveles; las hojas se reparten según el peso de cada grupo"""
+    chart = []
+    for digit, name, account_type, nature, weight, subgroups in CHART_ROOTS:
+        chart.append({"code": digit, "name": name, "type": account_type, "nature": nature, "level": 1, "parent": None})
+        root_leaves = max(2, round(leaves * weight))
+        level2 = subgroups[:rng.randint(2, len(subgroups))]
+        level3_codes = []
+        for i, subgroup in enumerate(level2, start=1):
+            code2 = f"{digit}{i:02d}"
+            chart.append({"code": code2, "name": subgroup, "type": account_type, "nature": nature, "level": 2, "parent": digit})
+            for j in range(1, rng.randint(2, 4) + 1):
+                code3 = f"{code2}{j:02d}"
+                chart.append({"code": code3, "name": f"{subgroup} {j}", "type": account_type, "nature": nature, "level": 3, "parent": code2})
+                level3_codes.append((code3, f"{subgroup} {j}"))
+        counters = [0] * len(level3_codes)
+        for n in range(min(root_leaves, 99 * len(level3_codes))):
+            slot = n % len(level3_codes)
+            counters[slot] += 1
+            code3, name3 = level3_codes[slot]
+            chart.append({
+                "code": f"{code3}{counters[slot]:02d}",
+                "name": f"{name3} - DETALLE {counters[slot]}",
+                "type": account_type, "nature": nature, "level": 4, "parent": code3, "leaf": True
+            })
+    return chart
+
+
+def initial_balances(rng: random.Random, leaves: List[dict]) -> Dict[str, List[int]]:
+    """Saldos iniciales cuadrados: activos al débito; pasivo y patrimonio al crédito por el mismo total"""
+    balances = {leaf["code"]: [0, 0] for leaf in leaves}
+    assets = [leaf for leaf in leaves if leaf["code"][0] == "1"]
+    funding = [leaf for leaf in leaves if leaf["code"][0] in ("2", "3")]
+    total = 0
+    for leaf in assets:
+        cents = rng.randrange(100000, 5000000)
+        balances[leaf["code"]][0] = cents
+        total += cents
+    shares = sorted(rng.randrange(1, total) for _ in range(len(funding) - 1))
+    for leaf, low, high in zip(funding, [0] + shares, shares + [total]):
+        balances[leaf["code"]][1] = high - low
+    return balances
+
+
+def split_amount(rng: random.Random, total: int, parts: int) -> List[int]:
+    """Repartir `total` centavos en `parts` montos positivos (total >= parts)"""
+    cuts = sorted(rng.sample(range(1, total), parts - 1))
+    return [b - a for a, b in zip([0] + cuts, cuts + [total])]
+
+
+async def generate_company(database, index: int, options: dict, semaphore: asyncio.Semaphore, digest) -> dict:
+    rng = random.Random(f"{options['seed']}-{index}")
+    ids = IdFactory(index + 1)
+    start = datetime.strptime(options["start_date"], "%Y-%m-%d")
+    days = 365 * options["years"]
+
+    company_id = ids.next(start)
+    company_key = str(company_id)
+    chart = build_chart(rng, options["leaves"])
+    for account in chart:
+        account["_id"] = ids.next(start)
+    leaves = [account for account in chart if account.get("leaf")]
+    initial = initial_balances(rng, leaves)
+    running = {code: list(balance) for code, balance in initial.items()}
+    last_date: Dict[str, datetime] = {}
+
+    journal_writer = BatchWriter(database.journal_entries, options["batch_size"], semaphore)
+    ledger_writer = BatchWriter(database.ledger_entries, options["batch_size"], semaphore)
+    sequences = {code: 0 for code, _ in ENTRY_DOCUMENT_CODES}
+    document_codes = [code for code, _ in ENTRY_DOCUMENT_CODES]
+    document_weights = [weight for _, weight in ENTRY_DOCUMENT_CODES]
+    debit_side = [leaf for leaf in leaves if leaf["code"][0] in ("1", "5", "6")]
+    credit_side = [leaf for leaf in leaves if leaf["code"][0] in ("1", "2", "3", "4")]
+
+    entries = options["entries"]
+    posted = 0
+    for n in range(entries):
+        # Fechas crecientes: el orden de inserción coincide con (date, created_at, _id)
+        day = start + timedelta(days=n * days // entries)
+        created_at = day + timedelta(seconds=86399 * ((n * days) % entries) / entries)
+        code = rng.choices(document_codes, document_weights)[0]
+        sequences[code] += 1
+        entry_number = f"{code}-{sequences[code]:06d}"
+
+        line_count = rng.randint(2, options["max_lines"])
+        debit_count = rng.randint(1, line_count - 1)
+        debit_amounts = [rng.randrange(1000, 2500000) for _ in range(debit_count)]
+        total = sum(debit_amounts)
+        credit_amounts = split_amount(rng, total, line_count - debit_count)
+        lines = [(rng.choice(debit_side), amount, 0) for amount in debit_amounts]
+        lines += [(rng.choice(credit_side), 0, amount) for amount in credit_amounts]
+        is_posted = rng.random() < options["posted_ratio"]
+
+        entry_id = ids.next(created_at)
+        description = f"{code} OPERACIÓN {sequences[code]}"
+        await journal_writer.add({
+            "_id": entry_id,
+            "entry_number": entry_number,
+            "date": day,
+            "description": description,
+            "entry_type": "manual",
+            "status": "posted" if is_posted else "draft",
+            "document_type_code": code,
+            "lines": [
+                {
+                    "account_code": leaf["code"],
+                    "account_name": leaf["name"],
+                    "description": description,
+                    "debit": money(debit),
+                    "credit": money(credit),
+                    "reference": entry_number
+                }
+                for leaf, debit, credit in lines
+            ],
+            "total_debit": money(total),
+            "total_credit": money(total),
+            "company_id": company_key,
+            "created_by": CREATED_BY,
+            "responsable": "GENERADOR DE ESCALA",
+            "revision": 0,
+            "created_at": created_at,
+            "updated_at": created_at
+        })
+        digest.update(f"{index}|{entry_number}|{day:%Y%m%d}|{is_posted}|".encode())
+        digest.update(",".join(f"{leaf['code']}:{debit}:{credit}" for leaf, debit, credit in lines).encode())
+
+        if is_posted:
+            posted += 1
+            for leaf, debit, credit in lines:
+                balance = running[leaf["code"]]
+                balance[0] += debit
+                balance[1] += credit
+                last_date[leaf["code"]] = day
+                await ledger_writer.add({
+                    "_id": ids.next(created_at),
+                    "account_id": str(leaf["_id"]),
+                    "account_code": leaf["code"],
+                    "account_name": leaf["name"],
+                    "company_id": company_key,
+                    "entry_type": "journal",
+                    "journal_entry_id": str(entry_id),
+                    "date": day,
+                    "description": description,
+                    "reference": entry_number,
+                    "debit_amount": money(debit),
+                    "credit_amount": money(credit),
+                    "running_debit_balance": money(balance[0]),
+                    "running_credit_balance": money(balance[1]),
+                    "created_at": created_at,
+                    "created_by": CREATED_BY
+                })
+
+        if options["progress"] and (n + 1) % options["progress"] == 0:
+            print(f"   🏢 empresa {index + 1}: {n + 1}/{entries} asientos")
+
+    await journal_writer.close()
+    await ledger_writer.close()
+
+    # Saldos actuales: solo movimientos (como en la app, el saldo es inicial + actual).
+    # Hojas: acumulado menos saldo inicial; padres sumando hijas (del nivel más profundo a la raíz)
+    current = {
+        code: [balance[0] - initial[code][0], balance[1] - initial[code][1]]
+        for code, balance in running.items()
+    }
+    for account in sorted(chart, key=lambda a: a["level"], reverse=True):
+        balance = current.setdefault(account["code"], [0, 0])
+        if account["parent"]:
+            parent = current.setdefault(account["parent"], [0, 0])
+            parent[0] += balance[0]
+            parent[1] += balance[1]
+            if account["code"] in last_date:
+                moved = last_date[account["code"]]
+                last_date[account["parent"]] = max(last_date.get(account["parent"], moved), moved)
+
+    await database.accounts.insert_many([
+        {
+            "_id": account["_id"],
+            "code": account["code"],
+            "name": account["name"],
+            "account_type": account["type"].value,
+            "nature": account["nature"].value,
+            "parent_code": account["parent"],
+            "level": account["level"],
+            "company_id": company_key,
+            "is_active": True,
+            "is_editable": True,
+            "initial_debit_balance": money(initial.get(account["code"], [0, 0])[0]),
+            "initial_credit_balance": money(initial.get(account["code"], [0, 0])[1]),
+            "current_debit_balance": money(current[account["code"]][0]),
+            "current_credit_balance": money(current[account["code"]][1]),
+            "last_transaction_date": last_date.get(account["code"]),
+            "revision": 0,
+            "created_at": start,
+            "updated_at": start,
+            "created_by": CREATED_BY
+        }
+        for account in chart
+    ], ordered=False)
+
+    await database.document_types.insert_many([
+        {
+            "_id": ids.next(start),
+            "code": doc_type["code"],
+            "name": doc_type["name"],
+            "control_number": None,
+            "establishment_point": "001-001",
+            "is_electronic": False,
+            "next_sequence": sequences.get(doc_type["code"], 0),
+            "padding": 6,
+            "company_id": company_key,
+            "is_active": True,
+            "created_at": start,
+            "updated_at": start,
+            "created_by": CREATED_BY
+        }
+        for doc_type in ECUADORIAN_DOCUMENT_TYPES
+    ], ordered=False)
+
+    await database.companies.insert_one({
+        "_id": company_id,
+        "name": f"EMPRESA DE ESCALA {index + 1}",
+        "ruc": f"17{index + 1:08d}001",
+        "legal_name": f"EMPRESA DE ESCALA {index + 1} S.A.",
+        "address": "Quito, Ecuador",
+        "phone": "02-0000000",
+        "email": f"escala{index + 1}@example.com",
+        "status": "active",
+        "fiscal_year_start": 1,
+        "currency": "USD",
+        "created_at": start,
+        "updated_at": start,
+        "created_by": CREATED_BY
+    })
+
+    return {
+        "company_id": company_key,
+        "accounts": len(chart),
+        "leaf_accounts": len(leaves),
+        "journal_entries": journal_writer.inserted,
+        "posted_entries": posted,
+        "ledger_entries": ledger_writer.inserted,
+    }
+
+
+async def generate(database, options: dict) -> dict:
+    """Generar el fixture completo en `database` y devolver su manifiesto"""
+    semaphore = asyncio.Semaphore(options["concurrency"])
+    digest = hashlib.sha256(json.dumps({k: options[k] for k in FINGERPRINT_OPTIONS}, sort_keys=True).encode())
+    companies = []
+    for index in range(options["companies"]):
+        companies.append(await generate_company(database, index, options, semaphore, digest))
+
+    # Usuario contador con acceso a todas las empresas generadas (para pruebas de carga HTTP)
+    await database.users.insert_one({
+        "username": options["username"],
+        "email": f"{options['username']}@example.com",
+        "password_hash": get_password_hash(options["password"]),
+        "first_name": "Usuario",
+        "last_name": "Escala",
+        "role": "contador",
+        "status": "active",
+        "permissions": get_user_permissions("contador"),
+        "companies": [company["company_id"] for company in companies],
+        "created_at": datetime.now(),
+        "updated_at": datetime.now(),
+        "audit_log": []
+    })
+
+    manifest = {
+        "_id": "manifest",
+        "options": {k: options[k] for k in FINGERPRINT_OPTIONS},
+        "fingerprint": digest.hexdigest(),
+        "companies": companies,
+        "username": options["username"],
+        "generated_at": datetime.now()
+    }
+    await database[FIXTURE_COLLECTION].replace_one({"_id": "manifest"}, manifest, upsert=True)
+    return manifest
+
+
+# Parámetros que determinan el contenido (la huella no depende de lotes ni concurrencia)
+FINGERPRINT_OPTIONS = ["companies", "entries", "leaves", "max_lines", "posted_ratio", "start_date", "years", "seed"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Generar datos sintéticos a escala (deterministas por semilla)")
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--entries", type=int, default=100000, help="Asientos por empresa")
+    parser.add_argument("--leaves", type=int, default=400, help="Cuentas de detalle (hojas) por empresa")
+    parser.add_argument("--max-lines", type=int, default=6, help="Máximo de líneas por asiento (mínimo 2)")
+    parser.add_argument("--posted-ratio", type=float, default=0.9, help="Fracción de asientos mayorizados")
+    parser.add_argument("--start-date", default="2024-01-01")
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4, help="Lotes insert_many en paralelo")
+    parser.add_argument("--progress", type=int, default=100000, help="Informar cada N asientos (0 = nunca)")
+    parser.add_argument("--username", default="escala")
+    parser.add_argument("--password", default="escala123")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=f"{settings.database_name}_scale")
+    parser.add_argument("--drop", action="store_true", help="Eliminar la base destino antes de generar")
+    args = parser.parse_args()
+    if args.max_lines < 2:
+        parser.error("--max-lines debe ser al menos 2")
+
+    client = AsyncIOMotorClient(args.mongodb_url)
+    database = client[args.database]
+    try:
+        if args.drop:
+            await client.drop_database(args.database)
+        elif await database.journal_entries.estimated_document_count():
+            print(f"❌ La base {args.database} ya tiene asientos; use --drop para regenerar el fixture")
+            return
+
+        # Crear los índices declarados en los modelos antes de cargar
+        await init_beanie(database=database, document_models=[User, Company, Account, JournalEntry, LedgerEntry, DocumentType])
+
+        print(f"🌱 Generando {args.companies} empresas x {args.entries} asientos en {args.database} (semilla {args.seed})...")
+        t0 = time.perf_counter()
+        manifest = await generate(database, vars(args))
+        elapsed = time.perf_counter() - t0
+
+        journal_total = sum(company["journal_entries"] for company in manifest["companies"])
+        ledger_total = sum(company["ledger_entries"] for company in manifest["companies"])
+        for company in manifest["companies"]:
+            print(f"   🏢 {company['company_id']}: {company['accounts']} cuentas, "
+                  f"{company['journal_entries']} asientos ({company['posted_entries']} mayorizados), "
+                  f"{company['ledger_entries']} filas del mayor")
+        print(f"⏱️  {journal_total} asientos y {ledger_total} filas del mayor en {elapsed:.1f}s "
+              f"({(journal_total + ledger_total) / elapsed:,.0f} documentos/s)")
+        print(f"🔑 Huella del fixture: {manifest['fingerprint']}")
+        print(f"👤 Usuario: {args.username} / {args.password}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
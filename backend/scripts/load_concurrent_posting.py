@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de mayorización concurrente sobre las mismas cuentas.
+
+Crea asientos en borrador que comparten unas pocas cuentas, los mayoriza en
+paralelo y verifica que:
+  - los saldos actuales de cada cuenta sean el saldo inicial más la suma de las líneas
+  - cada cuenta padre sume exactamente a sus hijas
+  - los saldos acumulados del mayor sean coherentes fila por fila (requiere transacciones)
+  - dos mayorizaciones simultáneas del mismo asiento terminen en un éxito y un conflicto
+
+Uso:
+    python scripts/load_concurrent_posting.py --entries 300 --concurrency 32
+    python scripts/load_concurrent_posting.py --replica-set       # levanta un replica set temporal
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from app.config import settings
+from app.models.account import Account, AccountType, AccountNature
+from app.models.journal import JournalEntry, JournalLine
+from app.models.company_version import CompanyVersion
+from app.models.period_closing import PeriodLock
+from app.models.ledger import LedgerEntry
+from app.models.money import ZERO
+from app.services.concurrency import ConcurrencyConflictError
+from app.services.data_version import data_versions
+from app.services.ledger_service import LedgerService
+from app.services.transactions import supports_transactions
+from scripts.local_replica_set import LocalReplicaSet
+
+COMPANY_ID = "load-company"
+USER_ID = "load-user"
+
+
+async def seed(entries: int, leaf_accounts: int, seed_value: int):
+    """Plan 1 / 101 / 101NN con saldos iniciales y asientos en borrador entre sus hojas"""
+    rng = random.Random(seed_value)
+    leaves = [f"101{i:02d}" for i in range(1, leaf_accounts + 1)]
+    accounts = [
+        Account(code="1", name="ACTIVO", account_type=AccountType.ACTIVO, nature=AccountNature.DEUDORA,
+                level=1, company_id=COMPANY_ID, created_by=USER_ID, created_at=datetime.now(), updated_at=datetime.now()),
+        Account(code="101", name="ACTIVO CORRIENTE", account_type=AccountType.ACTIVO, nature=AccountNature.DEUDORA,
+                parent_code="1", level=2, company_id=COMPANY_ID, created_by=USER_ID, created_at=datetime.now(), updated_at=datetime.now()),
+    ]
+    for code in leaves:
+        accounts.append(Account(
+            code=code, name=f"Cuenta {code}", account_type=AccountType.ACTIVO, nature=AccountNature.DEUDORA,
+            parent_code="101", level=3, company_id=COMPANY_ID, created_by=USER_ID,
+            initial_debit_balance=1000.0, created_at=datetime.now(), updated_at=datetime.now()
+        ))
+    await Account.insert_many(accounts)
+
+    start = datetime(2024, 1, 1)
+    drafts = []
+    for i in range(entries):
+        amount = round(rng.uniform(1, 500), 2)
+        debit_code, credit_code = rng.sample(leaves, 2)
+        drafts.append(JournalEntry(
+            entry_number=f"LD-{i + 1:06d}", date=start + timedelta(days=rng.randrange(60)),
+            description=f"Carga {i + 1}", status="draft", total_debit=amount, total_credit=amount,
+            lines=[
+                JournalLine(account_code=debit_code, account_name=debit_code, description="Débito", debit=amount),
+                JournalLine(account_code=credit_code, account_name=credit_code, description="Crédito", credit=amount),
+            ],
+            company_id=COMPANY_ID, created_by=USER_ID, created_at=datetime.now(), updated_at=datetime.now()
+        ))
+    await JournalEntry.insert_many(drafts)
+    return leaves
+
+
+async def post_all(entries, concurrency: int):
+    """Mayorizar en paralelo; devuelve (éxitos, conflictos, fallos, duración)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"ok": 0, "conflict": 0, "failed": 0}
+
+    async def post(entry):
+        async with semaphore:
+            try:
+                ok = await LedgerService.post_journal_entry(entry, COMPANY_ID, USER_ID)
+                results["ok" if ok else "failed"] += 1
+            except ConcurrencyConflictError:
+                results["conflict"] += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(post(entry) for entry in entries))
+    return results, time.perf_counter() - t0
+
+
+async def race_same_entry(pairs: int):
+    """Dos copias del mismo asiento en borrador mayorizadas a la vez: una debe ganar"""
+    drafts = await JournalEntry.find(JournalEntry.company_id == COMPANY_ID, JournalEntry.status == "draft").limit(pairs).to_list()
+    outcomes = []
+    for draft in drafts:
+        first, second = await JournalEntry.get(draft.id), await JournalEntry.get(draft.id)
+        results, _ = await post_all([first, second], 2)
+        outcomes.append(results)
+    return outcomes
+
+
+async def verify(leaves, check_running: bool) -> list:
+    """Comparar saldos de cuentas contra las líneas de los asientos mayorizados"""
+    problems = []
+    expected = {code: [Decimal("1000.00"), ZERO] for code in leaves}
+    async for entry in JournalEntry.find(JournalEntry.company_id == COMPANY_ID, JournalEntry.status == "posted"):
+        for line in entry.lines:
+            expected[line.account_code][0] += line.debit
+            expected[line.account_code][1] += line.credit
+
+    accounts = {acc.code: acc for acc in await Account.find(Account.company_id == COMPANY_ID).to_list()}
+    for code in leaves:
+        acc = accounts[code]
+        current = (acc.initial_debit_balance + acc.current_debit_balance, acc.initial_credit_balance + acc.current_credit_balance)
+        if list(current) != expected[code]:
+            problems.append(f"Cuenta {code}: saldo {current} != esperado {tuple(expected[code])}")
+
+    for parent, children in (("101", leaves), ("1", ["101"])):
+        debit = sum((accounts[c].current_debit_balance for c in children), ZERO)
+        credit = sum((accounts[c].current_credit_balance for c in children), ZERO)
+        if accounts[parent].current_debit_balance != debit or accounts[parent].current_credit_balance != credit:
+            problems.append(f"Cuenta padre {parent} no suma a sus hijas")
+
+    if check_running:
+        for code in leaves:
+            acc = accounts[code]
+            running = [acc.initial_debit_balance, acc.initial_credit_balance]
+            rows = LedgerEntry.find(LedgerEntry.account_id == str(acc.id)).sort([("date", 1), ("created_at", 1), ("_id", 1)])
+            async for row in rows:
+                running[0] += row.debit_amount
+                running[1] += row.credit_amount
+                if row.running_debit_balance != running[0] or row.running_credit_balance != running[1]:
+                    problems.append(f"Saldo acumulado incoherente en {code} ({row.reference})")
+                    break
+    return problems
+
+
+async def run(url: str, args) -> bool:
+    database_name = f"load_posting_{int(time.time())}"
+    client = AsyncIOMotorClient(url, maxPoolSize=max(100, args.concurrency * 2))
+    try:
+        await init_beanie(database=client[database_name], document_models=[Account, JournalEntry, LedgerEntry, CompanyVersion, PeriodLock])
+        await data_versions.ensure_epoch()
+        transactional = settings.mongodb_transactions and await supports_transactions(client)
+        print(f"🌱 {args.entries} asientos sobre {args.accounts} cuentas en {database_name} (transacciones: {'sí' if transactional else 'no'})")
+        leaves = await seed(args.entries, args.accounts, args.seed)
+
+        race_entries = min(args.race, args.entries)
+        drafts = await JournalEntry.find(JournalEntry.company_id == COMPANY_ID).skip(race_entries).to_list()
+        results, elapsed = await post_all(drafts, args.concurrency)
+        print(f"⏱️  {results['ok']} mayorizados en {elapsed:.2f}s ({results['ok'] / elapsed:.1f}/s), "
+              f"conflictos: {results['conflict']}, fallos: {results['failed']}")
+
+        outcomes = await race_same_entry(race_entries)
+        race_ok = all(o["ok"] == 1 and o["conflict"] + o["failed"] == 1 for o in outcomes)
+        print(f"🏁 Mayorización doble del mismo asiento: {sum(o['ok'] for o in outcomes)}/{len(outcomes)} ganadores únicos")
+
+        problems = await verify(leaves, check_running=transactional)
+        if not race_ok:
+            problems.append("Una mayorización doble no terminó en exactamente un éxito")
+        if results["failed"]:
+            problems.append(f"{results['failed']} mayorizaciones fallaron")
+        if not transactional:
+            print("⚠️ Sin transacciones no se verifican los saldos acumulados del mayor")
+
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        if not problems:
+            print("✅ Saldos finales iguales a la suma de las líneas")
+        return not problems
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de mayorización concurrente")
+    parser.add_argument("--entries", type=int, default=300)
+    parser.add_argument("--accounts", type=int, default=4, help="Cuentas hoja compartidas por todos los asientos")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--race", type=int, default=10, help="Asientos mayorizados dos veces en simultáneo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--replica-set", action="store_true", help="Levantar un replica set local temporal")
+    parser.add_argument("--mongod", default="mongod")
+    args = parser.parse_args()
+
+    if args.replica_set:
+        async with LocalReplicaSet(args.mongod) as replica_set:
+            ok = await run(replica_set.url, args)
+    else:
+        ok = await run(args.mongodb_url, args)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Pruebas de carga HTTP de punta a punta (httpx + asyncio).
+
+Ejecuta escenarios contra `app.main:app` en el mismo proceso (ASGITransport, con
+el lifespan real y MongoDB local) o contra un servidor ya levantado (--base-url).
+Usa como fixture la base generada por scripts/generate_scale_data.py: lee su
+manifiesto (empresas, usuario y huella) de la colección `scale_fixture`.
+
+Escenarios:
+    login            ráfaga de inicios de sesión
+    journal          crear un asiento balanceado y mayorizarlo (modifica el fixture)
+    balance          balance general a una fecha
+    ledger           mayor general de un mes y movimientos de una cuenta
+    import           importación masiva de saldos iniciales (modifica el fixture: la importación
+                     deja en 0 los saldos actuales de las cuentas que toca; no se ejecuta por
+                     omisión, regenere el fixture después de usarlo)
+
+Para cada escenario informa rendimiento (req/s), latencias p50/p95/p99 y tasa de
+error, y escribe el resultado en JSON junto con el commit y la huella del fixture.
+Con --baseline compara contra una ejecución anterior y termina con código 1 si
+algún escenario empeora más que la tolerancia.
+
+Uso:
+    python scripts/load_testing.py --requests 500 --concurrency 20 --output results.json
+    python scripts/load_testing.py --scenarios balance,ledger --baseline results-main.json
+    python scripts/load_testing.py --base-url http://localhost:8005 --scenarios login
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+DEFAULT_SCENARIOS = ["login", "balance", "ledger", "journal"]
+
+
+class Recorder:
+    """Latencias y estados por nombre de petición"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.status_codes: Dict[str, Dict[int, int]] = {}
+
+    async def request(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        t0 = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.samples.setdefault(name, []).append(elapsed)
+        code = response.status_code if response is not None else 0
+        codes = self.status_codes.setdefault(name, {})
+        codes[code] = codes.get(code, 0) + 1
+        if response is None or response.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        return response
+
+
+class Context:
+    """Datos del fixture compartidos por los escenarios"""
+
+    def __init__(self, manifest: dict, password: str, seed: int):
+        self.manifest = manifest
+        self.password = password
+        self.rng = random.Random(seed)
+        self.run_tag = datetime.now().strftime("%m%d%H%M%S")
+        self.companies = [company["company_id"] for company in manifest["companies"]]
+        self.headers: Dict[str, str] = {}
+        self.leaves: Dict[str, List[dict]] = {}
+        options = manifest.get("options", {})
+        self.start = datetime.strptime(options.get("start_date", "2024-01-01"), "%Y-%m-%d")
+        self.days = 365 * int(options.get("years", 1))
+
+    def random_date(self) -> datetime:
+        return self.start + timedelta(days=self.rng.randrange(self.days))
+
+
+async def prepare(client: httpx.AsyncClient, ctx: Context):
+    """Iniciar sesión una vez y cargar las cuentas de detalle de cada empresa"""
+    response = await client.post("/api/auth/login", json={"username": ctx.manifest["username"], "password": ctx.password})
+    response.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    for company_id in ctx.companies:
+        response = await client.get("/api/accounts/", params={"company_id": company_id}, headers=ctx.headers)
+        response.raise_for_status()
+        accounts = response.json()
+        codes = {account.get("parent_code") for account in accounts}
+        ctx.leaves[company_id] = [account for account in accounts if account["code"] not in codes]
+
+
+async def scenario_login(client, ctx: Context, recorder: Recorder, i: int):
+    await recorder.request(client, "login", "POST", "/api/auth/login",
+                           json={"username": ctx.manifest["username"], "password": ctx.password})
+
+
+async def scenario_journal(client, ctx: Context, recorder: Recorder, i: int):
+    company_id = ctx.rng.choice(ctx.companies)
+    leaves = ctx.leaves[company_id]
+    amount = round(ctx.rng.uniform(10, 5000), 2)
+    debit_account, credit_account = ctx.rng.sample(leaves, 2)
+    entry = {
+        "entry_number": f"LT{ctx.run_tag}-{i:06d}",
+        "date": ctx.random_date().isoformat(),
+        "description": f"PRUEBA DE CARGA {i}",
+        "entry_type": "manual",
+        "lines": [
+            {"account_code": debit_account["code"], "account_name": debit_account["name"], "description": "Débito", "debit": amount, "credit": 0},
+            {"account_code": credit_account["code"], "account_name": credit_account["name"], "description": "Crédito", "debit": 0, "credit": amount},
+        ]
+    }
+    response = await recorder.request(client, "journal:create", "POST", "/api/journal/",
+                                      params={"company_id": company_id}, json=entry, headers=ctx.headers)
+    if response is not None:
+        await recorder.request(client, "journal:post", "POST", f"/api/journal/{response.json()['id']}/post/", headers=ctx.headers)
+
+
+async def scenario_balance(client, ctx: Context, recorder: Recorder, i: int):
+    await recorder.request(client, "reports:balance-general", "GET", "/api/reports/balance-general", headers=ctx.headers, params={
+        "company_id": ctx.rng.choice(ctx.companies),
+        "as_of_date": ctx.random_date().strftime("%Y-%m-%d")
+    })
+
+
+async def scenario_ledger(client, ctx: Context, recorder: Recorder, i: int):
+    company_id = ctx.rng.choice(ctx.companies)
+    start = ctx.random_date().replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    window = {"company_id": company_id, "start_date": start.strftime("%Y-%m-%d"), "end_date": end.strftime("%Y-%m-%d")}
+    await recorder.request(client, "ledger:general", "GET", "/api/ledger/", params=window, headers=ctx.headers)
+    account = ctx.rng.choice(ctx.leaves[company_id])
+    await recorder.request(client, "ledger:account-entries", "GET", f"/api/ledger/account/{account['id']}/entries",
+                           params=window, headers=ctx.headers)
+
+
+async def scenario_import(client, ctx: Context, recorder: Recorder, i: int, batch: int = 100):
+    company_id = ctx.rng.choice(ctx.companies)
+    leaves = ctx.leaves[company_id]
+    balances = [
+        {
+            "account_code": account["code"],
+            "initial_debit_balance": account["initial_debit_balance"],
+            "initial_credit_balance": account["initial_credit_balance"],
+            "parent_code": account.get("parent_code"),
+            "level": account.get("level")
+        }
+        for account in ctx.rng.sample(leaves, min(batch, len(leaves)))
+    ]
+    await recorder.request(client, "accounts:import-initial-balances", "POST", "/api/accounts/import-initial-balances",
+                           params={"company_id": company_id}, json={"balances": balances}, headers=ctx.headers)
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login": scenario_login,
+    "journal": scenario_journal,
+    "balance": scenario_balance,
+    "ledger": scenario_ledger,
+    "import": scenario_import,
+}
+
+
+async def run_scenario(client, ctx: Context, name: str, requests: int, concurrency: int, warmup: int) -> dict:
+    scenario = SCENARIOS[name]
+    for i in range(warmup):
+        await scenario(client, ctx, Recorder(), requests + i)
+
+    recorder = Recorder()
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            await scenario(client, ctx, recorder, i)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    result = {"iterations": requests, "elapsed_s": round(elapsed, 3), "requests": {}}
+    for request_name, samples in recorder.samples.items():
+        errors = recorder.errors.get(request_name, 0)
+        result["requests"][request_name] = {
+            "count": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "latency_ms": latency_summary(samples),
+            "status_codes": {str(code): count for code, count in sorted(recorder.status_codes[request_name].items())}
+        }
+    return result
+
+
+def latency_summary(samples: List[float]) -> dict:
+    if len(samples) > 1:
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = samples[0]
+    return {
+        "p50": round(p50, 2),
+        "p95": round(p95, 2),
+        "p99": round(p99, 2),
+        "mean": round(statistics.mean(samples), 2),
+        "max": round(max(samples), 2)
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regresiones: p95 más alto o rendimiento más bajo que la base en más de `tolerance`"""
+    if baseline.get("fixture") != results.get("fixture"):
+        print("⚠️ La base de comparación usa otro fixture (huella distinta); las cifras no son comparables")
+    regressions = []
+    for scenario, data in results["scenarios"].items():
+        for request_name, current in data["requests"].items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get("requests", {}).get(request_name)
+            if not previous:
+                continue
+            p95_ratio = current["latency_ms"]["p95"] / max(previous["latency_ms"]["p95"], 0.001)
+            rps_ratio = current["throughput_rps"] / max(previous["throughput_rps"], 0.001)
+            marker = "✅"
+            if p95_ratio > 1 + tolerance or rps_ratio < 1 - tolerance or current["error_rate"] > previous["error_rate"]:
+                marker = "❌"
+                regressions.append(request_name)
+            print(f"   {marker} {request_name:<36} p95 x{p95_ratio:.2f}   req/s x{rps_ratio:.2f}   errores {previous['error_rate']:.2%} → {current['error_rate']:.2%}")
+    return regressions
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga HTTP sobre el fixture de escala")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"Lista separada por comas ({', '.join(SCENARIOS)})")
+    parser.add_argument("--requests", type=int, default=200, help="Iteraciones por escenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="Iteraciones de calentamiento (no se miden)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", default=None, help="Servidor ya levantado; por defecto la app en el mismo proceso")
+    parser.add_argument("--mongodb-url", default=None)
+    parser.add_argument("--database", default=None, help="Base del fixture (por defecto <database_name>_scale)")
+    parser.add_argument("--password", default="escala123")
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", default=None, help="Resultados JSON anteriores para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento admitido frente a la base (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(unknown)}")
+    if "import" in scenarios:
+        print("⚠️ El escenario import deja en 0 los saldos actuales de las cuentas importadas: "
+              "regenere el fixture antes de comparar con --baseline")
+
+    # La configuración se lee del entorno al importar la app: apuntarla al fixture antes
+    from app.config import settings
+    database_name = args.database or f"{settings.database_name}_scale"
+    mongodb_url = args.mongodb_url or settings.mongodb_url
+    os.environ["DATABASE_NAME"] = database_name
+    os.environ["MONGODB_URL"] = mongodb_url
+    settings.database_name = database_name
+    settings.mongodb_url = mongodb_url
+
+    mongo = AsyncIOMotorClient(mongodb_url)
+    manifest = await mongo[database_name].scale_fixture.find_one({"_id": "manifest"})
+    mongo.close()
+    if not manifest:
+        print(f"❌ {database_name} no tiene manifiesto; genere el fixture con scripts/generate_scale_data.py")
+        return 1
+
+    ctx = Context(manifest, args.password, args.seed)
+    timeout = httpx.Timeout(120.0)
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(),
+        "fixture": manifest.get("fingerprint"),
+        "target": args.base_url or "in-process",
+        "options": {"requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup, "seed": args.seed},
+        "scenarios": {}
+    }
+
+    async def run_all(client: httpx.AsyncClient):
+        await prepare(client, ctx)
+        for name in scenarios:
+            print(f"🚀 Escenario {name}: {args.requests} iteraciones, concurrencia {args.concurrency}...")
+            results["scenarios"][name] = await run_scenario(client, ctx, name, args.requests, args.concurrency, args.warmup)
+            for request_name, data in results["scenarios"][name]["requests"].items():
+                latency = data["latency_ms"]
+                print(f"   📊 {request_name:<36} {data['throughput_rps']:8.1f} req/s   p50 {latency['p50']:8.1f}   "
+                      f"p95 {latency['p95']:8.1f}   p99 {latency['p99']:8.1f} ms   errores {data['error_rate']:.2%}")
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+            await run_all(client)
+    else:
+        from app.main import app
+        # ASGITransport no ejecuta el lifespan: abrirlo a mano (init_beanie sobre el fixture)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                await run_all(client)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"🔍 Comparando con {args.baseline} (commit {baseline.get('commit')}, tolerancia {args.tolerance:.0%})...")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones: {', '.join(regressions)}")
+            return 1
+        print("✅ Sin regresiones frente a la base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
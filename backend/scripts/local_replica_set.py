@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Replica set local de un nodo para probar la mayorización transaccional.
+
+Las transacciones multi-documento de MongoDB requieren replica set; el contenedor
+de docker-compose es standalone. Este script levanta un `mongod --replSet`
+temporal y:
+
+    serve  -> lo deja corriendo e imprime el MONGODB_URL a usar con el backend
+    check  -> ejecuta una verificación de mayorizar / desmayorizar / revertir,
+              incluida una falla inyectada a mitad de la transacción, y lo detiene
+
+Uso:
+    python scripts/local_replica_set.py check
+    python scripts/local_replica_set.py serve --port 27117
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from app.models.account import Account, AccountType, AccountNature
+from app.models.journal import JournalEntry, JournalLine
+from app.models.ledger import LedgerEntry
+from app.models.company_version import CompanyVersion
+from app.models.period_closing import PeriodLock
+from app.services.ledger_service import LedgerService
+from app.services.transactions import supports_transactions
+
+COMPANY_ID = "rs-check-company"
+USER_ID = "rs-check-user"
+
+
+class LocalReplicaSet:
+    """mongod temporal con replica set de un nodo (se usa como `async with`)"""
+
+    def __init__(self, mongod: str = "mongod", port: int = 27117, set_name: str = "rs0", timeout: float = 30.0):
+        self.mongod = mongod
+        self.port = port
+        self.set_name = set_name
+        self.timeout = timeout
+        self.dbpath = None
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}/?replicaSet={self.set_name}"
+
+    async def __aenter__(self) -> "LocalReplicaSet":
+        binary = shutil.which(self.mongod)
+        if not binary:
+            raise RuntimeError(f"No se encontró el ejecutable '{self.mongod}' (use --mongod)")
+
+        self.dbpath = tempfile.mkdtemp(prefix="accountsystem_rs_")
+        self.process = subprocess.Popen(
+            [
+                binary, "--replSet", self.set_name, "--port", str(self.port),
+                "--bind_ip", "127.0.0.1", "--dbpath", self.dbpath,
+                "--logpath", os.path.join(self.dbpath, "mongod.log")
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            await self._initiate()
+        except Exception:
+            await self.__aexit__(None, None, None)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.dbpath:
+            shutil.rmtree(self.dbpath, ignore_errors=True)
+
+    async def _initiate(self):
+        """Iniciar el replica set y esperar a que el nodo sea primario"""
+        client = AsyncIOMotorClient(f"mongodb://127.0.0.1:{self.port}/?directConnection=true", serverSelectionTimeoutMS=1000)
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"mongod terminó con código {self.process.returncode} (ver {self.dbpath}/mongod.log)")
+                try:
+                    hello = await client.admin.command("hello")
+                    break
+                except Exception:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError("mongod no aceptó conexiones a tiempo")
+                    await asyncio.sleep(0.2)
+
+            if not hello.get("setName"):
+                await client.admin.command("replSetInitiate", {
+                    "_id": self.set_name,
+                    "members": [{"_id": 0, "host": f"127.0.0.1:{self.port}"}]
+                })
+
+            while not hello.get("isWritablePrimary"):
+                if time.monotonic() > deadline:
+                    raise RuntimeError("El replica set no eligió primario a tiempo")
+                await asyncio.sleep(0.2)
+                hello = await client.admin.command("hello")
+        finally:
+            client.close()
+
+
+async def seed_accounts():
+    """Plan mínimo: 1 / 101 / 10101 (caja, bancos) y 2 / 201 / 20101 (proveedores)"""
+    chart = [
+        ("1", "ACTIVO", None, 1), ("101", "ACTIVO CORRIENTE", "1", 2),
+        ("10101", "CAJA", "101", 3), ("10102", "BANCOS", "101", 3),
+        ("2", "PASIVO", None, 1), ("201", "PASIVO CORRIENTE", "2", 2),
+        ("20101", "PROVEEDORES", "201", 3),
+    ]
+    await Account.insert_many([
+        Account(
+            code=code, name=name,
+            account_type=AccountType.ACTIVO if code.startswith("1") else AccountType.PASIVO,
+            nature=AccountNature.DEUDORA if code.startswith("1") else AccountNature.ACREEDORA,
+            parent_code=parent, level=level, company_id=COMPANY_ID, created_by=USER_ID,
+            created_at=datetime.now(), updated_at=datetime.now()
+        )
+        for code, name, parent, level in chart
+    ])
+
+
+async def create_entry(number: str, debit_code: str, credit_code: str, amount: float) -> JournalEntry:
+    entry = JournalEntry(
+        entry_number=number, date=datetime.now(), description=f"Verificación {number}",
+        status="draft", total_debit=amount, total_credit=amount,
+        lines=[
+            JournalLine(account_code=debit_code, account_name=debit_code, description="Débito", debit=amount),
+            JournalLine(account_code=credit_code, account_name=credit_code, description="Crédito", credit=amount),
+        ],
+        company_id=COMPANY_ID, created_by=USER_ID, created_at=datetime.now(), updated_at=datetime.now()
+    )
+    await entry.insert()
+    return entry
+
+
+async def balances() -> dict:
+    return {
+        acc.code: (acc.current_debit_balance, acc.current_credit_balance)
+        for acc in await Account.find(Account.company_id == COMPANY_ID).to_list()
+    }
+
+
+def expect(condition: bool, message: str):
+    if not condition:
+        raise AssertionError(message)
+    print(f"   ✅ {message}")
+
+
+async def run_check(url: str):
+    """Mayorizar, desmayorizar y revertir dentro de transacciones y verificar atomicidad"""
+    database_name = f"rs_check_{int(time.time())}"
+    client = AsyncIOMotorClient(url)
+    try:
+        await init_beanie(database=client[database_name], document_models=[Account, JournalEntry, LedgerEntry, CompanyVersion, PeriodLock])
+        expect(await supports_transactions(client), "El servidor admite transacciones")
+        await seed_accounts()
+
+        print("🔍 Mayorización")
+        entry = await create_entry("CHK-001", "10101", "20101", 150.0)
+        expect(await LedgerService.post_journal_entry(entry, COMPANY_ID, USER_ID), "post_journal_entry devuelve True")
+        state = await balances()
+        expect(state["10101"] == (150.0, 0.0) and state["1"] == (150.0, 0.0), "Saldos de la cuenta y sus padres aplicados")
+        expect(await LedgerEntry.find(LedgerEntry.journal_entry_id == str(entry.id)).count() == 2, "Dos filas en el mayor")
+
+        print("🔍 Falla inyectada a mitad de la transacción")
+        second = await create_entry("CHK-002", "10102", "20101", 80.0)
+        before = await balances()
+        original = LedgerService._apply_balance_deltas
+
+        async def failing_deltas(*args, **kwargs):
+            raise RuntimeError("falla inyectada")
+
+        # Falla después de reclamar el asiento e insertar las filas del mayor
+        LedgerService._apply_balance_deltas = staticmethod(failing_deltas)
+        try:
+            expect(not await LedgerService.post_journal_entry(second, COMPANY_ID, USER_ID), "La mayorización fallida devuelve False")
+        finally:
+            LedgerService._apply_balance_deltas = original
+        expect(await balances() == before, "Ningún saldo cambió tras la falla")
+        expect(await LedgerEntry.find(LedgerEntry.journal_entry_id == str(second.id)).count() == 0, "Ninguna fila del mayor quedó escrita")
+        stored = await JournalEntry.get(second.id)
+        expect(stored.status == "draft" and second.status == "draft", "El asiento sigue en DRAFT")
+
+        print("🔍 Desmayorización")
+        expect(await LedgerService.unpost_journal_entry(entry, COMPANY_ID, USER_ID), "unpost_journal_entry devuelve True")
+        state = await balances()
+        expect(all(value == (0.0, 0.0) for value in state.values()), "Todos los saldos vuelven a cero")
+        expect((await JournalEntry.get(entry.id)).status == "draft", "Estado DRAFT persistido")
+
+        print("🔍 Reversión")
+        expect(await LedgerService.post_journal_entry(entry, COMPANY_ID, USER_ID), "Re-mayorización correcta")
+        expect(await LedgerService.reverse_journal_entry(entry, COMPANY_ID, USER_ID), "reverse_journal_entry devuelve True")
+        reversal = await JournalEntry.find_one(JournalEntry.entry_number == "REV-CHK-001")
+        expect(reversal is not None and reversal.status == "posted", "Asiento de reversión creado y mayorizado")
+        state = await balances()
+        expect(state["10101"] == (150.0, 150.0) and state["20101"] == (150.0, 150.0), "La reversión compensa los saldos")
+
+        print("🎉 Verificación transaccional completada")
+    finally:
+        await client.drop_database(database_name)
+        client.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replica set local para mayorización transaccional")
+    parser.add_argument("command", choices=["serve", "check"])
+    parser.add_argument("--mongod", default="mongod", help="Ruta del ejecutable mongod")
+    parser.add_argument("--port", type=int, default=27117)
+    parser.add_argument("--set-name", default="rs0")
+    args = parser.parse_args()
+
+    async with LocalReplicaSet(args.mongod, args.port, args.set_name) as replica_set:
+        print(f"🚀 Replica set '{args.set_name}' listo en {replica_set.url}")
+        if args.command == "check":
+            await run_check(replica_set.url)
+        else:
+            print(f"💡 Ejecute el backend con MONGODB_URL=\"{replica_set.url}\" (Ctrl+C para detener)")
+            try:
+                while replica_set.process.poll() is None:
+                    await asyncio.sleep(1)
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                pass
+            print("🛑 Deteniendo replica set...")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
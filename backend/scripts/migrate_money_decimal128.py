@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Migración de montos float a Decimal128 (redondeados al centavo).
+
+Convierte saldos de cuentas, totales y líneas de asientos, y montos / saldos
+acumulados del mayor. Es idempotente: los valores que ya son Decimal128 al
+centavo no se reescriben. Al final reporta los asientos que quedan descuadrados
+(antes ocultos por la tolerancia de 0.01).
+
+Uso:
+    python scripts/migrate_money_decimal128.py --dry-run
+    python scripts/migrate_money_decimal128.py --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.config import settings
+from app.models.money import ZERO, to_decimal, to_decimal128
+
+MONEY_FIELDS = {
+    "accounts": [
+        "initial_debit_balance", "initial_credit_balance",
+        "current_debit_balance", "current_credit_balance",
+    ],
+    "journal_entries": ["total_debit", "total_credit"],
+    "ledger_entries": [
+        "debit_amount", "credit_amount",
+        "running_debit_balance", "running_credit_balance",
+    ],
+}
+
+# Campos monetarios dentro de cada línea de asiento
+LINE_FIELDS = ["debit", "credit"]
+
+
+def convert(value):
+    """Devuelve el Decimal128 a escribir, o None si el valor ya está migrado"""
+    target = to_decimal128(value)
+    if value is not None and value == target:
+        return None
+    return target
+
+
+def convert_document(doc: dict, fields: list) -> dict:
+    changes = {}
+    for field in fields:
+        if field in doc:
+            new_value = convert(doc[field])
+            if new_value is not None:
+                changes[field] = new_value
+    if "lines" in doc and isinstance(doc["lines"], list):
+        lines = []
+        dirty = False
+        for line in doc["lines"]:
+            line = dict(line)
+            for field in LINE_FIELDS:
+                new_value = convert(line.get(field, 0))
+                if new_value is not None:
+                    line[field] = new_value
+                    dirty = True
+            lines.append(line)
+        if dirty:
+            changes["lines"] = lines
+    return changes
+
+
+async def migrate_collection(database, name: str, fields: list, batch_size: int, dry_run: bool) -> int:
+    collection = database[name]
+    projection = {field: 1 for field in fields}
+    if name == "journal_entries":
+        projection["lines"] = 1
+
+    total = await collection.count_documents({})
+    converted = 0
+    batch = []
+    async for doc in collection.find({}, projection):
+        changes = convert_document(doc, fields)
+        if not changes:
+            continue
+        converted += 1
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(batch) >= batch_size:
+            if not dry_run:
+                await collection.bulk_write(batch, ordered=False)
+            batch = []
+    if batch and not dry_run:
+        await collection.bulk_write(batch, ordered=False)
+
+    print(f"   📦 {name}: {converted}/{total} documentos {'por convertir' if dry_run else 'convertidos'}")
+    return converted
+
+
+async def report_unbalanced(database) -> int:
+    """Asientos cuyo débito y crédito no son exactamente iguales al centavo"""
+    unbalanced = 0
+    async for doc in database.journal_entries.find({}, {"entry_number": 1, "company_id": 1, "lines": 1}):
+        debit = sum((to_decimal(line.get("debit")) for line in doc.get("lines", [])), ZERO)
+        credit = sum((to_decimal(line.get("credit")) for line in doc.get("lines", [])), ZERO)
+        if debit != credit:
+            unbalanced += 1
+            print(f"   ⚠️ Asiento {doc.get('entry_number')} ({doc.get('company_id')}) descuadrado: D={debit} C={credit}")
+    return unbalanced
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migrar montos float a Decimal128")
+    parser.add_argument("--mongodb-url", default=settings.mongodb_url)
+    parser.add_argument("--database", default=settings.database_name)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar documentos a convertir")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.mongodb_url)
+    database = client[args.database]
+    try:
+        print(f"💰 Migrando montos a Decimal128 en {args.database}{' (simulación)' if args.dry_run else ''}...")
+        for name, fields in MONEY_FIELDS.items():
+            await migrate_collection(database, name, fields, args.batch_size, args.dry_run)
+
+        unbalanced = await report_unbalanced(database)
+        if unbalanced:
+            print(f"⚠️ {unbalanced} asientos descuadrados al centavo; revíselos antes de volver a mayorizarlos")
+        else:
+            print("✅ Todos los asientos cuadran exactamente")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
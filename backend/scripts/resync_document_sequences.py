@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Sincronizar next_sequence de los tipos de documento con los asientos existentes.
+
+El listado de tipos de documento ya no recalcula la secuencia en cada consulta:
+next_sequence se mantiene al crear asientos. Este script calcula la marca de
+agua alta de todas las empresas (o de una) con una sola agregación; ejecútelo
+una vez después de actualizar o tras cargar asientos por fuera de la API.
+
+Uso:
+    python scripts/resync_document_sequences.py
+    python scripts/resync_document_sequences.py --company-id <id>
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from app.config import settings
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry
+from app.services.document_sequences import resync_document_sequences
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Sincronizar secuencias de tipos de documento")
+    parser.add_argument("--company-id", default=None, help="Solo esta empresa (por defecto todas)")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    try:
+        # init_beanie también crea los índices (company_id, code) y (company_id, entry_number)
+        await init_beanie(database=client[settings.database_name], document_models=[DocumentType, JournalEntry])
+        updated = await resync_document_sequences(args.company_id)
+        print(f"✅ {updated} tipos de documento actualizados")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Calcular los formularios 103 y 104 de un mes para todas las empresas activas (o
+para las indicadas) y guardarlos como JSON, uno por empresa y formulario.
+
+Cada formulario es una sola lectura de los asientos mayorizados del mes; las
+empresas se procesan en paralelo (a lo sumo --concurrency a la vez). Con
+--detalle también se escribe el detalle del 103 en NDJSON, leído con cursor.
+
+Uso:
+    python scripts/sri_monthly_forms.py --period 2024-01
+    python scripts/sri_monthly_forms.py --period 2024-01 --company-id <id> --detalle --output ./sri
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie import init_beanie
+from bson import ObjectId
+from app.config import settings
+from app.models.account import Account
+from app.models.company import Company, CompanyStatus
+from app.models.company_version import CompanyVersion
+from app.models.document_type import DocumentType
+from app.models.journal import JournalEntry
+from app.models.period_closing import FiscalArchive
+from app.services.consolidation import gather_bounded
+from app.services.fast_json import dumps
+from app.services.sri_forms import Formulario103, formulario_103, formulario_104, month_bounds, roles_103, roles_104
+
+
+async def process_company(company: Company, period: str, output: str, detail: bool) -> str:
+    started = time.perf_counter()
+    company_id = str(company.id)
+    roles_by_form = {"103": roles_103(), "104": roles_104()}
+    forms = {
+        "103": await formulario_103(company, period, *roles_by_form["103"]),
+        "104": await formulario_104(company, period, *roles_by_form["104"]),
+    }
+    for form, content in forms.items():
+        with open(os.path.join(output, f"{company.ruc}_{period}_formulario_{form}.json"), "wb") as handle:
+            handle.write(dumps(content))
+    if detail:
+        form = await Formulario103.load(company_id, period, *roles_by_form["103"])
+        with open(os.path.join(output, f"{company.ruc}_{period}_formulario_103_detalle.ndjson"), "wb") as handle:
+            async for row in form.rows():
+                handle.write(dumps(row) + b"\n")
+    return (
+        f"✅ {company.name} ({company.ruc}): IVA a pagar {forms['104']['iva']['iva_pagar']}, "
+        f"retenciones {forms['103']['total_retenciones']} en {time.perf_counter() - started:.2f}s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Formularios 103 y 104 del mes para todas las empresas")
+    parser.add_argument("--period", required=True, help="Período YYYY-MM")
+    parser.add_argument("--company-id", action="append", default=[], help="Solo estas empresas (repetible; por defecto todas las activas)")
+    parser.add_argument("--output", default="sri_formularios", help="Directorio de salida")
+    parser.add_argument("--detalle", action="store_true", help="Escribir también el detalle del 103 (NDJSON)")
+    parser.add_argument("--concurrency", type=int, default=settings.consolidation_max_concurrency, help="Empresas calculadas a la vez")
+    args = parser.parse_args()
+    try:
+        month_bounds(args.period)
+    except ValueError:
+        parser.error("Formato de período inválido. Use YYYY-MM")
+
+    os.makedirs(args.output, exist_ok=True)
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    try:
+        await init_beanie(
+            database=client[settings.database_name],
+            document_models=[Account, Company, CompanyVersion, DocumentType, JournalEntry, FiscalArchive]
+        )
+        if args.company_id:
+            companies = await Company.find({"_id": {"$in": [ObjectId(company_id) for company_id in args.company_id]}}).to_list()
+        else:
+            companies = await Company.find(Company.status == CompanyStatus.ACTIVE).to_list()
+
+        print(f"🧾 Formularios {args.period} de {len(companies)} empresas en {args.output}/")
+        started = time.perf_counter()
+        results = await gather_bounded(
+            [lambda company=company: process_company(company, args.period, args.output, args.detalle) for company in companies],
+            args.concurrency
+        )
+        for line in results:
+            print(line)
+        print(f"🏁 {len(companies)} empresas en {time.perf_counter() - started:.2f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())